@@ -0,0 +1,1517 @@
+"""
+Benchmarks & Equivalence Checks for the WiFi Analyzer Fast Paths
+Each subcommand checks a fast path against the original scapy/numpy
+implementation and reports the speedup on synthetic (or your own) traffic.
+
+Usage:
+python3 benchmarks.py decoder [--pcap FILE] [--packets N]
+python3 benchmarks.py columnar [--pcap FILE] [--packets N]
+python3 benchmarks.py sharded [--pcap FILE] [--packets N] [--workers N] [--min-shard-bytes N]
+python3 benchmarks.py expiry [--flows N] [--packets N]
+python3 benchmarks.py memory [--flows N] [--packets N] [--legacy-flows N]
+python3 benchmarks.py flowkey [--flows N] [--packets N]
+python3 benchmarks.py pipeline [--packets N] [--rate N] [--queue-size N] [--workers N]
+python3 benchmarks.py batching [--flows N] [--rate N] [--batch-size N] [--max-wait MS ...]
+python3 benchmarks.py backends [--batch N] [--repeat N]
+python3 benchmarks.py importtime [--repeat N] [--lite]
+python3 benchmarks.py bundle [--flows N] [--repeat N]
+python3 benchmarks.py cascade [--batch N] [--batches N] [--margin X] [--sample-rate X]
+python3 benchmarks.py lstm [--flows N] [--ticks N] [--packets N]
+python3 benchmarks.py tcn [--flows N] [--ticks N] [--packets N]
+python3 benchmarks.py inference [--batch N ...] [--repeat N]
+python3 benchmarks.py onnx [--batch N] [--repeat N] [--threads N ...]
+python3 benchmarks.py dot11 [--pcap FILE] [--packets N]
+sudo python3 benchmarks.py ring [--iface lo] [--seconds N] [--block-size N] [--blocks N] [--timeout MS]
+python3 benchmarks.py pipe [--pcap FILE] [--packets N] [--read-size N]   (or: cat FILE | python3 benchmarks.py pipe -)
+python3 benchmarks.py replay [--pcap FILE] [--packets N] [--timeout S] [--speed X ...] [--batch-size N] [--batch-wait S]
+"""
+
+import argparse
+import json
+import os
+import random
+import struct
+import sys
+import tempfile
+import time
+
+
+def synthetic_packets(count=20000, seed=42):
+    """Build a reproducible mix of Ethernet and RadioTap/802.11 frames"""
+    from scapy.all import (Ether, Dot1Q, IP, IPv6, TCP, UDP, ICMP, ARP, Raw,
+                           RadioTap, Dot11, Dot11QoS, Dot11Beacon, Dot11Elt, LLC, SNAP)
+
+    rng = random.Random(seed)
+    hosts = [f"10.0.{i // 250}.{i % 250 + 1}" for i in range(200)]
+    servers = [f"192.168.1.{i}" for i in range(1, 20)]
+    packets = []
+    timestamp = 1700000000.0
+
+    for _ in range(count):
+        timestamp += rng.random() * 0.002
+        src, dst = rng.choice(hosts), rng.choice(servers)
+        sport, dport = rng.randint(1024, 65535), rng.choice([22, 53, 80, 443, 8080])
+        payload = Raw(b'x' * rng.randint(0, 400))
+        kind = rng.random()
+
+        if kind < 0.40:
+            l4 = TCP(sport=sport, dport=dport, flags=rng.choice(['S', 'SA', 'A', 'PA', 'FA', 'R']),
+                     window=rng.randint(0, 65535), seq=rng.getrandbits(32), ack=rng.getrandbits(32))
+        elif kind < 0.65:
+            l4 = UDP(sport=sport, dport=dport)
+        elif kind < 0.70:
+            l4 = ICMP()
+        else:
+            l4 = None
+
+        link = rng.random()
+        if l4 is not None and link < 0.70:
+            pkt = Ether() / IP(src=src, dst=dst, ttl=rng.randint(1, 255)) / l4 / payload
+        elif l4 is not None and link < 0.80:
+            pkt = Ether() / Dot1Q(vlan=10) / IP(src=src, dst=dst) / l4 / payload
+        elif l4 is not None:
+            pkt = (RadioTap() / Dot11(type=2, subtype=8, FCfield='to_DS') / Dot11QoS() /
+                   LLC() / SNAP() / IP(src=src, dst=dst) / l4 / payload)
+        elif kind < 0.80:
+            pkt = RadioTap() / Dot11(type=0, subtype=8) / Dot11Beacon() / Dot11Elt(ID=0, info=b'lab')
+        elif kind < 0.88:
+            pkt = Ether() / ARP(psrc=src, pdst=dst)
+        elif kind < 0.94:
+            pkt = Ether() / IPv6() / TCP(sport=sport, dport=dport) / payload
+        else:
+            pkt = Ether() / IP(src=src, dst=dst, frag=rng.randint(1, 100)) / payload
+
+        pkt = pkt.__class__(bytes(pkt))
+        pkt.time = timestamp
+        packets.append(pkt)
+
+    return packets
+
+
+def write_synthetic_pcap(path, count=200000, link='Ether', seed=42):
+    """Write a classic pcap of ``count`` records by replaying a synthetic base set
+
+    Only the base set is built with scapy; the records are then repeated
+    with fresh timestamps, so multi-million packet files are cheap to make.
+    """
+    from packet_decoder import _SCAPY_LINKTYPES
+
+    base = [bytes(p) for p in synthetic_packets(min(count, 2000), seed)
+            if p.__class__.__name__ == link]
+    rng = random.Random(seed)
+    timestamp = 1700000000.0
+
+    with open(path, 'wb') as f:
+        f.write(struct.pack('<IHHiIII', 0xA1B2C3D4, 2, 4, 0, 0, 65535, _SCAPY_LINKTYPES[link]))
+        for i in range(count):
+            timestamp += rng.random() * 0.002
+            data = base[i % len(base)]
+            sec = int(timestamp)
+            f.write(struct.pack('<IIII', sec, int((timestamp - sec) * 1e6), len(data), len(data)))
+            f.write(data)
+    return path
+
+
+def _pcap_path(args, default_count):
+    if args.pcap:
+        return args.pcap, False
+    fd, path = tempfile.mkstemp(suffix='.pcap')
+    os.close(fd)
+    return write_synthetic_pcap(path, args.packets or default_count), True
+
+
+def _load_packets(args):
+    if args.pcap:
+        from scapy.all import rdpcap
+        return list(rdpcap(args.pcap, count=args.packets or -1))
+    return synthetic_packets(args.packets or 20000)
+
+
+def _rate(count, seconds):
+    return count / seconds if seconds > 0 else float('inf')
+
+
+def bench_decoder(args):
+    """Raw-bytes decoder vs full scapy dissection + haslayer()"""
+    from scapy.all import conf
+    from packet_decoder import DecodedFrame, decode_frame, _SCAPY_LINKTYPES
+
+    packets = _load_packets(args)
+    frames = [(bytes(p), _SCAPY_LINKTYPES.get(p.__class__.__name__, 1), float(p.time))
+              for p in packets]
+    print(f"[*] {len(frames):,} frames")
+
+    # Equivalence: every field must match the scapy path
+    mismatches = fallbacks = 0
+    for data, linktype, ts in frames:
+        fast = decode_frame(data, linktype, ts)
+        if fast is None:
+            fallbacks += 1
+            continue
+        packet = conf.l2types.num2layer[linktype](data)
+        packet.time = ts
+        slow = DecodedFrame.from_scapy(packet)
+        for field in DecodedFrame.__slots__:
+            a, b = getattr(fast, field), getattr(slow, field)
+            if field == 'timestamp':
+                continue
+            if a != b:
+                mismatches += 1
+                print(f"[!] {field}: fast={a} scapy={b} ({packet.summary()})")
+                break
+
+    print(f"[+] Equivalence: {mismatches} mismatches, {fallbacks} scapy fallbacks")
+
+    # Speed: dissect + haslayer as the extractors did vs fixed-offset decode
+    start = time.perf_counter()
+    for data, linktype, ts in frames:
+        packet = conf.l2types.num2layer[linktype](data)
+        packet.time = ts
+        DecodedFrame.from_scapy(packet)
+    scapy_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for data, linktype, ts in frames:
+        decode_frame(data, linktype, ts)
+    fast_time = time.perf_counter() - start
+
+    print(f"    scapy dissection : {_rate(len(frames), scapy_time):>12,.0f} pkt/s")
+    print(f"    raw decoder      : {_rate(len(frames), fast_time):>12,.0f} pkt/s")
+    print(f"    speedup          : {scapy_time / fast_time:.1f}x")
+    return mismatches == 0
+
+
+def bench_columnar(args):
+    """mmap + NumPy columnar engine vs streaming per-packet extraction"""
+    import numpy as np
+    from wifi_pcap_analyzer import PCAPFeatureExtractor
+
+    path, temporary = _pcap_path(args, 200000)
+    extractor = PCAPFeatureExtractor()
+    try:
+        start = time.perf_counter()
+        _, flows = extractor.process_pcap(path, keep_packet_features=False)
+        stream_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        packet_table, flow_table = extractor.process_pcap_columnar(path)
+        columnar_time = time.perf_counter() - start
+    finally:
+        if temporary:
+            os.remove(path)
+
+    # Equivalence of the flow statistics
+    ok = len(flows) == len(flow_table)
+    if ok:
+        for name in flow_table.dtype.names:
+            expected = [f[name] for f in flows]
+            if flow_table.dtype[name].kind == 'U':
+                ok &= list(flow_table[name]) == expected
+            else:
+                ok &= bool(np.allclose(flow_table[name], expected, rtol=1e-9, atol=1e-9))
+
+    n = len(packet_table)
+    print(f"[+] Equivalence: {'OK' if ok else 'MISMATCH'} ({len(flow_table):,} flows)")
+    print(f"    streaming per-packet : {_rate(n, stream_time):>12,.0f} pkt/s")
+    print(f"    mmap columnar        : {_rate(n, columnar_time):>12,.0f} pkt/s")
+    print(f"    speedup              : {stream_time / columnar_time:.1f}x")
+    return ok
+
+
+def _same_flows(expected, actual):
+    import numpy as np
+    if len(expected) != len(actual):
+        return False
+    for name in expected.dtype.names:
+        if expected.dtype[name].kind in 'iuU':
+            if not np.array_equal(expected[name], actual[name]):
+                return False
+        elif not np.allclose(expected[name], actual[name], rtol=1e-9, atol=1e-12):
+            return False
+    return True
+
+
+def bench_sharded(args):
+    """Multi-process sharded flow aggregation vs the serial columnar engine"""
+    import mmap
+    from pcap_columnar import read_pcap_header, index_records, read_pcap_table, aggregate_flows
+    from pcap_parallel import plan_shards, process_pcap_sharded
+
+    path, temporary = _pcap_path(args, 2000000)
+    try:
+        start = time.perf_counter()
+        table = read_pcap_table(path)
+        expected = aggregate_flows(table)
+        serial_time = time.perf_counter() - start
+        with open(path, 'rb') as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                records = set(index_records(mm, read_pcap_header(mm)[0]).tolist())
+            finally:
+                mm.close()
+        print(f"[*] {len(table):,} packets, {len(expected):,} flows, "
+              f"shards of at least {args.min_shard_bytes:,} bytes")
+        print(f"    serial               : {_rate(len(table), serial_time):>12,.0f} pkt/s")
+
+        ok = True
+        workers = 1
+        while workers <= args.workers:
+            # Every shard must start on a real record header
+            ranges = plan_shards(path, workers, args.min_shard_bytes)
+            synced = all(start in records for start, _ in ranges[1:])
+            start = time.perf_counter()
+            flows, count = process_pcap_sharded(path, workers, args.min_shard_bytes)
+            elapsed = time.perf_counter() - start
+            same = count == len(table) and _same_flows(expected, flows)
+            ok &= same and synced
+            print(f"    {workers:>2} workers, {len(ranges):>2} shards: {_rate(count, elapsed):>12,.0f} pkt/s "
+                  f"({serial_time / elapsed:.1f}x, {'identical' if same else 'MISMATCH'}"
+                  f"{'' if synced else ', shard off a record boundary'})")
+            workers *= 2
+    finally:
+        if temporary:
+            os.remove(path)
+
+    return ok
+
+
+def _flow_frame(i, flags=0x10):
+    """TCP frame of synthetic flow ``i`` (10.x.x.x:port -> 192.168.0.1:443)"""
+    from packet_decoder import DecodedFrame
+
+    frame = DecodedFrame(time.time(), 60 + i % 1400)
+    frame.has_ip = frame.has_tcp = 1
+    frame.ip_proto, frame.ip_ttl = 6, 64
+    frame.src_addr, frame.dst_addr = 0x0A000000 + (i >> 8), 0xC0A80001
+    frame.src_port, frame.dst_port = 1024 + (i & 0xFF), 443
+    frame.tcp_flags = flags
+    return frame
+
+
+def _scan_completed(extractor):
+    """Per-packet flow scan the realtime extractors used before the expiry queue"""
+    current_time = time.time()
+    completed = []
+    with extractor.lock:
+        for flow_key, stats in list(extractor.flow_stats.items()):
+            time_since_last = current_time - stats.last_time if stats.last_time else 0
+            if stats.packet_count >= 5 and (
+                stats.completed or
+                time_since_last > extractor.flow_timeout
+            ):
+                completed.append(flow_key)
+    return completed
+
+
+def bench_expiry(args):
+    """Flow expiry queue vs scanning every live flow on every packet"""
+    from wifi_pcap_analyzer_with_wireshark_and_6_modals_continuous import RealTimeFeatureExtractor
+
+    rng = random.Random(42)
+
+    # Equivalence: same completed set as the scan for FIN/RST and idle flows
+    extractor = RealTimeFeatureExtractor(flow_timeout=0.5)
+    for i in range(2000):
+        for _ in range(5):
+            extractor.update_flow_stats(_flow_frame(i))
+    time.sleep(0.6)
+    for i in range(0, 2000, 2):
+        extractor.update_flow_stats(_flow_frame(i, 0x11 if i % 10 == 0 else 0x10))
+    expected = set(_scan_completed(extractor))
+    actual = extractor.check_completed_flows()
+    ok = len(actual) == len(set(actual)) and set(actual) == expected
+    print(f"[+] Equivalence: {'OK' if ok else 'MISMATCH'} ({len(expected):,} completed flows)")
+
+    # Speed with N live flows that stay active during the measurement
+    extractor = RealTimeFeatureExtractor()
+    frames = [_flow_frame(i) for i in range(args.flows)]
+    for frame in frames:
+        for _ in range(5):
+            extractor.update_flow_stats(frame)
+    print(f"[*] {extractor.get_active_flow_count():,} live flows")
+
+    def run(check, count):
+        start = time.perf_counter()
+        for _ in range(count):
+            extractor.update_flow_stats(frames[rng.randrange(len(frames))])
+            check()
+        return (time.perf_counter() - start) / count
+
+    scan_time = run(lambda: _scan_completed(extractor), max(1, min(args.packets, 20)))
+    queue_time = run(extractor.check_completed_flows, args.packets)
+
+    print(f"    full scan per packet   : {scan_time * 1e6:>12,.1f} us")
+    print(f"    expiry queue per packet: {queue_time * 1e6:>12,.1f} us")
+    print(f"    speedup                : {scan_time / queue_time:,.0f}x")
+    return ok
+
+
+def _legacy_flow_state(flows, frames, sequence_length=20, window_size=50):
+    """Per-flow dict + lists + window/sequence deques as the extractors kept them"""
+    from collections import defaultdict, deque
+
+    flow_windows = defaultdict(lambda: deque(maxlen=window_size))
+    flow_sequences = defaultdict(lambda: deque(maxlen=sequence_length))
+    flow_stats = defaultdict(lambda: {
+        'packet_count': 0, 'byte_count': 0, 'start_time': None, 'last_time': None,
+        'src_ip': None, 'dst_ip': None, 'src_port': None, 'dst_port': None,
+        'protocol': None, 'packet_sizes': [], 'inter_arrival_times': [], 'completed': False
+    })
+    for flow_key, frame, timestamp in frames:
+        stats = flow_stats[flow_key]
+        stats['packet_count'] += 1
+        stats['byte_count'] += frame.length
+        stats['packet_sizes'].append(frame.length)
+        if stats['start_time'] is None:
+            stats['start_time'] = timestamp
+        else:
+            stats['inter_arrival_times'].append(timestamp - stats['last_time'])
+        stats['last_time'] = timestamp
+        stats['src_ip'], stats['dst_ip'] = frame.src_ip, frame.dst_ip
+        stats['protocol'], stats['src_port'], stats['dst_port'] = 'TCP', frame.src_port, frame.dst_port
+        flow_windows[flow_key].append({'length': frame.length, 'time': timestamp})
+        flow_sequences[flow_key].append([frame.length, frame.ip_ttl, frame.tcp_window,
+                                         frame.has_tcp, frame.has_udp])
+    flows.extend((flow_stats, flow_windows, flow_sequences))
+
+
+def _record_flow_state(flows, frames, sequence_length=20):
+    from collections import defaultdict
+    from flow_stats import FlowRecord
+
+    flow_stats = defaultdict(lambda: FlowRecord(sequence_length))
+    for flow_key, frame, timestamp in frames:
+        flow_stats[flow_key].update(frame, timestamp)
+    flows.append(flow_stats)
+
+
+def _bytes_per_flow(build, flow_count, packets_per_flow):
+    import gc
+    import tracemalloc
+
+    frames = []
+    for i in range(flow_count):
+        frame = _flow_frame(i)
+        key = ((frame.src_ip, frame.src_port), (frame.dst_ip, frame.dst_port), 'TCP')
+        frames.append((key, frame))
+    stream = ((key, frame, 1700000000.0 + p * 0.01) for p in range(packets_per_flow)
+              for key, frame in frames)
+
+    # Keys and frames exist before the measurement; only flow state is counted
+    gc.collect()
+    tracemalloc.start()
+    held = []
+    build(held, stream)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return current / flow_count
+
+
+def bench_memory(args):
+    """Bytes per flow: dict/list/deque flow state vs compact FlowRecord"""
+    legacy_flows = args.legacy_flows or args.flows
+    print(f"[*] {args.packets} packets per flow")
+
+    legacy = _bytes_per_flow(_legacy_flow_state, legacy_flows, args.packets)
+    print(f"    dict + lists + deques : {legacy:>10,.0f} bytes/flow  ({legacy_flows:,} flows)")
+    compact = _bytes_per_flow(_record_flow_state, args.flows, args.packets)
+    print(f"    FlowRecord            : {compact:>10,.0f} bytes/flow  ({args.flows:,} flows)")
+    print(f"    reduction             : {legacy / compact:.1f}x")
+
+
+def _tuple_flow_key(frame):
+    """Sorted tuple-of-strings key the extractors built before packed keys"""
+    if not frame.has_ip:
+        return None
+    src_ip, dst_ip = frame.src_ip, frame.dst_ip
+    if frame.has_tcp:
+        return tuple(sorted([(src_ip, frame.src_port), (dst_ip, frame.dst_port)]) + ['TCP'])
+    elif frame.has_udp:
+        return tuple(sorted([(src_ip, frame.src_port), (dst_ip, frame.dst_port)]) + ['UDP'])
+    return tuple(sorted([(src_ip, 0), (dst_ip, 0)]) + ['OTHER'])
+
+
+def bench_flowkey(args):
+    """Packed integer flow keys vs sorted tuples of address strings"""
+    from flow_stats import packet_flow_key
+
+    rng = random.Random(42)
+    frames = []
+    for _ in range(args.packets):
+        frame = _flow_frame(rng.randrange(args.flows), rng.choice([0x02, 0x10, 0x18]))
+        if rng.random() < 0.5:
+            frame.src_addr, frame.dst_addr = frame.dst_addr, frame.src_addr
+            frame.src_port, frame.dst_port = frame.dst_port, frame.src_port
+        if rng.random() < 0.3:
+            frame.has_tcp, frame.has_udp = 0, 1
+        frames.append(frame)
+
+    # Equivalence: both keys must group the packets into the same flows
+    pairs = {(_tuple_flow_key(f), packet_flow_key(f) >> 1) for f in frames}
+    ok = len(pairs) == len({a for a, _ in pairs}) == len({b for _, b in pairs})
+    directions = {(_tuple_flow_key(f), (f.src_ip, f.src_port), packet_flow_key(f) & 1) for f in frames}
+    ok &= len(directions) == len({(k, e) for k, e, _ in directions})
+    print(f"[+] Equivalence: {'OK' if ok else 'MISMATCH'} ({len(pairs):,} flows, {len(frames):,} packets)")
+
+    def run(key_of):
+        counts = {}
+        start = time.perf_counter()
+        for frame in frames:
+            key = key_of(frame)
+            counts[key] = counts.get(key, 0) + 1
+        return (time.perf_counter() - start) / len(frames)
+
+    tuple_time = run(_tuple_flow_key)
+    packed_time = run(lambda f: packet_flow_key(f) >> 1)
+    print(f"    tuple of strings : {tuple_time * 1e9:>8,.0f} ns/packet (key + dict update)")
+    print(f"    packed int       : {packed_time * 1e9:>8,.0f} ns/packet (key + dict update)")
+    print(f"    speedup          : {tuple_time / packed_time:.1f}x")
+    return ok
+
+
+def bench_pipeline(args):
+    """Capture callback latency inline vs through the bounded queue, per overflow policy"""
+    import threading
+    from capture_pipeline import PacketPipeline, OVERFLOW_POLICIES
+    from flow_stats import FlowRecord, packet_flow_key
+
+    rng = random.Random(42)
+    frames = [_flow_frame(rng.randrange(args.flows)) for _ in range(args.packets)]
+    stall = args.stall_ms / 1000.0
+
+    def make_handler():
+        flows = {}
+        lock = threading.Lock()
+        seen = [0]
+
+        def handler(frame):
+            key = packet_flow_key(frame) >> 1
+            with lock:
+                record = flows.get(key)
+                if record is None:
+                    record = flows[key] = FlowRecord(20)
+                record.update(frame, frame.timestamp)
+                seen[0] += 1
+                stalled = seen[0] % args.stall_every == 0
+            # Stand-in for training / inference / printing on the analysis path
+            if stalled:
+                time.sleep(stall)
+        return handler
+
+    def offer(callback):
+        """Feed frames at --rate packets/s; return the worst callback time"""
+        interval = 1.0 / args.rate
+        worst = 0.0
+        start = time.perf_counter()
+        for i, frame in enumerate(frames):
+            delay = start + i * interval - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            t0 = time.perf_counter()
+            callback(frame)
+            worst = max(worst, time.perf_counter() - t0)
+        return worst, time.perf_counter() - start
+
+    print(f"[*] {len(frames):,} packets at {args.rate:,} pkt/s, "
+          f"{args.stall_ms} ms analysis stall every {args.stall_every:,} packets")
+    worst, elapsed = offer(make_handler())
+    print(f"    inline           : worst callback {worst * 1e3:>8.2f} ms | "
+          f"capture took {elapsed:.2f}s | kernel must buffer the stalls")
+
+    ok = True
+    for policy in OVERFLOW_POLICIES:
+        pipeline = PacketPipeline(make_handler(), workers=args.workers, maxsize=args.queue_size,
+                                  policy=policy).start()
+        worst, elapsed = offer(pipeline.submit)
+        pipeline.stop()
+        stats = pipeline.stats()
+        ok &= stats['enqueued'] + stats['dropped'] == len(frames)
+        ok &= stats['processed'] == stats['enqueued'] and stats['errors'] == 0
+        print(f"    {policy:<17}: worst callback {worst * 1e3:>8.2f} ms | "
+              f"capture took {elapsed:.2f}s | {pipeline.summary()}")
+    print(f"[+] Counters: {'OK' if ok else 'MISMATCH'} (enqueued + dropped = offered, processed = enqueued)")
+    return ok
+
+
+def _trained_analyzer(flow_count=400, seed=42, script=None):
+    """Continuous-analyzer (or ``script``) models trained on synthetic flows, plus those flows"""
+    if script is None:
+        import wifi_pcap_analyzer_with_wireshark_and_6_modals_continuous as script
+
+    rng = random.Random(seed)
+    extractor = script.RealTimeFeatureExtractor()
+    for _ in range(flow_count * 10):
+        extractor.update_flow_stats(_flow_frame(rng.randrange(flow_count), rng.choice([0x02, 0x10, 0x18])))
+    keys = list(extractor.flow_stats)
+    features = [extractor.get_flow_features(k) for k in keys]
+    sequences = [extractor.get_flow_sequence(k) for k in keys]
+
+    analyzer = script.MultiModelAnalyzer()
+    if script.__name__ == 'wifi_analyzer_gpu':
+        analyzer.train_all_models(features, sequences)
+    else:
+        analyzer.train_all_models(features, sequences, verbose=False)
+    return analyzer, features, sequences
+
+
+def bench_batching(args):
+    """Per-flow predict_all vs the micro-batching scheduler at several max-wait settings"""
+    import threading
+    from inference_scheduler import MicroBatchScheduler
+
+    analyzer, features, sequences = _trained_analyzer()
+    print(f"[*] Models: {analyzer.bundle.active_models}/6 trained on {len(features)} flows; "
+          f"{args.flows:,} flows arriving at {args.rate:,}/s")
+    order = [random.Random(7).randrange(len(features)) for _ in range(args.flows)]
+
+    start = time.perf_counter()
+    for i in order[:min(args.flows, 500)]:
+        analyzer.predict_all([features[i]], [sequences[i]])
+    per_flow = (time.perf_counter() - start) / min(args.flows, 500)
+    print(f"    one flow per call : {per_flow * 1e3:8.2f} ms/flow | {1 / per_flow:>9,.0f} flows/s")
+
+    ok = True
+    for max_wait in args.max_wait:
+        scored = []
+        done = threading.Event()
+
+        def on_results(results, batch, info):
+            scored.append(results['flow_count'])
+            if sum(scored) == len(order):
+                done.set()
+
+        scheduler = MicroBatchScheduler(analyzer.predict_all, on_results,
+                                        max_batch_size=args.batch_size, max_wait=max_wait / 1000.0).start()
+        interval = 1.0 / args.rate
+        start = time.perf_counter()
+        for n, i in enumerate(order):
+            delay = start + n * interval - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            scheduler.submit([features[i]], [sequences[i]])
+        done.wait(60)
+        scheduler.stop()
+        ok &= sum(scored) == len(order)
+        print(f"    max wait {max_wait:>4g} ms   : {scheduler.summary()}")
+    print(f"[+] All flows scored: {'OK' if ok else 'MISSING'}")
+    return ok
+
+
+def bench_backends(args):
+    """Thread vs process backend of ParallelModelPredictor on large flow batches"""
+    import numpy as np
+    from wifi_pcap_analyzer_with_wireshark_and_6_modals_continuous import ParallelModelPredictor
+
+    analyzer, features, sequences = _trained_analyzer()
+    bundle = analyzer.bundle
+    rng = random.Random(3)
+    batch = [features[rng.randrange(len(features))] for _ in range(args.batch)]
+    X, _, _ = analyzer._prepare_features(batch, bundle.feature_columns)
+    X_scaled = bundle.scaler.transform(X)
+    X_seq = np.array([])
+    print(f"[*] {len(X):,}-flow batches, {bundle.active_models}/6 models, {os.cpu_count()} CPUs")
+
+    outputs = {}
+    for backend in ('thread', 'process'):
+        start = time.perf_counter()
+        predictor = ParallelModelPredictor(bundle.models, backend=backend)
+        setup = time.perf_counter() - start
+        try:
+            outputs[backend] = predictor.predict_all_parallel(X, X_scaled, X_seq)  # warm-up
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                predictor.predict_all_parallel(X, X_scaled, X_seq)
+            per_batch = (time.perf_counter() - start) / args.repeat
+        finally:
+            predictor.close()
+            predictor.executor.shutdown()
+        print(f"    {backend:<8}: {per_batch * 1e3:8.1f} ms/batch | {len(X) / per_batch:>10,.0f} flows/s "
+              f"| setup {setup:.2f}s | {', '.join(outputs[backend]['models_used'])}")
+
+    thread, process = outputs['thread'], outputs['process']
+    ok = thread['models_used'] == process['models_used'] and all(
+        np.allclose(thread[key], process[key]) for key in thread if key != 'models_used')
+    print(f"[+] Equivalence: {'OK' if ok else 'MISMATCH'}")
+    return ok
+
+
+ANALYZER_MODULES = ('wifi_pcap_analyzer', 'wifi_pcap_analyzer_with_wireshark_integration',
+                    'wifi_pcap_analyzer_with_wireshark_and_6_modals',
+                    'wifi_pcap_analyzer_with_wireshark_and_6_modals_continuous', 'wifi_analyzer_gpu')
+HEAVY_MODULES = ('tensorflow', 'sklearn', 'xgboost', 'lightgbm', 'pandas', 'scapy')
+
+
+def _import_time(module, env):
+    """Cumulative import time of ``module`` in a fresh interpreter, and the heavy modules it pulled in"""
+    import subprocess
+    code = (f"import sys, {module}; "
+            f"print('loaded:' + ','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))")
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], capture_output=True,
+                          text=True, env=env, cwd=os.path.dirname(os.path.abspath(__file__)))
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+    micros = 0
+    for line in proc.stderr.splitlines():
+        parts = line.split('|')
+        if len(parts) == 3 and parts[2].strip() == module:
+            micros = int(parts[1])
+    loaded = proc.stdout.rsplit('loaded:', 1)[-1].strip()   # skip the scripts' own start-up output
+    return micros / 1e6, [m for m in loaded.split(',') if m]
+
+
+def bench_importtime(args):
+    """Cold-start import time of each analyzer script (heavy libraries must stay unimported)"""
+    from lazy_imports import LITE_ENV
+    env = dict(os.environ)
+    if args.lite:
+        env[LITE_ENV] = '1'
+    print(f"[*] Fresh interpreter per import, best of {args.repeat}{' (lite mode)' if args.lite else ''}")
+
+    ok = True
+    for module in ANALYZER_MODULES:
+        timings = [_import_time(module, env) for _ in range(args.repeat)]
+        seconds = min(t for t, _ in timings)
+        heavy = timings[-1][1]
+        ok &= not heavy
+        print(f"    {module:<58}: {seconds * 1e3:7.0f} ms | heavy imports: {', '.join(heavy) or 'none'}")
+    print(f"[+] Deferred imports: {'OK' if ok else 'heavy libraries imported at start-up'}")
+    return ok
+
+
+def bench_bundle(args):
+    """Single-file model bundle vs the loose pickle files: load time, equality, schema check"""
+    import pickle
+    from contextlib import redirect_stdout
+    from pathlib import Path
+    import numpy as np
+    import wifi_analyzer_gpu as gpu
+    from model_bundle import BUNDLE_FILE, ModelBundle, load_bundle, read_bundle_header, save_bundle
+
+    with tempfile.TemporaryDirectory() as tmp:
+        gpu.MODEL_DIR = Path(tmp)
+        with redirect_stdout(open(os.devnull, 'w')):
+            analyzer, features, sequences = _trained_analyzer(args.flows, script=gpu)
+        bundle = analyzer.bundle
+        path = gpu.MODEL_DIR / BUNDLE_FILE
+        print(f"[*] {bundle.active_models}/6 models on {len(features):,} flows | "
+              f"bundle {path.stat().st_size / 1e6:.2f} MB")
+
+        # The layout written by earlier versions, one pickle per part
+        for key, name in (('isolation_forest', 'if.pkl'), ('xgboost_classifier', 'xgb.pkl'),
+                          ('rf_fingerprinter', 'rf.pkl'), ('autoencoder_threshold', 'ae_thresh.pkl')):
+            if bundle.models[key] is not None:
+                with open(gpu.MODEL_DIR / name, 'wb') as f:
+                    pickle.dump(bundle.models[key], f)
+        with open(gpu.MODEL_DIR / 'scaler.pkl', 'wb') as f:
+            pickle.dump(bundle.scaler, f)
+        with open(gpu.MODEL_DIR / 'features.pkl', 'wb') as f:
+            pickle.dump(bundle.feature_columns, f)
+
+        loaders = {
+            'loose pickles': lambda: analyzer._load_loose_models(),
+            'bundle': lambda: load_bundle(path),
+        }
+        loaded = {}
+        for label, load in loaders.items():
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                with redirect_stdout(open(os.devnull, 'w')):
+                    loaded[label] = load()
+            print(f"    {label:<14}: {(time.perf_counter() - start) / args.repeat * 1e3:7.1f} ms/load")
+        layout = read_bundle_header(path)['buffers']
+        print(f"    out-of-band: {len(layout):,} arrays, {sum(size for _, size in layout) / 1e6:.2f} MB")
+
+        X, _, _ = analyzer._prepare_features(features, bundle.feature_columns)
+        X_scaled = bundle.scaler.transform(X)
+        ok = True
+        for label, other in loaded.items():
+            ok &= np.allclose(other.scaler.transform(X), X_scaled) and other.feature_columns == bundle.feature_columns
+            for key in ('isolation_forest', 'xgboost_classifier', 'rf_fingerprinter'):
+                if bundle.models[key] is not None:
+                    source = X_scaled if key == 'isolation_forest' else X
+                    ok &= np.array_equal(other.models[key].predict(source), bundle.models[key].predict(source))
+        print(f"[+] Same predictions after reload: {'OK' if ok else 'MISMATCH'}")
+
+        # Parts that do not belong together must be refused
+        original = path.read_bytes()
+        column = json.dumps(bundle.feature_columns[0]).encode()
+        edited = original.replace(column, b'"' + b'x' * (len(column) - 2) + b'"', 1)
+        # Same header over model data that was not written with it (one byte of the last array changed)
+        header = read_bundle_header(path)
+        last = header['data_offset'] + sum(header['buffers'][-1]) - 1
+        swapped = original[:last] + bytes([original[last] ^ 0xFF]) + original[last + 1:]
+        mismatched = ModelBundle(bundle.models, bundle.scaler, bundle.feature_columns[:-1])
+        refused = True
+        for label, write in (('edited header', lambda: path.write_bytes(edited)),
+                             ('foreign model data', lambda: path.write_bytes(swapped)),
+                             ('scaler/columns mismatch', lambda: save_bundle(mismatched, path))):
+            write()
+            try:
+                load_bundle(path)
+                refused = False
+            except ValueError as e:
+                print(f"    {label:<23} refused: {e}")
+        print(f"[+] Schema check: {'OK' if refused else 'tampered bundle was accepted'}")
+        analyzer.close()
+        analyzer.executor.shutdown()
+    return ok and refused
+
+
+def bench_cascade(args):
+    """Full six-model run vs the cascade: inference time saved and detection agreement"""
+    import numpy as np
+    from model_cascade import DEEP_OUTPUTS, ModelCascade
+
+    analyzer, features, sequences = _trained_analyzer()
+    models = analyzer.bundle.models
+    deep_models = [name for name in ('autoencoder', 'lstm_classifier', 'tcn_predictor') if models[name] is not None]
+    print(f"[*] {analyzer.bundle.active_models}/6 models | deep models: {', '.join(deep_models) or 'none'}")
+    if not deep_models:
+        print("[*] No Keras models in this bundle (TensorFlow unavailable): the cascade has nothing to skip")
+
+    rng = random.Random(5)
+    batches = []
+    for _ in range(args.batches):
+        picks = [rng.randrange(len(features)) for _ in range(args.batch)]
+        batches.append(([features[i] for i in picks], [sequences[i] for i in picks]))
+    analyzer.predict_all(*batches[0])   # warm-up
+
+    cascade = ModelCascade(margin=args.margin, sample_rate=args.sample_rate, seed=7)
+    timings, outputs = {}, {}
+    for label, mode in (('full', None), ('cascade', cascade)):
+        analyzer.cascade = mode
+        start = time.perf_counter()
+        outputs[label] = [analyzer.predict_all(*batch) for batch in batches]
+        timings[label] = time.perf_counter() - start
+        print(f"    {label:<8}: {timings[label] / args.batches * 1e3:8.1f} ms/batch")
+
+    full, cascaded = outputs['full'], outputs['cascade']
+    same_cheap = all(np.array_equal(f[key], c[key]) for f, c in zip(full, cascaded)
+                     for key in f if key not in DEEP_OUTPUTS and key != 'models_used')
+    print(f"    {cascade.summary()}")
+    print(f"    measured saving: {timings['full'] - timings['cascade']:.2f}s of {timings['full']:.2f}s")
+    if 'autoencoder_anomalies' in full[0]:
+        agree = np.mean(np.concatenate([f['autoencoder_anomalies'] == c['autoencoder_anomalies']
+                                        for f, c in zip(full, cascaded)]))
+        flagged = np.concatenate([f['autoencoder_anomalies'] == -1 for f in full])
+        kept = np.concatenate([c['autoencoder_anomalies'] == -1 for c in cascaded])[flagged]
+        print(f"    AE verdict agreement: {agree:.1%} measured | "
+              f"{kept.mean() if len(kept) else 1.0:.1%} of full-run AE anomalies kept")
+    print(f"[+] Cheap-model outputs unchanged: {'OK' if same_cheap else 'MISMATCH'}")
+    analyzer.close()
+    return same_cheap
+
+
+def _random_lstm_layers(seed=0, n_classes=5):
+    """Weights in the shape of build_lstm_classifier (LSTM 64 -> LSTM 32 -> Dense 32 -> softmax)"""
+    import numpy as np
+    rng = np.random.default_rng(seed)
+
+    def lstm(inputs, units):
+        return (rng.normal(0, 0.1, (inputs, 4 * units)), rng.normal(0, 0.1, (units, 4 * units)),
+                rng.normal(0, 0.1, 4 * units), 'tanh', 'sigmoid')
+
+    dense = [(rng.normal(0, 0.1, (32, 32)), np.zeros(32), 'relu'),
+             (rng.normal(0, 0.1, (32, n_classes)), np.zeros(n_classes), 'softmax')]
+    return [lstm(5, 64), lstm(64, 32)], dense
+
+
+def bench_lstm(args):
+    """Re-running the windows of flows with new packets vs every flow's window each tick, checked against Keras"""
+    import numpy as np
+    from lazy_imports import tensorflow_available
+    from streaming_models import StreamingLSTM, stream_flows
+    from wifi_pcap_analyzer_with_wireshark_and_6_modals_continuous import RealTimeFeatureExtractor
+
+    extractor = RealTimeFeatureExtractor()
+    length = extractor.sequence_length
+    keras_model = None
+    if tensorflow_available():
+        keras_model = _trained_analyzer()[0].bundle.models['lstm_classifier']
+    if keras_model is not None:
+        engine = StreamingLSTM.from_keras(keras_model)
+        print("[*] Weights of the trained continuous-analyzer LSTM")
+    else:
+        engine = StreamingLSTM(*_random_lstm_layers(), length)
+        print("[*] TensorFlow unavailable: random weights in the build_lstm_classifier shape")
+
+    rng = random.Random(11)
+    stream_time = window_time = keras_time = 0.0
+    agree, worst, keras_diff = [], 0.0, 0.0
+    for tick in range(args.ticks):
+        for _ in range(args.packets):
+            extractor.update_flow_stats(_flow_frame(rng.randrange(args.flows), rng.choice([0x02, 0x10, 0x18])))
+        keys = list(extractor.flow_stats)
+
+        start = time.perf_counter()
+        streamed = stream_flows(engine, extractor, keys)
+        stream_time += time.perf_counter() - start
+
+        start = time.perf_counter()
+        windows = np.array([extractor.get_flow_sequence(key) for key in keys])
+        windowed = engine.predict_sequences(windows)
+        window_time += time.perf_counter() - start
+        if keras_model is not None:
+            start = time.perf_counter()
+            keras_out = keras_model.predict(windows, verbose=0)
+            keras_time += time.perf_counter() - start
+            keras_diff = max(keras_diff, float(np.abs(keras_out - streamed).max()))
+
+        agree.append(np.mean(streamed.argmax(axis=1) == windowed.argmax(axis=1)))
+        worst = max(worst, float(np.abs(streamed - windowed).max()))
+
+    print(f"    {len(keys):,} flows, {args.ticks} ticks of {args.packets:,} packets")
+    print(f"    streamed state : {stream_time / args.ticks * 1e3:8.1f} ms/tick")
+    print(f"    full windows   : {window_time / args.ticks * 1e3:8.1f} ms/tick (numpy)")
+    if keras_model is not None:
+        print(f"    full windows   : {keras_time / args.ticks * 1e3:8.1f} ms/tick (Keras predict)")
+        print(f"    streamed vs Keras predict on the windows: max |diff| {keras_diff:.2e}")
+    else:
+        print("[!] Keras equivalence not checked: needs TensorFlow and a trained LSTM")
+
+    print(f"    vs {length}-packet windows (numpy): {np.mean(agree):.1%} same class, max |diff| {worst:.2e}")
+    ok = worst < 1e-4 and (keras_model is None or keras_diff < 1e-4)
+    print(f"[+] Streaming equivalence (max |diff| < 1e-4): {'OK' if ok else 'MISMATCH'}")
+    return ok
+
+
+def _random_tcn_layers(seed=0, length=20):
+    """Weights in the shape of build_tcn_predictor (Conv1D 64/64/32, dilations 1/2/4 -> MaxPool -> Dense 32 -> 1)"""
+    import numpy as np
+    rng = np.random.default_rng(seed)
+
+    def conv(inputs, filters, dilation):
+        return (rng.normal(0, 0.2, (3, inputs, filters)), rng.normal(0, 0.05, filters), dilation, 'same', 'relu')
+
+    head = [('maxpool', 2, 2), ('flatten',),
+            ('dense', rng.normal(0, 0.05, (length // 2 * 32, 32)), np.zeros(32), 'relu'),
+            ('dense', rng.normal(0, 0.1, (32, 1)), np.zeros(1), 'linear')]
+    return [conv(5, 64, 1), conv(64, 64, 2), conv(64, 32, 4)], head
+
+
+def bench_tcn(args):
+    """Streaming per-flow TCN activations vs re-running every flow's full window each analysis tick"""
+    import numpy as np
+    from lazy_imports import tensorflow_available
+    from streaming_models import StreamingTCN, stream_flows
+    from wifi_pcap_analyzer_with_wireshark_and_6_modals_continuous import RealTimeFeatureExtractor
+
+    extractor = RealTimeFeatureExtractor()
+    length = extractor.sequence_length
+    keras_model = None
+    if tensorflow_available():
+        keras_model = _trained_analyzer()[0].bundle.models['tcn_predictor']
+    if keras_model is not None:
+        engine = StreamingTCN.from_keras(keras_model)
+        print("[*] Weights of the trained continuous-analyzer TCN")
+    else:
+        engine = StreamingTCN(*_random_tcn_layers(length=length), length)
+        print("[*] TensorFlow unavailable: random weights in the build_tcn_predictor shape")
+
+    rng = random.Random(13)
+    stream_time = window_time = keras_time = 0.0
+    worst = keras_diff = 0.0
+    for tick in range(args.ticks):
+        for _ in range(args.packets):
+            extractor.update_flow_stats(_flow_frame(rng.randrange(args.flows), rng.choice([0x02, 0x10, 0x18])))
+        keys = list(extractor.flow_stats)
+
+        start = time.perf_counter()
+        streamed = stream_flows(engine, extractor, keys)
+        stream_time += time.perf_counter() - start
+
+        start = time.perf_counter()
+        windows = np.array([extractor.get_flow_sequence(key) for key in keys])
+        windowed = engine.predict_sequences(windows)
+        window_time += time.perf_counter() - start
+        if keras_model is not None:
+            start = time.perf_counter()
+            keras_out = keras_model.predict(windows, verbose=0)
+            keras_time += time.perf_counter() - start
+            keras_diff = max(keras_diff, float(np.abs(keras_out - windowed).max()))
+
+        scale = max(float(np.abs(windowed).max()), 1.0)
+        worst = max(worst, float(np.abs(streamed - windowed).max()) / scale)
+
+    print(f"    {len(keys):,} flows, {args.ticks} ticks of {args.packets:,} packets")
+    print(f"    streamed activations : {stream_time / args.ticks * 1e3:8.1f} ms/tick")
+    print(f"    full windows         : {window_time / args.ticks * 1e3:8.1f} ms/tick (numpy)")
+    if keras_model is not None:
+        print(f"    full windows         : {keras_time / args.ticks * 1e3:8.1f} ms/tick (Keras predict)")
+        print(f"    numpy vs Keras on the same windows: max |diff| {keras_diff:.2e}")
+    print(f"    vs {length}-packet windows: max relative |diff| {worst:.2e}")
+    ok = worst < 1e-4 and (keras_model is None or keras_diff < 1e-3)
+    print(f"[+] Streaming equivalence: {'OK' if ok else 'MISMATCH'}")
+    return ok
+
+
+# Compiled runners vs Keras: max |diff| relative to the output scale, and the share of equal
+# decisions (autoencoder anomaly flags, LSTM classes); int8 is lossy, so it is held to the decisions
+FLOAT_TOLERANCE = 1e-3
+INT8_TOLERANCE = 0.05      # TCN throughput prediction, relative
+INT8_AGREEMENT = 0.95
+
+
+def bench_inference(args):
+    """Keras predict vs tf.function / TFLite / int8 TFLite runners, per-batch latency on CPU"""
+    import numpy as np
+    from lazy_imports import tensorflow_available
+    from model_bundle import KERAS_MODELS
+    from compiled_models import INFERENCE_MODES, compile_bundle
+
+    if not tensorflow_available():
+        print("[!] TensorFlow unavailable: nothing to compile")
+        return None
+    analyzer, features, sequences = _trained_analyzer()
+    bundle = analyzer.bundle
+    X, _, _ = analyzer._prepare_features(features, bundle.feature_columns)
+    X_scaled = bundle.scaler.transform(X)
+    X_seq = np.array(sequences)
+    inputs = {'autoencoder': X_scaled, 'lstm_classifier': X_seq, 'tcn_predictor': X_seq}
+    runners = {mode: compile_bundle(bundle, mode, inputs) for mode in INFERENCE_MODES[1:]}
+
+    ok = True
+    for key in KERAS_MODELS:
+        model = bundle.models.get(key)
+        if model is None:
+            continue
+        print(f"[*] {key}: median ms per batch over {args.repeat} calls")
+        print(f"    {'batch':>6} | " + " | ".join(f"{mode:>11}" for mode in INFERENCE_MODES))
+        callers = {'keras': lambda x: model.predict(x, verbose=0)}
+        callers.update({mode: runners[mode][key].predict for mode in runners if key in runners[mode]})
+        diffs = dict.fromkeys(callers, 0.0)
+        agree = {mode: [] for mode in callers}
+
+        def decisions(rows, output):
+            if key == 'autoencoder':
+                return np.mean((rows - output) ** 2, axis=1) > bundle.models['autoencoder_threshold']
+            return output.argmax(axis=1) if key == 'lstm_classifier' else None
+        for size in args.batch:
+            rows = np.resize(inputs[key], (size,) + inputs[key].shape[1:]).astype(np.float32)
+            reference = callers['keras'](rows)
+            scale = max(float(np.abs(reference).max()), 1.0)
+            expected = decisions(rows, reference)
+            cells = []
+            for mode in INFERENCE_MODES:
+                if mode not in callers:
+                    cells.append(f"{'n/a':>11}")
+                    continue
+                output = callers[mode](rows)
+                diffs[mode] = max(diffs[mode], float(np.abs(output - reference).max()) / scale)
+                if expected is not None:
+                    agree[mode].append(np.mean(decisions(rows, output) == expected))
+                times = []
+                for _ in range(args.repeat):
+                    start = time.perf_counter()
+                    callers[mode](rows)
+                    times.append(time.perf_counter() - start)
+                cells.append(f"{np.median(times) * 1e3:11.3f}")
+            print(f"    {size:>6} | " + " | ".join(cells))
+        print("    max |diff| / output scale vs Keras: "
+              + ", ".join(f"{mode} {diff:.1e}" for mode, diff in diffs.items() if mode != 'keras'))
+        if agree['keras']:
+            print(f"    same {'anomaly flag' if key == 'autoencoder' else 'class'} as Keras: "
+                  + ", ".join(f"{mode} {np.mean(rate):.1%}" for mode, rate in agree.items() if mode != 'keras'))
+        ok &= all(diffs[mode] < FLOAT_TOLERANCE for mode in ('function', 'tflite') if mode in diffs)
+        if 'tflite-int8' in diffs:
+            ok &= (np.mean(agree['tflite-int8']) >= INT8_AGREEMENT if agree['tflite-int8']
+                   else diffs['tflite-int8'] < INT8_TOLERANCE)
+    print(f"[+] Compiled runners match Keras: {'OK' if ok else 'MISMATCH'} (float32: max |diff| / output scale "
+          f"< {FLOAT_TOLERANCE:g}; int8: decisions >= {INT8_AGREEMENT:.0%} equal, TCN < {INT8_TOLERANCE:g})")
+    return ok
+
+
+def bench_onnx(args):
+    """Native models vs their ONNX export (saved and reloaded with the bundle) in onnxruntime: agreement and batch latency"""
+    import numpy as np
+    from model_bundle import BUNDLE_FILE, load_bundle, save_bundle
+    from onnx_models import ONNX_AVAILABLE, PART_KINDS, export_onnx, onnx_runners
+
+    if not ONNX_AVAILABLE:
+        print("[!] onnxruntime not installed: nothing to compare")
+        return None
+    analyzer, features, sequences = _trained_analyzer()
+    bundle = analyzer.bundle
+    rng = random.Random(5)
+    batch = [features[rng.randrange(len(features))] for _ in range(args.batch)]
+    X, _, _ = analyzer._prepare_features(batch, bundle.feature_columns)
+    X_scaled = bundle.scaler.transform(X)
+    X_seq = np.array([sequences[rng.randrange(len(sequences))] for _ in range(args.batch)])
+    bundle.compiled['onnx'] = export_onnx(bundle)
+    with tempfile.TemporaryDirectory() as directory:
+        # Scored as the analyzers do it: export -> save -> load -> onnxruntime sessions
+        path = os.path.join(directory, BUNDLE_FILE)
+        save_bundle(bundle, path)
+        loaded = load_bundle(path)
+    exported = loaded.compiled.get('onnx', {})
+    missing = [key for key in PART_KINDS if key not in exported and
+               (bundle.scaler if key == 'scaler' else bundle.models.get(key)) is not None]
+    print(f"[*] {len(X):,}-flow batches, exported: {', '.join(exported)}"
+          + (f" | not exported: {', '.join(missing)}" if missing else ""))
+
+    def outputs(model, key):
+        """Comparable outputs of a native or ONNX model: (continuous values, labels or None)"""
+        kind = PART_KINDS[key]
+        if kind == 'scaler':
+            return model.transform(X), None
+        if kind == 'anomaly':
+            return model.score_samples(X_scaled), model.predict(X_scaled)
+        if kind == 'classifier':
+            return model.predict_proba(X), model.predict(X)
+        inputs = X_scaled if key == 'autoencoder' else X_seq
+        return model.predict(inputs, verbose=0), None
+
+    ok = not missing
+    runners = {threads: onnx_runners(loaded, threads) for threads in args.threads}
+    for key in exported:
+        native = bundle.scaler if key == 'scaler' else bundle.models[key]
+        values, labels = outputs(native, key)
+        timings = []
+        for threads in args.threads:
+            runner = runners[threads][key]
+            onnx_values, onnx_labels = outputs(runner, key)
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                outputs(runner, key)
+            timings.append((threads, (time.perf_counter() - start) / args.repeat))
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            outputs(native, key)
+        native_time = (time.perf_counter() - start) / args.repeat
+
+        diff = float(np.abs(np.asarray(onnx_values, dtype=np.float64) - values).max())
+        scale = max(float(np.abs(values).max()), 1.0)
+        agree = 1.0 if labels is None else float(np.mean(np.asarray(onnx_labels) == np.asarray(labels)))
+        ok &= diff / scale < 1e-3 and agree >= 0.99
+        print(f"    {key:<19}: native {native_time * 1e3:7.2f} ms | "
+              + " | ".join(f"ort x{t} {seconds * 1e3:7.2f} ms" for t, seconds in timings)
+              + f" | max |diff| {diff:.1e}" + ("" if labels is None else f", labels {agree:.1%} equal"))
+    print(f"[+] ONNX equivalence: {'OK' if ok else 'MISMATCH'} "
+          f"(tolerance: max |diff| < 1e-3 x output scale, labels >= 99% equal)")
+    return ok
+
+
+def monitor_frames(count=20000, seed=42):
+    """RadioTap frames in a monitor-mode mix: management, control, protected and some plain IP data"""
+    from scapy.all import (IP, UDP, Raw, RadioTap, Dot11, Dot11QoS, Dot11Beacon, Dot11ProbeReq,
+                           Dot11ProbeResp, Dot11Auth, Dot11Deauth, Dot11Elt, LLC, SNAP)
+
+    rng = random.Random(seed)
+    aps = [f"02:00:00:00:00:{i:02x}" for i in range(12)]
+    stations = [f"06:00:00:00:{i // 256:02x}:{i % 256:02x}" for i in range(300)]
+    packets = []
+    timestamp = 1700000000.0
+
+    for _ in range(count):
+        timestamp += rng.random() * 0.002
+        ap, sta = rng.choice(aps), rng.choice(stations)
+        radio = RadioTap(present='Flags+Channel+dBm_AntSignal', Flags=0, ChannelFrequency=2437,
+                         dBm_AntSignal=-rng.randint(30, 90))
+        kind = rng.random()
+        if kind < 0.35:
+            pkt = (radio / Dot11(type=0, subtype=8, addr1='ff:ff:ff:ff:ff:ff', addr2=ap, addr3=ap) /
+                   Dot11Beacon() / Dot11Elt(ID=0, info=ap[-2:].encode()) / Dot11Elt(ID=3, info=b'\x06'))
+        elif kind < 0.45:
+            pkt = (radio / Dot11(type=0, subtype=4, addr1='ff:ff:ff:ff:ff:ff', addr2=sta,
+                                 addr3='ff:ff:ff:ff:ff:ff') / Dot11ProbeReq() / Dot11Elt(ID=0, info=b''))
+        elif kind < 0.50:
+            pkt = radio / Dot11(type=0, subtype=5, addr1=sta, addr2=ap, addr3=ap) / Dot11ProbeResp()
+        elif kind < 0.52:
+            pkt = radio / Dot11(type=0, subtype=11, addr1=ap, addr2=sta, addr3=ap) / Dot11Auth()
+        elif kind < 0.53:
+            pkt = radio / Dot11(type=0, subtype=12, addr1=sta, addr2=ap, addr3=ap) / Dot11Deauth(reason=7)
+        elif kind < 0.73:
+            pkt = radio / Dot11(type=1, subtype=rng.choice([11, 12, 13]), addr1=ap, addr2=sta)
+        elif kind < 0.93:
+            pkt = (radio / Dot11(type=2, subtype=8, FCfield='to_DS+protected', addr1=ap, addr2=sta, addr3=ap) /
+                   Dot11QoS() / Raw(b'x' * rng.randint(40, 400)))
+        else:
+            pkt = (radio / Dot11(type=2, subtype=8, FCfield='to_DS', addr1=ap, addr2=sta, addr3=ap) /
+                   Dot11QoS() / LLC() / SNAP() / IP(src='10.0.0.2', dst='192.168.1.1') /
+                   UDP(sport=rng.randint(1024, 65535), dport=53) / Raw(b'x' * rng.randint(0, 200)))
+        pkt = pkt.__class__(bytes(pkt))
+        pkt.time = timestamp
+        packets.append(pkt)
+
+    return packets
+
+
+def bench_dot11(args):
+    """Raw-byte frame triage + 802.11 aggregator vs scapy dissection of every frame"""
+    from scapy.all import conf
+    from packet_decoder import decode_frame, decode_packet, _SCAPY_LINKTYPES
+    from dot11_frames import FRAME_DOT11, FRAME_IP, WirelessAggregator, classify_frame
+
+    packets = _load_packets(args) if args.pcap else monitor_frames(args.packets or 20000)
+    frames = [(bytes(p), _SCAPY_LINKTYPES.get(p.__class__.__name__, 1), float(p.time))
+              for p in packets]
+    print(f"[*] {len(frames):,} frames")
+
+    # Equivalence: no frame that decodes to an IP flow may lose FRAME_IP
+    kinds = [classify_frame(data, linktype) for data, linktype, _ in frames]
+    lost = 0
+    for (data, linktype, ts), kind in zip(frames, kinds):
+        frame = decode_frame(data, linktype, ts)
+        if frame is not None and frame.has_ip and not kind & FRAME_IP:
+            lost += 1
+            print(f"[!] IP frame classified {kind}: {conf.l2types.num2layer[linktype](data).summary()}")
+    dropped = sum(1 for kind in kinds if not kind)
+    dot11 = sum(1 for kind in kinds if kind & FRAME_DOT11)
+    ip = sum(1 for kind in kinds if kind & FRAME_IP)
+    print(f"[+] Triage: {dropped:,} dropped | {dot11:,} to the 802.11 aggregator | "
+          f"{ip:,} to the flow extractor | {lost} IP frames lost")
+
+    # Speed: sniff() dissection + flow decode of every frame vs triage on the raw bytes
+    start = time.perf_counter()
+    for data, linktype, ts in frames:
+        packet = conf.l2types.num2layer[linktype](data)
+        packet.time = ts
+        decode_packet(packet)
+    scapy_time = time.perf_counter() - start
+
+    aggregator = WirelessAggregator()
+    start = time.perf_counter()
+    for data, linktype, ts in frames:
+        kind = classify_frame(data, linktype)
+        if kind & FRAME_DOT11:
+            aggregator.update(data, linktype, ts)
+        if kind & FRAME_IP:
+            decode_frame(data, linktype, ts)
+    fast_time = time.perf_counter() - start
+
+    print(f"    scapy dissection   : {_rate(len(frames), scapy_time):>12,.0f} pkt/s")
+    print(f"    triage + aggregate : {_rate(len(frames), fast_time):>12,.0f} pkt/s")
+    print(f"[+] Speedup: {scapy_time / fast_time:.1f}x | {aggregator.summary()}")
+    return lost == 0
+
+
+_LOOPBACK_SENDER = """
+import socket, sys, time
+sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW)
+sock.bind((sys.argv[1], 0))
+frames = [bytes.fromhex(h) for h in sys.argv[3:]]
+deadline = time.time() + float(sys.argv[2])
+sent = 0
+while time.time() < deadline:
+    for frame in frames:
+        try:
+            sock.send(frame)
+        except OSError:
+            time.sleep(0.0001)
+    sent += len(frames)
+print(sent)
+"""
+
+
+def bench_ring(args):
+    """AF_PACKET TPACKET_V3 ring vs scapy sniff(): sustained capture rate on loopback traffic"""
+    import subprocess
+    import threading
+    from scapy.all import sniff
+    from capture_filter import KernelCaptureStats
+    from capture_pipeline import iter_raw_frames
+    from packet_decoder import decode_bytes, decode_packet
+    from packet_ring import PacketRing
+
+    frames = [bytes(p) for p in synthetic_packets(200) if p.__class__.__name__ == 'Ether'][:64]
+
+    def run(name, open_capture, read):
+        source, sock = open_capture()
+        stats = KernelCaptureStats()
+        stats.attach(sock, args.iface)
+        active = [True]
+        sender = subprocess.Popen([sys.executable, '-c', _LOOPBACK_SENDER, args.iface, str(args.seconds)]
+                                  + [f.hex() for f in frames], stdout=subprocess.PIPE, text=True)
+        timer = threading.Timer(args.seconds + 0.5, lambda: active.__setitem__(0, False))
+        timer.start()
+        start = time.perf_counter()
+        captured = read(source, lambda: active[0])
+        elapsed = time.perf_counter() - start
+        sent = int(sender.communicate()[0] or 0)
+        stats.detach()
+        source.close()
+        print(f"    {name:<6}: {_rate(captured, elapsed):>10,.0f} frames/s decoded | {captured:,} captured, "
+              f"{stats.drops:,} kernel drops | sender {sent / args.seconds:,.0f} frames/s")
+        return captured, stats.drops
+
+    def read_sniff(sock, is_active):
+        count = [0]
+
+        def handle(packet):
+            decode_packet(packet)
+            count[0] += 1
+        sniff(opened_socket=sock, prn=handle, store=False, stop_filter=lambda _: not is_active(), timeout=args.seconds + 1)
+        return count[0]
+
+    def read_raw(sock, is_active):
+        count = 0
+        for data, linktype, timestamp in iter_raw_frames(sock, is_active, poll=0.1):
+            decode_bytes(data, linktype, timestamp)
+            count += 1
+        return count
+
+    def read_ring(ring, is_active):
+        count = 0
+        for view, linktype, timestamp in ring.frames(is_active, poll=0.1):
+            decode_bytes(view, linktype, timestamp)
+            count += 1
+        return count
+
+    def scapy_socket():
+        from scapy.all import conf
+        sock = conf.L2listen(iface=args.iface)
+        return sock, sock.ins
+
+    def ring_socket():
+        ring = PacketRing(args.iface, block_size=args.block_size, block_count=args.blocks, timeout_ms=args.timeout)
+        return ring, ring.sock
+
+    print(f"[*] {args.seconds}s of {len(frames)} Ethernet/IP frames on {args.iface} per backend "
+          f"(loopback delivers each frame twice: outgoing and incoming)")
+    results = {name: run(name, opener, reader) for name, opener, reader in (
+        ('sniff', scapy_socket, read_sniff),
+        ('raw', scapy_socket, read_raw),
+        ('ring', ring_socket, read_ring),
+    )}
+    ring_rate, sniff_rate = results['ring'][0], results['sniff'][0]
+    print(f"[+] Ring captured {ring_rate / max(sniff_rate, 1):.1f}x the frames sniff() did")
+    return results['ring'][0] > 0
+
+
+def bench_pipe(args):
+    """Incremental pcap stream parsing from a pipe vs scapy reading and dissecting the same file"""
+    import subprocess
+    from scapy.all import PcapReader
+    from packet_decoder import DecodedFrame, decode_bytes, decode_packet
+    from pcap_stream import PcapStream
+
+    fields = [f for f in DecodedFrame.__slots__ if f != 'timestamp']
+
+    def stream_frames(source):
+        stream = PcapStream(source, args.read_size)
+        start = time.perf_counter()
+        frames = [decode_bytes(view, linktype, timestamp) for view, linktype, timestamp in stream.frames()]
+        elapsed = time.perf_counter() - start
+        print(f"    pipe stream : {_rate(len(frames), elapsed):>12,.0f} pkt/s | {stream.bytes / 1e6:,.1f} MB "
+              f"in {stream.reads:,} reads of up to {args.read_size:,} bytes")
+        return frames
+
+    if args.source == '-':
+        print("[*] Reading a pcap stream from stdin")
+        return len(stream_frames(sys.stdin.buffer.raw)) > 0
+
+    path, temporary = _pcap_path(args, 200000)
+    try:
+        # `cat` stands in for dumpcap/tcpdump writing to the pipe
+        writer = subprocess.Popen(['cat', path], stdout=subprocess.PIPE, bufsize=0)
+        frames = stream_frames(writer.stdout)
+        writer.wait()
+
+        start = time.perf_counter()
+        with PcapReader(path) as reader:
+            reference = [decode_packet(packet) for packet in reader]
+        scapy_time = time.perf_counter() - start
+        print(f"    scapy reader: {_rate(len(reference), scapy_time):>12,.0f} pkt/s")
+
+        mismatches = sum(1 for a, b in zip(frames, reference)
+                         if any(getattr(a, f) != getattr(b, f) for f in fields)
+                         or abs(a.timestamp - b.timestamp) > 1e-5)
+        mismatches += abs(len(frames) - len(reference))
+        print(f"[+] Equivalence: {len(frames):,} frames, {mismatches} mismatches")
+        return mismatches == 0
+    finally:
+        if temporary:
+            os.remove(path)
+
+
+def bench_replay(args):
+    """Completed flows and their micro-batches, replayed on the pcap's clock at several speeds and on the wall clock"""
+    import wifi_pcap_analyzer_with_wireshark_and_6_modals_continuous as script
+    from inference_scheduler import MicroBatchScheduler
+    from packet_decoder import decode_bytes
+    from pcap_replay import PcapReplay
+
+    def replay(path, speed, wall_clock=False):
+        source = PcapReplay(path, speed)
+        clock = time.time if wall_clock else source.clock
+        extractor = script.RealTimeFeatureExtractor(flow_timeout=args.timeout, clock=clock)
+        batches = []
+
+        def record(features, sequences):
+            batches.append(tuple(f['flow_id'] for f in features))
+
+        scheduler = MicroBatchScheduler(record, lambda results, features, info: None,
+                                        max_batch_size=args.batch_size, max_wait=args.batch_wait,
+                                        clock=None if wall_clock else clock).start()
+        flows = []
+        for view, linktype, timestamp in source.frames():
+            extractor.update_flow_stats(decode_bytes(view, linktype, timestamp))
+            completed = []
+            for key in extractor.check_completed_flows():
+                features = extractor.get_flow_features(key)
+                if features:
+                    flows.append((key, tuple(sorted(features.items()))))
+                    completed.append(dict(features, flow_id=key))
+                extractor.remove_flow(key)
+            scheduler.submit(completed, [None] * len(completed))
+            scheduler.poll()
+        scheduler.stop()
+        source.close()
+        label = 'wall clock' if wall_clock else (f"{speed:g}x" if speed else 'max speed')
+        print(f"    {label:<10}: {len(flows):>7,} completed flows in {len(batches):,} batches | {source.summary()}")
+        return flows, batches
+
+    path, temporary = _pcap_path(args, 50000)
+    try:
+        print(f"[*] Replaying {path} with a {args.timeout:g}s flow timeout")
+        reference = replay(path, 0)
+        ok = replay(path, 0) == reference
+        for speed in args.speed:
+            ok &= replay(path, speed) == reference
+        wall = replay(path, 0, wall_clock=True)
+        print(f"[+] Determinism: {'OK' if ok else 'MISMATCH'} (same flows, features and batches at every speed) | "
+              f"wall clock: {'same' if wall[0] == reference[0] else 'different'} flows, "
+              f"{'same' if wall[1] == reference[1] else 'different'} batches")
+        return ok
+    finally:
+        if temporary:
+            os.remove(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="WiFi analyzer fast-path benchmarks")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('decoder', help=bench_decoder.__doc__)
+    p.add_argument('--pcap', help="Use frames from this capture instead of synthetic traffic")
+    p.add_argument('--packets', type=int, default=0, help="Number of packets")
+    p.set_defaults(func=bench_decoder)
+
+    p = sub.add_parser('columnar', help=bench_columnar.__doc__)
+    p.add_argument('--pcap', help="Classic libpcap file to decode instead of synthetic traffic")
+    p.add_argument('--packets', type=int, default=0, help="Number of synthetic packets")
+    p.set_defaults(func=bench_columnar)
+
+    p = sub.add_parser('sharded', help=bench_sharded.__doc__)
+    p.add_argument('--pcap', help="Classic libpcap file to process instead of synthetic traffic")
+    p.add_argument('--packets', type=int, default=0, help="Number of synthetic packets")
+    p.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Largest worker count to try")
+    p.add_argument('--min-shard-bytes', type=int, default=8 * 1024 * 1024,
+                   help="Smallest shard per worker; e.g. 4096 forces small inputs through the merge")
+    p.set_defaults(func=bench_sharded)
+
+    p = sub.add_parser('expiry', help=bench_expiry.__doc__)
+    p.add_argument('--flows', type=int, default=100000, help="Number of live flows")
+    p.add_argument('--packets', type=int, default=100000, help="Packets to time with the expiry queue")
+    p.set_defaults(func=bench_expiry)
+
+    p = sub.add_parser('memory', help=bench_memory.__doc__)
+    p.add_argument('--flows', type=int, default=1000000, help="Number of flows")
+    p.add_argument('--packets', type=int, default=10, help="Packets per flow")
+    p.add_argument('--legacy-flows', type=int, default=0,
+                   help="Flows for the legacy layout (default: --flows; it needs several GB at 1M)")
+    p.set_defaults(func=bench_memory)
+
+    p = sub.add_parser('flowkey', help=bench_flowkey.__doc__)
+    p.add_argument('--flows', type=int, default=50000, help="Number of distinct flows")
+    p.add_argument('--packets', type=int, default=500000, help="Number of packets")
+    p.set_defaults(func=bench_flowkey)
+
+    p = sub.add_parser('pipeline', help=bench_pipeline.__doc__)
+    p.add_argument('--packets', type=int, default=50000, help="Packets offered by the capture side")
+    p.add_argument('--flows', type=int, default=2000, help="Number of distinct flows")
+    p.add_argument('--rate', type=int, default=20000, help="Offered packets per second")
+    p.add_argument('--stall-ms', type=int, default=200, help="Simulated model stall in milliseconds")
+    p.add_argument('--stall-every', type=int, default=5000, help="Packets between model stalls")
+    p.add_argument('--queue-size', type=int, default=2000, help="Queue capacity")
+    p.add_argument('--workers', type=int, default=2, help="Analysis worker threads")
+    p.set_defaults(func=bench_pipeline)
+
+    p = sub.add_parser('batching', help=bench_batching.__doc__)
+    p.add_argument('--flows', type=int, default=5000, help="Completed flows to score")
+    p.add_argument('--rate', type=int, default=2000, help="Completed flows per second")
+    p.add_argument('--batch-size', type=int, default=256, help="Largest micro-batch")
+    p.add_argument('--max-wait', type=float, nargs='+', default=[0, 10, 50], help="Max wait settings in ms")
+    p.set_defaults(func=bench_batching)
+
+    p = sub.add_parser('backends', help=bench_backends.__doc__)
+    p.add_argument('--batch', type=int, default=10000, help="Flows per batch")
+    p.add_argument('--repeat', type=int, default=10, help="Timed batches per backend")
+    p.set_defaults(func=bench_backends)
+
+    p = sub.add_parser('importtime', help=bench_importtime.__doc__)
+    p.add_argument('--repeat', type=int, default=3, help="Fresh interpreters per script")
+    p.add_argument('--lite', action='store_true', help="Set WIFI_ANALYZER_LITE=1 for the imports")
+    p.set_defaults(func=bench_importtime)
+
+    p = sub.add_parser('bundle', help=bench_bundle.__doc__)
+    p.add_argument('--flows', type=int, default=400, help="Synthetic flows to train on")
+    p.add_argument('--repeat', type=int, default=20, help="Loads per format")
+    p.set_defaults(func=bench_bundle)
+
+    p = sub.add_parser('cascade', help=bench_cascade.__doc__)
+    p.add_argument('--batch', type=int, default=256, help="Flows per batch")
+    p.add_argument('--batches', type=int, default=20, help="Batches per mode")
+    p.add_argument('--margin', type=float, default=0.05, help="IsolationForest decision margin for escalation")
+    p.add_argument('--sample-rate', type=float, default=0.05, help="Share of other flows escalated at random")
+    p.set_defaults(func=bench_cascade)
+
+    p = sub.add_parser('lstm', help=bench_lstm.__doc__)
+    p.add_argument('--flows', type=int, default=2000, help="Active flows")
+    p.add_argument('--ticks', type=int, default=10, help="Analysis ticks")
+    p.add_argument('--packets', type=int, default=5000, help="Packets between ticks")
+    p.set_defaults(func=bench_lstm)
+
+    p = sub.add_parser('tcn', help=bench_tcn.__doc__)
+    p.add_argument('--flows', type=int, default=2000, help="Active flows")
+    p.add_argument('--ticks', type=int, default=10, help="Analysis ticks")
+    p.add_argument('--packets', type=int, default=5000, help="Packets between ticks")
+    p.set_defaults(func=bench_tcn)
+
+    p = sub.add_parser('inference', help=bench_inference.__doc__)
+    p.add_argument('--batch', type=int, nargs='+', default=[1, 8, 64, 1024], help="Batch sizes")
+    p.add_argument('--repeat', type=int, default=50, help="Calls per batch size and runner")
+    p.set_defaults(func=bench_inference)
+
+    p = sub.add_parser('onnx', help=bench_onnx.__doc__)
+    p.add_argument('--batch', type=int, default=256, help="Flows per batch")
+    p.add_argument('--repeat', type=int, default=20, help="Batches timed per model")
+    p.add_argument('--threads', type=int, nargs='+', default=[1, 2, 4], help="onnxruntime intra-op threads")
+    p.set_defaults(func=bench_onnx)
+
+    p = sub.add_parser('dot11', help=bench_dot11.__doc__)
+    p.add_argument('--pcap', help="Use frames from this capture instead of a synthetic monitor-mode mix")
+    p.add_argument('--packets', type=int, default=0, help="Number of packets")
+    p.set_defaults(func=bench_dot11)
+
+    p = sub.add_parser('ring', help=bench_ring.__doc__)
+    p.add_argument('--iface', default='lo', help="Interface to send and capture on")
+    p.add_argument('--seconds', type=float, default=3.0, help="Send/capture time per backend")
+    p.add_argument('--block-size', type=int, default=1 << 20, help="Ring block size in bytes")
+    p.add_argument('--blocks', type=int, default=64, help="Ring block count")
+    p.add_argument('--timeout', type=int, default=50, help="Block retire timeout in ms")
+    p.set_defaults(func=bench_ring)
+
+    p = sub.add_parser('pipe', help=bench_pipe.__doc__)
+    p.add_argument('source', nargs='?', help="'-' to parse a pcap stream from stdin")
+    p.add_argument('--pcap', help="Classic libpcap file to pipe instead of synthetic traffic")
+    p.add_argument('--packets', type=int, default=0, help="Number of synthetic packets")
+    p.add_argument('--read-size', type=int, default=1 << 20, help="Bytes per pipe read")
+    p.set_defaults(func=bench_pipe)
+
+    p = sub.add_parser('replay', help=bench_replay.__doc__)
+    p.add_argument('--pcap', help="Classic libpcap file to replay instead of synthetic traffic")
+    p.add_argument('--packets', type=int, default=0, help="Number of synthetic packets")
+    p.add_argument('--timeout', type=float, default=1.0, help="Flow timeout in seconds")
+    p.add_argument('--speed', type=float, nargs='+', default=[20.0], help="Paced replay speedups to compare")
+    p.add_argument('--batch-size', type=int, default=64, help="Micro-batch size limit")
+    p.add_argument('--batch-wait', type=float, default=0.05, help="Micro-batch max wait in seconds")
+    p.set_defaults(func=bench_replay)
+
+    args = parser.parse_args()
+    ok = args.func(args)
+    sys.exit(0 if ok in (None, True) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+"""
+Kernel-side capture filtering for LivePacketCapture
+A CaptureScope says which traffic the analyzers want (protocols, subnets,
+ports and, on 802.11 interfaces, frame types) and compiles it into a BPF
+expression. The expression is attached to the capture socket, so the
+kernel discards everything else before it is copied to userspace or
+dissected. Compiling needs libpcap or the tcpdump binary (scapy uses
+whichever it finds).
+
+KernelCaptureStats reads the socket's PACKET_STATISTICS counters (frames
+that passed the filter, frames dropped because the socket buffer or ring
+was full) next to the interface's own receive counters, which shows how much
+of the traffic the filter kept out of Python.
+"""
+
+import ipaddress
+import socket
+import struct
+import threading
+
+from packet_decoder import LINKTYPE_ETHERNET, LINKTYPE_IEEE802_11, LINKTYPE_IEEE802_11_RADIOTAP
+
+SOL_PACKET = 263
+PACKET_STATISTICS = 6
+
+# Scope protocol names -> BPF primitives
+PROTOCOLS = {
+    'ip': 'ip', 'ipv4': 'ip', 'ip6': 'ip6', 'ipv6': 'ip6',
+    'tcp': 'tcp', 'udp': 'udp', 'sctp': 'sctp',
+    'icmp': 'icmp', 'icmp6': 'icmp6', 'arp': 'arp',
+}
+
+# 802.11 frame types and management subtypes -> BPF primitives
+DOT11_TYPES = {
+    'mgt': 'type mgt', 'management': 'type mgt',
+    'ctl': 'type ctl', 'control': 'type ctl',
+    'data': 'type data',
+    'beacon': 'subtype beacon',
+    'probe-req': 'subtype probe-req', 'probe-resp': 'subtype probe-resp',
+    'assoc-req': 'subtype assoc-req', 'assoc-resp': 'subtype assoc-resp',
+    'reassoc-req': 'subtype reassoc-req', 'reassoc-resp': 'subtype reassoc-resp',
+    'auth': 'subtype auth', 'deauth': 'subtype deauth', 'disassoc': 'subtype disassoc',
+}
+
+# /sys/class/net/<interface>/type (ARPHRD_*) -> capture link type
+_ARPHRD_LINKTYPES = {
+    1: LINKTYPE_ETHERNET,
+    772: LINKTYPE_ETHERNET,              # loopback: AF_PACKET sees an Ethernet header
+    801: LINKTYPE_IEEE802_11,
+    803: LINKTYPE_IEEE802_11_RADIOTAP,
+}
+
+_DOT11_LINKTYPES = (LINKTYPE_IEEE802_11, LINKTYPE_IEEE802_11_RADIOTAP)
+
+# CaptureScope.parse keys -> constructor arguments
+_SCOPE_KEYS = {
+    'proto': 'protocols', 'net': 'subnets', 'port': 'ports', 'dot11': 'dot11_types',
+    '!net': 'exclude_subnets', '!port': 'exclude_ports',
+}
+
+
+def interface_linktype(interface):
+    """Capture link type of a Linux interface (Ethernet when it cannot be read)"""
+    try:
+        with open(f"/sys/class/net/{interface}/type") as f:
+            return _ARPHRD_LINKTYPES.get(int(f.read()), LINKTYPE_ETHERNET)
+    except (OSError, ValueError):
+        return LINKTYPE_ETHERNET
+
+
+def _port(value):
+    low, _, high = str(value).partition('-')
+    low, high = int(low), int(high or low)
+    if not 0 < low <= high < 65536:
+        raise ValueError(f"Invalid port or port range {value!r}")
+    return f"port {low}" if low == high else f"portrange {low}-{high}"
+
+
+def _any(primitives):
+    return primitives[0] if len(primitives) == 1 else "(" + " or ".join(primitives) + ")"
+
+
+class CaptureScope:
+    """Declarative description of the traffic to capture, compiled to BPF
+
+    protocols, subnets and ports each keep frames matching any of their
+    entries; the three are combined with "and". exclude_subnets and
+    exclude_ports remove IP traffic (the analyzer's own SSH session, say).
+    On 802.11 interfaces dot11_types keeps frames of those types or
+    subtypes in addition to the IP traffic in scope; it is ignored on
+    Ethernet. An empty scope captures everything.
+    """
+
+    def __init__(self, protocols=(), subnets=(), ports=(), dot11_types=(), exclude_subnets=(), exclude_ports=()):
+        for name in protocols:
+            if name.lower() not in PROTOCOLS:
+                raise ValueError(f"Unknown protocol {name!r}, expected one of {sorted(PROTOCOLS)}")
+        for name in dot11_types:
+            if name.lower() not in DOT11_TYPES:
+                raise ValueError(f"Unknown 802.11 frame type {name!r}, expected one of {sorted(DOT11_TYPES)}")
+        self.protocols = [PROTOCOLS[name.lower()] for name in protocols]
+        self.subnets = [str(ipaddress.ip_network(net, strict=False)) for net in subnets]
+        self.ports = [_port(port) for port in ports]
+        self.dot11_types = [DOT11_TYPES[name.lower()] for name in dot11_types]
+        self.exclude_subnets = [str(ipaddress.ip_network(net, strict=False)) for net in exclude_subnets]
+        self.exclude_ports = [_port(port) for port in exclude_ports]
+
+    @classmethod
+    def parse(cls, text):
+        """Scope from 'proto=tcp,udp net=10.0.0.0/8 port=53,8000-8080 dot11=mgt !port=22' ('' = everything)"""
+        kwargs = {}
+        for item in text.split():
+            key, sep, values = item.partition('=')
+            if not sep or key not in _SCOPE_KEYS:
+                raise ValueError(f"Invalid scope item {item!r}, expected one of "
+                                 f"{', '.join(k + '=...' for k in _SCOPE_KEYS)}")
+            kwargs.setdefault(_SCOPE_KEYS[key], []).extend(v for v in values.split(',') if v)
+        return cls(**kwargs)
+
+    def _ip_expression(self):
+        terms = [_any(group) for group in (self.protocols, [f"net {net}" for net in self.subnets], self.ports)
+                 if group]
+        terms += [f"not {_any(group)}" for group in ([f"net {net}" for net in self.exclude_subnets],
+                                                     self.exclude_ports) if group]
+        return " and ".join(terms)
+
+    def bpf(self, linktype=LINKTYPE_ETHERNET):
+        """BPF expression for an interface of ``linktype``, None to capture everything"""
+        expression = self._ip_expression()
+        if linktype in _DOT11_LINKTYPES and self.dot11_types:
+            dot11 = _any(self.dot11_types)
+            expression = f"{dot11} or ({expression})" if expression else dot11
+        return expression or None
+
+    def __repr__(self):
+        return f"CaptureScope({self.bpf(LINKTYPE_IEEE802_11_RADIOTAP) or 'everything'!r})"
+
+
+class KernelCaptureStats:
+    """Kernel receive / drop counters of the capture socket and its interface
+
+    The socket counters are reset by every read, so they are accumulated
+    here. ``filtered`` estimates the frames the BPF filter kept out of
+    userspace: interface receptions the socket never saw (the socket also
+    sees outgoing frames, so on a busy sender this undercounts).
+    """
+
+    def __init__(self):
+        self.interface = None
+        self.packets = 0           # passed the filter (including drops)
+        self.drops = 0             # passed the filter, lost to a full socket buffer / ring
+        self.bpf = None
+        self._sock = None
+        self._baseline = (0, 0)
+        self._lock = threading.Lock()
+
+    def attach(self, sock, interface, bpf=None):
+        """Start counting for an AF_PACKET socket (anything else has no kernel counters)"""
+        with self._lock:
+            available = isinstance(sock, socket.socket) and sock.family == getattr(socket, 'AF_PACKET', None)
+            self._sock = sock if available else None
+            self.interface = interface
+            self.bpf = bpf
+            self._baseline = self._interface_counters()
+        self.poll()   # discard what the socket counted before the capture started
+        self.packets = self.drops = 0
+
+    def _interface_counters(self):
+        counters = []
+        for name in ('rx_packets', 'rx_dropped'):
+            try:
+                with open(f"/sys/class/net/{self.interface}/statistics/{name}") as f:
+                    counters.append(int(f.read()))
+            except (OSError, ValueError, TypeError):
+                counters.append(0)
+        return tuple(counters)
+
+    def poll(self):
+        """Fold the socket counters read since the last poll into the totals"""
+        with self._lock:
+            if self._sock is None:
+                return
+            try:
+                # struct tpacket_stats(_v3): packets, drops[, freeze_q_cnt]
+                packets, drops = struct.unpack_from('II', self._sock.getsockopt(SOL_PACKET, PACKET_STATISTICS, 12))
+            except OSError:
+                return
+            self.packets += packets
+            self.drops += drops
+
+    def detach(self):
+        self.poll()
+        with self._lock:
+            self._sock = None
+
+    @property
+    def available(self):
+        return self._sock is not None or self.packets > 0
+
+    @property
+    def interface_received(self):
+        return max(0, self._interface_counters()[0] - self._baseline[0])
+
+    @property
+    def interface_dropped(self):
+        return max(0, self._interface_counters()[1] - self._baseline[1])
+
+    @property
+    def filtered(self):
+        return max(0, self.interface_received - self.packets) if self.bpf else 0
+
+    def summary(self):
+        """One-line kernel counter summary for status output"""
+        if not self.available:
+            return "no kernel counters"
+        self.poll()
+        received = self.interface_received
+        line = (f"socket {self.packets:,} received, {self.drops:,} dropped | "
+                f"{self.interface} {received:,} received, {self.interface_dropped:,} dropped")
+        if self.bpf:
+            line += f" | filter kept ~{self.filtered:,} ({self.filtered / max(received, 1):.0%}) out of userspace"
+        return line
+
+
+def attach_bpf(sock, interface, bpf):
+    """Attach ``bpf`` to an AF_PACKET socket; returns it, or None (with a message) if it cannot be compiled"""
+    if not bpf:
+        return None
+    try:
+        from scapy.arch.linux import attach_filter
+        attach_filter(sock, bpf, interface)
+        return bpf
+    except Exception as e:
+        print(f"[!] Capture filter not attached, capturing everything: {e}")
+        return None
+
+
+def open_capture_socket(interface, bpf=None):
+    """(scapy listen socket on ``interface``, BPF expression actually attached)
+
+    When the expression cannot be compiled (no libpcap or tcpdump) the
+    socket is opened without it, with a message.
+    """
+    from scapy.all import conf
+
+    if bpf:
+        try:
+            return conf.L2listen(iface=interface, filter=bpf), bpf
+        except PermissionError:
+            raise
+        except Exception as e:
+            print(f"[!] Capture filter not attached, capturing everything: {e}")
+    return conf.L2listen(iface=interface), None
@@ -0,0 +1,163 @@
+"""
+Capture -> bounded queue -> analysis workers for the realtime analyzers
+The sniff() callback only enqueues the captured frame, so flow updates,
+model training, inference and printing run on worker threads and can no
+longer stall the capture thread (and make the kernel drop packets).
+
+iter_raw_frames reads frames without the per-frame scapy dissection that
+sniff() does, so the capture thread can triage them from their raw bytes.
+The 'ring' capture backend goes further and reads them from an mmap'd
+TPACKET_V3 ring (packet_ring.py); the 'pipe' backend parses the pcap
+stream of a dumpcap/tcpdump child process (pcap_stream.py).
+"""
+
+import queue
+import select
+import threading
+import time
+
+# Overflow policies when the queue is full
+POLICY_BLOCK = 'block'              # wait for room: back-pressure into the kernel buffer
+POLICY_DROP_NEWEST = 'drop-newest'  # drop the incoming frame
+POLICY_SAMPLE = 'sample'            # above half full admit every Nth frame, drop when full
+OVERFLOW_POLICIES = (POLICY_BLOCK, POLICY_DROP_NEWEST, POLICY_SAMPLE)
+
+# LivePacketCapture backends: scapy socket (sniff() or raw reads), AF_PACKET mmap ring,
+# pcap stream from a capture tool's pipe
+CAPTURE_BACKENDS = ('sniff', 'ring', 'pipe')
+
+_STOP = object()
+
+
+class PacketPipeline:
+    """Bounded hand-off between the capture thread and analysis worker threads"""
+
+    def __init__(self, handler, workers=1, maxsize=10000, policy=POLICY_DROP_NEWEST, sample_every=10):
+        if policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy {policy!r}, expected one of {OVERFLOW_POLICIES}")
+        if workers < 1 or maxsize < 1 or sample_every < 1:
+            raise ValueError("workers, maxsize and sample_every must be positive")
+
+        self.handler = handler
+        self.workers = workers
+        self.maxsize = maxsize
+        self.policy = policy
+        self.sample_every = sample_every
+        self.queue = queue.Queue(maxsize=maxsize)
+
+        # Written by the capture thread only
+        self.enqueued = 0
+        self.dropped = 0
+        self.max_depth = 0
+        self._sampled = 0
+
+        # Written by the workers
+        self.processed = 0
+        self.errors = 0
+        self._count_lock = threading.Lock()
+        self._threads = []
+
+    def start(self):
+        """Start the worker threads"""
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"analysis-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def submit(self, packet):
+        """Capture callback: enqueue one frame according to the overflow policy"""
+        if self.policy == POLICY_BLOCK:
+            self.queue.put(packet)
+        else:
+            if self.policy == POLICY_SAMPLE and self.queue.qsize() * 2 >= self.maxsize:
+                self._sampled += 1
+                if self._sampled % self.sample_every:
+                    self.dropped += 1
+                    return
+            try:
+                self.queue.put_nowait(packet)
+            except queue.Full:
+                self.dropped += 1
+                return
+
+        self.enqueued += 1
+        depth = self.queue.qsize()
+        if depth > self.max_depth:
+            self.max_depth = depth
+
+    def stop(self, drain=True):
+        """Stop the workers, after processing what is queued if ``drain``"""
+        if not drain:
+            while True:
+                try:
+                    self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                self.dropped += 1
+                self.queue.task_done()
+
+        for _ in self._threads:
+            self.queue.put(_STOP)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    @property
+    def depth(self):
+        return self.queue.qsize()
+
+    def stats(self):
+        """Counters: enqueued, dropped, processed, errors, depth, max_depth"""
+        return {
+            'enqueued': self.enqueued,
+            'dropped': self.dropped,
+            'processed': self.processed,
+            'errors': self.errors,
+            'depth': self.depth,
+            'max_depth': self.max_depth
+        }
+
+    def summary(self):
+        """One-line counter summary for status output"""
+        return (f"{self.enqueued:,} enqueued | {self.dropped:,} dropped | "
+                f"max depth {self.max_depth:,}/{self.maxsize:,}")
+
+    def _worker(self):
+        while True:
+            packet = self.queue.get()
+            if packet is _STOP:
+                self.queue.task_done()
+                return
+
+            failed = False
+            try:
+                self.handler(packet)
+            except Exception as e:
+                failed = True
+                print(f"[!] Analysis error: {e}")
+            finally:
+                self.queue.task_done()
+
+            with self._count_lock:
+                self.processed += 1
+                self.errors += failed
+
+
+def iter_raw_frames(sock, is_active, poll=0.5):
+    """Undissected (data, linktype, timestamp) frames from an open scapy listen socket
+
+    Stops once ``is_active()`` is false, checked at least every ``poll``
+    seconds. The socket is left open.
+    """
+    from scapy.all import conf, MTU
+    from packet_decoder import LINKTYPE_ETHERNET
+
+    while is_active():
+        ready, _, _ = select.select([sock], [], [], poll)
+        if not ready:
+            continue
+        layer, data, timestamp = sock.recv_raw(MTU)
+        if not data:
+            continue
+        yield data, conf.l2types.layer2num.get(layer, LINKTYPE_ETHERNET), timestamp or time.time()
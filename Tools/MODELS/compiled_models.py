@@ -0,0 +1,181 @@
+"""
+Compiled inference for the Keras models (autoencoder, LSTM, TCN)
+Keras ``model.predict`` builds a data adapter, runs callbacks and dispatches
+a graph on every call; on the small batches the analyzers score, that
+overhead costs more than the math. The runners here skip it:
+
+- 'function': a ``tf.function`` with a fixed input signature (any batch
+  size), traced once per model
+- 'tflite': the model converted to a TFLite flatbuffer, run by the TFLite
+  interpreter
+- 'tflite-int8': the same with int8 weights; activations are quantized too
+  when training data is given as the representative dataset
+- 'onnx': every model, the scaler and the sklearn/XGBoost models too, run
+  by onnxruntime (onnx_models.py)
+
+TFLite and ONNX conversions are made when a bundle is built and saved
+with it (bundle.compiled), so loading a saved bundle does not convert again.
+"""
+
+import threading
+
+import numpy as np
+
+from lazy_imports import import_tensorflow
+from model_bundle import KERAS_MODELS
+
+INFERENCE_MODES = ('keras', 'function', 'tflite', 'tflite-int8', 'onnx')
+
+_MAX_BATCH = 1024            # TFLite batches are split into chunks of at most this
+_REPRESENTATIVE_ROWS = 200   # calibration rows for int8 activation ranges
+_STATIC_BATCH = 16           # batch of models that only convert with a fixed one (the LSTM)
+
+
+class FunctionRunner:
+    """Keras model called through a tf.function traced once for every batch size"""
+
+    def __init__(self, model):
+        tf = import_tensorflow()
+        spec = tf.TensorSpec([None] + list(model.input_shape[1:]), tf.float32)
+        self._function = tf.function(lambda x: model(x, training=False), input_signature=[spec])
+
+    def predict(self, X):
+        return self._function(np.asarray(X, dtype=np.float32)).numpy()
+
+
+class TFLiteRunner:
+    """TFLite interpreter with one allocated instance per power-of-two batch size
+
+    Batches are zero-padded up to the next power of two, so the interpreter
+    is resized at most log2(1024) + 1 times instead of on every new batch
+    size. A model converted with a static batch size is run in chunks of
+    exactly that size instead. Interpreters are not thread-safe; calls are
+    serialised.
+    """
+
+    def __init__(self, content):
+        self.content = content
+        self._interpreters = {}
+        self._static = None      # fixed batch size of the model, 0 if it has none
+        self._lock = threading.Lock()
+
+    def _interpreter(self, batch):
+        interpreter = self._interpreters.get(batch)
+        if interpreter is None:
+            tf = import_tensorflow()
+            interpreter = tf.lite.Interpreter(model_content=self.content)
+            details = interpreter.get_input_details()[0]
+            if not self._static:
+                interpreter.resize_tensor_input(details['index'], [batch] + list(details['shape'][1:]))
+            interpreter.allocate_tensors()
+            self._interpreters[batch] = interpreter
+        return interpreter
+
+    def _static_batch(self):
+        if self._static is None:
+            tf = import_tensorflow()
+            size = int(tf.lite.Interpreter(model_content=self.content).get_input_details()[0]['shape_signature'][0])
+            self._static = max(size, 0)
+        return self._static
+
+    def predict(self, X):
+        X = np.asarray(X, dtype=np.float32)
+        outputs = []
+        with self._lock:
+            static = self._static_batch()
+            step = static or _MAX_BATCH
+            for start in range(0, len(X), step):
+                chunk = X[start:start + step]
+                batch = static or 1 << (len(chunk) - 1).bit_length()
+                if batch > len(chunk):
+                    chunk = np.concatenate([chunk, np.zeros((batch - len(chunk),) + chunk.shape[1:], np.float32)])
+                interpreter = self._interpreter(batch)
+                interpreter.set_tensor(interpreter.get_input_details()[0]['index'], chunk)
+                interpreter.invoke()
+                output = interpreter.get_tensor(interpreter.get_output_details()[0]['index'])
+                outputs.append(output[:min(len(X) - start, step)])
+        return np.concatenate(outputs)
+
+
+def _fixed_batch(model, batch):
+    """Copy of a Sequential model with a static batch size and the same weights"""
+    tf = import_tensorflow()
+    layers = [tf.keras.layers.Input(batch_shape=(batch,) + tuple(model.input_shape[1:]))]
+    layers += [layer.__class__.from_config(layer.get_config()) for layer in model.layers]
+    fixed = tf.keras.Sequential(layers)
+    fixed.set_weights(model.get_weights())
+    return fixed
+
+
+def _convert(model, quantize, representative):
+    tf = import_tensorflow()
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    if quantize:
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        if representative is not None and len(representative):
+            batch = model.input_shape[0] or 1
+            sample = np.asarray(representative[:_REPRESENTATIVE_ROWS], dtype=np.float32)
+            converter.representative_dataset = lambda: ([sample[i:i + batch]]
+                                                        for i in range(0, len(sample) - batch + 1, batch))
+    content = converter.convert()
+    # Fails here rather than on the first batch when the interpreter cannot run it
+    TFLiteRunner(content).predict(np.zeros((2,) + tuple(model.input_shape[1:]), dtype=np.float32))
+    return content
+
+
+def convert_tflite(model, quantize=False, representative=None):
+    """TFLite flatbuffer of a Keras model
+
+    With ``quantize`` the weights are stored as int8; ``representative``
+    rows (training inputs) additionally calibrate int8 activations. Inputs
+    and outputs stay float32 either way. A model that does not convert with
+    a dynamic batch size (Keras 3 LSTMs lower to tensor-list ops that need
+    a static one, and the Flex ops of SELECT_TF_OPS are not in the Python
+    interpreter) is converted with a batch of _STATIC_BATCH and stays
+    float32: calibrating int8 activations through its while loop crashes
+    the TFLite calibrator (TensorFlow 2.21), and int8 weights alone changed
+    the class of about 9% of flows.
+    """
+    try:
+        return _convert(model, quantize, representative)
+    except Exception:
+        return _convert(_fixed_batch(model, _STATIC_BATCH), False, None)
+
+
+def compile_bundle(bundle, mode, representative=None):
+    """Runners for the bundle's Keras models under ``mode`` ({} for plain Keras predict)
+
+    TFLite/ONNX conversions missing from ``bundle.compiled`` are made and
+    stored there, so call this before the bundle is published.
+    ``representative`` maps model keys to training inputs for int8
+    calibration. A model that fails to convert keeps using Keras predict.
+    With 'onnx' the runners also cover the scaler and the sklearn/XGBoost
+    models, under their bundle keys.
+    """
+    if mode not in INFERENCE_MODES:
+        raise ValueError(f"Unknown inference mode {mode!r}, expected one of {INFERENCE_MODES}")
+    if mode == 'onnx':
+        from onnx_models import ONNX_AVAILABLE, export_onnx, onnx_runners
+        if not ONNX_AVAILABLE:
+            print("[!] onnxruntime not installed, using the native models")
+            return {}
+        bundle.compiled['onnx'] = export_onnx(bundle, bundle.compiled.get('onnx'))
+        return onnx_runners(bundle)
+    models = {key: bundle.models.get(key) for key in KERAS_MODELS if bundle.models.get(key) is not None}
+    if mode == 'keras' or not models:
+        return {}
+
+    runners = {}
+    blobs = bundle.compiled.setdefault(mode, {}) if mode != 'function' else None
+    for key, model in models.items():
+        try:
+            if blobs is None:
+                runners[key] = FunctionRunner(model)
+                continue
+            if key not in blobs:
+                blobs[key] = convert_tflite(model, quantize=mode == 'tflite-int8',
+                                            representative=(representative or {}).get(key))
+            runners[key] = TFLiteRunner(blobs[key])
+        except Exception as e:
+            print(f"[!] {key}: {mode} compilation failed, using Keras predict: {e}")
+    return runners
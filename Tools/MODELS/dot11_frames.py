@@ -0,0 +1,465 @@
+"""
+Early frame triage and 802.11 management-frame aggregation for monitor mode
+In monitor mode almost every captured frame is 802.11 without an IP layer:
+beacons, probes, control frames and encrypted data. classify_frame looks
+at a few header bytes of the raw frame, before any dissection, and says
+where it goes. Frames that may carry IP go to the flow extractor. 802.11
+management and data frames go to the WirelessAggregator. Everything else
+(control frames, ARP, ...) is dropped on the spot.
+
+The aggregator keeps one record per BSSID and per station (transmitter
+MAC), updated from beacons, probe requests/responses, (re)association,
+authentication, deauthentication/disassociation and data frames. Its
+feature dicts are plain numbers, like the flow features, and can be saved
+as CSV training data.
+"""
+
+import csv
+import struct
+import threading
+
+from flow_stats import RunningStats
+from packet_decoder import (LINKTYPE_ETHERNET, LINKTYPE_IEEE802_11, LINKTYPE_IEEE802_11_RADIOTAP,
+                            LINKTYPE_IPV4, LINKTYPE_LINUX_SLL, LINKTYPE_RAW, ETH_P_8021AD, ETH_P_8021Q,
+                            ETH_P_IP, ETH_P_IPV6, ETH_P_QINQ)
+
+# classify_frame result bits (0: drop)
+FRAME_IP = 1       # may carry IP: flow extractor
+FRAME_DOT11 = 2    # 802.11 management or data frame: wireless aggregator
+
+# Management frame subtypes
+SUBTYPE_ASSOC_REQ = 0
+SUBTYPE_ASSOC_RESP = 1
+SUBTYPE_REASSOC_REQ = 2
+SUBTYPE_REASSOC_RESP = 3
+SUBTYPE_PROBE_REQ = 4
+SUBTYPE_PROBE_RESP = 5
+SUBTYPE_BEACON = 8
+SUBTYPE_DISASSOC = 10
+SUBTYPE_AUTH = 11
+SUBTYPE_DEAUTH = 12
+
+_ASSOC_SUBTYPES = frozenset((SUBTYPE_ASSOC_REQ, SUBTYPE_ASSOC_RESP, SUBTYPE_REASSOC_REQ, SUBTYPE_REASSOC_RESP))
+
+# Ethertypes the flow extractor may turn into an IP flow (directly, behind
+# VLAN tags, or through scapy for MPLS/PPPoE/...)
+_IP_ETHERTYPES = frozenset((ETH_P_IP, ETH_P_IPV6, ETH_P_8021Q, ETH_P_8021AD, ETH_P_QINQ,
+                            0x8847, 0x8848, 0x8863, 0x8864, 0x6558, 0x88BE, 0x894F))
+
+_SNAP = b'\xaa\xaa\x03\x00\x00\x00'
+_BROADCAST = b'\xff' * 6
+
+_unpack_u16be = struct.Struct('!H').unpack_from
+_unpack_u16le = struct.Struct('<H').unpack_from
+_unpack_u32le = struct.Struct('<I').unpack_from
+
+# RadioTap fields up to antenna signal: (alignment, size) by present bit
+_RADIOTAP_FIELDS = ((8, 8), (1, 1), (1, 1), (2, 4), (1, 2), (1, 1))
+
+
+def _ethertype_class(ethertype):
+    return FRAME_IP if ethertype in _IP_ETHERTYPES or ethertype <= 1500 else 0
+
+
+def classify_frame(data, linktype):
+    """FRAME_IP / FRAME_DOT11 bits for raw frame bytes, 0 for frames to drop
+
+    Reads at most the link header and the LLC/SNAP Ethertype. Anything it
+    cannot rule out as an IP carrier keeps FRAME_IP, so the flow extractor
+    sees every frame it would have turned into a flow.
+    """
+    if linktype == LINKTYPE_IEEE802_11_RADIOTAP:
+        if len(data) < 8:
+            return 0
+        return _classify_dot11(data, _unpack_u16le(data, 2)[0])
+    if linktype == LINKTYPE_IEEE802_11:
+        return _classify_dot11(data, 0)
+    if linktype == LINKTYPE_ETHERNET:
+        return _ethertype_class(_unpack_u16be(data, 12)[0]) if len(data) >= 14 else 0
+    if linktype == LINKTYPE_LINUX_SLL:
+        return _ethertype_class(_unpack_u16be(data, 14)[0]) if len(data) >= 16 else 0
+    if linktype in (LINKTYPE_RAW, LINKTYPE_IPV4):
+        return FRAME_IP if data else 0
+    return FRAME_IP
+
+
+def _classify_dot11(data, offset):
+    if len(data) < offset + 24:
+        return 0
+    fc_type = (data[offset] >> 2) & 0x3
+    if fc_type == 0:
+        return FRAME_DOT11
+    if fc_type != 2:
+        return 0    # control / extension frames
+
+    subtype = data[offset] >> 4
+    fc_flags = data[offset + 1]
+    if fc_flags & 0x40 or subtype & 0x4:
+        return FRAME_DOT11    # protected or null data: no readable IP
+
+    header_len = 30 if fc_flags & 0x03 == 0x03 else 24
+    if subtype & 0x8:
+        if len(data) < offset + header_len + 2 or fc_flags & 0x80 or data[offset + header_len] & 0x80:
+            return FRAME_DOT11 | FRAME_IP    # A-MSDU / +HTC: left to the decoder's scapy fallback
+        header_len += 2
+    llc = offset + header_len
+    if len(data) >= llc + 8 and data[llc:llc + 6] == _SNAP:
+        return FRAME_DOT11 | _ethertype_class(_unpack_u16be(data, llc + 6)[0])
+    return FRAME_DOT11
+
+
+def radiotap_header(data):
+    """(header length, flags, frequency MHz, antenna signal dBm) of a RadioTap header
+
+    Fields that are not present are None. Only the fields before the
+    antenna signal are walked, so vendor extensions do not matter.
+    """
+    length = _unpack_u16le(data, 2)[0]
+    present = _unpack_u32le(data, 4)[0]
+    offset = 8
+    word = present
+    while word & 0x80000000 and offset + 4 <= length:
+        word = _unpack_u32le(data, offset)[0]
+        offset += 4
+
+    flags = frequency = signal = None
+    for bit, (align, size) in enumerate(_RADIOTAP_FIELDS):
+        if not present & (1 << bit):
+            continue
+        offset = -(-offset // align) * align
+        if offset + size > length:
+            break
+        if bit == 1:
+            flags = data[offset]
+        elif bit == 3:
+            frequency = _unpack_u16le(data, offset)[0]
+        elif bit == 5:
+            signal = data[offset] - 256 if data[offset] > 127 else data[offset]
+        offset += size
+    return length, flags, frequency, signal
+
+
+def _information_elements(data, offset, end):
+    """SSID and DS channel from the tagged parameters of a beacon / probe"""
+    ssid = channel = None
+    while offset + 2 <= end:
+        tag, size = data[offset], data[offset + 1]
+        value = data[offset + 2:offset + 2 + size]
+        if len(value) < size:
+            break
+        if tag == 0 and ssid is None:
+            ssid = bytes(value).decode('utf-8', 'replace')
+        elif tag == 3 and size == 1:
+            channel = value[0]
+        offset += 2 + size
+    return ssid, channel
+
+
+def _mac(raw):
+    return ':'.join(f'{b:02x}' for b in raw)
+
+
+class BssidRecord:
+    """What one access point advertised and carried"""
+
+    __slots__ = ('bssid', 'ssid', 'channel', 'frequency', 'privacy', 'beacon_interval',
+                 'beacons', 'probe_responses', 'auth_frames', 'assoc_frames', 'deauth_frames',
+                 'disassoc_frames', 'data_frames', 'data_bytes', 'stations', 'signal',
+                 'first_seen', 'last_seen')
+
+    def __init__(self, bssid, timestamp):
+        self.bssid = bssid
+        self.ssid = None
+        self.channel = 0
+        self.frequency = 0
+        self.privacy = 0
+        self.beacon_interval = 0
+        self.beacons = 0
+        self.probe_responses = 0
+        self.auth_frames = 0
+        self.assoc_frames = 0
+        self.deauth_frames = 0
+        self.disassoc_frames = 0
+        self.data_frames = 0
+        self.data_bytes = 0
+        self.stations = set()
+        self.signal = RunningStats()
+        self.first_seen = timestamp
+        self.last_seen = timestamp
+
+    def features(self):
+        duration = self.last_seen - self.first_seen
+        return {
+            'channel': self.channel,
+            'frequency': self.frequency,
+            'privacy': self.privacy,
+            'beacon_interval': self.beacon_interval,
+            'beacons': self.beacons,
+            'beacon_rate': self.beacons / max(duration, 1.0),
+            'probe_responses': self.probe_responses,
+            'auth_frames': self.auth_frames,
+            'assoc_frames': self.assoc_frames,
+            'deauth_frames': self.deauth_frames,
+            'disassoc_frames': self.disassoc_frames,
+            'data_frames': self.data_frames,
+            'data_bytes': self.data_bytes,
+            'stations': len(self.stations),
+            'signal_mean': self.signal.mean,
+            'signal_std': self.signal.std,
+            'signal_min': self.signal.min or 0,
+            'signal_max': self.signal.max or 0,
+            'duration': duration,
+        }
+
+
+class StationRecord:
+    """What one client station sent and received"""
+
+    __slots__ = ('station', 'bssid', 'bssids', 'probe_requests', 'wildcard_probes', 'probed_ssids',
+                 'auth_frames', 'assoc_frames', 'deauth_frames', 'disassoc_frames',
+                 'data_frames', 'data_bytes', 'frames', 'signal', 'first_seen', 'last_seen')
+
+    def __init__(self, station, timestamp):
+        self.station = station
+        self.bssid = None
+        self.bssids = set()
+        self.probe_requests = 0
+        self.wildcard_probes = 0
+        self.probed_ssids = set()
+        self.auth_frames = 0
+        self.assoc_frames = 0
+        self.deauth_frames = 0
+        self.disassoc_frames = 0
+        self.data_frames = 0
+        self.data_bytes = 0
+        self.frames = 0
+        self.signal = RunningStats()
+        self.first_seen = timestamp
+        self.last_seen = timestamp
+
+    def features(self):
+        duration = self.last_seen - self.first_seen
+        return {
+            'probe_requests': self.probe_requests,
+            'wildcard_probes': self.wildcard_probes,
+            'probed_ssids': len(self.probed_ssids),
+            'auth_frames': self.auth_frames,
+            'assoc_frames': self.assoc_frames,
+            'deauth_frames': self.deauth_frames,
+            'disassoc_frames': self.disassoc_frames,
+            'data_frames': self.data_frames,
+            'data_bytes': self.data_bytes,
+            'bssids': len(self.bssids),
+            'frame_rate': self.frames / max(duration, 1.0),
+            'signal_mean': self.signal.mean,
+            'signal_std': self.signal.std,
+            'signal_min': self.signal.min or 0,
+            'signal_max': self.signal.max or 0,
+            'duration': duration,
+        }
+
+
+class WirelessAggregator:
+    """Per-BSSID and per-station records built from raw 802.11 frames (thread-safe)
+
+    Records idle for ``idle_timeout`` seconds of capture time are handed
+    out by ``expire`` and forgotten.
+    """
+
+    def __init__(self, idle_timeout=300):
+        self.idle_timeout = idle_timeout
+        self.bssids = {}
+        self.stations = {}
+        self.frames = 0
+        self.malformed = 0
+        self.last_seen = 0.0
+        self._lock = threading.Lock()
+
+    def _bssid(self, mac, timestamp):
+        record = self.bssids.get(mac)
+        if record is None:
+            record = self.bssids[mac] = BssidRecord(mac, timestamp)
+        record.last_seen = timestamp
+        return record
+
+    def _station(self, mac, timestamp):
+        record = self.stations.get(mac)
+        if record is None:
+            record = self.stations[mac] = StationRecord(mac, timestamp)
+        record.last_seen = timestamp
+        return record
+
+    def update(self, data, linktype, timestamp):
+        """Fold one raw 802.11 frame into the records; False if it is not one we read"""
+        frequency = signal = None
+        offset, end = 0, len(data)
+        if linktype == LINKTYPE_IEEE802_11_RADIOTAP:
+            if len(data) < 8:
+                return False
+            offset, flags, frequency, signal = radiotap_header(data)
+            if flags is not None and flags & 0x10:
+                end -= 4    # trailing FCS
+        elif linktype != LINKTYPE_IEEE802_11:
+            return False
+        if end < offset + 24:
+            with self._lock:
+                self.malformed += 1
+            return False
+
+        fc_type = (data[offset] >> 2) & 0x3
+        if fc_type not in (0, 2):
+            return False
+        subtype = data[offset] >> 4
+        fc_flags = data[offset + 1]
+        addr1 = bytes(data[offset + 4:offset + 10])
+        addr2 = bytes(data[offset + 10:offset + 16])
+        addr3 = bytes(data[offset + 16:offset + 22])
+
+        with self._lock:
+            self.frames += 1
+            self.last_seen = max(self.last_seen, timestamp)
+            if fc_type == 0:
+                self._management(data, offset + 24, end, subtype, addr1, addr2, addr3,
+                                 timestamp, frequency, signal)
+            else:
+                self._data(fc_flags, addr1, addr2, addr3, end - offset, timestamp, signal)
+        return True
+
+    def _management(self, data, body, end, subtype, addr1, addr2, addr3, timestamp, frequency, signal):
+        # addr1 = receiver, addr2 = transmitter, addr3 = BSSID
+        from_ap = addr2 == addr3
+        if subtype in (SUBTYPE_BEACON, SUBTYPE_PROBE_RESP):
+            ap = self._bssid(_mac(addr3), timestamp)
+            if subtype == SUBTYPE_BEACON:
+                ap.beacons += 1
+            else:
+                ap.probe_responses += 1
+            if signal is not None:
+                ap.signal.add(signal)
+            if frequency:
+                ap.frequency = frequency
+            if end >= body + 12:
+                ap.beacon_interval = _unpack_u16le(data, body + 8)[0]
+                ap.privacy = (_unpack_u16le(data, body + 10)[0] >> 4) & 1
+                ssid, channel = _information_elements(data, body + 12, end)
+                if ssid is not None and (ap.ssid is None or ssid):
+                    ap.ssid = ssid
+                if channel:
+                    ap.channel = channel
+            return
+
+        if subtype == SUBTYPE_PROBE_REQ:
+            station = self._station(_mac(addr2), timestamp)
+            station.frames += 1
+            station.probe_requests += 1
+            if signal is not None:
+                station.signal.add(signal)
+            ssid, _ = _information_elements(data, body, end)
+            if ssid:
+                station.probed_ssids.add(ssid)
+            else:
+                station.wildcard_probes += 1
+            return
+
+        if addr3 == _BROADCAST:
+            return
+        ap = self._bssid(_mac(addr3), timestamp)
+        client = addr1 if from_ap else addr2
+        if client == _BROADCAST:
+            # Broadcast deauth/disassoc from the AP hits every associated station
+            station = None
+        else:
+            station = self._station(_mac(client), timestamp)
+            station.bssids.add(ap.bssid)
+            ap.stations.add(station.station)
+            if not from_ap:
+                station.frames += 1
+                if signal is not None:
+                    station.signal.add(signal)
+
+        if subtype == SUBTYPE_AUTH:
+            ap.auth_frames += 1
+            if station is not None:
+                station.auth_frames += 1
+        elif subtype in _ASSOC_SUBTYPES:
+            ap.assoc_frames += 1
+            if station is not None:
+                station.assoc_frames += 1
+                station.bssid = ap.bssid
+        elif subtype == SUBTYPE_DEAUTH:
+            ap.deauth_frames += 1
+            if station is not None:
+                station.deauth_frames += 1
+        elif subtype == SUBTYPE_DISASSOC:
+            ap.disassoc_frames += 1
+            if station is not None:
+                station.disassoc_frames += 1
+
+    def _data(self, fc_flags, addr1, addr2, addr3, size, timestamp, signal):
+        direction = fc_flags & 0x03
+        if direction == 0x01:       # to the AP: BSSID, station, destination
+            bssid, client, sent = addr1, addr2, True
+        elif direction == 0x02:     # from the AP: destination station, BSSID, source
+            bssid, client, sent = addr2, addr1, False
+        elif direction == 0x00:     # ad hoc / direct link: destination, source, BSSID
+            bssid, client, sent = addr3, addr2, True
+        else:
+            return                  # WDS bridge between access points
+        ap = self._bssid(_mac(bssid), timestamp)
+        ap.data_frames += 1
+        ap.data_bytes += size
+        if client[0] & 0x01:
+            return                  # group-addressed
+        station = self._station(_mac(client), timestamp)
+        station.data_frames += 1
+        station.data_bytes += size
+        station.bssid = ap.bssid
+        station.bssids.add(ap.bssid)
+        ap.stations.add(station.station)
+        if sent:
+            station.frames += 1
+            if signal is not None:
+                station.signal.add(signal)
+
+    def expire(self, now=None):
+        """Records idle longer than idle_timeout (at ``now``, default: newest frame time), removed"""
+        now = self.last_seen if now is None else now
+        cutoff = now - self.idle_timeout
+        with self._lock:
+            bssids = [r for r in self.bssids.values() if r.last_seen < cutoff]
+            stations = [r for r in self.stations.values() if r.last_seen < cutoff]
+            for record in bssids:
+                del self.bssids[record.bssid]
+            for record in stations:
+                del self.stations[record.station]
+        return bssids, stations
+
+    def records(self):
+        """Snapshot of the live records: (bssid records, station records)"""
+        with self._lock:
+            return list(self.bssids.values()), list(self.stations.values())
+
+    def summary(self):
+        """One-line summary for status output"""
+        with self._lock:
+            deauths = sum(r.deauth_frames for r in self.bssids.values())
+            return (f"{self.frames:,} 802.11 frames | {len(self.bssids):,} BSSIDs | "
+                    f"{len(self.stations):,} stations | {deauths:,} deauth")
+
+
+def save_records(records, path):
+    """Write BssidRecord or StationRecord feature rows (plus their identity) to a CSV file"""
+    if not records:
+        return 0
+    rows = []
+    for record in records:
+        if isinstance(record, BssidRecord):
+            identity = {'bssid': record.bssid, 'ssid': record.ssid or ''}
+        else:
+            identity = {'station': record.station, 'bssid': record.bssid or ''}
+        rows.append({**identity, 'first_seen': record.first_seen, **record.features()})
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+    return len(rows)
@@ -0,0 +1,358 @@
+"""
+Shared flow statistics helpers for the WiFi traffic analyzers
+Constant-memory running accumulators used instead of per-packet lists
+"""
+
+import heapq
+import itertools
+import math
+import socket
+from array import array
+
+import numpy as np
+
+
+class RunningStats:
+    """Running count/mean/std/min/max (Welford) in O(1) memory"""
+
+    __slots__ = ('count', 'mean', 'm2', 'min', 'max')
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = None
+        self.max = None
+
+    def add(self, value):
+        """Fold a single value into the accumulator"""
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    @property
+    def std(self):
+        """Population standard deviation (same as np.std)"""
+        if self.count == 0:
+            return 0.0
+        return math.sqrt(max(self.m2, 0.0) / self.count)
+
+    def __len__(self):
+        return self.count
+
+
+# Flow key protocol codes (same as pcap_columnar.flow_keys)
+PROTO_OTHER = 0
+PROTO_TCP = 1
+PROTO_UDP = 2
+PROTO_NAMES = ('OTHER', 'TCP', 'UDP')
+
+# Bits per packed endpoint (address << 16 | port) plus the 2 protocol bits
+_V4_SHIFT = 32 + 16 + 2
+_V6_SHIFT = 128 + 16 + 2
+_V6_FLAG = 1 << (2 * _V6_SHIFT)
+
+
+def pack_flow_key(src_addr, src_port, dst_addr, dst_port, proto, ipv6=False):
+    """Canonical bidirectional flow key of one packet, direction in bit 0
+
+    Both endpoints are packed as (address << 16 | port) and ordered, so
+    ``key >> 1`` is the same for both directions of a flow; bit 0 is set
+    when the packet travels from the higher endpoint to the lower one.
+    Addresses are ints: 32-bit IPv4, or 128-bit IPv6 with ``ipv6``.
+    """
+    a = (src_addr << 16) | src_port
+    b = (dst_addr << 16) | dst_port
+    direction = 0
+    if a > b:
+        a, b = b, a
+        direction = 1
+
+    if ipv6:
+        flow = _V6_FLAG | (a << _V6_SHIFT) | (b << 2) | proto
+    else:
+        flow = (a << _V4_SHIFT) | (b << 2) | proto
+    return (flow << 1) | direction
+
+
+def packet_flow_key(frame):
+    """Packed key (flow key << 1 | direction) of a decoded IPv4 frame, or None"""
+    if not frame.has_ip:
+        return None
+    if frame.has_tcp:
+        return pack_flow_key(frame.src_addr, frame.src_port, frame.dst_addr, frame.dst_port, PROTO_TCP)
+    if frame.has_udp:
+        return pack_flow_key(frame.src_addr, frame.src_port, frame.dst_addr, frame.dst_port, PROTO_UDP)
+    return pack_flow_key(frame.src_addr, 0, frame.dst_addr, 0, PROTO_OTHER)
+
+
+def unpack_flow_key(flow_key):
+    """Readable ((ip, port), (ip, port), protocol) of a flow key (packet key >> 1)"""
+    if flow_key & _V6_FLAG:
+        flow_key ^= _V6_FLAG
+        shift, family, size = _V6_SHIFT, socket.AF_INET6, 16
+    else:
+        shift, family, size = _V4_SHIFT, socket.AF_INET, 4
+
+    def endpoint(packed):
+        return socket.inet_ntop(family, (packed >> 16).to_bytes(size, 'big')), packed & 0xFFFF
+
+    high = (flow_key >> 2) & ((1 << (shift - 2)) - 1)
+    return endpoint(flow_key >> shift), endpoint(high), PROTO_NAMES[flow_key & 0x3]
+
+
+# Bit layout of a packed sequence step: length | ttl | tcp window | has_tcp | has_udp
+_SEQ_LENGTH_SHIFT = 26
+_SEQ_TTL_SHIFT = 18
+_SEQ_WINDOW_SHIFT = 2
+
+
+class FlowRecord:
+    """Compact per-flow state shared by the realtime extractors
+
+    Replaces the dict of counters and per-packet lists plus the per-flow
+    window and sequence deques. Counters and Welford accumulators live in
+    slots, addresses stay integers until they are read, and the last
+    ``sequence_length`` packet vectors are packed one 64-bit word each
+    into a preallocated ring. Forward is the direction of the flow's first
+    packet (the direction bit of packet_flow_key); backward counts are the
+    remainder.
+    """
+
+    __slots__ = (
+        'packet_count', 'byte_count', 'start_time', 'last_time',
+        'src_addr', 'dst_addr', 'src_port', 'dst_port', 'protocol', 'completed',
+        'forward', 'fwd_packets', 'fwd_bytes',
+        'size_mean', 'size_m2', 'size_min', 'size_max',
+        'gap_mean', 'gap_m2', 'gap_min', 'gap_max',
+        'sequence_ring'
+    )
+
+    def __init__(self, sequence_length=0):
+        self.packet_count = 0
+        self.byte_count = 0
+        self.start_time = None
+        self.last_time = None
+        self.src_addr = 0
+        self.dst_addr = 0
+        self.src_port = None
+        self.dst_port = None
+        self.protocol = None
+        self.completed = False
+        self.forward = 0
+        self.fwd_packets = 0
+        self.fwd_bytes = 0
+        self.size_mean = 0.0
+        self.size_m2 = 0.0
+        self.size_min = None
+        self.size_max = None
+        self.gap_mean = 0.0
+        self.gap_m2 = 0.0
+        self.gap_min = None
+        self.gap_max = None
+        self.sequence_ring = array('Q', bytes(8 * sequence_length)) if sequence_length else None
+
+    def update(self, frame, timestamp, direction=0):
+        """Fold one decoded IP frame seen at ``timestamp`` into the flow
+
+        ``direction`` is the packet key's direction bit (``key & 1``).
+        """
+        n = self.packet_count = self.packet_count + 1
+        length = frame.length
+        self.byte_count += length
+        if n == 1:
+            self.forward = direction
+        if direction == self.forward:
+            self.fwd_packets += 1
+            self.fwd_bytes += length
+
+        delta = length - self.size_mean
+        self.size_mean += delta / n
+        self.size_m2 += delta * (length - self.size_mean)
+
+        if n == 1:
+            self.start_time = timestamp
+            self.size_min = self.size_max = length
+        else:
+            if length < self.size_min:
+                self.size_min = length
+            elif length > self.size_max:
+                self.size_max = length
+
+            gap = timestamp - self.last_time
+            delta = gap - self.gap_mean
+            self.gap_mean += delta / (n - 1)
+            self.gap_m2 += delta * (gap - self.gap_mean)
+            if n == 2:
+                self.gap_min = self.gap_max = gap
+            elif gap < self.gap_min:
+                self.gap_min = gap
+            elif gap > self.gap_max:
+                self.gap_max = gap
+        self.last_time = timestamp
+
+        self.src_addr = frame.src_addr
+        self.dst_addr = frame.dst_addr
+
+        window = 0
+        if frame.has_tcp:
+            self.protocol = 'TCP'
+            self.src_port = frame.src_port
+            self.dst_port = frame.dst_port
+            window = frame.tcp_window
+            if frame.flag_fin or frame.flag_rst:
+                self.completed = True
+        elif frame.has_udp:
+            self.protocol = 'UDP'
+            self.src_port = frame.src_port
+            self.dst_port = frame.dst_port
+
+        ring = self.sequence_ring
+        if ring is not None:
+            ring[(n - 1) % len(ring)] = (
+                (length << _SEQ_LENGTH_SHIFT) | (frame.ip_ttl << _SEQ_TTL_SHIFT) |
+                (window << _SEQ_WINDOW_SHIFT) | (frame.has_tcp << 1) | frame.has_udp
+            )
+
+    @property
+    def src_ip(self):
+        return socket.inet_ntoa(self.src_addr.to_bytes(4, 'big'))
+
+    @property
+    def dst_ip(self):
+        return socket.inet_ntoa(self.dst_addr.to_bytes(4, 'big'))
+
+    @property
+    def bwd_packets(self):
+        return self.packet_count - self.fwd_packets
+
+    @property
+    def bwd_bytes(self):
+        return self.byte_count - self.fwd_bytes
+
+    @property
+    def gap_count(self):
+        return max(self.packet_count - 1, 0)
+
+    @property
+    def size_std(self):
+        """Population standard deviation of the packet sizes"""
+        if self.packet_count == 0:
+            return 0.0
+        return math.sqrt(max(self.size_m2, 0.0) / self.packet_count)
+
+    @property
+    def gap_std(self):
+        """Population standard deviation of the inter-arrival times"""
+        if self.packet_count < 2:
+            return 0.0
+        return math.sqrt(max(self.gap_m2, 0.0) / (self.packet_count - 1))
+
+    def sequence(self, length):
+        """Last ``length`` packet vectors, oldest first, zero-padded in front
+
+        Each row is [packet_length, ip_ttl, tcp_window, has_tcp, has_udp].
+        """
+        result = np.zeros((length, 5), dtype=np.int64)
+        ring = self.sequence_ring
+        if ring is None:
+            return result
+
+        stored = min(self.packet_count, len(ring), length)
+        if stored == 0:
+            return result
+        newest = (self.packet_count - 1) % len(ring)
+        slots = (np.arange(newest - stored + 1, newest + 1)) % len(ring)
+        words = np.frombuffer(ring, dtype=np.uint64)[slots].astype(np.int64)
+
+        rows = result[length - stored:]
+        rows[:, 0] = words >> _SEQ_LENGTH_SHIFT
+        rows[:, 1] = (words >> _SEQ_TTL_SHIFT) & 0xFF
+        rows[:, 2] = (words >> _SEQ_WINDOW_SHIFT) & 0xFFFF
+        rows[:, 3] = (words >> 1) & 1
+        rows[:, 4] = words & 1
+        return result
+
+
+class FlowExpiryQueue:
+    """Flow expiry scheduler: lazy-deletion deadline heap + completion queue
+
+    Each tracked flow has one live heap entry. Packets only refresh the
+    flow's own last-seen time; when an entry reaches the top of the heap
+    the owner is asked for the flow's current deadline and the entry is
+    re-armed if the flow was seen again in the meantime. Flows finished by
+    FIN/RST are queued for immediate hand-off. Per-packet work is O(1)
+    amortized instead of a scan over every active flow.
+    """
+
+    __slots__ = ('_heap', '_scheduled', '_completed', '_counter')
+
+    def __init__(self):
+        self._heap = []
+        self._scheduled = {}
+        self._completed = {}
+        self._counter = itertools.count()
+
+    def schedule(self, flow_key, deadline):
+        """Make sure the flow is checked again no later than ``deadline``
+
+        A later deadline than the pending one needs no heap work; it is
+        picked up when the pending entry surfaces.
+        """
+        pending = self._scheduled.get(flow_key)
+        if pending is None or deadline < pending[0]:
+            entry = (deadline, next(self._counter), flow_key)
+            self._scheduled[flow_key] = entry
+            heapq.heappush(self._heap, entry)
+
+    def complete(self, flow_key):
+        """Queue a flow for immediate hand-off (e.g. TCP FIN/RST seen)"""
+        self._completed[flow_key] = True
+
+    def discard(self, flow_key):
+        """Forget a flow; its heap entry is dropped lazily when it surfaces"""
+        self._scheduled.pop(flow_key, None)
+        self._completed.pop(flow_key, None)
+
+    def pop_completed(self):
+        """Return and clear the flows queued by complete(), in arrival order"""
+        completed = list(self._completed)
+        self._completed.clear()
+        return completed
+
+    def pop_expired(self, now, deadline_of):
+        """Return the flows whose deadline is before ``now``
+
+        ``deadline_of(flow_key)`` gives the flow's current deadline (or None
+        if it no longer exists); stale entries are re-armed at that time.
+        Expired flows are no longer scheduled until schedule() is called
+        again.
+        """
+        expired = []
+        heap = self._heap
+        while heap and heap[0][0] < now:
+            entry = heapq.heappop(heap)
+            flow_key = entry[2]
+            if self._scheduled.get(flow_key) is not entry:
+                continue
+
+            deadline = deadline_of(flow_key)
+            if deadline is None:
+                del self._scheduled[flow_key]
+            elif deadline < now:
+                del self._scheduled[flow_key]
+                expired.append(flow_key)
+            else:
+                entry = (deadline, entry[1], flow_key)
+                self._scheduled[flow_key] = entry
+                heapq.heappush(heap, entry)
+        return expired
+
+    def __len__(self):
+        return len(self._scheduled)
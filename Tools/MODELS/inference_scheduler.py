@@ -0,0 +1,194 @@
+"""
+Micro-batching inference scheduler for the realtime analyzers
+Completed flows are queued and scored together once a batch is full or
+the oldest queued flow has waited ``max_wait`` seconds, so the fixed cost
+of Keras predict / XGBoost predict_proba is paid per batch instead of per
+flow. ``max_wait`` is the latency/throughput knob: 0 scores every
+submission on its own, larger values trade latency for bigger batches.
+
+``max_wait`` is measured on the wall clock by default. Given a virtual
+clock (a ReplayClock), batches are cut on the submitting thread instead,
+when a submission or ``poll`` finds them due on that clock, so a replayed
+capture is batched the same way at any speed.
+"""
+
+import threading
+import time
+
+from flow_stats import RunningStats
+
+
+class BatchInfo:
+    """Timing of one scored micro-batch"""
+
+    __slots__ = ('size', 'wait', 'inference', 'latency')
+
+    def __init__(self, size, wait, inference, latency):
+        self.size = size
+        self.wait = wait              # oldest flow: queued -> batch started
+        self.inference = inference    # predict() call
+        self.latency = latency        # oldest flow: queued -> results
+
+    @property
+    def throughput(self):
+        """Flows per second of inference time"""
+        return self.size / self.inference if self.inference > 0 else 0.0
+
+
+class MicroBatchScheduler:
+    """Collect flows into micro-batches in front of ``predict(features, sequences)``
+
+    ``on_results(results, flow_features, info)`` is called on the scheduler
+    thread with the predictions of each batch and its BatchInfo. Wait and
+    latency are in ``clock`` seconds, inference time on the wall clock.
+    """
+
+    def __init__(self, predict, on_results, max_batch_size=256, max_wait=0.05, name='inference',
+                 clock=None):
+        if max_batch_size < 1 or max_wait < 0:
+            raise ValueError("max_batch_size must be positive and max_wait non-negative")
+        self.predict = predict
+        self.on_results = on_results
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.name = name
+        self.clock = clock or time.perf_counter
+        self.virtual = clock is not None
+
+        self._pending = []   # (flow_features, sequence, queued_at)
+        self._ready = []     # batches cut on the submitting thread (virtual clock)
+        self._cond = threading.Condition()
+        self._running = False
+        self._thread = None
+
+        self.batches = 0
+        self.flows = 0
+        self.inference_seconds = 0.0
+        self.batch_size = RunningStats()
+        self.latency = RunningStats()
+        self.last_batch = None
+
+    def start(self):
+        with self._cond:
+            if self._running:
+                return self
+            self._running = True
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, drain=True):
+        """Stop the scheduler thread, scoring what is queued if ``drain``"""
+        with self._cond:
+            self._running = False
+            if not drain:
+                self._pending.clear()
+                self._ready.clear()
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def submit(self, flow_features, sequences):
+        """Queue completed flows (and their sequences) for scoring"""
+        if not flow_features:
+            return
+        now = self.clock()
+        with self._cond:
+            self._pending.extend((feat, seq, now) for feat, seq in zip(flow_features, sequences))
+            if self.virtual:
+                self._cut(now)
+            self._cond.notify()
+
+    def poll(self):
+        """Cut the batches that are due on the virtual clock (no-op on the wall clock)"""
+        if not self.virtual or not self._pending:
+            return
+        with self._cond:
+            if self._cut(self.clock()):
+                self._cond.notify()
+
+    def _cut(self, now, flush=False):
+        """Move due batches from pending to ready; the caller holds the lock"""
+        cut = False
+        while self._pending and (flush or len(self._pending) >= self.max_batch_size
+                                 or now - self._pending[0][2] >= self.max_wait):
+            self._ready.append(self._pending[:self.max_batch_size])
+            del self._pending[:self.max_batch_size]
+            cut = True
+        return cut
+
+    @property
+    def depth(self):
+        return len(self._pending) + sum(len(batch) for batch in self._ready)
+
+    @property
+    def throughput(self):
+        """Flows per second of inference time over all batches"""
+        return self.flows / self.inference_seconds if self.inference_seconds > 0 else 0.0
+
+    def summary(self):
+        """One-line batching summary for status output"""
+        if not self.batches:
+            return "no batches scored"
+        return (f"{self.batches:,} batches | {self.batch_size.mean:.1f} flows/batch | "
+                f"latency avg {self.latency.mean * 1e3:.0f} ms, max {self.latency.max * 1e3:.0f} ms | "
+                f"{self.throughput:,.0f} flows/s")
+
+    def _next_batch(self):
+        """Block until a batch is due; None once stopped and drained"""
+        with self._cond:
+            if self.virtual:
+                while self._running and not self._ready:
+                    self._cond.wait()
+                if not self._running:
+                    self._cut(None, flush=True)
+                return self._ready.pop(0) if self._ready else None
+
+            while self._running and not self._pending:
+                self._cond.wait()
+            if not self._pending:
+                return None
+
+            deadline = self._pending[0][2] + self.max_wait
+            while self._running and len(self._pending) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            batch = self._pending[:self.max_batch_size]
+            del self._pending[:self.max_batch_size]
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            try:
+                self._score(batch)
+            except Exception as e:
+                print(f"[!] Batch inference failed: {e}")
+
+    def _score(self, batch):
+        flow_features = [item[0] for item in batch]
+        sequences = [item[1] for item in batch]
+        queued_at = batch[0][2]
+
+        start = self.clock()
+        began = time.perf_counter()
+        results = self.predict(flow_features, sequences)
+        inference = time.perf_counter() - began
+        done = self.clock()
+
+        info = BatchInfo(len(batch), start - queued_at, inference, done - queued_at)
+        self.batches += 1
+        self.flows += info.size
+        self.inference_seconds += info.inference
+        self.batch_size.add(info.size)
+        self.latency.add(info.latency)
+        self.last_batch = info
+
+        if results:
+            self.on_results(results, flow_features, info)
@@ -0,0 +1,61 @@
+"""
+Deferred imports of the heavy optional dependencies
+At start-up the analyzers only check whether TensorFlow, XGBoost, LightGBM
+and scikit-learn are installed (importlib find_spec, nothing is imported);
+each library is imported when a model that needs it is first built or
+loaded. Lite mode (--lite on the command line or WIFI_ANALYZER_LITE=1)
+never touches TensorFlow, so the deep models are simply skipped.
+"""
+
+import importlib.util
+import os
+import sys
+
+LITE_ENV = 'WIFI_ANALYZER_LITE'
+
+_tensorflow = None
+_gpus_configured = False
+
+
+def lite_mode():
+    """True when TensorFlow must not be used"""
+    return '--lite' in sys.argv[1:] or os.environ.get(LITE_ENV, '') not in ('', '0')
+
+
+def module_available(name):
+    """Whether ``name`` is installed, without importing it"""
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+def tensorflow_available():
+    return not lite_mode() and module_available('tensorflow')
+
+
+def import_tensorflow(configure_gpus=False):
+    """Import TensorFlow on first use, with quiet logging
+
+    With ``configure_gpus`` the visible GPUs are switched to memory growth
+    (once, before anything allocates on them).
+    """
+    global _tensorflow, _gpus_configured
+    if _tensorflow is None:
+        if lite_mode():
+            raise ImportError("TensorFlow is disabled in lite mode")
+        os.environ.setdefault('TF_CPP_MIN_LOG_LEVEL', '3')
+        import tensorflow as tf
+        tf.get_logger().setLevel('ERROR')
+        _tensorflow = tf
+
+    if configure_gpus and not _gpus_configured:
+        _gpus_configured = True
+        gpus = _tensorflow.config.list_physical_devices('GPU')
+        if gpus:
+            for gpu in gpus:
+                _tensorflow.config.experimental.set_memory_growth(gpu, True)
+            print(f"[+] GPU enabled: {len(gpus)} GPU(s)")
+        else:
+            print("[*] CPU mode")
+    return _tensorflow
@@ -0,0 +1,273 @@
+"""
+Live capture front end of the realtime analyzers
+LivePacketCapture hands every frame to a callback (``prn``), read from one
+of the capture backends or from a recorded capture:
+
+- 'sniff': scapy socket, optionally raw reads without dissection
+- 'ring': AF_PACKET TPACKET_V3 mmap ring (packet_ring, Linux)
+- 'pipe': pcap stream of dumpcap/tcpdump, stdin or a FIFO (pcap_stream)
+- replay: a pcap file on its own clock (pcap_replay)
+
+The ring, pipe and replay yield memoryviews that are only valid until the
+next frame, so _deliver_views decodes them in place and copies only the
+802.11 frames handed on to the wireless aggregator. configure_capture asks
+for the source interactively, as both analyzers do at start-up.
+"""
+
+import subprocess
+import sys
+
+from capture_filter import CaptureScope, KernelCaptureStats, attach_bpf, interface_linktype, open_capture_socket
+from capture_pipeline import CAPTURE_BACKENDS, iter_raw_frames
+from dot11_frames import FRAME_DOT11, FRAME_IP, classify_frame
+from packet_decoder import RawFrame, decode_bytes
+from pcap_replay import PcapReplay
+
+
+class LivePacketCapture:
+    """Live packet capture using Scapy, an mmap ring, a pcap pipe or a replay"""
+
+    def __init__(self, interface='wlan0', scope=None, backend='sniff', ring_options=None, pipe_source='dumpcap'):
+        self.interface = interface
+        # CaptureScope compiled to a BPF filter in the kernel (None = capture everything)
+        self.scope = scope
+        # 'sniff': scapy socket, 'ring': AF_PACKET TPACKET_V3 mmap ring (Linux),
+        # 'pipe': pcap stream from pipe_source (dumpcap/tcpdump on the interface,
+        # '-' for stdin, or a file/FIFO path);
+        # ring_options: PacketRing block_size, block_count, frame_size, timeout_ms
+        self.backend = backend
+        self.ring_options = ring_options or {}
+        self.pipe_source = pipe_source
+        self.pipe = None
+        # PcapReplay: read a recorded capture on its own clock instead of the interface
+        self.replay = None
+        self.kernel_stats = KernelCaptureStats()
+        self.capture_active = False
+        self.packet_count = 0
+        self.early_drops = 0   # raw capture: frames classify_frame dropped
+
+    def list_interfaces(self):
+        """List available network interfaces"""
+        try:
+            result = subprocess.run(['ip', 'link', 'show'],
+                                  capture_output=True, text=True)
+            print("\n=== Available Network Interfaces ===")
+            print(result.stdout)
+
+            result = subprocess.run(['iwconfig'],
+                                  capture_output=True, text=True, stderr=subprocess.DEVNULL)
+            if result.stdout:
+                print("\n=== Wireless Interfaces ===")
+                print(result.stdout)
+        except Exception as e:
+            print(f"Error listing interfaces: {e}")
+
+    def enable_monitor_mode(self):
+        """Enable monitor mode on wireless interface"""
+        print(f"\n[*] Attempting to enable monitor mode on {self.interface}...")
+        try:
+            subprocess.run(['sudo', 'airmon-ng', 'check', 'kill'],
+                         capture_output=True)
+
+            result = subprocess.run(['sudo', 'airmon-ng', 'start', self.interface],
+                                  capture_output=True, text=True)
+            print(result.stdout)
+
+            if 'mon' in result.stdout:
+                self.interface = self.interface + 'mon'
+                print(f"[+] Monitor mode enabled on {self.interface}")
+                return True
+            else:
+                print("[!] Monitor mode may already be enabled")
+                return True
+
+        except Exception as e:
+            print(f"[!] Error enabling monitor mode: {e}")
+            print("[*] Continuing with managed mode...")
+            return False
+
+    def disable_monitor_mode(self):
+        """Disable monitor mode"""
+        try:
+            original_interface = self.interface.replace('mon', '')
+            subprocess.run(['sudo', 'airmon-ng', 'stop', self.interface],
+                         capture_output=True)
+            print(f"[+] Monitor mode disabled on {original_interface}")
+        except Exception as e:
+            print(f"[!] Error disabling monitor mode: {e}")
+
+    def start_capture(self, prn=None, raw=False):
+        """Start live packet capture (raw: triage frames from their bytes, no scapy dissection)"""
+        self.capture_active = True
+        self.packet_count = 0
+        self.early_drops = 0
+
+        if self.replay is not None:
+            self._capture_replay(prn, raw)
+            return
+
+        print(f"\n[*] Starting continuous packet capture on interface: {self.interface}")
+        print(f"[*] Press Ctrl+C to stop capture")
+
+        try:
+            # Out-of-scope traffic is discarded by the kernel, before it is copied to Python
+            bpf = self.scope.bpf(interface_linktype(self.interface)) if self.scope else None
+            if self.backend == 'ring':
+                self._capture_ring(prn, raw, bpf)
+                return
+            if self.backend == 'pipe':
+                self._capture_pipe(prn, raw, bpf)
+                return
+
+            from scapy.all import sniff
+            sock, bpf = open_capture_socket(self.interface, bpf)
+            if bpf:
+                print(f"[*] Kernel capture filter: {bpf}")
+            self.kernel_stats.attach(getattr(sock, 'ins', None), self.interface, bpf)
+
+            try:
+                if raw:
+                    self._capture_raw(prn, sock)
+                else:
+                    sniff(
+                        opened_socket=sock,
+                        prn=prn,
+                        store=False,
+                        stop_filter=lambda x: not self.capture_active
+                    )
+            finally:
+                self.kernel_stats.detach()
+                sock.close()
+
+        except PermissionError:
+            print("\n[!] ERROR: Permission denied. Please run with sudo:")
+            print(f"    sudo python3 {sys.argv[0]}")
+            sys.exit(1)
+        except Exception as e:
+            print(f"\n[!] Capture error: {e}")
+        finally:
+            self.capture_active = False
+
+    def _capture_raw(self, prn, sock):
+        """Hand undissected frames to prn as RawFrames; control frames, ARP etc. never leave this thread"""
+        for data, linktype, timestamp in iter_raw_frames(sock, lambda: self.capture_active):
+            self.packet_count += 1
+            kind = classify_frame(data, linktype)
+            if not kind:
+                self.early_drops += 1
+                continue
+            prn(RawFrame(data, linktype, timestamp, kind))
+
+    def _capture_ring(self, prn, raw, bpf):
+        """Read frames from the mmap ring; IP frames are decoded from the ring in place"""
+        from packet_ring import PacketRing
+        ring = PacketRing(self.interface, **self.ring_options)
+        bpf = attach_bpf(ring.sock, self.interface, bpf)
+        if bpf:
+            print(f"[*] Kernel capture filter: {bpf}")
+        self.kernel_stats.attach(ring.sock, self.interface, bpf)
+        try:
+            self._deliver_views(ring.frames(lambda: self.capture_active), prn, raw)
+        finally:
+            self.kernel_stats.detach()
+            ring.close()
+
+    def _capture_pipe(self, prn, raw, bpf):
+        """Parse the pcap stream of a capture tool (or stdin / a FIFO); the tool applies the filter"""
+        from pcap_stream import PcapPipe
+        self.pipe = PcapPipe(self.pipe_source, self.interface, bpf)
+        print(f"[*] Reading pcap stream from {self.pipe_source}" + (f" (filter: {bpf})" if bpf else ""))
+        try:
+            self._deliver_views(self.pipe.frames(lambda: self.capture_active), prn, raw)
+        finally:
+            self.pipe.close()
+
+    def _capture_replay(self, prn, raw):
+        """Feed a pcap file through prn, the replay's clock advanced to each packet first"""
+        speed = self.replay.clock.speed
+        print(f"\n[*] Replaying {self.replay.path} " + (f"at {speed:g}x recorded speed" if speed else "as fast as possible"))
+        print(f"[*] Press Ctrl+C to stop replay")
+        try:
+            self._deliver_views(self.replay.frames(lambda: self.capture_active), prn, raw)
+        except Exception as e:
+            print(f"\n[!] Replay error: {e}")
+        finally:
+            self.replay.close()
+            self.capture_active = False
+
+    def _deliver_views(self, frames, prn, raw):
+        """Decode (or triage) frame views in place; views are reused once the next frame is read"""
+        for view, linktype, timestamp in frames:
+            self.packet_count += 1
+            kind = classify_frame(view, linktype) if raw else FRAME_IP
+            if not kind:
+                self.early_drops += 1
+            elif kind & FRAME_DOT11:
+                # The aggregator runs on a worker, after the view is reused
+                prn(RawFrame(bytes(view), linktype, timestamp, kind))
+            else:
+                prn(decode_bytes(view, linktype, timestamp))
+
+    def stop_capture(self):
+        """Stop packet capture (kernel counters are in the analyzers' final summary)"""
+        self.capture_active = False
+        print(f"\n[+] Capture stopped. Total packets: {self.packet_count:,}")
+        if self.early_drops:
+            print(f"[+] Dropped before dissection: {self.early_drops:,}")
+        if self.pipe is not None:
+            print(f"[+] Pipe: {self.pipe.summary()}")
+        if self.replay is not None:
+            print(f"[+] Replay: {self.replay.summary()}")
+
+
+def configure_capture(capture, ask_monitor=False):
+    """Ask for a pcap to replay, or the interface, backend, pipe source and scope
+
+    With ``ask_monitor`` the user is also offered monitor mode, which is
+    enabled on the interface; returns whether it was.
+    """
+    # A recorded capture replays on its own packet timestamps: flow timeouts and
+    # analysis intervals are the same at any speed
+    while True:
+        replay = input("\n[?] Replay a pcap file instead of capturing (path, default: live capture): ").strip()
+        if not replay:
+            break
+        try:
+            speed = input("[?] Replay speed (1 = recorded pace, N = N times faster, "
+                          "default: 0 = as fast as possible): ").strip()
+            capture.replay = PcapReplay(replay, float(speed or 0))
+            break
+        except (OSError, ValueError) as e:
+            print(f"[!] {e}")
+    if capture.replay is not None:
+        return False
+
+    interface = input("[?] Enter interface name (default: wlan0): ").strip()
+    if interface:
+        capture.interface = interface
+
+    monitor = False
+    if ask_monitor:
+        monitor = input("[?] Enable monitor mode? (y/n, default: n): ").strip().lower() == 'y'
+        if monitor:
+            capture.enable_monitor_mode()
+
+    # The mmap ring hands frames over in blocks instead of one syscall each
+    backend = input(f"[?] Capture backend ({'/'.join(CAPTURE_BACKENDS)}, default: sniff): ").strip().lower()
+    if backend in CAPTURE_BACKENDS:
+        capture.backend = backend
+    if capture.backend == 'pipe':
+        # dumpcap/tcpdump capture in their own process; a FIFO lets any pcap writer feed the analyzer
+        source = input("[?] Pcap source (dumpcap/tcpdump, or a file/FIFO path, default: dumpcap): ").strip()
+        capture.pipe_source = source or 'dumpcap'
+
+    # Traffic outside the scope is dropped by a BPF filter in the kernel
+    while True:
+        scope = input("[?] Capture scope, e.g. 'proto=tcp,udp net=192.168.1.0/24 port=443 !port=22 dot11=mgt' "
+                      "(default: everything): ").strip()
+        try:
+            capture.scope = CaptureScope.parse(scope) if scope else None
+            break
+        except ValueError as e:
+            print(f"[!] {e}")
+    return monitor
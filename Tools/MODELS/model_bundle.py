@@ -0,0 +1,339 @@
+"""
+Model bundles and background training for the realtime analyzers
+A bundle holds everything scoring needs (scaler, feature columns, the
+fitted models and their parallel predictor). Training builds a complete
+new bundle off the capture path and publishes it with one reference
+assignment, so predictions use either the old or the new set, never a mix.
+
+A bundle is saved as one versioned file (save_bundle / load_bundle): a JSON
+header, a pickle stream, and the numpy buffers stored out-of-band (pickle
+protocol 5). The header's schema hash covers the feature columns and model
+names, and its payload digest (SHA-256 of the pickle stream and buffers)
+ties it to the scaler and models of the training run it was written with.
+On load the buffers are sliced out of the file contents without another copy.
+The file is written next to its final name and renamed into place, so
+readers never see a half-written bundle.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import struct
+import tempfile
+import threading
+import time
+
+MODEL_NAMES = ('isolation_forest', 'autoencoder', 'xgboost_classifier',
+               'lstm_classifier', 'tcn_predictor', 'rf_fingerprinter')
+KERAS_MODELS = ('autoencoder', 'lstm_classifier', 'tcn_predictor')
+
+BUNDLE_FORMAT = 2     # 2: payload digest in the header
+BUNDLE_FILE = 'models.bundle'
+BUNDLE_MAGIC = b'WIFIMDL\x00'
+_PREFIX = struct.Struct('<8sII')   # magic, format, header length
+_ALIGN = 64
+_OUT_OF_BAND = 4096   # smaller buffers stay inside the pickle stream
+
+
+class ModelBundle:
+    """Fitted models plus their preprocessing; never modified once published
+
+    Scoring threads hold the bundle with ``acquire``/``release`` while they
+    use its predictor. A replaced bundle is ``retire``d: its predictor (and
+    any worker processes) is closed once the last prediction using it ends.
+    """
+
+    __slots__ = ('models', 'scaler', 'feature_columns', 'predictor', 'compiled',
+                 'version', 'trained_at', 'training_flows', 'training_seconds',
+                 '_users', '_retired', '_lock')
+
+    def __init__(self, models, scaler, feature_columns, predictor=None, training_flows=0):
+        self.models = models
+        self.scaler = scaler
+        self.feature_columns = feature_columns
+        self.predictor = predictor
+        self.compiled = {}   # inference mode -> {model key: TFLite / ONNX bytes} (compiled_models)
+        self.version = 0
+        self.trained_at = time.time()
+        self.training_flows = training_flows
+        self.training_seconds = 0.0
+        self._users = 0
+        self._retired = False
+        self._lock = threading.Lock()
+
+    @property
+    def active_models(self):
+        return sum(self.models.get(name) is not None for name in MODEL_NAMES)
+
+    def acquire(self):
+        """Hold the bundle for one prediction; False once it has been retired"""
+        with self._lock:
+            if self._retired:
+                return False
+            self._users += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self._users -= 1
+            close = self._retired and self._users == 0
+        if close:
+            self._close()
+
+    def retire(self):
+        """Close the predictor now if idle, otherwise when the last holder releases it"""
+        with self._lock:
+            if self._retired:
+                return
+            self._retired = True
+            close = self._users == 0
+        if close:
+            self._close()
+
+    def _close(self):
+        if self.predictor is not None:
+            self.predictor.close()
+
+
+class BackgroundTrainer:
+    """Build bundles on a daemon thread, one job at a time
+
+    ``build(flow_features, sequences)`` returns a ModelBundle or None and
+    ``publish(bundle)`` installs it. A thread rather than a process: the
+    Keras models do not pickle cheaply and sklearn, XGBoost and TensorFlow
+    release the GIL in their fitting loops.
+    """
+
+    def __init__(self, build, publish, name='model-trainer'):
+        self.build = build
+        self.publish = publish
+        self.name = name
+        self.jobs = 0
+        self.failures = 0
+        self.last_duration = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def busy(self):
+        thread = self._thread
+        return thread is not None and thread.is_alive()
+
+    def submit(self, flow_features, sequences):
+        """Start training on a snapshot of the data; False if a job is running"""
+        with self._lock:
+            if self.busy:
+                return False
+            self._thread = threading.Thread(
+                target=self._run, args=(list(flow_features), list(sequences)),
+                name=self.name, daemon=True)
+            self.jobs += 1
+            self._thread.start()
+        return True
+
+    def wait(self, timeout=None):
+        """Wait for the running job; True when no job is left running"""
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+        return not self.busy
+
+    def _run(self, flow_features, sequences):
+        start = time.perf_counter()
+        try:
+            bundle = self.build(flow_features, sequences)
+            if bundle is None:
+                self.failures += 1
+                return
+            bundle.training_seconds = time.perf_counter() - start
+            self.publish(bundle)
+        except Exception as e:
+            self.failures += 1
+            print(f"[!] Background training failed: {e}")
+        finally:
+            self.last_duration = time.perf_counter() - start
+
+
+def schema_hash(feature_columns, model_names):
+    """Hash of what a bundle's parts must agree on: format, feature columns, models"""
+    schema = {'format': BUNDLE_FORMAT, 'features': list(feature_columns or []),
+              'models': sorted(model_names)}
+    return hashlib.sha256(json.dumps(schema).encode()).hexdigest()[:16]
+
+
+def payload_digest(stream, buffers):
+    """SHA-256 of a bundle's pickle stream and out-of-band buffers, in file order"""
+    digest = hashlib.sha256(stream)
+    for buffer in buffers:
+        digest.update(buffer)
+    return digest.hexdigest()
+
+
+def _aligned(offset):
+    return -(-offset // _ALIGN) * _ALIGN
+
+
+def _check_inputs(path, name, estimator, n_features):
+    expected = getattr(estimator, 'n_features_in_', None)
+    if expected is not None and expected != n_features:
+        raise ValueError(f"{path}: {name} expects {expected} features, bundle has {n_features} columns")
+
+
+def _keras_bytes(model):
+    fd, tmp = tempfile.mkstemp(suffix='.h5')
+    os.close(fd)
+    try:
+        model.save(tmp)
+        with open(tmp, 'rb') as f:
+            return f.read()
+    finally:
+        os.unlink(tmp)
+
+
+def _keras_model(blob, load_keras):
+    fd, tmp = tempfile.mkstemp(suffix='.h5')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(blob)
+        return load_keras(tmp)
+    finally:
+        os.unlink(tmp)
+
+
+def save_bundle(bundle, path):
+    """Write ``bundle`` to ``path`` atomically (temp file in the same directory, then rename)
+
+    Keras models are embedded as their saved .h5 bytes (kept as loaded when
+    the model itself was not), next to the TFLite/ONNX conversions in
+    ``bundle.compiled``.
+    """
+    models = {name: model for name, model in bundle.models.items() if model is not None}
+    keras_blobs = dict(bundle.compiled.get('keras', {}))
+    keras_blobs.update({name: _keras_bytes(models.pop(name)) for name in KERAS_MODELS if name in models})
+
+    buffers = []
+
+    def out_of_band(buffer):
+        raw = buffer.raw()
+        if raw.nbytes < _OUT_OF_BAND:
+            return True
+        buffers.append(raw)
+        return False
+
+    parts = set(models) | set(keras_blobs) | {'scaler'}
+    compiled = {mode: {name: blob for name, blob in blobs.items() if name in parts}
+                for mode, blobs in bundle.compiled.items() if mode != 'keras'}
+    stream = pickle.dumps({'scaler': bundle.scaler, 'models': models, 'keras': keras_blobs,
+                           'compiled': compiled},
+                          protocol=5, buffer_callback=out_of_band)
+
+    # Data section offsets, each block aligned for the arrays mapped onto it
+    offset, layout = len(stream), []
+    for buffer in buffers:
+        offset = _aligned(offset)
+        layout.append([offset, buffer.nbytes])
+        offset += buffer.nbytes
+
+    feature_columns = list(bundle.feature_columns or [])
+    names = sorted(list(models) + list(keras_blobs))
+    header = json.dumps({
+        'schema_hash': schema_hash(feature_columns, names),
+        'payload_digest': payload_digest(stream, buffers),
+        'models': names,
+        'compiled': {mode: sorted(blobs) for mode, blobs in compiled.items()},
+        'feature_columns': feature_columns,
+        'version': bundle.version,
+        'trained_at': bundle.trained_at,
+        'training_flows': bundle.training_flows,
+        'training_seconds': bundle.training_seconds,
+        'pickle': len(stream),
+        'buffers': layout,
+    }).encode()
+
+    path = os.fspath(path)
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix='.' + os.path.basename(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(_PREFIX.pack(BUNDLE_MAGIC, BUNDLE_FORMAT, len(header)))
+            f.write(header)
+            start = _aligned(f.tell())
+            f.write(b'\0' * (start - f.tell()))
+            f.write(stream)
+            for (offset, _), buffer in zip(layout, buffers):
+                f.write(b'\0' * (start + offset - f.tell()))
+                f.write(buffer)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    return path
+
+
+def read_bundle_header(path):
+    """Header of a bundle file (models, feature columns, version, ...) without loading it"""
+    with open(path, 'rb') as f:
+        prefix = f.read(_PREFIX.size)
+        if len(prefix) < _PREFIX.size:
+            raise ValueError(f"{path}: not a model bundle")
+        magic, version, length = _PREFIX.unpack(prefix)
+        if magic != BUNDLE_MAGIC:
+            raise ValueError(f"{path}: not a model bundle")
+        if version != BUNDLE_FORMAT:
+            raise ValueError(f"{path}: bundle format {version}, expected {BUNDLE_FORMAT}")
+        header = json.loads(f.read(length))
+    if schema_hash(header['feature_columns'], header['models']) != header['schema_hash']:
+        raise ValueError(f"{path}: schema hash mismatch, parts are from different training runs")
+    header['data_offset'] = _aligned(_PREFIX.size + length)
+    return header
+
+
+def load_bundle(path, load_keras=None):
+    """Read a bundle written by save_bundle; returns an unpublished ModelBundle
+
+    ``load_keras(h5_path)`` rebuilds a Keras model; without it the deep
+    models are left out. Raises ValueError when the file is from another
+    format version or its parts do not belong together (schema hash or
+    payload digest mismatch).
+    """
+    header = read_bundle_header(path)
+    with open(path, 'rb') as f:
+        data = memoryview(f.read())
+
+    start = header['data_offset']
+    stream = data[start:start + header['pickle']]
+    buffers = [data[start + offset:start + offset + size] for offset, size in header['buffers']]
+    if payload_digest(stream, buffers) != header['payload_digest']:
+        raise ValueError(f"{path}: payload digest mismatch, scaler/models are not the ones this header was written with")
+    payload = pickle.loads(stream, buffers=buffers)
+
+    feature_columns = header['feature_columns']
+    if sorted(list(payload['models']) + list(payload['keras'])) != header['models']:
+        raise ValueError(f"{path}: stored models do not match the header")
+    _check_inputs(path, 'scaler', payload['scaler'], len(feature_columns))
+    for name, model in payload['models'].items():
+        _check_inputs(path, name, model, len(feature_columns))
+
+    models = dict.fromkeys(MODEL_NAMES)
+    models['autoencoder_threshold'] = None
+    models.update(payload['models'])
+    compiled = payload.get('compiled', {})
+    if load_keras is not None:
+        for name, blob in payload['keras'].items():
+            models[name] = _keras_model(blob, load_keras)
+    elif payload['keras']:
+        # Not loaded, but written back unchanged if this bundle is saved again
+        compiled['keras'] = payload['keras']
+
+    bundle = ModelBundle(models, payload['scaler'], feature_columns,
+                         training_flows=header['training_flows'])
+    bundle.compiled = compiled
+    bundle.version = header['version']
+    bundle.trained_at = header['trained_at']
+    bundle.training_seconds = header['training_seconds']
+    return bundle
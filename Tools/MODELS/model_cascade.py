@@ -0,0 +1,141 @@
+"""
+Two-stage model cascade for the realtime analyzers
+Stage one runs the cheap models (IsolationForest, XGBoost, Random Forest)
+on every flow. Only the flows stage one finds suspicious, plus a random
+sample of the rest, go on to the Keras models (autoencoder, LSTM, TCN),
+which dominate inference time. The sample shows how often the autoencoder
+would have flagged a flow the cascade skipped, which gives a running
+estimate of the detection agreement with a full run.
+"""
+
+import threading
+import time
+
+import numpy as np
+
+# Deep-model outputs and the value a skipped flow gets in the full-length arrays
+DEEP_OUTPUTS = {
+    'autoencoder_scores': np.nan,
+    'autoencoder_anomalies': 1,      # skipped flows count as normal
+    'lstm_traffic_class': -1,
+    'lstm_confidence': np.nan,
+    'tcn_throughput': np.nan,
+}
+
+
+class ModelCascade:
+    """Decide which flows reach the deep models, and account for what skipping saved
+
+    A flow is suspicious when its IsolationForest decision value (score
+    minus the fitted offset, negative = anomaly) is below ``margin``. A
+    bundle without an IsolationForest uses a rule on the scaled features
+    instead: any feature more than ``z_threshold`` standard deviations out.
+    ``sample_rate`` of the other flows is escalated at random.
+    """
+
+    def __init__(self, margin=0.05, sample_rate=0.05, z_threshold=4.0, seed=None):
+        if not 0 <= sample_rate <= 1:
+            raise ValueError("sample_rate must be between 0 and 1")
+        self.margin = margin
+        self.sample_rate = sample_rate
+        self.z_threshold = z_threshold
+        self._rng = np.random.default_rng(seed)
+        self._lock = threading.Lock()
+
+        self.flows = 0
+        self.suspicious = 0
+        self.sampled = 0
+        self.cheap_seconds = 0.0
+        self.deep_seconds = 0.0
+        self.deep_flows = 0
+        self.sample_checked = 0      # sampled flows the autoencoder scored
+        self.sample_flagged = 0      # ... and flagged: anomalies the cascade would skip
+
+    def select(self, results, X_scaled, isolation_forest=None):
+        """Boolean masks (suspicious, sampled) over the batch"""
+        if 'isolation_forest_scores' in results and isolation_forest is not None:
+            decision = results['isolation_forest_scores'] - isolation_forest.offset_
+            suspicious = decision < self.margin
+        else:
+            suspicious = np.abs(X_scaled).max(axis=1) > self.z_threshold
+        with self._lock:
+            sampled = ~suspicious & (self._rng.random(len(suspicious)) < self.sample_rate)
+        return suspicious, sampled
+
+    def run(self, predictor, X, X_scaled, X_seq, lstm_proba=None, tcn_pred=None):
+        """Cascaded ``predictor.predict_all_parallel``; same result keys as a full run
+
+        Deep-model arrays keep one entry per flow, filled with DEEP_OUTPUTS
+        values where the flow was not escalated; ``deep_scored`` marks the
+        flows the deep models saw. ``lstm_proba`` and ``tcn_pred`` are
+        streamed LSTM / TCN outputs for the whole batch (see streaming_models).
+        """
+        start = time.perf_counter()
+        results = predictor.predict_all_parallel(X, X_scaled, X_seq, stage='cheap')
+        cheap_done = time.perf_counter()
+
+        suspicious, sampled = self.select(results, X_scaled, predictor.models.get('isolation_forest'))
+        deep = suspicious | sampled
+        n = len(X)
+        deep_results = {'models_used': []}
+        if deep.any():
+            seq = X_seq[deep] if len(X_seq) == n else np.array([])
+            deep_results = predictor.predict_all_parallel(
+                X[deep], X_scaled[deep], seq, stage='deep',
+                lstm_proba=lstm_proba[deep] if lstm_proba is not None else None,
+                tcn_pred=tcn_pred[deep] if tcn_pred is not None else None)
+        deep_done = time.perf_counter()
+
+        for key, fill in DEEP_OUTPUTS.items():
+            if key in deep_results:
+                values = np.asarray(deep_results[key])
+                full = np.full(n, fill, dtype=np.result_type(values.dtype, np.asarray(fill).dtype))
+                full[deep] = values
+                results[key] = full
+        results['models_used'].extend(deep_results['models_used'])
+        results['deep_scored'] = deep
+
+        flagged = checked = 0
+        if 'autoencoder_anomalies' in deep_results:
+            on_sample = results['autoencoder_anomalies'][sampled]
+            checked, flagged = len(on_sample), int(np.sum(on_sample == -1))
+
+        with self._lock:
+            self.flows += n
+            self.suspicious += int(suspicious.sum())
+            self.sampled += int(sampled.sum())
+            self.cheap_seconds += cheap_done - start
+            if deep_results['models_used']:
+                self.deep_seconds += deep_done - cheap_done
+                self.deep_flows += int(deep.sum())
+            self.sample_checked += checked
+            self.sample_flagged += flagged
+        return results
+
+    @property
+    def skipped(self):
+        return self.flows - self.suspicious - self.sampled
+
+    @property
+    def saved_seconds(self):
+        """Estimated deep-model time not spent on skipped flows"""
+        if not self.deep_flows:
+            return 0.0
+        return self.deep_seconds / self.deep_flows * self.skipped
+
+    @property
+    def agreement(self):
+        """Estimated share of flows whose autoencoder verdict matches a full run (None before any sample)"""
+        if not self.sample_checked or not self.flows:
+            return None
+        return 1.0 - self.sample_flagged / self.sample_checked * self.skipped / self.flows
+
+    def summary(self):
+        """One-line cascade summary for status output"""
+        if not self.flows:
+            return "no flows scored"
+        agreement = self.agreement
+        return (f"{self.suspicious + self.sampled:,}/{self.flows:,} flows to deep models "
+                f"({self.suspicious:,} suspicious, {self.sampled:,} sampled) | "
+                f"~{self.saved_seconds:.2f}s deep inference saved | "
+                f"AE agreement {'n/a' if agreement is None else f'{agreement:.1%}'}")
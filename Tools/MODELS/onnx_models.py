@@ -0,0 +1,169 @@
+"""
+ONNX export of a model bundle and onnxruntime scoring
+After training, the scaler and every fitted model are converted to ONNX:
+the scaler, IsolationForest and RandomForest with skl2onnx, XGBoost with
+onnxmltools and the Keras models with tf2onnx. Scoring then goes through
+onnxruntime sessions for all of them, which only needs onnxruntime: a
+bundle saved with its ONNX models is scored without importing TensorFlow.
+
+The exported models run in float32, so scores differ from the float64
+sklearn/XGBoost models in the last digits; a flow right on a tree split
+can change class (benchmarks.py onnx reports both).
+"""
+
+import os
+import threading
+
+import numpy as np
+
+from lazy_imports import import_tensorflow, module_available
+from model_bundle import KERAS_MODELS, MODEL_NAMES
+
+ONNX_AVAILABLE = module_available('onnxruntime')
+
+# Bundle part -> interface of the model the session stands in for
+PART_KINDS = {
+    'scaler': 'scaler',
+    'isolation_forest': 'anomaly',
+    'xgboost_classifier': 'classifier',
+    'rf_fingerprinter': 'classifier',
+    'autoencoder': 'keras',
+    'lstm_classifier': 'keras',
+    'tcn_predictor': 'keras',
+}
+
+_OPSET = 15
+_ML_OPSET = 3
+
+
+def default_threads():
+    """intra-op threads per session: the parallel predictor runs about three models at once"""
+    return max(1, (os.cpu_count() or 1) // 3)
+
+
+def _export_part(key, model, n_features):
+    if key in KERAS_MODELS:
+        import tf2onnx
+        tf = import_tensorflow()
+        spec = (tf.TensorSpec([None] + list(model.input_shape[1:]), tf.float32, name='input'),)
+        # Traced as a function: from_keras cannot map Keras 3 models' tensor names
+        function = tf.function(lambda x: model(x, training=False), input_signature=spec)
+        proto, _ = tf2onnx.convert.from_function(function, input_signature=spec, opset=_OPSET)
+    elif key == 'xgboost_classifier':
+        import onnxmltools
+        from onnxmltools.convert.common.data_types import FloatTensorType
+        proto = onnxmltools.convert_xgboost(model, initial_types=[('input', FloatTensorType([None, n_features]))],
+                                            target_opset=_OPSET)
+    else:
+        from skl2onnx import convert_sklearn
+        from skl2onnx.common.data_types import FloatTensorType
+        # Probabilities as a plain tensor rather than a list of per-class dicts
+        options = {id(model): {'zipmap': False}} if hasattr(model, 'predict_proba') else None
+        proto = convert_sklearn(model, initial_types=[('input', FloatTensorType([None, n_features]))],
+                                target_opset={'': _OPSET, 'ai.onnx.ml': _ML_OPSET}, options=options)
+    return proto.SerializeToString()
+
+
+def export_onnx(bundle, existing=None):
+    """ONNX bytes of the bundle's scaler and models, {part: bytes}
+
+    Parts already in ``existing`` are kept as they are. A part that fails to
+    convert (or whose converter is not installed) is left out with a message
+    and keeps its native model.
+    """
+    exported = dict(existing or {})
+    n_features = len(bundle.feature_columns)
+    parts = [('scaler', bundle.scaler)] + [(key, bundle.models.get(key)) for key in MODEL_NAMES]
+    for key, model in parts:
+        if model is None or key in exported:
+            continue
+        try:
+            exported[key] = _export_part(key, model, n_features)
+        except Exception as e:
+            print(f"[!] {key}: ONNX export failed, keeping the native model: {e}")
+    return exported
+
+
+class OnnxModel:
+    """onnxruntime session with the interface of the model it was exported from
+
+    kind 'scaler' has transform(), 'anomaly' predict() and score_samples()
+    plus the IsolationForest's offset_, 'classifier' predict() and
+    predict_proba(), 'keras' predict(). Each of those is one session run;
+    score_batch() returns both outputs of an 'anomaly' or 'classifier'
+    model from a single run. Pickles as its ONNX bytes, so it can be sent
+    to the process backend's workers.
+    """
+
+    def __init__(self, content, kind, threads=None, offset=None):
+        self.content = content
+        self.kind = kind
+        self.threads = threads or default_threads()
+        self.offset_ = offset
+        self._setup()
+
+    def _setup(self):
+        self._session = None
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        return {'content': self.content, 'kind': self.kind, 'threads': self.threads, 'offset_': self.offset_}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._setup()
+
+    def _run(self, X):
+        with self._lock:
+            if self._session is None:
+                import onnxruntime as ort
+                options = ort.SessionOptions()
+                options.intra_op_num_threads = self.threads
+                options.inter_op_num_threads = 1
+                options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+                self._session = ort.InferenceSession(self.content, options, providers=['CPUExecutionProvider'])
+                self._input = self._session.get_inputs()[0].name
+        return self._session.run(None, {self._input: np.ascontiguousarray(X, dtype=np.float32)})
+
+    def transform(self, X):
+        return self._run(X)[0]
+
+    def predict(self, X, verbose=0):
+        outputs = self._run(X)
+        return outputs[0] if self.kind == 'keras' else np.ravel(outputs[0])
+
+    def predict_proba(self, X):
+        return self._run(X)[1]
+
+    def score_samples(self, X):
+        # The exported IsolationForest scores are decision_function values
+        return np.ravel(self._run(X)[1]) + self.offset_
+
+    def score_batch(self, X):
+        """Labels plus anomaly scores or class confidence, from one session run"""
+        labels, second = self._run(X)[:2]
+        if self.kind == 'anomaly':
+            return {'scores': np.ravel(second) + self.offset_, 'predictions': np.ravel(labels)}
+        return {'predictions': np.ravel(labels), 'confidence': np.max(second, axis=1)}
+
+
+def onnx_runners(bundle, threads=None):
+    """OnnxModel per part exported in ``bundle.compiled['onnx']``"""
+    runners = {}
+    for key, content in bundle.compiled.get('onnx', {}).items():
+        offset = getattr(bundle.models.get(key), 'offset_', None) if key == 'isolation_forest' else None
+        runners[key] = OnnxModel(content, PART_KINDS[key], threads, offset)
+    return runners
+
+
+def write_onnx(bundle, directory):
+    """Write the bundle's ONNX models to ``directory`` as <part>.onnx; returns the paths"""
+    exported = export_onnx(bundle, bundle.compiled.get('onnx'))
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for key, content in exported.items():
+        path = os.path.join(directory, f"{key}.onnx")
+        with open(path, 'wb') as f:
+            f.write(content)
+        paths.append(path)
+    return paths
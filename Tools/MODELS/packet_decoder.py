@@ -0,0 +1,386 @@
+"""
+Fast raw-bytes header decoder for the WiFi traffic analyzers
+Reads Ethernet, Linux cooked, RadioTap/802.11 + LLC/SNAP, IPv4/IPv6,
+TCP and UDP headers straight from frame bytes at fixed offsets, so the
+hot path never builds a full scapy dissection or calls haslayer().
+
+Frames the decoder cannot handle exactly (tunnels, MPLS, PPPoE, A-MSDU,
+truncated headers, ...) fall back to scapy, so the emitted fields always
+match what the scapy-based extractors produced.
+"""
+
+import socket
+import struct
+
+# libpcap link-layer header types
+LINKTYPE_ETHERNET = 1
+LINKTYPE_RAW = 101
+LINKTYPE_IEEE802_11 = 105
+LINKTYPE_LINUX_SLL = 113
+LINKTYPE_IEEE802_11_RADIOTAP = 127
+LINKTYPE_IPV4 = 228
+
+ETH_P_IP = 0x0800
+ETH_P_IPV6 = 0x86DD
+ETH_P_8021Q = 0x8100
+ETH_P_8021AD = 0x88A8
+ETH_P_QINQ = 0x9100
+
+# Ethertypes scapy may dissect down to an IPv4 header through a layer we do
+# not decode here (MPLS, PPPoE, 802.3/LLC). Everything else carries no IP.
+_ETHERTYPES_NEED_SCAPY = frozenset((0x8847, 0x8848, 0x8863, 0x8864, 0x6558, 0x88BE, 0x894F))
+
+# IPv4 protocols that may hide another IP/TCP header (IP-in-IP, IPv6, GRE)
+_IP_PROTOS_NEED_SCAPY = frozenset((4, 41, 47))
+
+# IPv6 next headers we decode directly (TCP, UDP, ICMPv6, no next header)
+_IPV6_DIRECT_NEXT_HEADERS = frozenset((6, 17, 58, 59))
+
+# UDP ports scapy binds to encapsulations carrying an inner Ethernet/IP frame
+_UDP_TUNNEL_PORTS = frozenset((4789, 4790, 6081, 8472))
+
+# scapy first-layer class name -> link type, for already-dissected packets
+_SCAPY_LINKTYPES = {
+    'Ether': LINKTYPE_ETHERNET,
+    'CookedLinux': LINKTYPE_LINUX_SLL,
+    'RadioTap': LINKTYPE_IEEE802_11_RADIOTAP,
+    'Dot11': LINKTYPE_IEEE802_11,
+    'Dot11FCS': LINKTYPE_IEEE802_11,
+    'IP': LINKTYPE_IPV4,
+}
+
+_unpack_ipv4 = struct.Struct('!BBHHHBBH4s4s').unpack_from
+_unpack_tcp = struct.Struct('!HHIIBBH').unpack_from
+_unpack_udp = struct.Struct('!HHH').unpack_from
+_unpack_u16be = struct.Struct('!H').unpack_from
+_unpack_u16le = struct.Struct('<H').unpack_from
+_unpack_u32be = struct.Struct('!I').unpack_from
+
+
+class DecodedFrame:
+    """Header fields of one frame, as read by the extractors"""
+
+    __slots__ = (
+        'timestamp', 'length',
+        'has_ip', 'has_tcp', 'has_udp', 'has_icmp',
+        'ip_len', 'ip_ttl', 'ip_proto', 'src_addr', 'dst_addr',
+        'src_port', 'dst_port',
+        'tcp_flags', 'tcp_window', 'tcp_seq', 'tcp_ack', 'udp_len'
+    )
+
+    def __init__(self, timestamp=0.0, length=0):
+        self.timestamp = timestamp
+        self.length = length
+        self.has_ip = 0
+        self.has_tcp = 0
+        self.has_udp = 0
+        self.has_icmp = 0
+        self.ip_len = 0
+        self.ip_ttl = 0
+        self.ip_proto = 0
+        self.src_addr = 0
+        self.dst_addr = 0
+        self.src_port = 0
+        self.dst_port = 0
+        self.tcp_flags = 0
+        self.tcp_window = 0
+        self.tcp_seq = 0
+        self.tcp_ack = 0
+        self.udp_len = 0
+
+    @property
+    def src_ip(self):
+        return socket.inet_ntoa(self.src_addr.to_bytes(4, 'big'))
+
+    @property
+    def dst_ip(self):
+        return socket.inet_ntoa(self.dst_addr.to_bytes(4, 'big'))
+
+    @property
+    def flag_fin(self):
+        return self.tcp_flags & 0x01
+
+    @property
+    def flag_syn(self):
+        return (self.tcp_flags >> 1) & 1
+
+    @property
+    def flag_rst(self):
+        return (self.tcp_flags >> 2) & 1
+
+    @property
+    def flag_psh(self):
+        return (self.tcp_flags >> 3) & 1
+
+    @property
+    def flag_ack(self):
+        return (self.tcp_flags >> 4) & 1
+
+    @classmethod
+    def from_scapy(cls, packet):
+        """Slow path: fill the fields from a full scapy dissection"""
+        from scapy.all import IP, TCP, UDP, ICMP
+
+        frame = cls(float(packet.time), len(packet))
+        frame.has_tcp = 1 if packet.haslayer(TCP) else 0
+        frame.has_udp = 1 if packet.haslayer(UDP) else 0
+        frame.has_icmp = 1 if packet.haslayer(ICMP) else 0
+
+        if packet.haslayer(IP):
+            ip = packet[IP]
+            frame.has_ip = 1
+            frame.ip_len = ip.len
+            frame.ip_ttl = ip.ttl
+            frame.ip_proto = ip.proto
+            frame.src_addr = _unpack_u32be(socket.inet_aton(ip.src))[0]
+            frame.dst_addr = _unpack_u32be(socket.inet_aton(ip.dst))[0]
+
+        if frame.has_tcp:
+            tcp = packet[TCP]
+            frame.src_port = tcp.sport
+            frame.dst_port = tcp.dport
+            frame.tcp_flags = int(tcp.flags)
+            frame.tcp_window = tcp.window
+            frame.tcp_seq = tcp.seq
+            frame.tcp_ack = tcp.ack
+        elif frame.has_udp:
+            udp = packet[UDP]
+            frame.src_port = udp.sport
+            frame.dst_port = udp.dport
+            frame.udp_len = udp.len
+
+        return frame
+
+
+class RawFrame:
+    """Undissected frame from a raw capture, with its classify_frame bits"""
+
+    __slots__ = ('data', 'linktype', 'timestamp', 'kind')
+
+    def __init__(self, data, linktype, timestamp, kind=0):
+        self.data = data
+        self.linktype = linktype
+        self.timestamp = timestamp
+        self.kind = kind
+
+
+def decode_frame(data, linktype=LINKTYPE_ETHERNET, timestamp=0.0):
+    """Decode headers from raw frame bytes
+
+    Returns a DecodedFrame, or None when the frame needs a full scapy
+    dissection to be decoded exactly.
+    """
+    frame = DecodedFrame(timestamp, len(data))
+
+    if linktype == LINKTYPE_ETHERNET:
+        if len(data) < 14:
+            return None
+        return _decode_ethertype(frame, data, _unpack_u16be(data, 12)[0], 14)
+
+    if linktype == LINKTYPE_IEEE802_11_RADIOTAP:
+        if len(data) < 8:
+            return None
+        return _decode_dot11(frame, data, _unpack_u16le(data, 2)[0])
+
+    if linktype == LINKTYPE_IEEE802_11:
+        return _decode_dot11(frame, data, 0)
+
+    if linktype == LINKTYPE_LINUX_SLL:
+        if len(data) < 16:
+            return None
+        return _decode_ethertype(frame, data, _unpack_u16be(data, 14)[0], 16)
+
+    if linktype in (LINKTYPE_RAW, LINKTYPE_IPV4):
+        if not data:
+            return None
+        version = data[0] >> 4
+        if version == 4:
+            return _decode_ipv4(frame, data, 0)
+        if version == 6 and linktype == LINKTYPE_RAW:
+            return _decode_ipv6(frame, data, 0)
+        return None
+
+    return None
+
+
+def decode_packet(packet):
+    """Decode an already captured scapy packet (or a RawFrame) via the raw-bytes fast path"""
+    if isinstance(packet, DecodedFrame):
+        return packet
+    if isinstance(packet, RawFrame):
+        return decode_bytes(packet.data, packet.linktype, packet.timestamp)
+
+    linktype = _SCAPY_LINKTYPES.get(packet.__class__.__name__)
+    if linktype is not None:
+        data = getattr(packet, 'original', None) or bytes(packet)
+        frame = decode_frame(data, linktype, float(packet.time))
+        if frame is not None:
+            return frame
+
+    return DecodedFrame.from_scapy(packet)
+
+
+def decode_bytes(data, linktype, timestamp=0.0):
+    """Decode raw frame bytes, dissecting with scapy only if needed"""
+    frame = decode_frame(data, linktype, timestamp)
+    if frame is not None:
+        return frame
+
+    from scapy.all import conf, Raw
+    layer = conf.l2types.num2layer.get(linktype, Raw)
+    packet = layer(bytes(data))
+    packet.time = timestamp
+    return DecodedFrame.from_scapy(packet)
+
+
+def iter_pcap_frames(pcap_file, max_packets=None):
+    """Stream a pcap/pcapng file as DecodedFrames, packet by packet"""
+    from scapy.utils import RawPcapReader
+
+    with RawPcapReader(pcap_file) as reader:
+        linktype = getattr(reader, 'linktype', LINKTYPE_ETHERNET)
+        ts_divisor = 1e9 if getattr(reader, 'nano', False) else 1e6
+
+        for count, (data, meta) in enumerate(reader):
+            if max_packets and count >= max_packets:
+                break
+
+            if hasattr(meta, 'tshigh'):
+                # pcapng: per-interface link type and timestamp resolution
+                timestamp = ((meta.tshigh << 32) | meta.tslow) / meta.tsresol
+                yield decode_bytes(data, meta.linktype, timestamp)
+            else:
+                yield decode_bytes(data, linktype, meta.sec + meta.usec / ts_divisor)
+
+
+def _decode_ethertype(frame, data, ethertype, offset):
+    """Dispatch on an Ethertype found at the given payload offset"""
+    # Strip 802.1Q / 802.1ad VLAN tags
+    while ethertype in (ETH_P_8021Q, ETH_P_8021AD, ETH_P_QINQ):
+        if len(data) < offset + 4:
+            return None
+        ethertype = _unpack_u16be(data, offset + 2)[0]
+        offset += 4
+
+    if ethertype == ETH_P_IP:
+        return _decode_ipv4(frame, data, offset)
+    if ethertype == ETH_P_IPV6:
+        return _decode_ipv6(frame, data, offset)
+    if ethertype <= 1500 or ethertype in _ETHERTYPES_NEED_SCAPY:
+        return None
+
+    # ARP, EAPOL, LLDP, ... carry no IP layer
+    return frame
+
+
+def _decode_dot11(frame, data, offset):
+    """Decode an 802.11 frame starting at offset (after RadioTap)"""
+    if len(data) < offset + 24:
+        return None
+
+    fc_type = (data[offset] >> 2) & 0x3
+    subtype = data[offset] >> 4
+    fc_flags = data[offset + 1]
+
+    # Management / control frames, protected or null data carry no IP
+    if fc_type != 2 or fc_flags & 0x40 or subtype & 0x4:
+        return frame
+
+    header_len = 24
+    if fc_flags & 0x03 == 0x03:
+        header_len += 6
+    if subtype & 0x8:
+        # QoS data: A-MSDU aggregation and +HTC control need scapy
+        if len(data) < offset + header_len + 2:
+            return None
+        if fc_flags & 0x80 or data[offset + header_len] & 0x80:
+            return None
+        header_len += 2
+
+    llc = offset + header_len
+    if len(data) < llc + 8:
+        return None
+    if data[llc:llc + 6] != b'\xaa\xaa\x03\x00\x00\x00':
+        return None
+
+    return _decode_ethertype(frame, data, _unpack_u16be(data, llc + 6)[0], llc + 8)
+
+
+def _decode_ipv4(frame, data, offset):
+    """Decode an IPv4 header and its TCP/UDP/ICMP payload"""
+    if len(data) < offset + 20:
+        return None
+
+    (ver_ihl, _tos, ip_len, _ident, frag, ttl, proto, _csum,
+     src, dst) = _unpack_ipv4(data, offset)
+    ihl = (ver_ihl & 0x0F) << 2
+    if ver_ihl >> 4 != 4 or ihl < 20 or len(data) < offset + ihl:
+        return None
+    if proto in _IP_PROTOS_NEED_SCAPY:
+        return None
+
+    frame.has_ip = 1
+    frame.ip_len = ip_len
+    frame.ip_ttl = ttl
+    frame.ip_proto = proto
+    frame.src_addr = _unpack_u32be(src)[0]
+    frame.dst_addr = _unpack_u32be(dst)[0]
+
+    # Non-first fragments carry no transport header
+    if frag & 0x1FFF:
+        return frame
+
+    # Like scapy, the transport layer is bounded by the IP total length
+    start = offset + ihl
+    end = offset + ip_len if ip_len >= ihl else len(data)
+    end = min(end, len(data))
+    return _decode_transport(frame, data, start, end - start, proto)
+
+
+def _decode_ipv6(frame, data, offset):
+    """Decode an IPv6 header (no IPv4 layer; transport still reported)"""
+    if len(data) < offset + 40:
+        return None
+
+    next_header = data[offset + 6]
+    if next_header not in _IPV6_DIRECT_NEXT_HEADERS:
+        return None
+
+    payload_len = _unpack_u16be(data, offset + 4)[0]
+    start = offset + 40
+    available = min(payload_len, len(data) - start)
+    return _decode_transport(frame, data, start, available, next_header)
+
+
+def _decode_transport(frame, data, start, available, proto):
+    """Decode TCP/UDP/ICMP headers; a partial header is left to scapy"""
+    if proto == 6:
+        if available >= 20:
+            sport, dport, seq, ack, _off, flags, window = _unpack_tcp(data, start)
+            frame.has_tcp = 1
+            frame.src_port = sport
+            frame.dst_port = dport
+            frame.tcp_seq = seq
+            frame.tcp_ack = ack
+            frame.tcp_window = window
+            frame.tcp_flags = flags | ((data[start + 12] & 0x01) << 8)
+        elif available > 0:
+            return None
+    elif proto == 17:
+        if available >= 8:
+            sport, dport, udp_len = _unpack_udp(data, start)
+            if sport in _UDP_TUNNEL_PORTS or dport in _UDP_TUNNEL_PORTS:
+                return None
+            frame.has_udp = 1
+            frame.src_port = sport
+            frame.dst_port = dport
+            frame.udp_len = udp_len
+        elif available > 0:
+            return None
+    elif proto == 1 and frame.has_ip:
+        if available >= 8:
+            frame.has_icmp = 1
+        elif available > 0:
+            return None
+
+    return frame
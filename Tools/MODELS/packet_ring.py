@@ -0,0 +1,115 @@
+"""
+AF_PACKET TPACKET_V3 ring capture for LivePacketCapture (Linux only)
+sniff() reads one frame per recvmsg() through scapy's socket layer. Here
+the kernel writes frames into a ring of blocks shared with this process
+(mmap), and a whole block is handed over at once: the capture loop walks
+the frames of a block in place and gives the decoder memoryviews into the
+ring, without a syscall or a copy per frame. A block goes back to the
+kernel once all of its frames have been read, so a view is only valid
+until the loop moves on; anything kept longer must be copied (bytes()).
+
+The kernel retires a block when it is full or ``timeout_ms`` after its
+first frame, which bounds the latency on a quiet link.
+"""
+
+import mmap
+import select
+import socket
+import struct
+
+from capture_filter import interface_linktype
+
+ETH_P_ALL = 0x0003
+SOL_PACKET = 263
+PACKET_ADD_MEMBERSHIP = 1
+PACKET_MR_PROMISC = 1
+PACKET_RX_RING = 5
+PACKET_VERSION = 10
+TPACKET_V3 = 2
+
+TP_STATUS_KERNEL = 0
+TP_STATUS_USER = 1
+
+# struct tpacket_block_desc: version, offset_to_priv, then tpacket_hdr_v1
+# block_status, num_pkts, offset_to_first_pkt
+_unpack_block = struct.Struct('III').unpack_from
+_BLOCK_STATUS = 8
+# struct tpacket3_hdr: tp_next_offset, tp_sec, tp_nsec, tp_snaplen, tp_len, tp_status, tp_mac
+_unpack_frame = struct.Struct('IIIIIIH').unpack_from
+_pack_status = struct.Struct('I').pack_into
+
+
+class PacketRing:
+    """TPACKET_V3 receive ring on one interface
+
+    ``block_size`` (a multiple of the page size) times ``block_count`` is
+    the ring's memory; ``frame_size`` only caps the snap length of one
+    frame. The socket is exposed as ``sock`` for BPF filters and
+    PACKET_STATISTICS.
+    """
+
+    def __init__(self, interface, block_size=1 << 20, block_count=64, frame_size=1 << 16,
+                 timeout_ms=50, promisc=True):
+        if block_size % mmap.PAGESIZE or block_count < 1 or frame_size > block_size:
+            raise ValueError(f"block_size must be a multiple of {mmap.PAGESIZE} and hold at least one frame")
+        self.interface = interface
+        self.block_size = block_size
+        self.block_count = block_count
+        self.linktype = interface_linktype(interface)
+        self.blocks = 0
+        self.packets = 0
+
+        self.sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, socket.htons(ETH_P_ALL))
+        try:
+            self.sock.setsockopt(SOL_PACKET, PACKET_VERSION, TPACKET_V3)
+            # struct tpacket_req3: block size/count, frame size/count, retire timeout, priv size, features
+            request = struct.pack('IIIIIII', block_size, block_count, frame_size,
+                                  block_size // frame_size * block_count, timeout_ms, 0, 0)
+            self.sock.setsockopt(SOL_PACKET, PACKET_RX_RING, request)
+            self._map = mmap.mmap(self.sock.fileno(), block_size * block_count,
+                                  mmap.MAP_SHARED, mmap.PROT_READ | mmap.PROT_WRITE)
+            if promisc:
+                membership = struct.pack('iHH8s', socket.if_nametoindex(interface), PACKET_MR_PROMISC, 0, b'')
+                self.sock.setsockopt(SOL_PACKET, PACKET_ADD_MEMBERSHIP, membership)
+            self.sock.bind((interface, ETH_P_ALL))
+        except Exception:
+            self.sock.close()
+            raise
+        self._ring = memoryview(self._map)
+
+    def frames(self, is_active, poll=0.5):
+        """(memoryview, linktype, timestamp) per frame until ``is_active()`` is false
+
+        Each view points into the ring and is only valid until the next
+        frame is requested.
+        """
+        ring, block_size, linktype = self._ring, self.block_size, self.linktype
+        poller = select.poll()
+        poller.register(self.sock, select.POLLIN | select.POLLERR)
+        block = 0
+        while is_active():
+            base = block * block_size
+            status, count, offset = _unpack_block(ring, base + _BLOCK_STATUS)
+            if not status & TP_STATUS_USER:
+                poller.poll(poll * 1000)
+                continue
+
+            offset += base
+            for _ in range(count):
+                next_offset, sec, nsec, snaplen, _, _, mac = _unpack_frame(ring, offset)
+                start = offset + mac
+                yield ring[start:start + snaplen], linktype, sec + nsec * 1e-9
+                offset += next_offset
+
+            _pack_status(ring, base + _BLOCK_STATUS, TP_STATUS_KERNEL)
+            self.blocks += 1
+            self.packets += count
+            block = (block + 1) % self.block_count
+
+    def close(self):
+        self._ring.release()
+        try:
+            self._map.close()
+        except BufferError:
+            pass    # a frame view is still referenced; the mapping goes with it
+        self.sock.close()
@@ -0,0 +1,539 @@
+"""
+Memory-mapped, vectorized PCAP decoding for offline analysis
+Maps a classic libpcap file, indexes the record offsets in one pass and
+decodes every header column with NumPy gathers into a structured array,
+so no Python object is created per packet.
+
+The column semantics match packet_decoder.decode_frame(); the rare rows
+it would hand to scapy (tunnels, A-MSDU, truncated headers, ...) are
+patched one by one through packet_decoder.decode_bytes().
+"""
+
+import mmap
+import socket
+import struct
+
+import numpy as np
+
+from packet_decoder import (
+    decode_bytes,
+    LINKTYPE_ETHERNET, LINKTYPE_RAW, LINKTYPE_IEEE802_11, LINKTYPE_LINUX_SLL,
+    LINKTYPE_IEEE802_11_RADIOTAP, LINKTYPE_IPV4,
+    _ETHERTYPES_NEED_SCAPY, _IP_PROTOS_NEED_SCAPY, _IPV6_DIRECT_NEXT_HEADERS, _UDP_TUNNEL_PORTS,
+)
+
+PCAP_MAGIC_USEC = 0xA1B2C3D4
+PCAP_MAGIC_NSEC = 0xA1B23C4D
+PCAP_GLOBAL_HEADER_LEN = 24
+PCAP_RECORD_HEADER_LEN = 16
+
+# One row per packet, same fields as packet_decoder.DecodedFrame
+PACKET_DTYPE = np.dtype([
+    ('timestamp', 'f8'),
+    ('length', 'u4'),
+    ('has_ip', 'u1'),
+    ('has_tcp', 'u1'),
+    ('has_udp', 'u1'),
+    ('has_icmp', 'u1'),
+    ('ip_len', 'u2'),
+    ('ip_ttl', 'u1'),
+    ('ip_proto', 'u1'),
+    ('src_addr', 'u4'),
+    ('dst_addr', 'u4'),
+    ('src_port', 'u2'),
+    ('dst_port', 'u2'),
+    ('tcp_flags', 'u2'),
+    ('tcp_window', 'u2'),
+    ('tcp_seq', 'u4'),
+    ('tcp_ack', 'u4'),
+    ('udp_len', 'u2'),
+])
+
+# One row per flow, same columns as PCAPFeatureExtractor.extract_flow_features()
+FLOW_DTYPE = np.dtype([
+    ('flow_duration', 'f8'),
+    ('flow_packet_count', 'i8'),
+    ('flow_byte_count', 'i8'),
+    ('flow_bytes_per_packet_mean', 'f8'),
+    ('flow_bytes_per_packet_std', 'f8'),
+    ('flow_bytes_per_packet_min', 'i8'),
+    ('flow_bytes_per_packet_max', 'i8'),
+    ('flow_inter_arrival_mean', 'f8'),
+    ('flow_inter_arrival_std', 'f8'),
+    ('flow_inter_arrival_min', 'f8'),
+    ('flow_inter_arrival_max', 'f8'),
+    ('src_ip', 'U15'),
+    ('dst_ip', 'U15'),
+])
+
+
+# Mergeable per-flow state of one shard (or of a whole capture)
+PARTIAL_FLOW_DTYPE = np.dtype([
+    ('key_lo', 'u8'),
+    ('key_hi', 'u8'),
+    ('first_position', 'i8'),
+    ('last_position', 'i8'),
+    ('count', 'i8'),
+    ('first_time', 'f8'),
+    ('last_time', 'f8'),
+    ('byte_sum', 'i8'),
+    ('byte_m2', 'f8'),
+    ('byte_min', 'i8'),
+    ('byte_max', 'i8'),
+    ('gap_count', 'i8'),
+    ('gap_sum', 'f8'),
+    ('gap_m2', 'f8'),
+    ('gap_min', 'f8'),
+    ('gap_max', 'f8'),
+    ('src_addr', 'u4'),
+    ('dst_addr', 'u4'),
+])
+
+class PcapFormatError(ValueError):
+    """Raised for files that are not classic libpcap captures"""
+
+
+def read_pcap_header(buf):
+    """Parse the global header: returns (byte order, ts divisor, link type)"""
+    if len(buf) < PCAP_GLOBAL_HEADER_LEN:
+        raise PcapFormatError("File too short for a pcap global header")
+
+    for order in ('<', '>'):
+        magic = struct.unpack_from(order + 'I', buf, 0)[0]
+        if magic in (PCAP_MAGIC_USEC, PCAP_MAGIC_NSEC):
+            linktype = struct.unpack_from(order + 'I', buf, 20)[0] & 0x0FFFFFFF
+            divisor = 1e9 if magic == PCAP_MAGIC_NSEC else 1e6
+            return order, divisor, linktype
+
+    raise PcapFormatError("Not a classic libpcap file (pcapng is not supported by the mmap engine)")
+
+
+def index_records(buf, byte_order='<', start=PCAP_GLOBAL_HEADER_LEN, end=None, max_packets=None,
+                  stop=None):
+    """Walk the record headers once and return the record offsets
+
+    Only the 16-byte record headers are touched; a truncated trailing
+    record is ignored. With ``stop`` only records starting before that
+    offset are indexed (the last one may run past it).
+    """
+    unpack = struct.Struct(byte_order + 'I').unpack_from
+    end = len(buf) if end is None else end
+    stop = end if stop is None else stop
+    limit = max_packets or -1
+    offsets = []
+    append = offsets.append
+    offset = start
+
+    while offset < stop and offset + PCAP_RECORD_HEADER_LEN <= end and limit != 0:
+        caplen = unpack(buf, offset + 8)[0]
+        if offset + PCAP_RECORD_HEADER_LEN + caplen > end:
+            break
+        append(offset)
+        offset += PCAP_RECORD_HEADER_LEN + caplen
+        limit -= 1
+
+    return np.array(offsets, dtype=np.int64)
+
+
+def decode_records(buf, offsets, linktype, byte_order='<', ts_divisor=1e6):
+    """Decode the header columns of the records at ``offsets`` into a table"""
+    data = np.frombuffer(buf, dtype=np.uint8)
+    size = len(data)
+    n = len(offsets)
+    table = np.zeros(n, dtype=PACKET_DTYPE)
+    if n == 0:
+        return table
+
+    def u8(idx):
+        return data[np.minimum(idx, size - 1)].astype(np.int64)
+
+    def be16(idx):
+        return (u8(idx) << 8) | u8(idx + 1)
+
+    def le16(idx):
+        return u8(idx) | (u8(idx + 1) << 8)
+
+    def be32(idx):
+        return (be16(idx) << 16) | be16(idx + 2)
+
+    def le32(idx):
+        return le16(idx) | (le16(idx + 2) << 16)
+
+    hdr32 = le32 if byte_order == '<' else be32
+
+    # Record headers
+    ts_sec = hdr32(offsets)
+    ts_frac = hdr32(offsets + 4)
+    caplen = hdr32(offsets + 8)
+    table['timestamp'] = ts_sec + ts_frac / ts_divisor
+    table['length'] = caplen
+
+    rec_start = offsets + PCAP_RECORD_HEADER_LEN
+    rec_end = rec_start + caplen
+    fallback = np.zeros(n, dtype=bool)
+
+    # Link layer -> (ethertype, network-layer offset); -1 means "no IP"
+    if linktype == LINKTYPE_ETHERNET:
+        fallback |= caplen < 14
+        ethertype = be16(rec_start + 12)
+        l3 = rec_start + 14
+    elif linktype == LINKTYPE_LINUX_SLL:
+        fallback |= caplen < 16
+        ethertype = be16(rec_start + 14)
+        l3 = rec_start + 16
+    elif linktype in (LINKTYPE_RAW, LINKTYPE_IPV4):
+        version = u8(rec_start) >> 4
+        ethertype = np.where(version == 4, 0x0800, -1)
+        if linktype == LINKTYPE_RAW:
+            ethertype = np.where(version == 6, 0x86DD, ethertype)
+        fallback |= (caplen == 0) | (ethertype == -1)
+        l3 = rec_start
+    elif linktype in (LINKTYPE_IEEE802_11_RADIOTAP, LINKTYPE_IEEE802_11):
+        if linktype == LINKTYPE_IEEE802_11_RADIOTAP:
+            fallback |= caplen < 8
+            dot11 = rec_start + le16(rec_start + 2)
+        else:
+            dot11 = rec_start
+        fallback |= dot11 + 24 > rec_end
+
+        fc0 = u8(dot11)
+        fc1 = u8(dot11 + 1)
+        subtype = fc0 >> 4
+        is_data = (((fc0 >> 2) & 0x3) == 2) & ((fc1 & 0x40) == 0) & ((subtype & 0x4) == 0)
+
+        header_len = 24 + 6 * ((fc1 & 0x03) == 0x03)
+        qos = (subtype & 0x8) != 0
+        fallback |= is_data & qos & (dot11 + header_len + 2 > rec_end)
+        fallback |= is_data & qos & (((fc1 & 0x80) != 0) | ((u8(dot11 + header_len) & 0x80) != 0))
+        llc = dot11 + header_len + 2 * qos
+
+        snap = np.ones(n, dtype=bool)
+        for i, byte in enumerate(b'\xaa\xaa\x03\x00\x00\x00'):
+            snap &= u8(llc + i) == byte
+        fallback |= is_data & ((llc + 8 > rec_end) | ~snap)
+
+        ethertype = np.where(is_data, be16(llc + 6), -1)
+        l3 = llc + 8
+    else:
+        raise PcapFormatError(f"Unsupported link type {linktype}")
+
+    # 802.1Q / 802.1ad VLAN tags
+    for _ in range(2):
+        vlan = np.isin(ethertype, (0x8100, 0x88A8, 0x9100))
+        fallback |= vlan & (l3 + 4 > rec_end)
+        ethertype = np.where(vlan, be16(l3 + 2), ethertype)
+        l3 = np.where(vlan, l3 + 4, l3)
+    fallback |= np.isin(ethertype, (0x8100, 0x88A8, 0x9100))
+    fallback |= (ethertype >= 0) & (ethertype <= 1500)
+    fallback |= np.isin(ethertype, list(_ETHERTYPES_NEED_SCAPY))
+
+    # IPv4
+    ipv4 = ethertype == 0x0800
+    ver_ihl = u8(l3)
+    ihl = (ver_ihl & 0x0F) << 2
+    fallback |= ipv4 & ((l3 + 20 > rec_end) | ((ver_ihl >> 4) != 4) | (ihl < 20) | (l3 + ihl > rec_end))
+    proto = u8(l3 + 9)
+    fallback |= ipv4 & np.isin(proto, list(_IP_PROTOS_NEED_SCAPY))
+    ip_len = be16(l3 + 2)
+    first_fragment = (be16(l3 + 6) & 0x1FFF) == 0
+
+    table['has_ip'] = ipv4
+    table['ip_len'] = np.where(ipv4, ip_len, 0)
+    table['ip_ttl'] = np.where(ipv4, u8(l3 + 8), 0)
+    table['ip_proto'] = np.where(ipv4, proto, 0)
+    table['src_addr'] = np.where(ipv4, be32(l3 + 12), 0)
+    table['dst_addr'] = np.where(ipv4, be32(l3 + 16), 0)
+
+    ipv4_start = l3 + ihl
+    ipv4_end = np.minimum(np.where(ip_len >= ihl, l3 + ip_len, rec_end), rec_end)
+
+    # IPv6 (no IPv4 layer, but the transport is still reported like scapy)
+    ipv6 = ethertype == 0x86DD
+    fallback |= ipv6 & (l3 + 40 > rec_end)
+    next_header = u8(l3 + 6)
+    fallback |= ipv6 & ~np.isin(next_header, list(_IPV6_DIRECT_NEXT_HEADERS))
+    ipv6_start = l3 + 40
+    ipv6_end = np.minimum(ipv6_start + be16(l3 + 4), rec_end)
+
+    l4_proto = np.where(ipv4 & first_fragment, proto, np.where(ipv6, next_header, -1))
+    l4 = np.where(ipv4, ipv4_start, ipv6_start)
+    available = np.where(ipv4, ipv4_end, ipv6_end) - l4
+
+    # TCP / UDP / ICMP
+    tcp = (l4_proto == 6) & (available >= 20)
+    udp = (l4_proto == 17) & (available >= 8)
+    icmp = ipv4 & (l4_proto == 1) & (available >= 8)
+    fallback |= (l4_proto == 6) & (available > 0) & (available < 20)
+    fallback |= ((l4_proto == 17) | (ipv4 & (l4_proto == 1))) & (available > 0) & (available < 8)
+
+    sport = be16(l4)
+    dport = be16(l4 + 2)
+    fallback |= udp & (np.isin(sport, list(_UDP_TUNNEL_PORTS)) | np.isin(dport, list(_UDP_TUNNEL_PORTS)))
+
+    table['has_tcp'] = tcp
+    table['has_udp'] = udp
+    table['has_icmp'] = icmp
+    table['src_port'] = np.where(tcp | udp, sport, 0)
+    table['dst_port'] = np.where(tcp | udp, dport, 0)
+    table['tcp_seq'] = np.where(tcp, be32(l4 + 4), 0)
+    table['tcp_ack'] = np.where(tcp, be32(l4 + 8), 0)
+    table['tcp_flags'] = np.where(tcp, u8(l4 + 13) | ((u8(l4 + 12) & 0x01) << 8), 0)
+    table['tcp_window'] = np.where(tcp, be16(l4 + 14), 0)
+    table['udp_len'] = np.where(udp, be16(l4 + 4), 0)
+
+    # Rows the fixed-offset path cannot decode exactly
+    for row in np.flatnonzero(fallback):
+        frame = decode_bytes(bytes(data[rec_start[row]:rec_end[row]]), linktype,
+                             float(table['timestamp'][row]))
+        for field in PACKET_DTYPE.names:
+            table[field][row] = getattr(frame, field)
+
+    return table
+
+
+def read_pcap_table(pcap_file, max_packets=None):
+    """Memory-map a classic libpcap file and decode it into a packet table"""
+    with open(pcap_file, 'rb') as f:
+        f.seek(0, 2)
+        if f.tell() == 0:
+            raise PcapFormatError("Empty capture file")
+
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            byte_order, ts_divisor, linktype = read_pcap_header(mm)
+            offsets = index_records(mm, byte_order, max_packets=max_packets)
+            return decode_records(mm, offsets, linktype, byte_order, ts_divisor)
+        finally:
+            mm.close()
+
+
+def flow_keys(table):
+    """Canonical bidirectional flow key of every IP row
+
+    Returns (ip_rows, key_lo, key_hi): the lower (address, port) endpoint
+    and the higher endpoint packed with the protocol, as uint64 columns.
+    """
+    ip_rows = np.flatnonzero(table['has_ip'])
+    rows = table[ip_rows]
+    transport = (rows['has_tcp'] | rows['has_udp']).astype(bool)
+    sport = np.where(transport, rows['src_port'], 0).astype(np.uint64)
+    dport = np.where(transport, rows['dst_port'], 0).astype(np.uint64)
+    proto = np.where(rows['has_tcp'] == 1, 1, np.where(rows['has_udp'] == 1, 2, 0)).astype(np.uint64)
+
+    a = (rows['src_addr'].astype(np.uint64) << np.uint64(16)) | sport
+    b = (rows['dst_addr'].astype(np.uint64) << np.uint64(16)) | dport
+    key_lo = np.minimum(a, b)
+    key_hi = (np.maximum(a, b) << np.uint64(2)) | proto
+    return ip_rows, key_lo, key_hi
+
+
+def flow_ids(table):
+    """Dense bidirectional flow id per row, numbered by first appearance (-1 = no IP)"""
+    ids = np.full(len(table), -1, dtype=np.int64)
+    ip_rows, key_lo, key_hi = flow_keys(table)
+    if len(ip_rows) == 0:
+        return ids, 0
+
+    order = np.lexsort((key_hi, key_lo))
+    starts = _group_starts(key_lo[order], key_hi[order])
+    group = np.repeat(np.arange(len(starts)), np.diff(np.append(starts, len(order))))
+
+    # Renumber groups by first appearance so flows keep capture order
+    n_flows = len(starts)
+    first = np.minimum.reduceat(order, starts)
+    rank = np.empty(n_flows, dtype=np.int64)
+    rank[np.argsort(first, kind='stable')] = np.arange(n_flows)
+
+    local = np.empty(len(order), dtype=np.int64)
+    local[order] = rank[group]
+    ids[ip_rows] = local
+    return ids, n_flows
+
+
+def _group_starts(*keys):
+    """Start index of every run of equal values in already sorted key columns"""
+    change = np.zeros(len(keys[0]) - 1, dtype=bool)
+    for key in keys:
+        change |= key[1:] != key[:-1]
+    return np.flatnonzero(np.concatenate(([True], change)))
+
+
+def partial_flows(table, positions=None):
+    """Reduce a packet table to one PARTIAL_FLOW_DTYPE row per flow
+
+    ``positions`` orders the rows within the whole capture (record byte
+    offsets for a shard) and defaults to the row index. Rows are lexsorted
+    by (flow key, timestamp, position) and every column is reduced over
+    the contiguous flow groups with ufunc.reduceat. Single-packet flows
+    are kept so partials of neighbouring shards can still be merged.
+    """
+    if positions is None:
+        positions = np.arange(len(table), dtype=np.int64)
+
+    ip_rows, key_lo, key_hi = flow_keys(table)
+    if len(ip_rows) == 0:
+        return np.zeros(0, dtype=PARTIAL_FLOW_DTYPE)
+
+    sort = np.lexsort((positions[ip_rows], table['timestamp'][ip_rows], key_hi, key_lo))
+    order = ip_rows[sort]
+    key_lo, key_hi = key_lo[sort], key_hi[sort]
+    times = table['timestamp'][order]
+    lengths = table['length'][order].astype(np.int64)
+    where = positions[order]
+
+    starts = _group_starts(key_lo, key_hi)
+    counts = np.diff(np.append(starts, len(order)))
+    group = np.repeat(np.arange(len(starts)), counts)
+
+    partial = np.zeros(len(starts), dtype=PARTIAL_FLOW_DTYPE)
+    partial['key_lo'] = key_lo[starts]
+    partial['key_hi'] = key_hi[starts]
+    partial['first_position'] = np.minimum.reduceat(where, starts)
+    partial['last_position'] = last_position = np.maximum.reduceat(where, starts)
+    partial['count'] = counts
+    partial['first_time'] = times[starts]
+    partial['last_time'] = times[starts + counts - 1]
+
+    byte_sum = np.add.reduceat(lengths, starts)
+    byte_dev = lengths - (byte_sum / counts)[group]
+    partial['byte_sum'] = byte_sum
+    partial['byte_m2'] = np.add.reduceat(byte_dev * byte_dev, starts)
+    partial['byte_min'] = np.minimum.reduceat(lengths, starts)
+    partial['byte_max'] = np.maximum.reduceat(lengths, starts)
+
+    # n - 1 gaps per flow; gaps spanning two flows are dropped
+    same_flow = np.ones(len(order) - 1, dtype=bool)
+    same_flow[starts[1:] - 1] = False
+    gaps = np.diff(times)[same_flow]
+    gap_counts = counts - 1
+    partial['gap_count'] = gap_counts
+    partial['gap_min'] = np.inf
+    partial['gap_max'] = -np.inf
+
+    with_gaps = gap_counts > 0
+    if len(gaps):
+        gap_starts = (starts - np.arange(len(starts)))[with_gaps]
+        gap_sum = np.add.reduceat(gaps, gap_starts)
+        gap_dev = gaps - np.repeat(gap_sum / gap_counts[with_gaps], gap_counts[with_gaps])
+        partial['gap_sum'][with_gaps] = gap_sum
+        partial['gap_m2'][with_gaps] = np.add.reduceat(gap_dev * gap_dev, gap_starts)
+        partial['gap_min'][with_gaps] = np.minimum.reduceat(gaps, gap_starts)
+        partial['gap_max'][with_gaps] = np.maximum.reduceat(gaps, gap_starts)
+
+    # Addresses come from the flow's last packet in capture order
+    last_rows = order[where == last_position[group]]
+    partial['src_addr'] = table['src_addr'][last_rows]
+    partial['dst_addr'] = table['dst_addr'][last_rows]
+    return partial
+
+
+def merge_partial_flows(partials):
+    """Merge partial flow states of consecutive shards into one partial
+
+    ``partials`` must be given in file order. Counts, sums, minima and
+    maxima add up directly; the squared deviations are combined with the
+    parallel variance formula, and for a flow seen by several shards the
+    gap between one shard's last packet and the next shard's first packet
+    is added as an extra inter-arrival sample.
+    """
+    merged = np.concatenate(partials) if len(partials) else np.zeros(0, dtype=PARTIAL_FLOW_DTYPE)
+    if len(merged) == 0:
+        return merged
+
+    merged = merged[np.lexsort((merged['first_position'], merged['key_hi'], merged['key_lo']))]
+    starts = _group_starts(merged['key_lo'], merged['key_hi'])
+    pieces = np.diff(np.append(starts, len(merged)))
+    group = np.repeat(np.arange(len(starts)), pieces)
+    ends = starts + pieces - 1
+
+    result = np.zeros(len(starts), dtype=PARTIAL_FLOW_DTYPE)
+    result['key_lo'] = merged['key_lo'][starts]
+    result['key_hi'] = merged['key_hi'][starts]
+    result['first_position'] = merged['first_position'][starts]
+    result['last_position'] = merged['last_position'][ends]
+    result['first_time'] = np.minimum.reduceat(merged['first_time'], starts)
+    result['last_time'] = np.maximum.reduceat(merged['last_time'], starts)
+    result['src_addr'] = merged['src_addr'][ends]
+    result['dst_addr'] = merged['dst_addr'][ends]
+
+    result['count'] = count = np.add.reduceat(merged['count'], starts)
+    result['byte_sum'] = byte_sum = np.add.reduceat(merged['byte_sum'], starts)
+    result['byte_m2'] = _merge_m2(merged['count'], merged['byte_sum'], merged['byte_m2'],
+                                  byte_sum / count, group, starts)
+    result['byte_min'] = np.minimum.reduceat(merged['byte_min'], starts)
+    result['byte_max'] = np.maximum.reduceat(merged['byte_max'], starts)
+
+    # One boundary gap in front of every piece that continues a flow
+    boundary = np.zeros(len(merged))
+    continues = np.ones(len(merged), dtype=bool)
+    continues[starts] = False
+    boundary[continues] = merged['first_time'][continues] - merged['last_time'][np.flatnonzero(continues) - 1]
+
+    gap_count = merged['gap_count'] + continues
+    gap_sum = merged['gap_sum'] + boundary
+    inner_mean = np.divide(merged['gap_sum'], merged['gap_count'],
+                           out=np.zeros(len(merged)), where=merged['gap_count'] > 0)
+    piece_mean = np.divide(gap_sum, gap_count, out=np.zeros(len(merged)), where=gap_count > 0)
+    # Fold the boundary sample into each piece before merging the pieces
+    piece_m2 = (merged['gap_m2'] + merged['gap_count'] * (inner_mean - piece_mean) ** 2
+                + continues * (boundary - piece_mean) ** 2)
+
+    result['gap_count'] = total_gaps = np.add.reduceat(gap_count, starts)
+    result['gap_sum'] = total_sum = np.add.reduceat(gap_sum, starts)
+    mean = np.divide(total_sum, total_gaps, out=np.zeros(len(starts)), where=total_gaps > 0)
+    result['gap_m2'] = _merge_m2(gap_count, gap_sum, piece_m2, mean, group, starts)
+    result['gap_min'] = np.minimum.reduceat(np.where(continues, np.minimum(merged['gap_min'], boundary),
+                                                     merged['gap_min']), starts)
+    result['gap_max'] = np.maximum.reduceat(np.where(continues, np.maximum(merged['gap_max'], boundary),
+                                                     merged['gap_max']), starts)
+
+    return result[np.argsort(result['first_position'], kind='stable')]
+
+
+def _merge_m2(counts, sums, m2, mean, group, starts):
+    """Combine per-piece squared deviations around the merged group mean"""
+    piece_mean = np.divide(sums, counts, out=np.zeros(len(counts)), where=counts > 0)
+    return np.add.reduceat(m2 + counts * (piece_mean - mean[group]) ** 2, starts)
+
+
+def finalize_flows(partial):
+    """Turn partial flow states into the FLOW_DTYPE table (flows of 2+ packets)"""
+    partial = partial[partial['count'] >= 2]
+    partial = partial[np.argsort(partial['first_position'], kind='stable')]
+    counts = partial['count']
+    gap_counts = partial['gap_count']
+
+    flows = np.zeros(len(partial), dtype=FLOW_DTYPE)
+    flows['flow_duration'] = partial['last_time'] - partial['first_time']
+    flows['flow_packet_count'] = counts
+    flows['flow_byte_count'] = partial['byte_sum']
+    flows['flow_bytes_per_packet_mean'] = partial['byte_sum'] / counts
+    flows['flow_bytes_per_packet_std'] = np.sqrt(partial['byte_m2'] / counts)
+    flows['flow_bytes_per_packet_min'] = partial['byte_min']
+    flows['flow_bytes_per_packet_max'] = partial['byte_max']
+    flows['flow_inter_arrival_mean'] = partial['gap_sum'] / gap_counts
+    flows['flow_inter_arrival_std'] = np.sqrt(partial['gap_m2'] / gap_counts)
+    flows['flow_inter_arrival_min'] = partial['gap_min']
+    flows['flow_inter_arrival_max'] = partial['gap_max']
+    flows['src_ip'] = [_ntoa(a) for a in partial['src_addr']]
+    flows['dst_ip'] = [_ntoa(a) for a in partial['dst_addr']]
+    return flows
+
+
+def aggregate_flows(table):
+    """Compute the per-flow statistics of extract_flow_features() from a packet table
+
+    One lexsort by (flow key, timestamp) plus a handful of reduceat passes;
+    for a capture written in time order this matches the per-packet path.
+    """
+    return finalize_flows(partial_flows(table))
+
+
+def flow_records(flow_table):
+    """Convert a flow table into the list-of-dicts form used by the reports"""
+    names = flow_table.dtype.names
+    return [dict(zip(names, row.tolist())) for row in flow_table]
+
+
+def _ntoa(addr):
+    return socket.inet_ntoa(int(addr).to_bytes(4, 'big'))
@@ -0,0 +1,137 @@
+"""
+Multi-process sharded processing of a single large PCAP
+Splits a classic libpcap file into record-aligned byte ranges, lets each
+worker process decode its range and reduce it to partial flow states, and
+merges the partials in file order into the same flow table as the serial
+columnar engine.
+
+Shard starts are found by scanning for a run of plausible record headers.
+Each worker reports where its last record ends; that must be exactly the
+next shard's start, otherwise the file is processed serially instead.
+"""
+
+import mmap
+import os
+import struct
+from concurrent.futures import ProcessPoolExecutor
+
+from pcap_columnar import (
+    PCAP_GLOBAL_HEADER_LEN, PCAP_RECORD_HEADER_LEN, PcapFormatError,
+    read_pcap_header, index_records, decode_records, read_pcap_table,
+    partial_flows, merge_partial_flows, finalize_flows, aggregate_flows,
+)
+
+# Consecutive plausible record headers required to accept a shard start
+SYNC_RECORDS = 8
+# Largest packet libpcap will ever write (MAXIMUM_SNAPLEN)
+MAX_RECORD_LEN = 262144
+# Files smaller than this per worker are not worth the process start-up
+MIN_SHARD_BYTES = 8 * 1024 * 1024
+
+
+def _plausible_record(buf, offset, header, ts_divisor, first_sec):
+    """Return the offset of the next record if ``offset`` looks like a record header"""
+    if offset + PCAP_RECORD_HEADER_LEN > len(buf):
+        return None
+    sec, frac, caplen, origlen = header.unpack_from(buf, offset)
+    if frac >= ts_divisor or sec < first_sec or caplen > origlen or origlen > MAX_RECORD_LEN:
+        return None
+    end = offset + PCAP_RECORD_HEADER_LEN + caplen
+    return end if end <= len(buf) else None
+
+
+def find_record_start(buf, position, byte_order, ts_divisor, first_sec):
+    """First offset at or after ``position`` followed by a chain of valid headers"""
+    header = struct.Struct(byte_order + 'IIII')
+    for offset in range(position, len(buf) - PCAP_RECORD_HEADER_LEN + 1):
+        cursor = offset
+        for _ in range(SYNC_RECORDS):
+            cursor = _plausible_record(buf, cursor, header, ts_divisor, first_sec)
+            if cursor is None or cursor == len(buf):
+                break
+        if cursor is not None:
+            return offset
+    return None
+
+
+def shard_ranges(buf, byte_order, ts_divisor, shards):
+    """Split the records of a mapped capture into up to ``shards`` byte ranges"""
+    if len(buf) < PCAP_GLOBAL_HEADER_LEN + PCAP_RECORD_HEADER_LEN:
+        return [(PCAP_GLOBAL_HEADER_LEN, len(buf))]
+
+    first_sec = struct.unpack_from(byte_order + 'I', buf, PCAP_GLOBAL_HEADER_LEN)[0]
+    step = (len(buf) - PCAP_GLOBAL_HEADER_LEN) // shards
+    starts = [PCAP_GLOBAL_HEADER_LEN]
+    for i in range(1, shards):
+        start = find_record_start(buf, max(PCAP_GLOBAL_HEADER_LEN + i * step, starts[-1] + 1),
+                                  byte_order, ts_divisor, first_sec)
+        if start is None:
+            break
+        starts.append(start)
+
+    return list(zip(starts, starts[1:] + [len(buf)]))
+
+
+def _process_shard(task):
+    """Worker: decode one byte range and reduce it to partial flow states"""
+    pcap_file, start, stop = task
+    with open(pcap_file, 'rb') as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            byte_order, ts_divisor, linktype = read_pcap_header(mm)
+            offsets = index_records(mm, byte_order, start=start, stop=stop)
+            table = decode_records(mm, offsets, linktype, byte_order, ts_divisor)
+            next_offset = start
+            if len(offsets):
+                caplen = struct.unpack_from(byte_order + 'I', mm, int(offsets[-1]) + 8)[0]
+                next_offset = int(offsets[-1]) + PCAP_RECORD_HEADER_LEN + caplen
+        finally:
+            mm.close()
+
+    # Record offsets are the capture-wide packet order
+    return partial_flows(table, offsets), len(table), next_offset
+
+
+def plan_shards(pcap_file, workers, min_shard_bytes=MIN_SHARD_BYTES):
+    """Byte ranges process_pcap_sharded would give its workers (one range: serial)"""
+    with open(pcap_file, 'rb') as f:
+        f.seek(0, 2)
+        size = f.tell()
+        if size == 0:
+            raise PcapFormatError("Empty capture file")
+
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            byte_order, ts_divisor, _ = read_pcap_header(mm)
+            shards = min(workers, max(1, size // max(min_shard_bytes, 1)))
+            return shard_ranges(mm, byte_order, ts_divisor, shards)
+        finally:
+            mm.close()
+
+
+def process_pcap_sharded(pcap_file, workers=None, min_shard_bytes=MIN_SHARD_BYTES):
+    """Compute the flow table of a classic libpcap file with several processes
+
+    Returns (flow_table, packet_count); the flow table is the same as
+    aggregate_flows(read_pcap_table(pcap_file)). ``min_shard_bytes`` is the
+    smallest range worth a worker; lowering it forces small files to be
+    sharded, which the benchmark uses to exercise the merge.
+    """
+    ranges = plan_shards(pcap_file, workers or os.cpu_count() or 1, min_shard_bytes)
+    if len(ranges) == 1:
+        table = read_pcap_table(pcap_file)
+        return aggregate_flows(table), len(table)
+
+    tasks = [(pcap_file, start, stop) for start, stop in ranges]
+    with ProcessPoolExecutor(max_workers=len(tasks)) as pool:
+        results = list(pool.map(_process_shard, tasks))
+
+    # Every shard must end exactly where the next one starts
+    for (_, _, next_offset), (_, stop) in zip(results[:-1], ranges[:-1]):
+        if next_offset != stop:
+            print("[!] Shard boundary did not line up with a record; falling back to serial processing")
+            table = read_pcap_table(pcap_file)
+            return aggregate_flows(table), len(table)
+
+    partial = merge_partial_flows([r[0] for r in results])
+    return finalize_flows(partial), sum(r[1] for r in results)
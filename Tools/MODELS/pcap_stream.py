@@ -0,0 +1,183 @@
+"""
+Live capture through a dumpcap / tcpdump pipe
+The capture runs in a native child process (``dumpcap -P -w -`` or
+``tcpdump -U -w -``) with its own kernel buffer, and writes a classic pcap
+stream to a pipe. PcapStream parses that stream incrementally: large
+reads into one reusable buffer, records handed out as memoryviews into
+it. When the analyzer stalls, the pipe and the child's capture buffer
+absorb the burst instead of the kernel dropping packets.
+
+Any other pcap stream works as a source too: '-' reads stdin, a path
+reads a file or a FIFO.
+"""
+
+import os
+import re
+import select
+import signal
+import struct
+import subprocess
+import sys
+import tempfile
+
+from pcap_columnar import (PCAP_GLOBAL_HEADER_LEN, PCAP_RECORD_HEADER_LEN, PcapFormatError,
+                           read_pcap_header)
+
+CAPTURE_TOOLS = ('dumpcap', 'tcpdump')
+
+_MAX_RECORD = 1 << 24     # larger caplen: not a pcap stream (or out of sync)
+
+# Final capture statistics the tools print on stderr: (received, dropped)
+_TOOL_STATS = (
+    re.compile(r"received/dropped on interface '[^']*': (\d+)/(\d+)"),                # dumpcap
+    re.compile(r"(\d+) packets? received by filter\s+(\d+) packets? dropped by kernel"),  # tcpdump
+)
+
+
+def capture_command(tool, interface, bpf=None, buffer_mb=64):
+    """Command line writing a classic pcap stream of ``interface`` to stdout"""
+    if tool == 'dumpcap':
+        command = ['dumpcap', '-i', interface, '-P', '-w', '-', '-B', str(buffer_mb)]
+        return command + (['-f', bpf] if bpf else [])
+    if tool == 'tcpdump':
+        command = ['tcpdump', '-i', interface, '-U', '-w', '-', '-B', str(buffer_mb * 1024)]
+        return command + ([bpf] if bpf else [])
+    raise ValueError(f"Unknown capture tool {tool!r}, expected one of {CAPTURE_TOOLS}")
+
+
+class PcapStream:
+    """Incremental parser of a classic pcap byte stream
+
+    ``source`` is a binary file object or a file descriptor; it is read
+    unbuffered, ``read_size`` bytes at most per read. Record views are
+    only valid until the next record is requested.
+    """
+
+    def __init__(self, source, read_size=1 << 20):
+        self.fd = source if isinstance(source, int) else source.fileno()
+        self.read_size = read_size
+        self.linktype = None
+        self.packets = 0
+        self.bytes = 0
+        self.reads = 0
+
+    def frames(self, is_active=lambda: True, poll=0.5):
+        """(memoryview, linktype, timestamp) per record until end of stream or ``is_active()`` is false"""
+        buf = bytearray(max(self.read_size, PCAP_GLOBAL_HEADER_LEN))
+        view = memoryview(buf)
+        start = end = 0
+        unpack_record = None
+
+        while True:
+            if unpack_record is None and end >= PCAP_GLOBAL_HEADER_LEN:
+                byte_order, divisor, self.linktype = read_pcap_header(buf[:PCAP_GLOBAL_HEADER_LEN])
+                unpack_record = struct.Struct(byte_order + 'IIII').unpack_from
+                start = PCAP_GLOBAL_HEADER_LEN
+
+            needed = PCAP_GLOBAL_HEADER_LEN
+            while unpack_record is not None:
+                if end - start < PCAP_RECORD_HEADER_LEN:
+                    needed = PCAP_RECORD_HEADER_LEN
+                    break
+                sec, frac, caplen, _ = unpack_record(view, start)
+                if caplen > _MAX_RECORD:
+                    raise PcapFormatError(f"Record of {caplen} bytes: stream is corrupt or not pcap")
+                stop = start + PCAP_RECORD_HEADER_LEN + caplen
+                if stop > end:
+                    needed = stop - start
+                    break
+                self.packets += 1
+                yield view[start + PCAP_RECORD_HEADER_LEN:stop], self.linktype, sec + frac / divisor
+                start = stop
+
+            # Keep the partial record, at the front of a buffer large enough for it
+            if needed > len(buf):
+                buf = bytearray(needed + self.read_size)
+                buf[:end - start] = view[start:end]
+                view = memoryview(buf)
+            elif start:
+                buf[:end - start] = buf[start:end]
+            end -= start
+            start = 0
+
+            if not self._wait(is_active, poll):
+                return
+            count = os.readv(self.fd, [view[end:]])
+            if not count:
+                return
+            end += count
+            self.bytes += count
+            self.reads += 1
+
+    def _wait(self, is_active, poll):
+        while is_active():
+            ready, _, _ = select.select([self.fd], [], [], poll)
+            if ready:
+                return True
+        return False
+
+
+class PcapPipe:
+    """Pcap source for LivePacketCapture: a capture tool's pipe, stdin ('-') or a file/FIFO path
+
+    A capture tool is started on ``interface`` with ``bpf`` as its capture
+    filter. Its final received/dropped counters are read from its stderr
+    when the pipe is closed.
+    """
+
+    def __init__(self, source, interface=None, bpf=None, buffer_mb=64, read_size=1 << 20):
+        self.source = source
+        self.process = None
+        self.received = self.dropped = None
+        self._file = None
+        self._stderr = None
+
+        if source in CAPTURE_TOOLS:
+            self._stderr = tempfile.TemporaryFile()
+            self.process = subprocess.Popen(capture_command(source, interface, bpf, buffer_mb),
+                                            stdout=subprocess.PIPE, stderr=self._stderr, bufsize=0)
+            stream = self.process.stdout
+        elif source == '-':
+            stream = sys.stdin.buffer
+        else:
+            stream = self._file = open(source, 'rb', buffering=0)
+        self.stream = PcapStream(stream, read_size)
+
+    def frames(self, is_active=lambda: True, poll=0.5):
+        return self.stream.frames(is_active, poll)
+
+    def close(self):
+        if self.process is not None:
+            # SIGINT: the tools flush and print their capture statistics
+            if self.process.poll() is None:
+                self.process.send_signal(signal.SIGINT)
+            try:
+                self.process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+            self.process.stdout.close()
+            self._read_tool_stats()
+        if self._file is not None:
+            self._file.close()
+
+    def _read_tool_stats(self):
+        self._stderr.seek(0)
+        output = self._stderr.read().decode(errors='replace')
+        self._stderr.close()
+        for pattern in _TOOL_STATS:
+            match = pattern.search(output)
+            if match:
+                self.received, self.dropped = int(match.group(1)), int(match.group(2))
+                return
+        if self.process.returncode not in (0, -signal.SIGINT) and output.strip():
+            print(f"[!] {self.source}: {output.strip().splitlines()[-1]}")
+
+    def summary(self):
+        """One-line pipe summary for status output"""
+        stream = self.stream
+        line = (f"{self.source}: {stream.packets:,} records, {stream.bytes / 1e6:,.1f} MB in "
+                f"{stream.reads:,} reads")
+        if self.received is not None:
+            line += f" | capture {self.received:,} received, {self.dropped:,} dropped"
+        return line
@@ -0,0 +1,180 @@
+"""
+Process-pool execution backend for the CPU-bound models
+IsolationForest, XGBoost and RandomForest scoring holds the GIL for much of
+its run, so a thread pool gives them little real parallelism. Here each of
+those models lives in its own persistent worker process: the model is
+pickled to the worker once, and every batch is written once into a shared
+memory block that all workers read in place. Only the per-flow outputs
+travel back through the pipes.
+
+A model whose worker is gone (crashed, or the backend was closed under a
+running batch) is scored in the calling process instead, so a batch is
+never silently left without its predictions.
+"""
+
+import multiprocessing as mp
+import threading
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# Model key -> (input matrix, output kind)
+CPU_MODELS = {
+    'isolation_forest': ('X_scaled', 'anomaly'),
+    'xgboost_classifier': ('X', 'classifier'),
+    'rf_fingerprinter': ('X', 'classifier'),
+}
+
+
+def score_batch(model, kind, X):
+    """Both outputs of a CPU model on one batch (an OnnxModel computes them in one run)"""
+    if hasattr(model, 'score_batch'):
+        return model.score_batch(X)
+    if kind == 'anomaly':
+        return {'scores': model.score_samples(X), 'predictions': model.predict(X)}
+    return {'predictions': model.predict(X), 'confidence': np.max(model.predict_proba(X), axis=1)}
+
+
+def _worker_main(conn, model, source, kind):
+    """Worker process: keep the model, score batches found in shared memory"""
+    shm = None
+    try:
+        while True:
+            message = conn.recv()
+            if message is None:
+                break
+            name, rows, cols = message
+            if shm is None or shm.name != name:
+                if shm is not None:
+                    shm.close()
+                # Workers share the parent's resource tracker, which owns the block
+                shm = shared_memory.SharedMemory(name=name)
+
+            size = rows * cols
+            offset = 0 if source == 'X' else size * 8
+            X = np.ndarray((rows, cols), dtype=np.float64, buffer=shm.buf, offset=offset)
+            try:
+                conn.send(score_batch(model, kind, X))
+            except Exception as e:
+                conn.send(e)
+            del X
+    except (EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        if shm is not None:
+            shm.close()
+
+
+class ProcessModelBackend:
+    """Persistent worker processes for the sklearn/XGBoost models of one bundle"""
+
+    def __init__(self, models, context='spawn'):
+        self._ctx = mp.get_context(context)
+        self._models = {}    # model key -> (model, input matrix, output kind), for in-process fallback
+        self._workers = {}
+        self._shm = None
+        self._lock = threading.Lock()
+
+        for key, (source, kind) in CPU_MODELS.items():
+            model = models.get(key)
+            if model is None:
+                continue
+            self._models[key] = (model, source, kind)
+            parent, child = self._ctx.Pipe()
+            process = self._ctx.Process(target=_worker_main, args=(child, model, source, kind),
+                                        name=f"model-{key}", daemon=True)
+            process.start()
+            child.close()
+            self._workers[key] = (process, parent)
+
+    @property
+    def model_keys(self):
+        return list(self._models)
+
+    def _buffer(self, nbytes):
+        """Shared block of at least ``nbytes``, grown by doubling"""
+        if self._shm is None or self._shm.size < nbytes:
+            if self._shm is not None:
+                self._shm.close()
+                self._shm.unlink()
+            size = max(nbytes, 2 * self._shm.size if self._shm is not None else 1 << 20)
+            self._shm = shared_memory.SharedMemory(create=True, size=size)
+        return self._shm
+
+    def predict(self, X, X_scaled):
+        """Score one batch on every worker; returns {model_key: result dict}
+
+        Models without a live worker are scored in this process. An error
+        raised by the model itself is re-raised here with its key.
+        """
+        X = np.asarray(X, dtype=np.float64)
+        X_scaled = np.asarray(X_scaled, dtype=np.float64)
+        inputs = {'X': X, 'X_scaled': X_scaled}
+        rows, cols = X.shape
+
+        with self._lock:
+            results = {}
+            sent = []
+            if self._workers:
+                shm = self._buffer(2 * X.nbytes)
+                np.ndarray(X.shape, dtype=np.float64, buffer=shm.buf)[:] = X
+                np.ndarray(X.shape, dtype=np.float64, buffer=shm.buf, offset=X.nbytes)[:] = X_scaled
+                for key, (_, conn) in self._workers.items():
+                    try:
+                        conn.send((shm.name, rows, cols))
+                        sent.append(key)
+                    except OSError:
+                        pass
+
+            failed = None
+            for key in sent:
+                try:
+                    result = self._workers[key][1].recv()
+                except (EOFError, OSError):
+                    continue
+                if isinstance(result, Exception):
+                    failed = failed or (key, result)   # raised once every pipe is drained
+                else:
+                    results[key] = result
+            if failed is not None:
+                key, error = failed
+                raise RuntimeError(f"{key} prediction failed in its worker process: {error!r}") from error
+
+            for key, (model, source, kind) in self._models.items():
+                if key in results:
+                    continue
+                if key in self._workers:
+                    print(f"[!] {key} worker process is gone, scoring in-process")
+                    self._drop_worker(key)
+                results[key] = score_batch(model, kind, inputs[source])
+            return results
+
+    def _drop_worker(self, key):
+        process, conn = self._workers.pop(key)
+        conn.close()
+        if process.is_alive():
+            process.terminate()
+        process.join(timeout=5)
+
+    def close(self):
+        """Stop the workers and free the shared block (waits for a running batch)
+
+        Later predict() calls score in-process.
+        """
+        with self._lock:
+            for process, conn in self._workers.values():
+                try:
+                    conn.send(None)
+                except (BrokenPipeError, OSError):
+                    pass
+            for process, conn in self._workers.values():
+                process.join(timeout=5)
+                if process.is_alive():
+                    process.terminate()
+                conn.close()
+            self._workers = {}
+
+            if self._shm is not None:
+                self._shm.close()
+                self._shm.unlink()
+                self._shm = None
@@ -0,0 +1,425 @@
+"""
+Incremental per-flow inference for the sequence models
+The periodic analysis used to rebuild every active flow's padded
+(sequence_length, 5) window and re-run the Keras model over all of it.
+Here each flow keeps the model's state between ticks, and a tick only
+recomputes the flows that received packets since the last one, batched
+across flows one time step at a time.
+
+The TCN has no recurrent state, its output is a function of the window.
+Each flow caches every conv layer's activations over the window instead,
+and a tick recomputes only the positions the slide invalidated: the ones
+that see a new packet, and those near the edges whose 'same' padding
+now covers different packets.
+
+The LSTM cannot be advanced one step per new packet. It was trained on
+zero-padded sequence_length windows, and the state after a window is not
+a function of the state after the previous window plus the new packet:
+the packet that slides out (or the padding step that goes) changes every
+step after it. Carrying (h, c) forward one step per packet would score the flow's
+whole history instead, which the model never saw. So a flow that
+received packets is re-run over its current window, from the state its
+zero padding leaves (precomputed once per padding length). A tick costs
+O(changed flows x sequence_length); only idle flows are free, as their
+cached state is reused.
+
+The engines run the trained Keras weights in numpy (float32, like Keras)
+and their streamed output equals the batch model on each flow's current
+window.
+"""
+
+import numpy as np
+
+_ACTIVATIONS = {
+    'linear': lambda x: x,
+    'relu': lambda x: np.maximum(x, 0),
+    'tanh': np.tanh,
+    'sigmoid': lambda x: 1.0 / (1.0 + np.exp(-x)),
+    'hard_sigmoid': lambda x: np.clip(0.2 * x + 0.5, 0.0, 1.0),
+}
+
+
+def _softmax(x):
+    e = np.exp(x - x.max(axis=-1, keepdims=True))
+    return e / e.sum(axis=-1, keepdims=True)
+
+
+def _activation(name):
+    if name == 'softmax':
+        return _softmax
+    if name not in _ACTIVATIONS:
+        raise ValueError(f"Unsupported activation {name!r}")
+    return _ACTIVATIONS[name]
+
+
+def _activation_name(fn):
+    return fn if isinstance(fn, str) else fn.__name__
+
+
+class _FlowStates:
+    """Per-flow state rows in preallocated arrays, addressed by slot"""
+
+    def __init__(self, widths, initial, capacity=1024):
+        self.widths = widths           # columns of each state array
+        self.initial = initial         # state of a new flow, one row per array
+        self.slots = {}                # flow key -> row
+        self.free = []
+        self.steps = np.zeros(capacity, dtype=np.int64)   # packets consumed per flow
+        self.arrays = [np.zeros((capacity, width), dtype=np.float32) for width in widths]
+
+    def __len__(self):
+        return len(self.slots)
+
+    def _grow(self):
+        capacity = 2 * len(self.steps)
+        self.steps = np.resize(self.steps, capacity)
+        self.arrays = [np.concatenate([a, np.zeros_like(a)]) for a in self.arrays]
+
+    def lookup(self, keys):
+        """Rows of ``keys``, allocating (and initialising) rows for new flows"""
+        rows = np.empty(len(keys), dtype=np.int64)
+        for i, key in enumerate(keys):
+            row = self.slots.get(key)
+            if row is None:
+                if self.free:
+                    row = self.free.pop()
+                else:
+                    row = len(self.slots)
+                    if row >= len(self.steps):
+                        self._grow()
+                self.slots[key] = row
+                self.steps[row] = 0
+                for array, init in zip(self.arrays, self.initial):
+                    array[row] = init
+            rows[i] = row
+        return rows
+
+    def seen(self, keys):
+        """Packets already consumed for each flow (0 for unknown flows)"""
+        return [int(self.steps[self.slots[key]]) if key in self.slots else 0 for key in keys]
+
+    def forget(self, keys):
+        for key in keys:
+            row = self.slots.pop(key, None)
+            if row is not None:
+                self.free.append(row)
+
+    def retain(self, keys):
+        """Drop every flow not in ``keys``"""
+        keep = set(keys)
+        self.forget([key for key in self.slots if key not in keep])
+
+
+class StreamingLSTM:
+    """Stacked-LSTM classifier advanced one packet at a time per flow
+
+    ``lstm_layers`` holds (kernel, recurrent_kernel, bias, activation,
+    recurrent_activation) per LSTM layer and ``dense_layers`` (kernel,
+    bias, activation) for the head, in Keras layout and gate order
+    (input, forget, cell, output). Not thread-safe: the analyzers call it
+    from the worker holding the model lock.
+
+    Not incremental: the state of a flow is always that of its current
+    window, and ``advance`` re-runs the whole window (not just the new
+    packets) of every flow that changed.
+    """
+
+    windowed = True                 # stream_flows passes whole windows
+
+    def __init__(self, lstm_layers, dense_layers, sequence_length):
+        self.lstm = [(np.asarray(k, np.float32), np.asarray(r, np.float32), np.asarray(b, np.float32),
+                      _activation(act), _activation(rec)) for k, r, b, act, rec in lstm_layers]
+        self.dense = [(np.asarray(k, np.float32), np.asarray(b, np.float32), _activation(act))
+                      for k, b, act in dense_layers]
+        self.sequence_length = sequence_length
+        self.n_features = self.lstm[0][0].shape[0]
+
+        units = [recurrent.shape[0] for _, recurrent, _, _, _ in self.lstm]
+        widths = [u for u in units for _ in (0, 1)]    # h and c of each layer
+        state = [np.zeros((1, w), dtype=np.float32) for w in widths]
+        zeros = np.zeros((1, self.n_features), dtype=np.float32)
+        # padding[j][k]: state array j after k zero time steps
+        self.padding = [np.zeros((sequence_length, w), dtype=np.float32) for w in widths]
+        for k in range(1, sequence_length):
+            self._step(zeros, state)
+            for padded, s in zip(self.padding, state):
+                padded[k] = s[0]
+        self.states = _FlowStates(widths, [padded[0] for padded in self.padding])
+
+    @classmethod
+    def from_keras(cls, model):
+        """Engine for a Sequential LSTM(..., return_sequences) / LSTM / Dense model"""
+        lstm_layers, dense_layers = [], []
+        for layer in model.layers:
+            kind = type(layer).__name__
+            if kind == 'LSTM':
+                if dense_layers:
+                    raise ValueError("LSTM layer after the Dense head")
+                kernel, recurrent, bias = layer.get_weights()
+                lstm_layers.append((kernel, recurrent, bias, _activation_name(layer.activation),
+                                    _activation_name(layer.recurrent_activation)))
+            elif kind == 'Dense':
+                kernel, bias = layer.get_weights()
+                dense_layers.append((kernel, bias, _activation_name(layer.activation)))
+            elif kind not in ('Dropout', 'InputLayer'):
+                raise ValueError(f"Unsupported layer {kind} for streaming")
+        if not lstm_layers:
+            raise ValueError("Model has no LSTM layer")
+        return cls(lstm_layers, dense_layers, model.input_shape[1])
+
+    def _step(self, x, state, rows=None):
+        """One time step of every LSTM layer; ``state`` is [h0, c0, h1, c1, ...]"""
+        for i, (kernel, recurrent, bias, act, rec) in enumerate(self.lstm):
+            h = state[2 * i] if rows is None else state[2 * i][rows]
+            c = state[2 * i + 1] if rows is None else state[2 * i + 1][rows]
+            z = x @ kernel + h @ recurrent + bias
+            gate_i, gate_f, cell, gate_o = np.split(z, 4, axis=1)
+            c = rec(gate_f) * c + rec(gate_i) * act(cell)
+            h = rec(gate_o) * act(c)
+            if rows is None:
+                state[2 * i], state[2 * i + 1] = h, c
+            else:
+                state[2 * i][rows], state[2 * i + 1][rows] = h, c
+            x = h
+        return x
+
+    def _head(self, h):
+        for kernel, bias, act in self.dense:
+            h = act(h @ kernel + bias)
+        return h
+
+    def seen(self, keys):
+        return self.states.seen(keys)
+
+    def advance(self, keys, windows, counts=None):
+        """Re-run each flow over its current window (oldest packet first)
+
+        A window holds the flow's last min(count, sequence_length) packet
+        rows; flows given an empty one keep their state. ``counts`` are the
+        flows' total packet counts (default: the window lengths); they are
+        what ``seen`` reports next time.
+        """
+        rows = self.states.lookup(keys)
+        lengths = np.array([len(w) for w in windows], dtype=np.int64)
+        if len(lengths) and lengths.max() > self.sequence_length:
+            raise ValueError(f"Window longer than sequence_length ({self.sequence_length})")
+        longest = int(lengths.max()) if len(lengths) else 0
+        if longest:
+            changed = lengths > 0
+            pad = self.sequence_length - lengths[changed]
+            for array, padded in zip(self.states.arrays, self.padding):
+                array[rows[changed]] = padded[pad]
+            batch = np.zeros((len(keys), longest, self.n_features), dtype=np.float32)
+            for i, window in enumerate(windows):
+                if len(window):
+                    batch[i, :len(window)] = window
+            for step in range(longest):
+                active = lengths > step
+                self._step(batch[active, step], self.states.arrays, rows[active])
+        if counts is None:
+            counts = np.where(lengths > 0, lengths, self.states.steps[rows])
+        self.states.steps[rows] = counts
+
+    def predict(self, keys):
+        """Class probabilities of each flow from its current state"""
+        rows = self.states.lookup(keys)
+        return self._head(self.states.arrays[-2][rows])
+
+    def forget(self, keys):
+        self.states.forget(keys)
+
+    def retain(self, keys):
+        self.states.retain(keys)
+
+    def predict_sequences(self, X):
+        """Reference full-sequence run over ``X`` (n, steps, features) from the zero state, as Keras does"""
+        X = np.asarray(X, dtype=np.float32)
+        state = [np.zeros((len(X), w), dtype=np.float32) for w in self.states.widths]
+        for step in range(X.shape[1]):
+            self._step(X[:, step], state)
+        return self._head(state[-2])
+
+
+class StreamingTCN:
+    """Dilated Conv1D stack over each flow's packet window, recomputed only where it changed
+
+    ``conv_layers`` holds (kernel (size, in, out), bias, dilation, padding,
+    activation) per Conv1D layer, padding 'same' or 'causal'; ``head`` is
+    a list of ('maxpool', size, stride), ('flatten',) and ('dense', kernel,
+    bias, activation) steps applied to the last conv layer's window.
+
+    Each layer's activations live in a per-flow ring indexed by packet
+    number. When a flow's window slides by k packets, a layer only
+    recomputes the positions whose receptive field reaches a new packet or
+    the window's zero padding: the last k + right reach and the first
+    left reach positions. Everything else is reused. Flows without new
+    packets keep their cached output.
+    """
+
+    def __init__(self, conv_layers, head, sequence_length):
+        self.sequence_length = length = sequence_length
+        self.conv = []
+        reach_left = reach_right = 0
+        for kernel, bias, dilation, padding, activation in conv_layers:
+            kernel = np.asarray(kernel, np.float32)
+            span = dilation * (kernel.shape[0] - 1)
+            if padding == 'same':
+                pad_left = span // 2
+            elif padding == 'causal':
+                pad_left = span
+            else:
+                raise ValueError(f"Unsupported Conv1D padding {padding!r} for streaming")
+            reach_left += pad_left
+            reach_right += span - pad_left
+            self.conv.append((kernel, np.asarray(bias, np.float32), dilation, pad_left,
+                              _activation(activation), reach_left, reach_right))
+        self.head = [(step[0], np.asarray(step[1], np.float32), np.asarray(step[2], np.float32),
+                      _activation(step[3])) if step[0] == 'dense' else step for step in head]
+        self.n_features = self.conv[0][0].shape[1]
+
+        channels = [self.n_features] + [kernel.shape[2] for kernel, *_ in self.conv]
+        self.channels = channels
+        outputs = self._apply_head(np.zeros((1, length, channels[-1]), dtype=np.float32)).shape[1]
+        widths = [length * c for c in channels] + [outputs]
+        self.states = _FlowStates(widths, [np.zeros(w, dtype=np.float32) for w in widths])
+
+    @classmethod
+    def from_keras(cls, model):
+        """Engine for a Sequential Conv1D stack / MaxPooling1D / Flatten / Dense model"""
+        conv_layers, head = [], []
+        for layer in model.layers:
+            kind = type(layer).__name__
+            if kind == 'Conv1D':
+                if head:
+                    raise ValueError("Conv1D layer after the head")
+                if tuple(layer.strides) != (1,):
+                    raise ValueError("Strided Conv1D is not supported for streaming")
+                kernel, bias = layer.get_weights()
+                conv_layers.append((kernel, bias, layer.dilation_rate[0], layer.padding,
+                                    _activation_name(layer.activation)))
+            elif kind == 'MaxPooling1D':
+                if layer.padding != 'valid':
+                    raise ValueError("Only 'valid' MaxPooling1D is supported for streaming")
+                head.append(('maxpool', layer.pool_size[0], layer.strides[0]))
+            elif kind == 'Flatten':
+                head.append(('flatten',))
+            elif kind == 'Dense':
+                kernel, bias = layer.get_weights()
+                head.append(('dense', kernel, bias, _activation_name(layer.activation)))
+            elif kind not in ('Dropout', 'InputLayer'):
+                raise ValueError(f"Unsupported layer {kind} for streaming")
+        if not conv_layers:
+            raise ValueError("Model has no Conv1D layer")
+        return cls(conv_layers, head, model.input_shape[1])
+
+    def _rings(self):
+        capacity = len(self.states.steps)
+        return [a.reshape(capacity, self.sequence_length, c)
+                for a, c in zip(self.states.arrays, self.channels)]
+
+    def _apply_head(self, x):
+        for step in self.head:
+            if step[0] == 'maxpool':
+                size, stride = step[1], step[2]
+                count = (x.shape[1] - size) // stride + 1
+                x = np.maximum.reduce([x[:, i:i + stride * (count - 1) + 1:stride] for i in range(size)])
+            elif step[0] == 'flatten':
+                x = x.reshape(len(x), -1)
+            else:
+                _, kernel, bias, act = step
+                x = act(x @ kernel + bias)
+        return x
+
+    def seen(self, keys):
+        return self.states.seen(keys)
+
+    def advance(self, keys, packets, counts=None):
+        """Feed each flow its new packet rows (oldest first) and update its output
+
+        ``counts`` are the flows' total packet counts after these rows
+        (default: previous count + rows given).
+        """
+        length = self.sequence_length
+        rows = self.states.lookup(keys)
+        previous = self.states.steps[rows].copy()
+        lengths = np.array([len(p) for p in packets], dtype=np.int64)
+        counts = np.asarray(counts, dtype=np.int64) if counts is not None else previous + lengths
+        slide = counts - previous
+        # Flows never computed (or slid by a whole window) are recomputed in full
+        slide[(previous == 0) | (slide > length)] = length
+
+        rings = self._rings()
+        for row, p, count in zip(rows, packets, counts):
+            if len(p):
+                times = np.arange(count - len(p), count)
+                rings[0][row, times % length] = p
+
+        for k in np.unique(slide[slide > 0]):
+            group = rows[slide == k]
+            base = counts[slide == k] - length          # packet number of window position 0
+            for layer, (kernel, bias, dilation, pad_left, act, reach_left, reach_right) in enumerate(self.conv):
+                if k >= length:
+                    positions = np.arange(length)
+                else:
+                    positions = np.union1d(np.arange(min(reach_left, length)),
+                                           np.arange(max(0, length - k - reach_right), length))
+                out = np.broadcast_to(bias, (len(group), len(positions), len(bias))).copy()
+                for tap in range(kernel.shape[0]):
+                    source = positions - pad_left + tap * dilation
+                    inside = (source >= 0) & (source < length)
+                    if inside.any():
+                        slots = (base[:, None] + source[None, inside]) % length
+                        out[:, inside] += rings[layer][group[:, None], slots] @ kernel[tap]
+                slots = (base[:, None] + positions[None, :]) % length
+                rings[layer + 1][group[:, None], slots] = act(out)
+
+        changed = rows[slide > 0]
+        if len(changed):
+            base = counts[slide > 0] - length
+            window = rings[-1][changed[:, None], (base[:, None] + np.arange(length)) % length]
+            self.states.arrays[-1][changed] = self._apply_head(window)
+        self.states.steps[rows] = counts
+
+    def predict(self, keys):
+        """Model output of each flow for its current window"""
+        return self.states.arrays[-1][self.states.lookup(keys)]
+
+    def forget(self, keys):
+        self.states.forget(keys)
+
+    def retain(self, keys):
+        self.states.retain(keys)
+
+    def predict_sequences(self, X):
+        """Reference batch run over whole windows ``X`` (n, sequence_length, features)"""
+        x = np.asarray(X, dtype=np.float32)
+        for kernel, bias, dilation, pad_left, act, _, _ in self.conv:
+            length = x.shape[1]
+            span = dilation * (kernel.shape[0] - 1)
+            padded = np.pad(x, ((0, 0), (pad_left, span - pad_left), (0, 0)))
+            out = bias + sum(padded[:, tap * dilation:tap * dilation + length] @ kernel[tap]
+                             for tap in range(kernel.shape[0]))
+            x = act(out)
+        return self._apply_head(x)
+
+
+def stream_flows(engine, extractor, keys):
+    """Advance ``engine`` by each flow's packets since the last tick and return its outputs
+
+    Flows missing from ``keys`` are dropped from the engine. Packets that
+    already left a flow's stored window (more than sequence_length since
+    the last tick) are skipped. Windowed engines get the whole current
+    window of every flow with new packets.
+    """
+    windowed = getattr(engine, 'windowed', False)
+    packets, counts = [], []
+    for key, seen in zip(keys, engine.seen(keys)):
+        count, rows = extractor.get_new_packets(key, seen)
+        if windowed and count > seen:
+            count, rows = extractor.get_new_packets(key, 0)
+        packets.append(rows)
+        counts.append(count)
+    engine.retain(keys)
+    engine.advance(keys, packets, counts)
+    return engine.predict(keys)
+
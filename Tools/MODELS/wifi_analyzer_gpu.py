@@ -9,363 +9,357 @@ Enhanced version with:
 Install: sudo pip3 install scapy numpy pandas scikit-learn xgboost tensorflow
 """
 
-import subprocess, threading, time, signal, sys, os, pickle
+import threading, time, signal, sys, os, pickle
 from collections import defaultdict, deque
 from datetime import datetime
 from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import numpy as np
-import pandas as pd
-from scapy.all import sniff, IP, TCP, UDP, ICMP
-from sklearn.ensemble import IsolationForest, RandomForestClassifier
-from sklearn.preprocessing import StandardScaler
-from sklearn.cluster import KMeans, DBSCAN
+from packet_decoder import decode_packet, RawFrame
+from flow_stats import FlowRecord, FlowExpiryQueue, packet_flow_key
+from capture_pipeline import PacketPipeline
+from live_capture import LivePacketCapture, configure_capture
+from dot11_frames import FRAME_DOT11, FRAME_IP, WirelessAggregator, save_records
+from model_bundle import (ModelBundle, BackgroundTrainer, BUNDLE_FILE, KERAS_MODELS, save_bundle,
+                          load_bundle, read_bundle_header)
+from inference_scheduler import MicroBatchScheduler
+from process_backend import ProcessModelBackend, score_batch
+from model_cascade import ModelCascade
+from streaming_models import StreamingLSTM, StreamingTCN, stream_flows
+from compiled_models import INFERENCE_MODES, compile_bundle
+from onnx_models import ONNX_AVAILABLE, write_onnx
+from pcap_replay import ReplayClock
+from lazy_imports import module_available, tensorflow_available, import_tensorflow, lite_mode
 import warnings
 warnings.filterwarnings('ignore')
 
-try:
-    import xgboost as xgb
-    XGBOOST_AVAILABLE = True
-except: XGBOOST_AVAILABLE = False
-
-# TensorFlow GPU setup
-try:
-    os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'
-    import tensorflow as tf
-    from tensorflow.keras.models import Sequential
-    from tensorflow.keras.layers import Dense, LSTM, Dropout, Conv1D, MaxPooling1D, Flatten
-    from tensorflow.keras.optimizers import Adam
-    
-    gpus = tf.config.list_physical_devices('GPU')
-    if gpus:
-        for gpu in gpus:
-            tf.config.experimental.set_memory_growth(gpu, True)
-        print(f"[+] GPU enabled: {len(gpus)} GPU(s)")
-    else:
-        print("[*] CPU mode")
-    TENSORFLOW_AVAILABLE = True
-except:
-    TENSORFLOW_AVAILABLE = False
+# sklearn/XGBoost/pandas/scapy are imported on first use; TensorFlow (and the
+# GPU query) only when a deep model is built or loaded, never with --lite
+XGBOOST_AVAILABLE = module_available('xgboost')
+TENSORFLOW_AVAILABLE = tensorflow_available()
+if lite_mode():
+    print("[*] Lite mode: TensorFlow models disabled")
+elif not TENSORFLOW_AVAILABLE:
     print("[!] TensorFlow unavailable")
 
-# Model persistence
+# Model persistence: one versioned bundle file (directory created on first save)
 MODEL_DIR = Path("saved_models")
-MODEL_DIR.mkdir(exist_ok=True)
-
-class LivePacketCapture:
-    def __init__(self, interface='wlan0'):
-        self.interface = interface
-        self.capture_active = False
-        self.packet_count = 0
-    
-    def list_interfaces(self):
-        try:
-            result = subprocess.run(['ip', 'link', 'show'], capture_output=True, text=True)
-            print("\n=== Available Interfaces ===\n" + result.stdout)
-        except Exception as e:
-            print(f"Error: {e}")
-    
-    def start_capture(self, prn=None):
-        self.capture_active = True
-        print(f"\n[*] Capturing on {self.interface}...")
-        try:
-            sniff(iface=self.interface, prn=prn, store=False, 
-                  stop_filter=lambda x: not self.capture_active)
-        except PermissionError:
-            print("\n[!] Run with sudo!")
-            sys.exit(1)
-        except Exception as e:
-            print(f"[!] Error: {e}")
-    
-    def stop_capture(self):
-        self.capture_active = False
+# 802.11 BSSID/station records from monitor-mode captures
+WIRELESS_DIR = Path("wireless_records")
 
 class RealTimeFeatureExtractor:
-    def __init__(self, sequence_length=10, flow_timeout=60):
+    def __init__(self, sequence_length=10, flow_timeout=60, clock=time.time):
         self.sequence_length = sequence_length
         self.flow_timeout = flow_timeout
-        self.flow_sequences = defaultdict(lambda: deque(maxlen=sequence_length))
-        self.flow_stats = defaultdict(lambda: {
-            'packet_count': 0, 'byte_count': 0, 'start_time': None,
-            'last_time': None, 'src_ip': None, 'dst_ip': None,
-            'src_port': None, 'dst_port': None, 'protocol': None,
-            'completed': False
-        })
+        self.clock = clock  # time.time, or a ReplayClock when replaying a capture
+        self.flow_stats = defaultdict(lambda: FlowRecord(sequence_length))
+        self.expiry = FlowExpiryQueue()
         self.lock = threading.Lock()
     
     def update_flow_stats(self, packet):
-        if not packet.haslayer(IP):
+        frame = decode_packet(packet)
+        if not frame.has_ip:
             return None
         
-        flow_key = self._get_flow_key(packet)
-        if not flow_key:
+        key = self._get_flow_key(frame)
+        if key is None:
             return None
+        flow_key, direction = key >> 1, key & 1
         
         with self.lock:
             stats = self.flow_stats[flow_key]
-            current_time = time.time()
-            
-            stats['packet_count'] += 1
-            stats['byte_count'] += len(packet)
-            if stats['start_time'] is None:
-                stats['start_time'] = current_time
-            stats['last_time'] = current_time
-            
-            ip = packet[IP]
-            stats['src_ip'] = ip.src
-            stats['dst_ip'] = ip.dst
-            
-            if packet.haslayer(TCP):
-                stats['protocol'] = 'TCP'
-                stats['src_port'] = packet[TCP].sport
-                stats['dst_port'] = packet[TCP].dport
-                if packet[TCP].flags.F or packet[TCP].flags.R:
-                    stats['completed'] = True
-            elif packet.haslayer(UDP):
-                stats['protocol'] = 'UDP'
-                stats['src_port'] = packet[UDP].sport
-                stats['dst_port'] = packet[UDP].dport
+            current_time = self.clock()
+            stats.update(frame, current_time, direction)
             
-            self.flow_sequences[flow_key].append([
-                len(packet), ip.ttl,
-                packet[TCP].window if packet.haslayer(TCP) else 0,
-                1 if packet.haslayer(TCP) else 0,
-                1 if packet.haslayer(UDP) else 0
-            ])
+            if stats.completed and stats.packet_count >= 5:
+                self.expiry.complete(flow_key)
+            self.expiry.schedule(flow_key, self._flow_deadline(flow_key))
         
         return flow_key
     
     def check_completed_flows(self):
-        current_time = time.time()
-        completed = []
+        current_time = self.clock()
         with self.lock:
-            for flow_key, stats in list(self.flow_stats.items()):
-                time_since = current_time - stats['last_time'] if stats['last_time'] else 0
-                if stats['packet_count'] >= 5 and (
-                    stats['completed'] or 
-                    time_since > self.flow_timeout or
-                    (stats['packet_count'] >= 10 and time_since > 30)
-                ):
-                    completed.append(flow_key)
-        return completed
+            completed = dict.fromkeys(self.expiry.pop_completed())
+            for flow_key in self.expiry.pop_expired(current_time, self._flow_deadline):
+                if self.flow_stats[flow_key].packet_count >= 5:
+                    completed[flow_key] = None
+        return list(completed)
+    
+    def _flow_deadline(self, flow_key):
+        # Flows with 10+ packets time out after 30s of silence
+        stats = self.flow_stats.get(flow_key)
+        if not stats:
+            return None
+        timeout = min(self.flow_timeout, 30) if stats.packet_count >= 10 else self.flow_timeout
+        return stats.last_time + timeout
     
     def get_flow_features(self, flow_key):
         with self.lock:
             stats = self.flow_stats.get(flow_key)
-            if not stats or stats['packet_count'] < 2:
+            if not stats or stats.packet_count < 2:
                 return None
             
-            duration = stats['last_time'] - stats['start_time'] if stats['start_time'] else 0
+            duration = stats.last_time - stats.start_time if stats.start_time else 0
             return {
                 'flow_duration': duration,
-                'flow_packet_count': stats['packet_count'],
-                'flow_byte_count': stats['byte_count'],
-                'flow_bytes_per_packet_mean': stats['byte_count'] / stats['packet_count'],
-                'src_ip': stats['src_ip'],
-                'dst_ip': stats['dst_ip'],
-                'src_port': stats.get('src_port', 0),
-                'dst_port': stats.get('dst_port', 0)
+                'flow_packet_count': stats.packet_count,
+                'flow_byte_count': stats.byte_count,
+                'flow_bytes_per_packet_mean': stats.byte_count / stats.packet_count,
+                'flow_fwd_packets': stats.fwd_packets,
+                'flow_bwd_packets': stats.bwd_packets,
+                'flow_fwd_bytes': stats.fwd_bytes,
+                'flow_bwd_bytes': stats.bwd_bytes,
+                'src_ip': stats.src_ip,
+                'dst_ip': stats.dst_ip,
+                'src_port': stats.src_port,
+                'dst_port': stats.dst_port
             }
     
     def get_flow_sequence(self, flow_key):
         with self.lock:
-            seq = list(self.flow_sequences.get(flow_key, []))
-            if len(seq) < self.sequence_length:
-                padding = [[0]*5] * (self.sequence_length - len(seq))
-                seq = padding + seq
-            return np.array(seq[-self.sequence_length:])
+            stats = self.flow_stats.get(flow_key)
+            if stats is None:
+                return np.zeros((self.sequence_length, 5), dtype=np.int64)
+            return stats.sequence(self.sequence_length)
+    
+    def get_new_packets(self, flow_key, seen):
+        # (packet count, vectors of the packets after the first `seen`, at most sequence_length)
+        with self.lock:
+            stats = self.flow_stats.get(flow_key)
+            if stats is None:
+                return seen, np.zeros((0, 5), dtype=np.int64)
+            new = max(0, min(stats.packet_count - seen, self.sequence_length))
+            return stats.packet_count, stats.sequence(new)
     
     def remove_flow(self, flow_key):
         with self.lock:
             self.flow_stats.pop(flow_key, None)
-            self.flow_sequences.pop(flow_key, None)
+            self.expiry.discard(flow_key)
     
     def get_active_flow_count(self):
         with self.lock:
             return len(self.flow_stats)
     
     def _get_flow_key(self, packet):
-        if not packet.haslayer(IP):
-            return None
-        src_ip, dst_ip = packet[IP].src, packet[IP].dst
-        if packet.haslayer(TCP):
-            return tuple(sorted([(src_ip, packet[TCP].sport), (dst_ip, packet[TCP].dport)]) + ['TCP'])
-        elif packet.haslayer(UDP):
-            return tuple(sorted([(src_ip, packet[UDP].sport), (dst_ip, packet[UDP].dport)]) + ['UDP'])
-        return tuple(sorted([(src_ip, 0), (dst_ip, 0)]) + ['OTHER'])
+        # flow key << 1 | direction bit
+        return packet_flow_key(decode_packet(packet))
 
 class ParallelModelPredictor:
-    def __init__(self, models):
-        self.models = models
-        self.executor = ThreadPoolExecutor(max_workers=6)
-    
-    def predict_all_parallel(self, X, X_scaled, X_seq):
+    # backend='process': IF, XGBoost and RF score in persistent worker processes;
+    # runners: compiled replacements for Keras predict (compiled_models.py), with
+    # ONNX also for the scaler and the sklearn/XGBoost models
+    PROCESS_MODEL_NAMES = {'isolation_forest': 'if', 'xgboost_classifier': 'xgb', 'rf_fingerprinter': 'rf'}
+    
+    def __init__(self, models, executor=None, backend='thread', runners=None):
+        self.runners = runners or {}
+        self.models = dict(models, **{key: runner for key, runner in self.runners.items()
+                                      if key in self.PROCESS_MODEL_NAMES})
+        self.scaler = self.runners.get('scaler')
+        self.executor = executor or ThreadPoolExecutor(max_workers=6)
+        self.process_backend = ProcessModelBackend(self.models) if backend == 'process' else None
+    
+    def close(self):
+        if self.process_backend is not None:
+            self.process_backend.close()
+    
+    def predict_all_parallel(self, X, X_scaled, X_seq, stage=None, lstm_proba=None, tcn_pred=None):
+        # stage='cheap' / 'deep': only the sklearn/XGBoost or only the Keras models (cascade);
+        # lstm_proba / tcn_pred: streamed LSTM / TCN outputs, used instead of running those models
         futures = {}
         results = {'models_used': []}
+        cheap, deep = stage != 'deep', stage != 'cheap'
         
-        if self.models['isolation_forest']:
+        if self.process_backend is not None and cheap:
+            futures['process'] = self.executor.submit(
+                lambda: {self.PROCESS_MODEL_NAMES[key]: result
+                         for key, result in self.process_backend.predict(X, X_scaled).items()})
+        
+        if self.models['isolation_forest'] and self.process_backend is None and cheap:
             futures['if'] = self.executor.submit(
-                lambda: {'scores': self.models['isolation_forest'].score_samples(X_scaled),
-                        'predictions': self.models['isolation_forest'].predict(X_scaled)})
+                score_batch, self.models['isolation_forest'], 'anomaly', X_scaled)
         
-        if self.models['autoencoder'] and TENSORFLOW_AVAILABLE:
+        if self.has_deep_model('autoencoder') and deep:
             futures['ae'] = self.executor.submit(
                 lambda: self._predict_ae(X_scaled))
         
-        if self.models['xgboost_classifier']:
+        if self.models['xgboost_classifier'] and self.process_backend is None and cheap:
             futures['xgb'] = self.executor.submit(
-                lambda: {'predictions': self.models['xgboost_classifier'].predict(X),
-                        'confidence': np.max(self.models['xgboost_classifier'].predict_proba(X), axis=1)})
+                score_batch, self.models['xgboost_classifier'], 'classifier', X)
         
-        if self.models['lstm_classifier'] and len(X_seq) > 0 and TENSORFLOW_AVAILABLE:
+        if lstm_proba is not None and deep:
+            futures['lstm'] = self.executor.submit(lambda: self._lstm_result(lstm_proba))
+        elif self.has_deep_model('lstm_classifier') and len(X_seq) > 0 and deep:
             futures['lstm'] = self.executor.submit(
                 lambda: self._predict_lstm(X_seq))
         
-        if self.models['tcn_predictor'] and len(X_seq) > 0 and TENSORFLOW_AVAILABLE:
+        if tcn_pred is not None and deep:
+            futures['tcn'] = self.executor.submit(lambda: {'predictions': np.asarray(tcn_pred).flatten()})
+        elif self.has_deep_model('tcn_predictor') and len(X_seq) > 0 and deep:
             futures['tcn'] = self.executor.submit(
-                lambda: {'predictions': self.models['tcn_predictor'].predict(X_seq, verbose=0).flatten()})
+                lambda: {'predictions': self.keras_predict('tcn_predictor', X_seq).flatten()})
         
-        if self.models['rf_fingerprinter']:
+        if self.models['rf_fingerprinter'] and self.process_backend is None and cheap:
             futures['rf'] = self.executor.submit(
-                lambda: {'predictions': self.models['rf_fingerprinter'].predict(X),
-                        'confidence': np.max(self.models['rf_fingerprinter'].predict_proba(X), axis=1)})
+                score_batch, self.models['rf_fingerprinter'], 'classifier', X)
         
+        model_results = {}
         for name, future in futures.items():
             try:
                 result = future.result(timeout=5)
-                if result:
-                    if name == 'if':
-                        results['isolation_forest_scores'] = result['scores']
-                        results['isolation_forest_anomalies'] = result['predictions']
-                        results['models_used'].append('Isolation Forest')
-                    elif name == 'ae':
-                        results['autoencoder_scores'] = result['scores']
-                        results['autoencoder_anomalies'] = result['predictions']
-                        results['models_used'].append('Autoencoder')
-                    elif name == 'xgb':
-                        results['xgboost_traffic_class'] = result['predictions']
-                        results['xgboost_confidence'] = result['confidence']
-                        results['models_used'].append('XGBoost')
-                    elif name == 'lstm':
-                        results['lstm_traffic_class'] = result['predictions']
-                        results['lstm_confidence'] = result['confidence']
-                        results['models_used'].append('LSTM')
-                    elif name == 'tcn':
-                        results['tcn_throughput'] = result['predictions']
-                        results['models_used'].append('TCN')
-                    elif name == 'rf':
-                        results['rf_device_id'] = result['predictions']
-                        results['rf_device_confidence'] = result['confidence']
-                        results['models_used'].append('Random Forest')
-            except:
-                pass
+            except Exception as e:
+                print(f"[!] {name} prediction failed: {e!r}")
+                continue
+            if name == 'process':
+                model_results.update(result)
+            else:
+                model_results[name] = result
+        
+        for name, result in model_results.items():
+            if result:
+                if name == 'if':
+                    results['isolation_forest_scores'] = result['scores']
+                    results['isolation_forest_anomalies'] = result['predictions']
+                    results['models_used'].append('Isolation Forest')
+                elif name == 'ae':
+                    results['autoencoder_scores'] = result['scores']
+                    results['autoencoder_anomalies'] = result['predictions']
+                    results['models_used'].append('Autoencoder')
+                elif name == 'xgb':
+                    results['xgboost_traffic_class'] = result['predictions']
+                    results['xgboost_confidence'] = result['confidence']
+                    results['models_used'].append('XGBoost')
+                elif name == 'lstm':
+                    results['lstm_traffic_class'] = result['predictions']
+                    results['lstm_confidence'] = result['confidence']
+                    results['models_used'].append('LSTM')
+                elif name == 'tcn':
+                    results['tcn_throughput'] = result['predictions']
+                    results['models_used'].append('TCN')
+                elif name == 'rf':
+                    results['rf_device_id'] = result['predictions']
+                    results['rf_device_confidence'] = result['confidence']
+                    results['models_used'].append('Random Forest')
         
         return results
     
+    def has_deep_model(self, key):
+        # ONNX runners score without TensorFlow
+        return key in self.runners or (self.models[key] is not None and TENSORFLOW_AVAILABLE)
+    
+    def keras_predict(self, key, X):
+        runner = self.runners.get(key)
+        if runner is not None:
+            return runner.predict(X)
+        return self.models[key].predict(X, verbose=0)
+    
     def _predict_ae(self, X_scaled):
-        recon = self.models['autoencoder'].predict(X_scaled, verbose=0)
+        recon = self.keras_predict('autoencoder', X_scaled)
         mse = np.mean(np.power(X_scaled - recon, 2), axis=1)
         anomalies = np.where((mse > self.models['autoencoder_threshold']), -1, 1)
         return {'scores': -mse, 'predictions': anomalies}
     
     def _predict_lstm(self, X_seq):
-        pred = np.argmax(self.models['lstm_classifier'].predict(X_seq, verbose=0), axis=1)
-        proba = self.models['lstm_classifier'].predict(X_seq, verbose=0)
-        return {'predictions': pred, 'confidence': np.max(proba, axis=1)}
+        return self._lstm_result(self.keras_predict('lstm_classifier', X_seq))
+    
+    def _lstm_result(self, proba):
+        if len(proba) == 0:
+            return None
+        return {'predictions': np.argmax(proba, axis=1), 'confidence': np.max(proba, axis=1)}
 
 class MultiModelAnalyzer:
-    def __init__(self):
-        self.models = {
-            'isolation_forest': None, 'autoencoder': None, 'autoencoder_threshold': None,
-            'xgboost_classifier': None, 'lstm_classifier': None,
-            'tcn_predictor': None, 'rf_fingerprinter': None
-        }
-        self.scaler = StandardScaler()
-        self.feature_columns = None
+    def __init__(self, backend='thread', cascade=None, inference='keras'):
+        # Live bundle (scaler, feature columns, models); replaced whole on retraining
+        self.bundle = None
+        self.backend = backend
+        self.cascade = cascade  # ModelCascade: Keras models only on suspicious/sampled flows
+        self.inference = inference  # 'keras', 'function', 'tflite', 'tflite-int8', 'onnx'; conversions saved in the bundle
         self.training_data = []
-        self.models_trained = False
+        self.training_sequences = []
         self.min_samples = 15
-        self.parallel_predictor = None
-    
-    def save_models(self):
+        self.executor = ThreadPoolExecutor(max_workers=6)
+        self.trainer = BackgroundTrainer(self.build_bundle, self._install_and_save)
+    
+    @property
+    def models_trained(self):
+        return self.bundle is not None
+    
+    @property
+    def parallel_predictor(self):
+        bundle = self.bundle
+        return bundle.predictor if bundle is not None else None
+    
+    def install_bundle(self, bundle):
+        previous = self.bundle
+        bundle.version = previous.version + 1 if previous is not None else 1
+        self.bundle = bundle
+        if previous is not None:
+            previous.retire()  # closed once its running predictions finish
+        print(f"[+] Model bundle v{bundle.version} live ({bundle.active_models}/6 models)")
+    
+    def close(self):
+        if self.bundle is not None:
+            self.bundle.retire()
+    
+    def _hold_bundle(self):
+        # live bundle, held so a concurrent swap can't close its predictor mid-batch
+        while True:
+            bundle = self.bundle
+            if bundle is None or bundle.acquire():
+                return bundle
+    
+    def _install_and_save(self, bundle):
+        self.install_bundle(bundle)
+        self.save_models(bundle)
+    
+    def train_in_background(self, flow_features, sequences):
+        return self.trainer.submit(flow_features, sequences)
+    
+    def save_models(self, bundle=None):
+        bundle = bundle or self.bundle
+        if bundle is None:
+            return
         try:
             print("\n[*] Saving models...")
-            if self.models['isolation_forest']:
-                with open(MODEL_DIR / 'if.pkl', 'wb') as f:
-                    pickle.dump(self.models['isolation_forest'], f)
-            if self.models['xgboost_classifier']:
-                with open(MODEL_DIR / 'xgb.pkl', 'wb') as f:
-                    pickle.dump(self.models['xgboost_classifier'], f)
-            if self.models['rf_fingerprinter']:
-                with open(MODEL_DIR / 'rf.pkl', 'wb') as f:
-                    pickle.dump(self.models['rf_fingerprinter'], f)
-            if self.models['autoencoder_threshold']:
-                with open(MODEL_DIR / 'ae_thresh.pkl', 'wb') as f:
-                    pickle.dump(self.models['autoencoder_threshold'], f)
-            
-            if TENSORFLOW_AVAILABLE:
-                if self.models['autoencoder']:
-                    self.models['autoencoder'].save(MODEL_DIR / 'ae.h5')
-                if self.models['lstm_classifier']:
-                    self.models['lstm_classifier'].save(MODEL_DIR / 'lstm.h5')
-                if self.models['tcn_predictor']:
-                    self.models['tcn_predictor'].save(MODEL_DIR / 'tcn.h5')
-            
-            with open(MODEL_DIR / 'scaler.pkl', 'wb') as f:
-                pickle.dump(self.scaler, f)
-            with open(MODEL_DIR / 'features.pkl', 'wb') as f:
-                pickle.dump(self.feature_columns, f)
-            
-            print("[+] ✓ Models saved")
+            path = save_bundle(bundle, MODEL_DIR / BUNDLE_FILE)
+            print(f"[+] ✓ Models saved to {path} (v{bundle.version}, {bundle.active_models} models)")
         except Exception as e:
             print(f"[!] Save error: {e}")
     
+    def export_onnx(self, directory=MODEL_DIR / 'onnx'):
+        bundle = self.bundle
+        if bundle is None:
+            return []
+        paths = write_onnx(bundle, directory)
+        print(f"[+] Exported {len(paths)} ONNX models to {directory}")
+        return paths
+    
+    def _load_keras(self, path):
+        tf = import_tensorflow(configure_gpus=True)
+        return tf.keras.models.load_model(path)
+    
     def load_models(self):
         try:
             print("\n[*] Loading saved models...")
-            count = 0
-            
-            if (MODEL_DIR / 'if.pkl').exists():
-                with open(MODEL_DIR / 'if.pkl', 'rb') as f:
-                    self.models['isolation_forest'] = pickle.load(f)
-                count += 1
-            
-            if (MODEL_DIR / 'xgb.pkl').exists():
-                with open(MODEL_DIR / 'xgb.pkl', 'rb') as f:
-                    self.models['xgboost_classifier'] = pickle.load(f)
-                count += 1
-            
-            if (MODEL_DIR / 'rf.pkl').exists():
-                with open(MODEL_DIR / 'rf.pkl', 'rb') as f:
-                    self.models['rf_fingerprinter'] = pickle.load(f)
-                count += 1
-            
-            if (MODEL_DIR / 'ae_thresh.pkl').exists():
-                with open(MODEL_DIR / 'ae_thresh.pkl', 'rb') as f:
-                    self.models['autoencoder_threshold'] = pickle.load(f)
-            
-            if TENSORFLOW_AVAILABLE:
-                if (MODEL_DIR / 'ae.h5').exists():
-                    self.models['autoencoder'] = tf.keras.models.load_model(MODEL_DIR / 'ae.h5')
-                    count += 1
-                if (MODEL_DIR / 'lstm.h5').exists():
-                    self.models['lstm_classifier'] = tf.keras.models.load_model(MODEL_DIR / 'lstm.h5')
-                    count += 1
-                if (MODEL_DIR / 'tcn.h5').exists():
-                    self.models['tcn_predictor'] = tf.keras.models.load_model(MODEL_DIR / 'tcn.h5')
-                    count += 1
-            
-            if (MODEL_DIR / 'scaler.pkl').exists():
-                with open(MODEL_DIR / 'scaler.pkl', 'rb') as f:
-                    self.scaler = pickle.load(f)
-            if (MODEL_DIR / 'features.pkl').exists():
-                with open(MODEL_DIR / 'features.pkl', 'rb') as f:
-                    self.feature_columns = pickle.load(f)
+            start = time.perf_counter()
+            if (MODEL_DIR / BUNDLE_FILE).exists():
+                # Keras models already exported to ONNX are scored without loading TensorFlow;
+                # without onnxruntime compile_bundle falls back to Keras, so they are loaded
+                header = read_bundle_header(MODEL_DIR / BUNDLE_FILE)
+                onnx = header.get('compiled', {}).get('onnx', []) if self.inference == 'onnx' and ONNX_AVAILABLE else []
+                need_keras = TENSORFLOW_AVAILABLE and any(
+                    name in KERAS_MODELS and name not in onnx for name in header['models'])
+                bundle = load_bundle(MODEL_DIR / BUNDLE_FILE,
+                                     load_keras=self._load_keras if need_keras else None)
+            else:
+                bundle = self._load_loose_models()
             
+            count = bundle.active_models if bundle is not None else 0
             if count >= 3:
-                self.models_trained = True
-                self.parallel_predictor = ParallelModelPredictor(self.models)
-                print(f"[+] ✓ Loaded {count} models - READY!")
+                runners = compile_bundle(bundle, self.inference)  # TFLite stored in the bundle is reused
+                bundle.predictor = ParallelModelPredictor(bundle.models, self.executor, self.backend, runners)
+                self.install_bundle(bundle)
+                print(f"[+] ✓ Loaded {count} models in {time.perf_counter() - start:.2f}s - READY!")
                 return True
             print(f"[*] Found {count} models, need training")
             return False
@@ -373,17 +367,57 @@ class MultiModelAnalyzer:
             print(f"[!] Load error: {e}")
             return False
     
+    def _load_loose_models(self):
+        # Models saved one file each by earlier versions; re-saved as a bundle on the next save
+        if not (MODEL_DIR / 'features.pkl').exists():
+            return None
+        print("[*] Reading loose model files from an earlier version")
+        models = dict.fromkeys(['isolation_forest', 'autoencoder', 'autoencoder_threshold',
+                                'xgboost_classifier', 'lstm_classifier',
+                                'tcn_predictor', 'rf_fingerprinter'])
+        for key, name in (('isolation_forest', 'if.pkl'), ('xgboost_classifier', 'xgb.pkl'),
+                          ('rf_fingerprinter', 'rf.pkl'), ('autoencoder_threshold', 'ae_thresh.pkl')):
+            if (MODEL_DIR / name).exists():
+                with open(MODEL_DIR / name, 'rb') as f:
+                    models[key] = pickle.load(f)
+        
+        if TENSORFLOW_AVAILABLE:
+            for key, name in (('autoencoder', 'ae.h5'), ('lstm_classifier', 'lstm.h5'), ('tcn_predictor', 'tcn.h5')):
+                if (MODEL_DIR / name).exists():
+                    models[key] = self._load_keras(MODEL_DIR / name)
+        
+        with open(MODEL_DIR / 'scaler.pkl', 'rb') as f:
+            scaler = pickle.load(f)
+        with open(MODEL_DIR / 'features.pkl', 'rb') as f:
+            feature_columns = pickle.load(f)
+        return ModelBundle(models, scaler, feature_columns)
+    
     def train_all_models(self, flow_features, sequences):
+        bundle = self.build_bundle(flow_features, sequences)
+        if bundle is None:
+            return False
+        self._install_and_save(bundle)
+        return True
+    
+    def build_bundle(self, flow_features, sequences):
         print("\n" + "="*70)
         print("TRAINING 6 AI MODELS")
         print("="*70)
         
-        X, _ = self._prepare_features(flow_features)
+        X, _, feature_columns = self._prepare_features(flow_features)
         if X is None or len(X) < self.min_samples:
             print(f"[!] Need {self.min_samples}, got {len(X) if X is not None else 0}")
-            return False
+            return None
+        
+        from sklearn.ensemble import IsolationForest, RandomForestClassifier
+        from sklearn.preprocessing import StandardScaler
+        from sklearn.cluster import KMeans, DBSCAN
         
-        X_scaled = self.scaler.fit_transform(X)
+        models = dict.fromkeys(['isolation_forest', 'autoencoder', 'autoencoder_threshold',
+                                'xgboost_classifier', 'lstm_classifier',
+                                'tcn_predictor', 'rf_fingerprinter'])
+        scaler = StandardScaler()
+        X_scaled = scaler.fit_transform(X)
         
         # Prepare sequences - ensure we have data for LSTM/TCN
         X_seq_all = []
@@ -406,11 +440,16 @@ class MultiModelAnalyzer:
         
         # Train models
         print("[1/6] Isolation Forest...")
-        self.models['isolation_forest'] = IsolationForest(contamination=0.1, random_state=42)
-        self.models['isolation_forest'].fit(X_scaled)
+        models['isolation_forest'] = IsolationForest(contamination=0.1, random_state=42)
+        models['isolation_forest'].fit(X_scaled)
         print("      ✓ Done")
         
         if TENSORFLOW_AVAILABLE:
+            import_tensorflow(configure_gpus=True)
+            from tensorflow.keras.models import Sequential
+            from tensorflow.keras.layers import Dense, LSTM, Dropout, Conv1D, MaxPooling1D, Flatten
+            from tensorflow.keras.optimizers import Adam
+            
             print("[2/6] Autoencoder...")
             input_dim = X_scaled.shape[1]
             enc_dim = max(input_dim // 2, 8)
@@ -424,19 +463,20 @@ class MultiModelAnalyzer:
             ])
             ae.compile(optimizer=Adam(0.001), loss='mse')
             ae.fit(X_scaled, X_scaled, epochs=20, batch_size=32, verbose=0)
-            self.models['autoencoder'] = ae
+            models['autoencoder'] = ae
             recon = ae.predict(X_scaled, verbose=0)
             mse = np.mean(np.power(X_scaled - recon, 2), axis=1)
-            self.models['autoencoder_threshold'] = np.percentile(mse, 90)
+            models['autoencoder_threshold'] = np.percentile(mse, 90)
             print("      ✓ Done")
         
         if XGBOOST_AVAILABLE:
+            import xgboost as xgb
             print("[3/6] XGBoost...")
             kmeans = KMeans(n_clusters=min(5, max(2, len(X)//4)), random_state=42)
             labels = kmeans.fit_predict(X_scaled)
-            self.models['xgboost_classifier'] = xgb.XGBClassifier(
+            models['xgboost_classifier'] = xgb.XGBClassifier(
                 n_estimators=100, max_depth=6, random_state=42, verbosity=0)
-            self.models['xgboost_classifier'].fit(X, labels)
+            models['xgboost_classifier'].fit(X, labels)
             print("      ✓ Done")
         
         # LSTM - Relaxed requirements (train with 10+ flows)
@@ -455,7 +495,7 @@ class MultiModelAnalyzer:
                 ])
                 lstm.compile(optimizer=Adam(0.001), loss='sparse_categorical_crossentropy')
                 lstm.fit(X_seq_all, y_seq, epochs=10, batch_size=8, verbose=0)
-                self.models['lstm_classifier'] = lstm
+                models['lstm_classifier'] = lstm
                 print("      ✓ Done")
             except Exception as e:
                 print(f"      ✗ Failed: {e}")
@@ -479,7 +519,7 @@ class MultiModelAnalyzer:
                 ])
                 tcn.compile(optimizer=Adam(0.001), loss='mse')
                 tcn.fit(X_seq_all, throughput, epochs=10, batch_size=8, verbose=0)
-                self.models['tcn_predictor'] = tcn
+                models['tcn_predictor'] = tcn
                 print("      ✓ Done")
             except Exception as e:
                 print(f"      ✗ Failed: {e}")
@@ -494,96 +534,174 @@ class MultiModelAnalyzer:
             valid = dev_labels != -1
             
             if np.sum(valid) >= 5:  # Reduced from 10 to 5
-                self.models['rf_fingerprinter'] = RandomForestClassifier(
+                models['rf_fingerprinter'] = RandomForestClassifier(
                     n_estimators=50, max_depth=8, random_state=42)
-                self.models['rf_fingerprinter'].fit(X[valid], dev_labels[valid])
+                models['rf_fingerprinter'].fit(X[valid], dev_labels[valid])
                 print(f"      ✓ Done ({len(np.unique(dev_labels[valid]))} devices)")
             else:
                 print(f"      ✗ Need 5+ clustered flows (got {np.sum(valid)})")
         except Exception as e:
             print(f"      ✗ Failed: {e}")
         
-        self.models_trained = True
-        self.parallel_predictor = ParallelModelPredictor(self.models)
-        
-        trained_count = sum([
-            self.models['isolation_forest'] is not None,
-            self.models['autoencoder'] is not None,
-            self.models['xgboost_classifier'] is not None,
-            self.models['lstm_classifier'] is not None,
-            self.models['tcn_predictor'] is not None,
-            self.models['rf_fingerprinter'] is not None
-        ])
+        bundle = ModelBundle(models, scaler, feature_columns, training_flows=len(X))
+        runners = compile_bundle(bundle, self.inference, {'autoencoder': X_scaled, 'lstm_classifier': X_seq_all,
+                                                          'tcn_predictor': X_seq_all})
+        bundle.predictor = ParallelModelPredictor(models, self.executor, self.backend, runners)
         
         print("\n" + "="*70)
-        print(f"✓ TRAINING COMPLETE - {trained_count}/6 MODELS ACTIVE")
+        print(f"✓ TRAINING COMPLETE - {bundle.active_models}/6 MODELS ACTIVE")
         print("="*70)
         
-        # Auto-save after training
-        self.save_models()
-        
-        return True
+        return bundle
     
-    def predict_all(self, flow_features, sequences):
-        if not self.models_trained:
+    def predict_all(self, flow_features, sequences, lstm_proba=None, tcn_pred=None):
+        bundle = self._hold_bundle()
+        if bundle is None:
             return None
-        
-        X, _ = self._prepare_features(flow_features)
+        try:
+            return self._predict_bundle(bundle, flow_features, sequences, lstm_proba, tcn_pred)
+        finally:
+            bundle.release()
+    
+    def _predict_bundle(self, bundle, flow_features, sequences, lstm_proba, tcn_pred):
+        X, _, _ = self._prepare_features(flow_features, bundle.feature_columns)
         if X is None:
             return None
         
-        X_scaled = self.scaler.transform(X)
+        X_scaled = (bundle.predictor.scaler or bundle.scaler).transform(X)
         X_seq = np.array([s for s in sequences if len(s) > 0]) if sequences else np.array([])
         
-        results = self.parallel_predictor.predict_all_parallel(X, X_scaled, X_seq)
+        if self.cascade is not None:
+            results = self.cascade.run(bundle.predictor, X, X_scaled, X_seq, lstm_proba, tcn_pred)
+        else:
+            results = bundle.predictor.predict_all_parallel(X, X_scaled, X_seq, lstm_proba=lstm_proba,
+                                                            tcn_pred=tcn_pred)
         results['flow_count'] = len(X)
+        results['bundle_version'] = bundle.version
         return results
     
-    def _prepare_features(self, flow_features):
+    def _prepare_features(self, flow_features, feature_columns=None):
         if not flow_features:
-            return None, None
+            return None, None, feature_columns
+        import pandas as pd
         df = pd.DataFrame(flow_features)
         numerical = [c for c in df.columns if c not in ['src_ip', 'dst_ip', 'protocol']]
         X = df[numerical].fillna(0)
-        if self.feature_columns is None:
-            self.feature_columns = X.columns.tolist()
-        for col in self.feature_columns:
+        if feature_columns is None:
+            feature_columns = X.columns.tolist()
+        for col in feature_columns:
             if col not in X.columns:
                 X[col] = 0
-        return X[self.feature_columns].values, None
+        return X[feature_columns].values, None, feature_columns
 
 class RealTimeMultiModelAnalyzer:
-    def __init__(self):
-        self.extractor = RealTimeFeatureExtractor(sequence_length=10, flow_timeout=60)
-        self.analyzer = MultiModelAnalyzer()
-        self.last_analysis = time.time()
-        self.last_debug = time.time()
+    def __init__(self, batch_wait=0.05, max_batch_size=256, model_backend='thread', cascade=None,
+                 streaming=False, inference='keras', clock=time.time):
+        # Flow timeouts and the debug/analysis timers all follow clock; on a
+        # ReplayClock training also blocks the replay, so runs are repeatable
+        self.clock = clock
+        self.replaying = isinstance(clock, ReplayClock)
+        self.extractor = RealTimeFeatureExtractor(sequence_length=10, flow_timeout=60, clock=clock)
+        self.analyzer = MultiModelAnalyzer(backend=model_backend, cascade=cascade, inference=inference)
+        self.scheduler = MicroBatchScheduler(self.analyzer.predict_all, self._display_batch_results,
+                                             max_batch_size=max_batch_size, max_wait=batch_wait,
+                                             clock=clock if self.replaying else None).start()
+        # Periodic analysis: per-flow LSTM state / TCN activations updated by new packets only
+        self.streaming = streaming
+        self.streams = {}  # model key -> (bundle version, streaming engine or None)
+        # 802.11 frames from a raw capture; idle records are moved to wireless_records
+        self.wireless = WirelessAggregator()
+        self.wireless_records = ([], [])
+        self.last_analysis = clock()
+        self.last_debug = clock()
+        self.analysis_pending = False  # tick not yet run by a worker holding model_lock
         self.total_packets = 0
         self.total_flows_processed = 0
         self.total_anomalies_if = 0
         self.total_anomalies_ae = 0
+        
+        # Called from several pipeline workers; one of them at a time runs the models
+        self.stats_lock = threading.Lock()
+        self.model_lock = threading.Lock()
+        self.pending_flows = deque()
+        self.pipeline = None
+        self.kernel_stats = None
     
     def process_packet(self, packet):
-        self.total_packets += 1
-        flow_key = self.extractor.update_flow_stats(packet)
-        
-        current = time.time()
-        if current - self.last_debug >= 5:
+        if isinstance(packet, RawFrame):
+            if packet.kind & FRAME_DOT11:
+                self.wireless.update(packet.data, packet.linktype, packet.timestamp)
+            if packet.kind & FRAME_IP:
+                self.extractor.update_flow_stats(packet)
+        else:
+            self.extractor.update_flow_stats(packet)
+        
+        current = self.clock()
+        with self.stats_lock:
+            self.total_packets += 1
+            print_debug = current - self.last_debug >= 5
+            if print_debug:
+                self.last_debug = current
+            run_analysis = current - self.last_analysis >= 15
+            if run_analysis:
+                self.last_analysis = current
+                self.analysis_pending = True
+        
+        if print_debug:
             active = self.extractor.get_active_flow_count()
-            print(f"[DEBUG {datetime.now().strftime('%H:%M:%S')}] "
+            queue_info = ""
+            if self.pipeline is not None:
+                queue_info = f"Queue: {self.pipeline.depth} | Dropped: {self.pipeline.dropped:,} | "
+            if self.kernel_stats is not None and self.kernel_stats.available:
+                self.kernel_stats.poll()
+                queue_info += f"Kernel drops: {self.kernel_stats.drops:,} | "
+            wireless_info = f"802.11: {self.wireless.summary()} | " if self.wireless.frames else ""
+            print(f"[DEBUG {self._now()}] "
                   f"Packets: {self.total_packets:,} | Active: {active} | "
-                  f"Processed: {self.total_flows_processed} | "
-                  f"Models: {'✓ TRAINED' if self.analyzer.models_trained else '✗ Training...'}")
-            self.last_debug = current
+                  f"Processed: {self.total_flows_processed} | {queue_info}{wireless_info}"
+                  f"Models: {'✓ TRAINED v%d' % self.analyzer.bundle.version if self.analyzer.models_trained else '✗ Training...'}")
+        
+        if run_analysis:
+            self._expire_wireless()
         
-        completed = self.extractor.check_completed_flows()
-        if completed:
-            self._process_completed_flows(completed)
+        self.pending_flows.extend(self.extractor.check_completed_flows())
+        if self.replaying:
+            self.scheduler.poll()  # max_wait follows the replay clock
         
-        if current - self.last_analysis >= 15:
-            if self.analyzer.models_trained:
+        if not self.model_lock.acquire(blocking=False):
+            return
+        try:
+            completed = []
+            while self.pending_flows:
+                completed.append(self.pending_flows.popleft())
+            if completed:
+                self._process_completed_flows(list(dict.fromkeys(completed)))
+            
+            with self.stats_lock:
+                analysis_due, self.analysis_pending = self.analysis_pending, False
+            if analysis_due and self.analyzer.models_trained:
                 self.analyze_all_active_flows()
-            self.last_analysis = current
+        finally:
+            self.model_lock.release()
+    
+    def _now(self):
+        return datetime.fromtimestamp(self.clock()).strftime('%H:%M:%S')
+    
+    def _expire_wireless(self):
+        bssids, stations = self.wireless.expire()
+        with self.stats_lock:
+            self.wireless_records[0].extend(bssids)
+            self.wireless_records[1].extend(stations)
+    
+    def save_wireless_records(self, directory=WIRELESS_DIR):
+        bssids, stations = self.wireless.records()
+        if not (bssids or stations or self.wireless_records[0] or self.wireless_records[1]):
+            return
+        directory.mkdir(parents=True, exist_ok=True)
+        for label, expired, live in (('BSSID', self.wireless_records[0], bssids),
+                                     ('station', self.wireless_records[1], stations)):
+            path = directory / f"wifi_{label.lower()}s.csv"
+            print(f"[+] {save_records(expired + live, path)} {label} records saved to {path}")
     
     def _process_completed_flows(self, completed_keys):
         features, sequences = [], []
@@ -598,58 +716,87 @@ class RealTimeMultiModelAnalyzer:
             return
         
         if not self.analyzer.models_trained:
-            total = len(self.analyzer.training_data) + len(features)
-            if total >= 15:
-                print(f"\n[*] Training with {total} flows...")
-                all_features = self.analyzer.training_data + features
-                self.analyzer.train_all_models(all_features, sequences)
-            else:
-                self.analyzer.training_data.extend(features)
+            self.analyzer.training_data.extend(features)
+            self.analyzer.training_sequences.extend(sequences)
+            total = len(self.analyzer.training_data)
+            if total < 15:
                 print(f"[*] Collecting... ({total}/15)")
-        elif self.analyzer.models_trained:
-            results = self.analyzer.predict_all(features, sequences)
-            if results:
-                print(f"\n{'='*70}")
-                print(f"[{datetime.now().strftime('%H:%M:%S')}] COMPLETED FLOWS ({len(features)})")
-                print(f"{'='*70}")
-                print(f"  Models: {', '.join(results['models_used'])}")
-                
-                if 'isolation_forest_anomalies' in results:
-                    anom = np.sum(results['isolation_forest_anomalies'] == -1)
-                    if anom > 0:
-                        self.total_anomalies_if += anom
-                        print(f"  [IF] ⚠ {anom}/{results['flow_count']} anomalies")
-                
-                if 'autoencoder_anomalies' in results:
-                    anom = np.sum(results['autoencoder_anomalies'] == -1)
-                    if anom > 0:
-                        self.total_anomalies_ae += anom
-                        print(f"  [AE] ⚠ {anom}/{results['flow_count']} anomalies")
-                
-                if 'xgboost_traffic_class' in results:
-                    classes = np.unique(results['xgboost_traffic_class'])
-                    print(f"  [XGB] Classes: {list(classes[:3])}")
-                
-                print(f"{'='*70}\n")
+            elif self.analyzer.train_in_background(self.analyzer.training_data,
+                                                   self.analyzer.training_sequences):
+                print(f"\n[*] Training with {total} flows in the background...")
+                if self.replaying:
+                    self.analyzer.trainer.wait()
+        else:
+            self.scheduler.submit(features, sequences)
         
         for key in completed_keys:
             self.extractor.remove_flow(key)
     
+    def _display_batch_results(self, results, features, info):
+        print(f"\n{'='*70}")
+        print(f"[{self._now()}] COMPLETED FLOWS ({len(features)}) | "
+              f"{info.latency * 1e3:.0f} ms | {info.throughput:,.0f} flows/s")
+        print(f"{'='*70}")
+        print(f"  Models: {', '.join(results['models_used'])}")
+        
+        if 'isolation_forest_anomalies' in results:
+            anom = np.sum(results['isolation_forest_anomalies'] == -1)
+            if anom > 0:
+                self.total_anomalies_if += anom
+                print(f"  [IF] ⚠ {anom}/{results['flow_count']} anomalies")
+        
+        if 'autoencoder_anomalies' in results:
+            anom = np.sum(results['autoencoder_anomalies'] == -1)
+            if anom > 0:
+                self.total_anomalies_ae += anom
+                print(f"  [AE] ⚠ {anom}/{results['flow_count']} anomalies")
+        
+        if 'xgboost_traffic_class' in results:
+            classes = np.unique(results['xgboost_traffic_class'])
+            print(f"  [XGB] Classes: {list(classes[:3])}")
+        
+        print(f"{'='*70}\n")
+    
+    def _stream_model(self, model_key, engine_class, keys):
+        bundle = self.analyzer.bundle
+        model = bundle.models.get(model_key) if bundle is not None else None
+        if model is None or not TENSORFLOW_AVAILABLE:
+            return None
+        stream = self.streams.get(model_key)
+        if stream is None or stream[0] != bundle.version:
+            try:
+                engine = engine_class.from_keras(model)
+            except ValueError as e:
+                print(f"[!] {model_key} cannot be streamed, running it on full windows: {e}")
+                engine = None
+            stream = self.streams[model_key] = (bundle.version, engine)
+        if stream[1] is None:
+            return None
+        return stream_flows(stream[1], self.extractor, keys)
+    
     def analyze_all_active_flows(self):
-        features, sequences = [], []
+        keys, features = [], []
         for key in list(self.extractor.flow_stats.keys()):
             feat = self.extractor.get_flow_features(key)
             if feat:
+                keys.append(key)
                 features.append(feat)
-                sequences.append(self.extractor.get_flow_sequence(key))
         
         if not features:
             return
         
-        results = self.analyzer.predict_all(features, sequences)
+        lstm_proba = tcn_pred = None
+        if self.streaming:
+            lstm_proba = self._stream_model('lstm_classifier', StreamingLSTM, keys)
+            tcn_pred = self._stream_model('tcn_predictor', StreamingTCN, keys)
+        # Full windows are only needed for a sequence model that is not streamed
+        sequences = []
+        if lstm_proba is None or tcn_pred is None:
+            sequences = [self.extractor.get_flow_sequence(key) for key in keys]
+        results = self.analyzer.predict_all(features, sequences, lstm_proba, tcn_pred)
         if results:
             print(f"\n{'='*70}")
-            print(f"[{datetime.now().strftime('%H:%M:%S')}] PERIODIC ANALYSIS")
+            print(f"[{self._now()}] PERIODIC ANALYSIS")
             print(f"{'='*70}")
             print(f"Models: {', '.join(results['models_used'])}")
             print(f"Active Flows: {results['flow_count']}")
@@ -670,10 +817,11 @@ class RealTimeMultiModelAnalyzer:
                     print(f"  Class {cls}: {cnt} ({cnt/results['flow_count']*100:.1f}%)")
             
             if 'lstm_traffic_class' in results:
-                print(f"\n[LSTM] Patterns: {len(np.unique(results['lstm_traffic_class']))}")
+                lstm_classes = results['lstm_traffic_class']
+                print(f"\n[LSTM] Patterns: {len(np.unique(lstm_classes[lstm_classes >= 0]))}")
             
             if 'tcn_throughput' in results:
-                print(f"[TCN] Throughput: Avg={np.mean(results['tcn_throughput']):.1f} bytes/sec")
+                print(f"[TCN] Throughput: Avg={np.nanmean(results['tcn_throughput']):.1f} bytes/sec")
             
             if 'rf_device_id' in results:
                 print(f"[RF] Devices: {len(np.unique(results['rf_device_id']))}")
@@ -685,6 +833,15 @@ class RealTimeMultiModelAnalyzer:
         print("FINAL SUMMARY")
         print(f"{'='*70}")
         print(f"Packets: {self.total_packets:,}")
+        if self.wireless.frames:
+            print(f"802.11: {self.wireless.summary()}")
+        if self.kernel_stats is not None and self.kernel_stats.available:
+            print(f"Kernel Capture: {self.kernel_stats.summary()}")
+        if self.pipeline is not None:
+            print(f"Capture Queue: {self.pipeline.summary()}")
+        print(f"Inference Batches: {self.scheduler.summary()}")
+        if self.analyzer.cascade is not None:
+            print(f"Model Cascade: {self.analyzer.cascade.summary()}")
         print(f"Flows Processed: {self.total_flows_processed:,}")
         print(f"Active Flows: {self.extractor.get_active_flow_count()}")
         print(f"Models Trained: {'Yes' if self.analyzer.models_trained else 'No'}")
@@ -731,12 +888,26 @@ def main():
     
     capture = LivePacketCapture()
     capture.list_interfaces()
-    
-    interface = input("\n[?] Interface (default: wlan0): ").strip()
-    if interface:
-        capture.interface = interface
-    
-    analyzer = RealTimeMultiModelAnalyzer()
+    configure_capture(capture)
+    
+    processes = input("[?] Score IF/XGBoost/RF in worker processes? (y/n, default: n): ").strip().lower()
+    cascade = input("[?] Run deep models only on suspicious flows? (y/n, default: n): ").strip().lower()
+    streaming = input("[?] Stream LSTM/TCN state per flow between analyses? (y/n, default: n): ").strip().lower()
+    inference = input(f"[?] Keras inference ({'/'.join(INFERENCE_MODES)}, default: keras): ").strip().lower()
+    if inference not in INFERENCE_MODES:
+        inference = 'keras'
+    raw = input("[?] Drop non-IP frames before dissection (monitor mode)? (y/n, default: n): ").strip().lower()
+    # A replay runs on the capture's clock, with a fixed cascade sample and no
+    # worker pipeline: packets are processed in file order, one at a time
+    replaying = capture.replay is not None
+    analyzer = RealTimeMultiModelAnalyzer(model_backend='process' if processes == 'y' else 'thread',
+                                          cascade=ModelCascade(seed=0 if replaying else None) if cascade == 'y' else None,
+                                          streaming=streaming == 'y', inference=inference,
+                                          clock=capture.replay.clock if replaying else time.time)
+    pipeline = PacketPipeline(analyzer.process_packet, workers=2, maxsize=10000, policy='drop-newest')
+    if not replaying:
+        analyzer.pipeline = pipeline
+        analyzer.kernel_stats = capture.kernel_stats
     
     # Try loading saved models
     analyzer.analyzer.load_models()
@@ -749,16 +920,25 @@ def main():
     print("    - Press Ctrl+C to stop\n")
     
     try:
-        capture.start_capture(prn=analyzer.process_packet)
+        if replaying:
+            capture.start_capture(prn=analyzer.process_packet, raw=raw == 'y')
+        else:
+            pipeline.start()
+            capture.start_capture(prn=pipeline.submit, raw=raw == 'y')
     except KeyboardInterrupt:
         print("\n[*] Stopping...")
     finally:
         capture.stop_capture()
+        pipeline.stop()
+        analyzer.scheduler.stop()
         analyzer.display_final_summary()
+        analyzer.save_wireless_records()
         
-        # Save models on exit
+        # Save models on exit (a training run still in progress gets a moment to finish)
+        analyzer.analyzer.trainer.wait(timeout=30)
         if analyzer.analyzer.models_trained:
             analyzer.analyzer.save_models()
+        analyzer.analyzer.close()
         
         print("[+] Complete!")
 
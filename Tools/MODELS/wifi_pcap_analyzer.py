@@ -10,27 +10,19 @@ Requirements:
 pip install scapy numpy pandas scikit-learn xgboost lightgbm tensorflow pyshark
 """
 
+import os
 import numpy as np
-import pandas as pd
-from scapy.all import rdpcap, IP, TCP, UDP, ICMP
-from sklearn.ensemble import IsolationForest, RandomForestClassifier, RandomForestRegressor
-from sklearn.preprocessing import StandardScaler, LabelEncoder
-from sklearn.model_selection import train_test_split
-import xgboost as xgb
-import lightgbm as lgb
 from collections import defaultdict
+from flow_stats import RunningStats, packet_flow_key
+from packet_decoder import decode_packet, iter_pcap_frames
+from pcap_columnar import read_pcap_table, aggregate_flows, flow_records
+from pcap_parallel import process_pcap_sharded
+from lazy_imports import tensorflow_available
 import warnings
 warnings.filterwarnings('ignore')
 
-# For deep learning models
-try:
-    from tensorflow.keras.models import Model, Sequential
-    from tensorflow.keras.layers import Input, Dense, LSTM, Dropout, Conv1D, MaxPooling1D, Flatten
-    from tensorflow.keras.optimizers import Adam
-    TENSORFLOW_AVAILABLE = True
-except ImportError:
-    TENSORFLOW_AVAILABLE = False
-    print("TensorFlow not available. Deep learning models disabled.")
+# scapy, pandas, scikit-learn, XGBoost and LightGBM are imported where first used
+TENSORFLOW_AVAILABLE = tensorflow_available()
 
 
 class PCAPFeatureExtractor:
@@ -41,50 +33,48 @@ class PCAPFeatureExtractor:
         self.flow_dict = defaultdict(list)
         
     def extract_packet_features(self, packet):
-        """Extract features from a single packet"""
+        """Extract features from a single packet (scapy packet or DecodedFrame)"""
+        frame = decode_packet(packet)
         features = {}
         
         # Basic packet info
-        features['packet_length'] = len(packet)
-        features['timestamp'] = float(packet.time)
+        features['packet_length'] = frame.length
+        features['timestamp'] = frame.timestamp
         
         # Protocol flags
-        features['has_ip'] = 1 if packet.haslayer(IP) else 0
-        features['has_tcp'] = 1 if packet.haslayer(TCP) else 0
-        features['has_udp'] = 1 if packet.haslayer(UDP) else 0
-        features['has_icmp'] = 1 if packet.haslayer(ICMP) else 0
-        
-        if packet.haslayer(IP):
-            ip_layer = packet[IP]
-            features['ip_len'] = ip_layer.len
-            features['ip_ttl'] = ip_layer.ttl
-            features['ip_proto'] = ip_layer.proto
-            features['src_ip'] = ip_layer.src
-            features['dst_ip'] = ip_layer.dst
+        features['has_ip'] = frame.has_ip
+        features['has_tcp'] = frame.has_tcp
+        features['has_udp'] = frame.has_udp
+        features['has_icmp'] = frame.has_icmp
+        
+        if frame.has_ip:
+            features['ip_len'] = frame.ip_len
+            features['ip_ttl'] = frame.ip_ttl
+            features['ip_proto'] = frame.ip_proto
+            features['src_ip'] = frame.src_ip
+            features['dst_ip'] = frame.dst_ip
             
             # TCP features
-            if packet.haslayer(TCP):
-                tcp_layer = packet[TCP]
-                features['src_port'] = tcp_layer.sport
-                features['dst_port'] = tcp_layer.dport
-                features['tcp_flags'] = int(tcp_layer.flags)
-                features['tcp_window'] = tcp_layer.window
-                features['tcp_seq'] = tcp_layer.seq
-                features['tcp_ack'] = tcp_layer.ack
+            if frame.has_tcp:
+                features['src_port'] = frame.src_port
+                features['dst_port'] = frame.dst_port
+                features['tcp_flags'] = frame.tcp_flags
+                features['tcp_window'] = frame.tcp_window
+                features['tcp_seq'] = frame.tcp_seq
+                features['tcp_ack'] = frame.tcp_ack
                 
                 # Flag breakdown
-                features['flag_syn'] = 1 if 'S' in str(tcp_layer.flags) else 0
-                features['flag_ack'] = 1 if 'A' in str(tcp_layer.flags) else 0
-                features['flag_fin'] = 1 if 'F' in str(tcp_layer.flags) else 0
-                features['flag_rst'] = 1 if 'R' in str(tcp_layer.flags) else 0
-                features['flag_psh'] = 1 if 'P' in str(tcp_layer.flags) else 0
+                features['flag_syn'] = frame.flag_syn
+                features['flag_ack'] = frame.flag_ack
+                features['flag_fin'] = frame.flag_fin
+                features['flag_rst'] = frame.flag_rst
+                features['flag_psh'] = frame.flag_psh
                 
             # UDP features
-            elif packet.haslayer(UDP):
-                udp_layer = packet[UDP]
-                features['src_port'] = udp_layer.sport
-                features['dst_port'] = udp_layer.dport
-                features['udp_len'] = udp_layer.len
+            elif frame.has_udp:
+                features['src_port'] = frame.src_port
+                features['dst_port'] = frame.dst_port
+                features['udp_len'] = frame.udp_len
             else:
                 features['src_port'] = 0
                 features['dst_port'] = 0
@@ -92,48 +82,77 @@ class PCAPFeatureExtractor:
         return features
     
     def extract_flow_features(self, packets, window_size=10):
-        """Extract flow-level features from packet sequences"""
-        flows = defaultdict(lambda: {
-            'packets': [],
-            'bytes': [],
-            'intervals': [],
-            'src_ip': None,
-            'dst_ip': None
-        })
-        
-        # Group packets into flows
+        """Extract flow-level features from packet sequences
+        
+        ``packets`` may be any iterable (list or generator), or a columnar
+        packet table from read_pcap_table(). Only running per-flow
+        statistics are kept, never the packets themselves.
+        """
+        if isinstance(packets, np.ndarray):
+            return flow_records(self.extract_flow_table(packets))
+        
+        flows = {}
         for pkt in packets:
-            if pkt.haslayer(IP):
-                flow_key = self._get_flow_key(pkt)
-                flows[flow_key]['packets'].append(pkt)
-                flows[flow_key]['bytes'].append(len(pkt))
-                flows[flow_key]['src_ip'] = pkt[IP].src
-                flows[flow_key]['dst_ip'] = pkt[IP].dst
-                
-                if len(flows[flow_key]['packets']) > 1:
-                    time_diff = float(pkt.time) - float(flows[flow_key]['packets'][-2].time)
-                    flows[flow_key]['intervals'].append(time_diff)
+            self._update_flow(flows, pkt)
+        return self._finalize_flows(flows)
+    
+    def _update_flow(self, flows, pkt):
+        """Fold one packet into the running per-flow statistics"""
+        frame = decode_packet(pkt)
+        if not frame.has_ip:
+            return
         
-        # Compute flow statistics
+        flow_key = self._get_flow_key(frame)
+        flow = flows.get(flow_key)
+        if flow is None:
+            flow = flows[flow_key] = {
+                'first_time': None,
+                'last_time': None,
+                'byte_count': 0,
+                'bytes': RunningStats(),
+                'intervals': RunningStats(),
+                'src_ip': None,
+                'dst_ip': None
+            }
+        
+        pkt_time = frame.timestamp
+        pkt_len = frame.length
+        
+        if flow['last_time'] is None:
+            flow['first_time'] = pkt_time
+        else:
+            flow['intervals'].add(pkt_time - flow['last_time'])
+        flow['last_time'] = pkt_time
+        
+        flow['byte_count'] += pkt_len
+        flow['bytes'].add(pkt_len)
+        flow['src_ip'] = frame.src_ip
+        flow['dst_ip'] = frame.dst_ip
+    
+    def _finalize_flows(self, flows):
+        """Compute flow statistics from the running per-flow state"""
         flow_features = []
         for flow_key, flow_data in flows.items():
-            if len(flow_data['packets']) < 2:
+            sizes = flow_data['bytes']
+            if sizes.count < 2:
                 continue
-                
+            
+            intervals = flow_data['intervals']
+            
             feat = {}
-            feat['flow_duration'] = float(flow_data['packets'][-1].time) - float(flow_data['packets'][0].time)
-            feat['flow_packet_count'] = len(flow_data['packets'])
-            feat['flow_byte_count'] = sum(flow_data['bytes'])
-            feat['flow_bytes_per_packet_mean'] = np.mean(flow_data['bytes'])
-            feat['flow_bytes_per_packet_std'] = np.std(flow_data['bytes'])
-            feat['flow_bytes_per_packet_min'] = np.min(flow_data['bytes'])
-            feat['flow_bytes_per_packet_max'] = np.max(flow_data['bytes'])
+            feat['flow_duration'] = flow_data['last_time'] - flow_data['first_time']
+            feat['flow_packet_count'] = sizes.count
+            feat['flow_byte_count'] = flow_data['byte_count']
+            feat['flow_bytes_per_packet_mean'] = sizes.mean
+            feat['flow_bytes_per_packet_std'] = sizes.std
+            feat['flow_bytes_per_packet_min'] = sizes.min
+            feat['flow_bytes_per_packet_max'] = sizes.max
             
-            if flow_data['intervals']:
-                feat['flow_inter_arrival_mean'] = np.mean(flow_data['intervals'])
-                feat['flow_inter_arrival_std'] = np.std(flow_data['intervals'])
-                feat['flow_inter_arrival_min'] = np.min(flow_data['intervals'])
-                feat['flow_inter_arrival_max'] = np.max(flow_data['intervals'])
+            if intervals.count:
+                feat['flow_inter_arrival_mean'] = intervals.mean
+                feat['flow_inter_arrival_std'] = intervals.std
+                feat['flow_inter_arrival_min'] = intervals.min
+                feat['flow_inter_arrival_max'] = intervals.max
             else:
                 feat['flow_inter_arrival_mean'] = 0
                 feat['flow_inter_arrival_std'] = 0
@@ -148,51 +167,105 @@ class PCAPFeatureExtractor:
         return flow_features
     
     def _get_flow_key(self, packet):
-        """Generate flow identifier"""
-        if packet.haslayer(IP):
-            src_ip = packet[IP].src
-            dst_ip = packet[IP].dst
-            
-            if packet.haslayer(TCP):
-                src_port = packet[TCP].sport
-                dst_port = packet[TCP].dport
-                proto = 'TCP'
-            elif packet.haslayer(UDP):
-                src_port = packet[UDP].sport
-                dst_port = packet[UDP].dport
-                proto = 'UDP'
-            else:
-                src_port = 0
-                dst_port = 0
-                proto = 'OTHER'
-            
-            # Bidirectional flow
-            return tuple(sorted([(src_ip, src_port), (dst_ip, dst_port)]) + [proto])
-        return None
+        """Generate flow identifier (packed int, same for both directions; direction bit dropped)"""
+        key = packet_flow_key(decode_packet(packet))
+        return None if key is None else key >> 1
     
-    def process_pcap(self, pcap_file, max_packets=None):
-        """Process PCAP file and extract all features"""
+    def extract_flow_table(self, packet_table):
+        """Extract flow-level features from a columnar packet table"""
+        return aggregate_flows(packet_table)
+    
+    def iter_packets(self, pcap_file, max_packets=None):
+        """Yield packets one at a time without loading the whole capture"""
+        from scapy.all import PcapReader
+        with PcapReader(pcap_file) as reader:
+            for count, pkt in enumerate(reader):
+                if max_packets and count >= max_packets:
+                    break
+                yield pkt
+    
+    def iter_frames(self, pcap_file, max_packets=None):
+        """Yield decoded frame headers one at a time, without scapy dissection"""
+        return iter_pcap_frames(pcap_file, max_packets)
+    
+    def iter_packet_features(self, pcap_file, max_packets=None):
+        """Yield per-packet features while streaming through a PCAP file"""
+        for pkt in self.iter_frames(pcap_file, max_packets):
+            try:
+                yield self.extract_packet_features(pkt)
+            except Exception:
+                continue
+    
+    def process_pcap(self, pcap_file, max_packets=None, streaming=True, keep_packet_features=True):
+        """Process PCAP file and extract all features
+        
+        In streaming mode (default) the file is read packet by packet, the
+        headers are decoded straight from the frame bytes (packet_decoder)
+        and every packet is discarded once folded into the flow statistics,
+        so peak memory depends on the number of flows rather than the file
+        size. The per-packet feature list still grows with the file: pass
+        ``keep_packet_features=False`` when only the flows are needed (it
+        is then returned empty; iter_packet_features streams them instead).
+        ``streaming=False`` restores the old load-everything ``rdpcap``
+        behaviour.
+        """
         print(f"Reading PCAP file: {pcap_file}")
-        packets = rdpcap(pcap_file)
-        
-        if max_packets:
-            packets = packets[:max_packets]
-        
-        print(f"Processing {len(packets)} packets...")
-        
-        # Extract packet-level features
+        if streaming:
+            packets = self.iter_frames(pcap_file, max_packets)
+        else:
+            from scapy.all import rdpcap
+            packets = rdpcap(pcap_file, count=max_packets or -1)
+            print(f"Processing {len(packets)} packets...")
+        
+        # Single pass: packet-level features and flow statistics together
         packet_features = []
+        flows = {}
+        packet_count = 0
         for pkt in packets:
-            try:
-                feat = self.extract_packet_features(pkt)
-                packet_features.append(feat)
-            except Exception as e:
-                continue
+            packet_count += 1
+            self._update_flow(flows, pkt)
+            
+            if keep_packet_features:
+                try:
+                    packet_features.append(self.extract_packet_features(pkt))
+                except Exception:
+                    continue
+        
+        if streaming:
+            print(f"Processed {packet_count} packets")
         
         # Extract flow-level features
-        flow_features = self.extract_flow_features(packets)
+        flow_features = self._finalize_flows(flows)
         
         return packet_features, flow_features
+    
+    def process_pcap_columnar(self, pcap_file, max_packets=None):
+        """Process a classic libpcap file with the mmap/NumPy engine
+        
+        Returns (packet_table, flow_table) as NumPy structured arrays; no
+        Python object is created per packet. Both tables can be passed
+        straight to MultiTaskWiFiAnalyzer.prepare_features().
+        """
+        print(f"Mapping PCAP file: {pcap_file}")
+        packet_table = read_pcap_table(pcap_file, max_packets)
+        print(f"Decoded {len(packet_table)} packets")
+        
+        flow_table = self.extract_flow_table(packet_table)
+        
+        return packet_table, flow_table
+    
+    def process_pcap_parallel(self, pcap_file, workers=None):
+        """Compute the flow table of a large classic libpcap file on several cores
+        
+        The file is split into record-aligned shards that worker processes
+        decode and reduce to partial flow states; the merged flow table is
+        the same as the one returned by process_pcap_columnar().
+        """
+        print(f"Sharding PCAP file: {pcap_file} ({workers or os.cpu_count()} workers)")
+        flow_table, packet_count = process_pcap_sharded(pcap_file, workers)
+        print(f"Processed {packet_count} packets")
+        
+        return flow_table
 
 
 class MultiTaskWiFiAnalyzer:
@@ -203,11 +276,12 @@ class MultiTaskWiFiAnalyzer:
         self.traffic_classifier = None
         self.performance_predictor = None
         self.device_fingerprinter = None
-        self.scaler = StandardScaler()
+        self.scaler = None
         self.feature_columns = None
         
     def prepare_features(self, flow_features_list):
-        """Convert flow features to numerical array"""
+        """Convert flow features (list of dicts or columnar flow table) to numerical array"""
+        import pandas as pd
         df = pd.DataFrame(flow_features_list)
         
         # Store IP addresses separately for device fingerprinting
@@ -229,8 +303,16 @@ class MultiTaskWiFiAnalyzer:
         
         return X.values, ip_data
     
+    def _ensure_scaler(self):
+        """Create the StandardScaler on first use"""
+        if self.scaler is None:
+            from sklearn.preprocessing import StandardScaler
+            self.scaler = StandardScaler()
+        return self.scaler
+    
     def train_anomaly_detector(self, X, contamination=0.1):
         """Train Isolation Forest for anomaly detection"""
+        from sklearn.ensemble import IsolationForest
         print("\n=== Training Anomaly Detector (Isolation Forest) ===")
         self.anomaly_detector = IsolationForest(
             contamination=contamination,
@@ -239,7 +321,7 @@ class MultiTaskWiFiAnalyzer:
             max_samples='auto'
         )
         
-        X_scaled = self.scaler.fit_transform(X)
+        X_scaled = self._ensure_scaler().fit_transform(X)
         self.anomaly_detector.fit(X_scaled)
         
         # Get anomaly scores
@@ -253,6 +335,8 @@ class MultiTaskWiFiAnalyzer:
     
     def train_traffic_classifier(self, X, y=None):
         """Train traffic classifier (unsupervised clustering if no labels)"""
+        import xgboost as xgb
+        from sklearn.model_selection import train_test_split
         print("\n=== Training Traffic Classifier (XGBoost) ===")
         
         if y is None:
@@ -260,7 +344,7 @@ class MultiTaskWiFiAnalyzer:
             from sklearn.cluster import KMeans
             print("No labels provided. Using KMeans clustering for pseudo-labeling...")
             kmeans = KMeans(n_clusters=5, random_state=42)
-            y = kmeans.fit_predict(self.scaler.fit_transform(X))
+            y = kmeans.fit_predict(self._ensure_scaler().fit_transform(X))
             print(f"Created {len(np.unique(y))} traffic classes")
         
         X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
@@ -284,6 +368,8 @@ class MultiTaskWiFiAnalyzer:
     
     def train_performance_predictor(self, X, throughput=None):
         """Train network performance predictor"""
+        from sklearn.ensemble import RandomForestRegressor
+        from sklearn.model_selection import train_test_split
         print("\n=== Training Performance Predictor (Random Forest Regressor) ===")
         
         if throughput is None:
@@ -310,6 +396,8 @@ class MultiTaskWiFiAnalyzer:
     
     def train_device_fingerprinter(self, X, device_labels=None):
         """Train device fingerprinting model"""
+        import lightgbm as lgb
+        from sklearn.model_selection import train_test_split
         print("\n=== Training Device Fingerprinter (LightGBM) ===")
         
         if device_labels is None:
@@ -317,7 +405,7 @@ class MultiTaskWiFiAnalyzer:
             from sklearn.cluster import DBSCAN
             print("No device labels provided. Using DBSCAN clustering...")
             dbscan = DBSCAN(eps=0.5, min_samples=5)
-            device_labels = dbscan.fit_predict(self.scaler.fit_transform(X))
+            device_labels = dbscan.fit_predict(self._ensure_scaler().fit_transform(X))
             n_devices = len(set(device_labels)) - (1 if -1 in device_labels else 0)
             print(f"Identified {n_devices} device clusters")
         
@@ -380,7 +468,7 @@ class MultiTaskWiFiAnalyzer:
         
         # Extract features
         extractor = PCAPFeatureExtractor()
-        packet_features, flow_features = extractor.process_pcap(pcap_file)
+        _, flow_features = extractor.process_pcap(pcap_file, keep_packet_features=False)
         
         if not flow_features:
             print("No flows detected in PCAP file")
@@ -457,7 +545,7 @@ def main():
     
     try:
         # Extract features
-        packet_features, flow_features = extractor.process_pcap(pcap_file, max_packets=1000)
+        _, flow_features = extractor.process_pcap(pcap_file, max_packets=1000, keep_packet_features=False)
         
         if not flow_features:
             print("No flows detected. Please provide a valid PCAP file.")
@@ -493,7 +581,7 @@ def main():
         print("\nExample usage:")
         print("  analyzer = MultiTaskWiFiAnalyzer()")
         print("  extractor = PCAPFeatureExtractor()")
-        print("  packet_features, flow_features = extractor.process_pcap('your_file.pcap')")
+        print("  _, flow_features = extractor.process_pcap('your_file.pcap', keep_packet_features=False)")
         print("  X, ip_data = analyzer.prepare_features(flow_features)")
         print("  analyzer.train_anomaly_detector(X)")
         print("  results = analyzer.analyze_realtime('your_file.pcap')")
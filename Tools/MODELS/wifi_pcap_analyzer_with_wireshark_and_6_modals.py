@@ -22,27 +22,19 @@ from collections import defaultdict, deque
 from datetime import datetime
 
 import numpy as np
-import pandas as pd
-from scapy.all import sniff, IP, TCP, UDP, ICMP, wrpcap, Ether, RadioTap
-from sklearn.ensemble import IsolationForest, RandomForestClassifier, RandomForestRegressor
-from sklearn.preprocessing import StandardScaler, LabelEncoder
-from sklearn.cluster import KMeans, DBSCAN
-import xgboost as xgb
-import lightgbm as lgb
+from packet_decoder import decode_packet
+from flow_stats import FlowRecord, packet_flow_key
+from capture_pipeline import PacketPipeline
+from lazy_imports import tensorflow_available, import_tensorflow, lite_mode
 import warnings
 warnings.filterwarnings('ignore')
 
-# TensorFlow for deep learning models
-try:
-    os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'
-    import tensorflow as tf
-    from tensorflow.keras.models import Model, Sequential
-    from tensorflow.keras.layers import Input, Dense, LSTM, Dropout, Conv1D, MaxPooling1D, Flatten, Reshape
-    from tensorflow.keras.optimizers import Adam
-    tf.get_logger().setLevel('ERROR')
-    TENSORFLOW_AVAILABLE = True
-except ImportError:
-    TENSORFLOW_AVAILABLE = False
+# scikit-learn, XGBoost, pandas and scapy are imported on first use;
+# TensorFlow only when a deep model is built, never in lite mode (--lite)
+TENSORFLOW_AVAILABLE = tensorflow_available()
+if lite_mode():
+    print("[*] Lite mode: deep learning models disabled")
+elif not TENSORFLOW_AVAILABLE:
     print("[!] TensorFlow not available. Deep learning models will be disabled.")
 
 
@@ -133,6 +125,7 @@ class LivePacketCapture:
                 prn = self.packet_callback
             
             # Start sniffing
+            from scapy.all import sniff
             sniff(
                 iface=self.interface,
                 prn=prn,
@@ -164,160 +157,99 @@ class LivePacketCapture:
 class RealTimeFeatureExtractor:
     """Extract features from packets in real-time"""
     
-    def __init__(self, window_size=50, sequence_length=20):
-        self.window_size = window_size
+    def __init__(self, sequence_length=20):
         self.sequence_length = sequence_length
-        self.flow_windows = defaultdict(lambda: deque(maxlen=window_size))
-        self.flow_sequences = defaultdict(lambda: deque(maxlen=sequence_length))
-        self.flow_stats = defaultdict(lambda: {
-            'packet_count': 0,
-            'byte_count': 0,
-            'start_time': None,
-            'last_time': None,
-            'src_ip': None,
-            'dst_ip': None,
-            'src_port': None,
-            'dst_port': None,
-            'protocol': None,
-            'packet_sizes': [],
-            'inter_arrival_times': []
-        })
+        self.flow_stats = defaultdict(lambda: FlowRecord(sequence_length))
     
     def extract_packet_features(self, packet):
         """Extract features from single packet"""
+        frame = decode_packet(packet)
         features = {
             'timestamp': time.time(),
-            'packet_length': len(packet),
+            'packet_length': frame.length,
             'has_ip': 0,
             'has_tcp': 0,
             'has_udp': 0,
             'has_icmp': 0
         }
         
-        if packet.haslayer(IP):
+        if frame.has_ip:
             features['has_ip'] = 1
-            ip = packet[IP]
-            features['ip_len'] = ip.len
-            features['ip_ttl'] = ip.ttl
-            features['ip_proto'] = ip.proto
-            features['src_ip'] = ip.src
-            features['dst_ip'] = ip.dst
+            features['ip_len'] = frame.ip_len
+            features['ip_ttl'] = frame.ip_ttl
+            features['ip_proto'] = frame.ip_proto
+            features['src_ip'] = frame.src_ip
+            features['dst_ip'] = frame.dst_ip
             
-            if packet.haslayer(TCP):
+            if frame.has_tcp:
                 features['has_tcp'] = 1
-                tcp = packet[TCP]
-                features['src_port'] = tcp.sport
-                features['dst_port'] = tcp.dport
-                features['tcp_window'] = tcp.window
-                features['flag_syn'] = 1 if tcp.flags.S else 0
-                features['flag_ack'] = 1 if tcp.flags.A else 0
-                features['flag_fin'] = 1 if tcp.flags.F else 0
-                features['flag_rst'] = 1 if tcp.flags.R else 0
-                features['flag_psh'] = 1 if tcp.flags.P else 0
+                features['src_port'] = frame.src_port
+                features['dst_port'] = frame.dst_port
+                features['tcp_window'] = frame.tcp_window
+                features['flag_syn'] = frame.flag_syn
+                features['flag_ack'] = frame.flag_ack
+                features['flag_fin'] = frame.flag_fin
+                features['flag_rst'] = frame.flag_rst
+                features['flag_psh'] = frame.flag_psh
                 
-            elif packet.haslayer(UDP):
+            elif frame.has_udp:
                 features['has_udp'] = 1
-                udp = packet[UDP]
-                features['src_port'] = udp.sport
-                features['dst_port'] = udp.dport
-                features['udp_len'] = udp.len
+                features['src_port'] = frame.src_port
+                features['dst_port'] = frame.dst_port
+                features['udp_len'] = frame.udp_len
             
-            elif packet.haslayer(ICMP):
+            elif frame.has_icmp:
                 features['has_icmp'] = 1
         
         return features
     
     def update_flow_stats(self, packet):
         """Update flow statistics with new packet"""
-        if not packet.haslayer(IP):
+        frame = decode_packet(packet)
+        if not frame.has_ip:
             return None
         
-        flow_key = self._get_flow_key(packet)
-        if not flow_key:
+        key = self._get_flow_key(frame)
+        if key is None:
             return None
+        flow_key, direction = key >> 1, key & 1
         
-        stats = self.flow_stats[flow_key]
-        current_time = time.time()
-        
-        # Update basic stats
-        stats['packet_count'] += 1
-        stats['byte_count'] += len(packet)
-        stats['packet_sizes'].append(len(packet))
-        
-        if stats['start_time'] is None:
-            stats['start_time'] = current_time
-        else:
-            # Calculate inter-arrival time
-            inter_arrival = current_time - stats['last_time']
-            stats['inter_arrival_times'].append(inter_arrival)
-        
-        stats['last_time'] = current_time
-        
-        # Store packet info
-        ip = packet[IP]
-        stats['src_ip'] = ip.src
-        stats['dst_ip'] = ip.dst
-        
-        if packet.haslayer(TCP):
-            stats['protocol'] = 'TCP'
-            stats['src_port'] = packet[TCP].sport
-            stats['dst_port'] = packet[TCP].dport
-        elif packet.haslayer(UDP):
-            stats['protocol'] = 'UDP'
-            stats['src_port'] = packet[UDP].sport
-            stats['dst_port'] = packet[UDP].dport
-        
-        # Add to flow window for aggregated features
-        self.flow_windows[flow_key].append({
-            'length': len(packet),
-            'time': current_time
-        })
-        
-        # Add to sequence for LSTM/TCN
-        packet_features = self.extract_packet_features(packet)
-        self.flow_sequences[flow_key].append([
-            packet_features.get('packet_length', 0),
-            packet_features.get('ip_ttl', 0),
-            packet_features.get('tcp_window', 0),
-            packet_features.get('has_tcp', 0),
-            packet_features.get('has_udp', 0)
-        ])
+        # Update basic stats, size/gap accumulators and the LSTM/TCN sequence
+        self.flow_stats[flow_key].update(frame, time.time(), direction)
         
         return flow_key
     
     def get_flow_features(self, flow_key):
         """Get comprehensive features for a flow"""
         stats = self.flow_stats[flow_key]
-        window = list(self.flow_windows[flow_key])
         
-        if len(window) < 2:
+        if stats.packet_count < 2:
             return None
         
-        # Calculate statistics
-        lengths = [p['length'] for p in window]
-        times = [p['time'] for p in window]
-        intervals = [times[i] - times[i-1] for i in range(1, len(times))]
-        
         features = {
-            'flow_duration': stats['last_time'] - stats['start_time'] if stats['start_time'] else 0,
-            'flow_packet_count': stats['packet_count'],
-            'flow_byte_count': stats['byte_count'],
-            'flow_bytes_per_packet_mean': np.mean(lengths),
-            'flow_bytes_per_packet_std': np.std(lengths),
-            'flow_bytes_per_packet_min': np.min(lengths),
-            'flow_bytes_per_packet_max': np.max(lengths),
-            'src_ip': stats['src_ip'],
-            'dst_ip': stats['dst_ip'],
-            'src_port': stats.get('src_port', 0),
-            'dst_port': stats.get('dst_port', 0),
-            'protocol': stats.get('protocol', 'OTHER')
+            'flow_duration': stats.last_time - stats.start_time if stats.start_time else 0,
+            'flow_packet_count': stats.packet_count,
+            'flow_byte_count': stats.byte_count,
+            'flow_bytes_per_packet_mean': stats.size_mean,
+            'flow_bytes_per_packet_std': stats.size_std,
+            'flow_bytes_per_packet_min': stats.size_min,
+            'flow_bytes_per_packet_max': stats.size_max,
+            'flow_fwd_packets': stats.fwd_packets,
+            'flow_bwd_packets': stats.bwd_packets,
+            'flow_fwd_bytes': stats.fwd_bytes,
+            'flow_bwd_bytes': stats.bwd_bytes,
+            'src_ip': stats.src_ip,
+            'dst_ip': stats.dst_ip,
+            'src_port': stats.src_port,
+            'dst_port': stats.dst_port,
+            'protocol': stats.protocol
         }
         
-        if intervals:
-            features['flow_inter_arrival_mean'] = np.mean(intervals)
-            features['flow_inter_arrival_std'] = np.std(intervals)
-            features['flow_inter_arrival_min'] = np.min(intervals)
-            features['flow_inter_arrival_max'] = np.max(intervals)
+        if stats.gap_count:
+            features['flow_inter_arrival_mean'] = stats.gap_mean
+            features['flow_inter_arrival_std'] = stats.gap_std
+            features['flow_inter_arrival_min'] = stats.gap_min
+            features['flow_inter_arrival_max'] = stats.gap_max
         else:
             features['flow_inter_arrival_mean'] = 0
             features['flow_inter_arrival_std'] = 0
@@ -328,40 +260,12 @@ class RealTimeFeatureExtractor:
     
     def get_flow_sequence(self, flow_key, length=20):
         """Get sequence of packets for LSTM/TCN"""
-        sequence = list(self.flow_sequences[flow_key])
-        
-        if len(sequence) < length:
-            # Pad with zeros
-            padding = [[0] * 5] * (length - len(sequence))
-            sequence = padding + sequence
-        else:
-            # Take last 'length' packets
-            sequence = sequence[-length:]
-        
-        return np.array(sequence)
+        # Last 'length' packets, zero-padded in front
+        return self.flow_stats[flow_key].sequence(length)
     
     def _get_flow_key(self, packet):
-        """Generate flow identifier"""
-        if not packet.haslayer(IP):
-            return None
-        
-        src_ip = packet[IP].src
-        dst_ip = packet[IP].dst
-        
-        if packet.haslayer(TCP):
-            src_port = packet[TCP].sport
-            dst_port = packet[TCP].dport
-            proto = 'TCP'
-        elif packet.haslayer(UDP):
-            src_port = packet[UDP].sport
-            dst_port = packet[UDP].dport
-            proto = 'UDP'
-        else:
-            src_port = 0
-            dst_port = 0
-            proto = 'OTHER'
-        
-        return tuple(sorted([(src_ip, src_port), (dst_ip, dst_port)]) + [proto])
+        """Packed packet key: flow identifier (same for both directions) << 1 | direction bit"""
+        return packet_flow_key(decode_packet(packet))
 
 
 class MultiModelAnalyzer:
@@ -387,10 +291,9 @@ class MultiModelAnalyzer:
         # Model 6: Random Forest (Device Fingerprinting)
         self.rf_fingerprinter = None
         
-        # Preprocessing
-        self.scaler = StandardScaler()
+        # Preprocessing (fitted in train_all_models)
+        self.scaler = None
         self.feature_columns = None
-        self.device_encoder = LabelEncoder()
         
         self.models_trained = False
         
@@ -398,6 +301,10 @@ class MultiModelAnalyzer:
         """Build autoencoder for anomaly detection"""
         if not TENSORFLOW_AVAILABLE:
             return None
+        import_tensorflow()
+        from tensorflow.keras.models import Sequential
+        from tensorflow.keras.layers import Dense
+        from tensorflow.keras.optimizers import Adam
         
         encoding_dim = max(input_dim // 2, 8)
         
@@ -417,6 +324,10 @@ class MultiModelAnalyzer:
         """Build LSTM for traffic classification"""
         if not TENSORFLOW_AVAILABLE:
             return None
+        import_tensorflow()
+        from tensorflow.keras.models import Sequential
+        from tensorflow.keras.layers import Dense, LSTM, Dropout
+        from tensorflow.keras.optimizers import Adam
         
         model = Sequential([
             LSTM(64, input_shape=(sequence_length, n_features), return_sequences=True),
@@ -434,6 +345,10 @@ class MultiModelAnalyzer:
         """Build TCN (Temporal Convolutional Network) for performance prediction"""
         if not TENSORFLOW_AVAILABLE:
             return None
+        import_tensorflow()
+        from tensorflow.keras.models import Sequential
+        from tensorflow.keras.layers import Dense, Conv1D, MaxPooling1D, Flatten
+        from tensorflow.keras.optimizers import Adam
         
         model = Sequential([
             Conv1D(64, 3, activation='relu', padding='same', input_shape=(sequence_length, n_features)),
@@ -462,6 +377,12 @@ class MultiModelAnalyzer:
             print("[!] Not enough data for training (need at least 20 samples)")
             return False
         
+        from sklearn.ensemble import IsolationForest, RandomForestClassifier
+        from sklearn.preprocessing import StandardScaler
+        from sklearn.cluster import KMeans, DBSCAN
+        import xgboost as xgb
+        self.scaler = StandardScaler()
+        
         # 1. Train Isolation Forest
         if verbose:
             print("\n[1/6] Training Isolation Forest (Anomaly Detection)...")
@@ -658,6 +579,7 @@ class MultiModelAnalyzer:
         if not flow_features:
             return None, None
         
+        import pandas as pd
         df = pd.DataFrame(flow_features)
         
         # Store IP addresses separately
@@ -705,7 +627,7 @@ class RealTimeMultiModelAnalyzer:
         # Extract features and update flow stats
         flow_key = self.extractor.update_flow_stats(packet)
         
-        if flow_key:
+        if flow_key is not None:
             self.total_flows = len(self.extractor.flow_stats)
         
         # Periodically analyze
@@ -933,6 +855,9 @@ def main():
     # Initialize analyzer with all 6 models
     analyzer = RealTimeMultiModelAnalyzer(update_interval=15)
     
+    # Phase 2 hands packets to one analysis worker so inference never blocks capture
+    pipeline = PacketPipeline(analyzer.process_packet, workers=1, maxsize=10000, policy='drop-newest')
+    
     print("\n[*] Phase 1: Capturing initial traffic for model training...")
     print("[*] Capturing 1000 packets for comprehensive training...")
     
@@ -963,18 +888,21 @@ def main():
         
         # Start real-time capture and analysis with all models
         capture.packet_count = 0
-        capture.start_capture(prn=analyzer.process_packet)
+        pipeline.start()
+        capture.start_capture(prn=pipeline.submit)
         
     except KeyboardInterrupt:
         print("\n[*] Stopping capture...")
     finally:
         capture.stop_capture()
+        pipeline.stop()
         
         if monitor == 'y':
             capture.disable_monitor_mode()
         
         # Final comprehensive summary
         analyzer.display_final_summary()
+        print(f"[+] Capture queue: {pipeline.summary()}")
         print("\n[+] Multi-model analysis complete!")
 
 
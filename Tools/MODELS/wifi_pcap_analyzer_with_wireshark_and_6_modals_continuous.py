@@ -10,7 +10,6 @@ System Requirements (Kali Linux):
 - Root/sudo privileges for packet capture
 """
 
-import subprocess
 import threading
 import queue
 import time
@@ -22,170 +21,66 @@ from datetime import datetime
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
 import numpy as np
-import pandas as pd
-from scapy.all import sniff, IP, TCP, UDP, ICMP
+from packet_decoder import decode_packet, RawFrame
+from flow_stats import FlowRecord, FlowExpiryQueue, packet_flow_key
+from capture_pipeline import PacketPipeline
+from live_capture import LivePacketCapture, configure_capture
+from dot11_frames import FRAME_DOT11, FRAME_IP, WirelessAggregator, save_records
+from model_bundle import ModelBundle, BackgroundTrainer
+from inference_scheduler import MicroBatchScheduler
+from process_backend import ProcessModelBackend, score_batch
+from model_cascade import ModelCascade
+from streaming_models import StreamingLSTM, StreamingTCN, stream_flows
+from compiled_models import INFERENCE_MODES, compile_bundle
+from onnx_models import write_onnx
+from pcap_replay import ReplayClock
+from lazy_imports import module_available, tensorflow_available, import_tensorflow, lite_mode
 
-try:
-    from sklearn.ensemble import IsolationForest, RandomForestClassifier, RandomForestRegressor
-    from sklearn.preprocessing import StandardScaler, LabelEncoder
-    from sklearn.cluster import KMeans, DBSCAN
-    SKLEARN_AVAILABLE = True
-except ImportError:
-    SKLEARN_AVAILABLE = False
+# scikit-learn, XGBoost, pandas, scapy and TensorFlow are imported where a
+# model or the capture first needs them; at start-up only check they exist
+SKLEARN_AVAILABLE = module_available('sklearn')
+if not SKLEARN_AVAILABLE:
     print("[!] scikit-learn not available. Please install: sudo pip3 install scikit-learn")
     sys.exit(1)
 
-try:
-    import xgboost as xgb
-    XGBOOST_AVAILABLE = True
-except ImportError:
-    XGBOOST_AVAILABLE = False
+XGBOOST_AVAILABLE = module_available('xgboost')
+if not XGBOOST_AVAILABLE:
     print("[!] XGBoost not available. Install: sudo pip3 install xgboost")
 
-try:
-    import lightgbm as lgb
-    LIGHTGBM_AVAILABLE = True
-except ImportError:
-    LIGHTGBM_AVAILABLE = False
+LIGHTGBM_AVAILABLE = module_available('lightgbm')
+if not LIGHTGBM_AVAILABLE:
     print("[!] LightGBM not available. Install: sudo pip3 install lightgbm")
 
 import warnings
 warnings.filterwarnings('ignore')
 
-# TensorFlow for deep learning models
-try:
-    os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'
-    import tensorflow as tf
-    from tensorflow.keras.models import Model, Sequential
-    from tensorflow.keras.layers import Input, Dense, LSTM, Dropout, Conv1D, MaxPooling1D, Flatten, Reshape
-    from tensorflow.keras.optimizers import Adam
-    tf.get_logger().setLevel('ERROR')
-    TENSORFLOW_AVAILABLE = True
-except ImportError:
-    TENSORFLOW_AVAILABLE = False
+# TensorFlow for deep learning models (never imported in lite mode: --lite)
+TENSORFLOW_AVAILABLE = tensorflow_available()
+if lite_mode():
+    print("[*] Lite mode: deep learning models disabled")
+elif not TENSORFLOW_AVAILABLE:
     print("[!] TensorFlow not available. Deep learning models will be disabled.")
     print("    Install: sudo pip3 install tensorflow")
 
 
-class LivePacketCapture:
-    """Live packet capture using Scapy"""
-    
-    def __init__(self, interface='wlan0'):
-        self.interface = interface
-        self.capture_active = False
-        self.packet_count = 0
-        
-    def list_interfaces(self):
-        """List available network interfaces"""
-        try:
-            result = subprocess.run(['ip', 'link', 'show'], 
-                                  capture_output=True, text=True)
-            print("\n=== Available Network Interfaces ===")
-            print(result.stdout)
-            
-            result = subprocess.run(['iwconfig'], 
-                                  capture_output=True, text=True, stderr=subprocess.DEVNULL)
-            if result.stdout:
-                print("\n=== Wireless Interfaces ===")
-                print(result.stdout)
-        except Exception as e:
-            print(f"Error listing interfaces: {e}")
-    
-    def enable_monitor_mode(self):
-        """Enable monitor mode on wireless interface"""
-        print(f"\n[*] Attempting to enable monitor mode on {self.interface}...")
-        try:
-            subprocess.run(['sudo', 'airmon-ng', 'check', 'kill'], 
-                         capture_output=True)
-            
-            result = subprocess.run(['sudo', 'airmon-ng', 'start', self.interface], 
-                                  capture_output=True, text=True)
-            print(result.stdout)
-            
-            if 'mon' in result.stdout:
-                self.interface = self.interface + 'mon'
-                print(f"[+] Monitor mode enabled on {self.interface}")
-                return True
-            else:
-                print("[!] Monitor mode may already be enabled")
-                return True
-                
-        except Exception as e:
-            print(f"[!] Error enabling monitor mode: {e}")
-            print("[*] Continuing with managed mode...")
-            return False
-    
-    def disable_monitor_mode(self):
-        """Disable monitor mode"""
-        try:
-            original_interface = self.interface.replace('mon', '')
-            subprocess.run(['sudo', 'airmon-ng', 'stop', self.interface], 
-                         capture_output=True)
-            print(f"[+] Monitor mode disabled on {original_interface}")
-        except Exception as e:
-            print(f"[!] Error disabling monitor mode: {e}")
-    
-    def start_capture(self, prn=None):
-        """Start live packet capture"""
-        self.capture_active = True
-        self.packet_count = 0
-        
-        print(f"\n[*] Starting continuous packet capture on interface: {self.interface}")
-        print(f"[*] Press Ctrl+C to stop capture")
-        
-        try:
-            sniff(
-                iface=self.interface,
-                prn=prn,
-                store=False,
-                stop_filter=lambda x: not self.capture_active
-            )
-            
-        except PermissionError:
-            print("\n[!] ERROR: Permission denied. Please run with sudo:")
-            print(f"    sudo python3 {sys.argv[0]}")
-            sys.exit(1)
-        except Exception as e:
-            print(f"\n[!] Capture error: {e}")
-        finally:
-            self.capture_active = False
-    
-    def stop_capture(self):
-        """Stop packet capture"""
-        self.capture_active = False
-        print(f"\n[+] Capture stopped. Total packets: {self.packet_count}")
-
-
 class RealTimeFeatureExtractor:
     """Extract features from packets in real-time"""
     
-    def __init__(self, window_size=50, sequence_length=20, flow_timeout=300):
-        self.window_size = window_size
+    def __init__(self, sequence_length=20, flow_timeout=300, clock=time.time):
         self.sequence_length = sequence_length
         self.flow_timeout = flow_timeout  # 5 minutes = 300 seconds
-        self.flow_windows = defaultdict(lambda: deque(maxlen=window_size))
-        self.flow_sequences = defaultdict(lambda: deque(maxlen=sequence_length))
-        self.flow_stats = defaultdict(lambda: {
-            'packet_count': 0,
-            'byte_count': 0,
-            'start_time': None,
-            'last_time': None,
-            'src_ip': None,
-            'dst_ip': None,
-            'src_port': None,
-            'dst_port': None,
-            'protocol': None,
-            'packet_sizes': [],
-            'inter_arrival_times': [],
-            'completed': False
-        })
+        # Current time: time.time for live capture, a ReplayClock (packet timestamps) for a replay
+        self.clock = clock
+        self.flow_stats = defaultdict(lambda: FlowRecord(sequence_length))
+        self.expiry = FlowExpiryQueue()
         self.lock = threading.Lock()
     
     def extract_packet_features(self, packet):
         """Extract features from single packet"""
+        frame = decode_packet(packet)
         features = {
-            'timestamp': time.time(),
-            'packet_length': len(packet),
+            'timestamp': self.clock(),
+            'packet_length': frame.length,
             'has_ip': 0,
             'has_tcp': 0,
             'has_udp': 0,
@@ -202,114 +97,80 @@ class RealTimeFeatureExtractor:
             'udp_len': 0
         }
         
-        if packet.haslayer(IP):
+        if frame.has_ip:
             features['has_ip'] = 1
-            ip = packet[IP]
-            features['ip_len'] = ip.len
-            features['ip_ttl'] = ip.ttl
-            features['ip_proto'] = ip.proto
-            features['src_ip'] = ip.src
-            features['dst_ip'] = ip.dst
+            features['ip_len'] = frame.ip_len
+            features['ip_ttl'] = frame.ip_ttl
+            features['ip_proto'] = frame.ip_proto
+            features['src_ip'] = frame.src_ip
+            features['dst_ip'] = frame.dst_ip
             
-            if packet.haslayer(TCP):
+            if frame.has_tcp:
                 features['has_tcp'] = 1
-                tcp = packet[TCP]
-                features['src_port'] = tcp.sport
-                features['dst_port'] = tcp.dport
-                features['tcp_window'] = tcp.window
-                features['flag_syn'] = 1 if tcp.flags.S else 0
-                features['flag_ack'] = 1 if tcp.flags.A else 0
-                features['flag_fin'] = 1 if tcp.flags.F else 0
-                features['flag_rst'] = 1 if tcp.flags.R else 0
-                features['flag_psh'] = 1 if tcp.flags.P else 0
+                features['src_port'] = frame.src_port
+                features['dst_port'] = frame.dst_port
+                features['tcp_window'] = frame.tcp_window
+                features['flag_syn'] = frame.flag_syn
+                features['flag_ack'] = frame.flag_ack
+                features['flag_fin'] = frame.flag_fin
+                features['flag_rst'] = frame.flag_rst
+                features['flag_psh'] = frame.flag_psh
                 
-            elif packet.haslayer(UDP):
+            elif frame.has_udp:
                 features['has_udp'] = 1
-                udp = packet[UDP]
-                features['src_port'] = udp.sport
-                features['dst_port'] = udp.dport
-                features['udp_len'] = udp.len
+                features['src_port'] = frame.src_port
+                features['dst_port'] = frame.dst_port
+                features['udp_len'] = frame.udp_len
             
-            elif packet.haslayer(ICMP):
+            elif frame.has_icmp:
                 features['has_icmp'] = 1
         
         return features
     
     def update_flow_stats(self, packet):
         """Update flow statistics with new packet"""
-        if not packet.haslayer(IP):
+        frame = decode_packet(packet)
+        if not frame.has_ip:
             return None
         
-        flow_key = self._get_flow_key(packet)
-        if not flow_key:
+        key = self._get_flow_key(frame)
+        if key is None:
             return None
+        flow_key, direction = key >> 1, key & 1
         
         with self.lock:
             stats = self.flow_stats[flow_key]
-            current_time = time.time()
-            
-            stats['packet_count'] += 1
-            stats['byte_count'] += len(packet)
-            stats['packet_sizes'].append(len(packet))
-            
-            if stats['start_time'] is None:
-                stats['start_time'] = current_time
-            else:
-                inter_arrival = current_time - stats['last_time']
-                stats['inter_arrival_times'].append(inter_arrival)
-            
-            stats['last_time'] = current_time
+            current_time = self.clock()
             
-            ip = packet[IP]
-            stats['src_ip'] = ip.src
-            stats['dst_ip'] = ip.dst
+            # Counters, size/gap accumulators and the LSTM/TCN sequence step
+            stats.update(frame, current_time, direction)
             
-            if packet.haslayer(TCP):
-                stats['protocol'] = 'TCP'
-                stats['src_port'] = packet[TCP].sport
-                stats['dst_port'] = packet[TCP].dport
-                
-                if packet[TCP].flags.F or packet[TCP].flags.R:
-                    stats['completed'] = True
-                    
-            elif packet.haslayer(UDP):
-                stats['protocol'] = 'UDP'
-                stats['src_port'] = packet[UDP].sport
-                stats['dst_port'] = packet[UDP].dport
-            
-            self.flow_windows[flow_key].append({
-                'length': len(packet),
-                'time': current_time
-            })
-            
-            packet_features = self.extract_packet_features(packet)
-            self.flow_sequences[flow_key].append([
-                packet_features.get('packet_length', 0),
-                packet_features.get('ip_ttl', 0),
-                packet_features.get('tcp_window', 0),
-                packet_features.get('has_tcp', 0),
-                packet_features.get('has_udp', 0)
-            ])
+            # FIN/RST flows are handed off immediately, others on timeout
+            if stats.completed and stats.packet_count >= 5:
+                self.expiry.complete(flow_key)
+            self.expiry.schedule(flow_key, current_time + self.flow_timeout)
         
         return flow_key
     
     def check_completed_flows(self):
         """Check for completed or timed-out flows (5 minute timeout)"""
-        current_time = time.time()
-        completed = []
+        current_time = self.clock()
         
         with self.lock:
-            for flow_key, stats in list(self.flow_stats.items()):
-                time_since_last = current_time - stats['last_time'] if stats['last_time'] else 0
-                
-                # Flow complete if: TCP FIN/RST, timeout (5 min), or has 5+ packets
-                if stats['packet_count'] >= 5 and (
-                    stats['completed'] or 
-                    time_since_last > self.flow_timeout
-                ):
-                    completed.append(flow_key)
+            # Flow complete if it has 5+ packets and: TCP FIN/RST or timeout (5 min)
+            completed = dict.fromkeys(self.expiry.pop_completed())
+            for flow_key in self.expiry.pop_expired(current_time, self._flow_deadline):
+                if self.flow_stats[flow_key].packet_count >= 5:
+                    completed[flow_key] = None
         
-        return completed
+        return list(completed)
+    
+    def _flow_deadline(self, flow_key):
+        """Time after which an idle flow counts as timed out"""
+        stats = self.flow_stats.get(flow_key)
+        if not stats:
+            return None
+        return stats.last_time + self.flow_timeout
     
     def get_flow_features(self, flow_key):
         """Get comprehensive features for a flow"""
@@ -318,35 +179,33 @@ class RealTimeFeatureExtractor:
             if not stats:
                 return None
             
-            window = list(self.flow_windows[flow_key])
-            
-            if len(window) < 2:
+            if stats.packet_count < 2:
                 return None
             
-            lengths = [p['length'] for p in window]
-            times = [p['time'] for p in window]
-            intervals = [times[i] - times[i-1] for i in range(1, len(times))]
-            
             features = {
-                'flow_duration': stats['last_time'] - stats['start_time'] if stats['start_time'] else 0,
-                'flow_packet_count': stats['packet_count'],
-                'flow_byte_count': stats['byte_count'],
-                'flow_bytes_per_packet_mean': np.mean(lengths),
-                'flow_bytes_per_packet_std': np.std(lengths),
-                'flow_bytes_per_packet_min': np.min(lengths),
-                'flow_bytes_per_packet_max': np.max(lengths),
-                'src_ip': stats['src_ip'],
-                'dst_ip': stats['dst_ip'],
-                'src_port': stats.get('src_port', 0),
-                'dst_port': stats.get('dst_port', 0),
-                'protocol': stats.get('protocol', 'OTHER')
+                'flow_duration': stats.last_time - stats.start_time if stats.start_time else 0,
+                'flow_packet_count': stats.packet_count,
+                'flow_byte_count': stats.byte_count,
+                'flow_bytes_per_packet_mean': stats.size_mean,
+                'flow_bytes_per_packet_std': stats.size_std,
+                'flow_bytes_per_packet_min': stats.size_min,
+                'flow_bytes_per_packet_max': stats.size_max,
+                'flow_fwd_packets': stats.fwd_packets,
+                'flow_bwd_packets': stats.bwd_packets,
+                'flow_fwd_bytes': stats.fwd_bytes,
+                'flow_bwd_bytes': stats.bwd_bytes,
+                'src_ip': stats.src_ip,
+                'dst_ip': stats.dst_ip,
+                'src_port': stats.src_port,
+                'dst_port': stats.dst_port,
+                'protocol': stats.protocol
             }
             
-            if intervals:
-                features['flow_inter_arrival_mean'] = np.mean(intervals)
-                features['flow_inter_arrival_std'] = np.std(intervals)
-                features['flow_inter_arrival_min'] = np.min(intervals)
-                features['flow_inter_arrival_max'] = np.max(intervals)
+            if stats.gap_count:
+                features['flow_inter_arrival_mean'] = stats.gap_mean
+                features['flow_inter_arrival_std'] = stats.gap_std
+                features['flow_inter_arrival_min'] = stats.gap_min
+                features['flow_inter_arrival_max'] = stats.gap_max
             else:
                 features['flow_inter_arrival_mean'] = 0
                 features['flow_inter_arrival_std'] = 0
@@ -358,25 +217,27 @@ class RealTimeFeatureExtractor:
     def get_flow_sequence(self, flow_key, length=20):
         """Get sequence of packets for LSTM/TCN"""
         with self.lock:
-            sequence = list(self.flow_sequences.get(flow_key, []))
-            
-            if len(sequence) < length:
-                padding = [[0] * 5] * (length - len(sequence))
-                sequence = padding + sequence
-            else:
-                sequence = sequence[-length:]
+            stats = self.flow_stats.get(flow_key)
+            if stats is None:
+                return np.zeros((length, 5), dtype=np.int64)
             
-            return np.array(sequence)
+            return stats.sequence(length)
+    
+    def get_new_packets(self, flow_key, seen):
+        """Packet count and the packet vectors after the first ``seen`` (at most sequence_length)"""
+        with self.lock:
+            stats = self.flow_stats.get(flow_key)
+            if stats is None:
+                return seen, np.zeros((0, 5), dtype=np.int64)
+            new = max(0, min(stats.packet_count - seen, self.sequence_length))
+            return stats.packet_count, stats.sequence(new)
     
     def remove_flow(self, flow_key):
         """Remove a completed flow from tracking"""
         with self.lock:
             if flow_key in self.flow_stats:
                 del self.flow_stats[flow_key]
-            if flow_key in self.flow_windows:
-                del self.flow_windows[flow_key]
-            if flow_key in self.flow_sequences:
-                del self.flow_sequences[flow_key]
+            self.expiry.discard(flow_key)
     
     def get_active_flow_count(self):
         """Thread-safe flow count"""
@@ -384,48 +245,66 @@ class RealTimeFeatureExtractor:
             return len(self.flow_stats)
     
     def _get_flow_key(self, packet):
-        """Generate flow identifier"""
-        if not packet.haslayer(IP):
-            return None
-        
-        src_ip = packet[IP].src
-        dst_ip = packet[IP].dst
-        
-        if packet.haslayer(TCP):
-            src_port = packet[TCP].sport
-            dst_port = packet[TCP].dport
-            proto = 'TCP'
-        elif packet.haslayer(UDP):
-            src_port = packet[UDP].sport
-            dst_port = packet[UDP].dport
-            proto = 'UDP'
-        else:
-            src_port = 0
-            dst_port = 0
-            proto = 'OTHER'
-        
-        return tuple(sorted([(src_ip, src_port), (dst_ip, dst_port)]) + [proto])
+        """Packed packet key: flow identifier (same for both directions) << 1 | direction bit"""
+        return packet_flow_key(decode_packet(packet))
 
 
 class ParallelModelPredictor:
-    """Run all 6 models in parallel using ThreadPoolExecutor"""
+    """Run all 6 models in parallel using ThreadPoolExecutor
     
-    def __init__(self, models):
-        self.models = models
-        self.executor = ThreadPoolExecutor(max_workers=6)
+    backend='process' scores IsolationForest, XGBoost and Random Forest in
+    persistent worker processes (process_backend.py) instead of threads.
+    ``runners`` replace Keras predict for the deep models (compiled_models.py);
+    ONNX runners also stand in for the scaler and the sklearn/XGBoost models.
+    """
+    
+    # Model key -> name used in futures/results below
+    PROCESS_MODEL_NAMES = {
+        'isolation_forest': 'isolation_forest',
+        'xgboost_classifier': 'xgboost',
+        'rf_fingerprinter': 'random_forest'
+    }
+    
+    def __init__(self, models, executor=None, backend='thread', runners=None):
+        self.runners = runners or {}
+        self.models = dict(models, **{key: runner for key, runner in self.runners.items()
+                                      if key in self.PROCESS_MODEL_NAMES})
+        self.scaler = self.runners.get('scaler')  # None: the bundle's own scaler
+        self.executor = executor or ThreadPoolExecutor(max_workers=6)
+        self.backend = backend
+        self.process_backend = ProcessModelBackend(self.models) if backend == 'process' else None
+    
+    def close(self):
+        """Stop the worker processes of the process backend"""
+        if self.process_backend is not None:
+            self.process_backend.close()
+    
+    def predict_process_models(self, X, X_scaled):
+        """Models 1, 3 and 6 in their worker processes"""
+        return {self.PROCESS_MODEL_NAMES[key]: result
+                for key, result in self.process_backend.predict(X, X_scaled).items()}
+    
+    def has_deep_model(self, key):
+        """Whether a Keras model can score (ONNX runners need no TensorFlow)"""
+        return key in self.runners or (self.models[key] is not None and TENSORFLOW_AVAILABLE)
+    
+    def keras_predict(self, key, X):
+        """Output of a Keras model, through its compiled runner when there is one"""
+        runner = self.runners.get(key)
+        if runner is not None:
+            return runner.predict(X)
+        return self.models[key].predict(X, verbose=0)
     
     def predict_isolation_forest(self, X_scaled):
         """Model 1: Isolation Forest"""
         if self.models['isolation_forest']:
-            scores = self.models['isolation_forest'].score_samples(X_scaled)
-            predictions = self.models['isolation_forest'].predict(X_scaled)
-            return {'scores': scores, 'predictions': predictions}
+            return score_batch(self.models['isolation_forest'], 'anomaly', X_scaled)
         return None
     
     def predict_autoencoder(self, X_scaled):
         """Model 2: Autoencoder"""
-        if self.models['autoencoder'] and TENSORFLOW_AVAILABLE:
-            reconstructions = self.models['autoencoder'].predict(X_scaled, verbose=0)
+        if self.has_deep_model('autoencoder'):
+            reconstructions = self.keras_predict('autoencoder', X_scaled)
             mse = np.mean(np.power(X_scaled - reconstructions, 2), axis=1)
             ae_anomalies = (mse > self.models['autoencoder_threshold']).astype(int)
             ae_anomalies = np.where(ae_anomalies == 1, -1, 1)
@@ -435,80 +314,91 @@ class ParallelModelPredictor:
     def predict_xgboost(self, X):
         """Model 3: XGBoost"""
         if self.models['xgboost_classifier']:
-            pred = self.models['xgboost_classifier'].predict(X)
-            proba = self.models['xgboost_classifier'].predict_proba(X)
-            return {'predictions': pred, 'confidence': np.max(proba, axis=1)}
+            return score_batch(self.models['xgboost_classifier'], 'classifier', X)
         return None
     
-    def predict_lstm(self, X_seq):
-        """Model 4: LSTM"""
-        if self.models['lstm_classifier'] and len(X_seq) > 0 and TENSORFLOW_AVAILABLE:
-            pred = np.argmax(self.models['lstm_classifier'].predict(X_seq, verbose=0), axis=1)
-            proba = self.models['lstm_classifier'].predict(X_seq, verbose=0)
-            return {'predictions': pred, 'confidence': np.max(proba, axis=1)}
+    def predict_lstm(self, X_seq, proba=None):
+        """Model 4: LSTM (``proba`` from the streaming engine replaces the Keras call)"""
+        if proba is None and self.has_deep_model('lstm_classifier') and len(X_seq) > 0:
+            proba = self.keras_predict('lstm_classifier', X_seq)
+        if proba is not None and len(proba) > 0:
+            return {'predictions': np.argmax(proba, axis=1), 'confidence': np.max(proba, axis=1)}
         return None
     
-    def predict_tcn(self, X_seq):
-        """Model 5: TCN"""
-        if self.models['tcn_predictor'] and len(X_seq) > 0 and TENSORFLOW_AVAILABLE:
-            pred = self.models['tcn_predictor'].predict(X_seq, verbose=0).flatten()
-            return {'predictions': pred}
+    def predict_tcn(self, X_seq, pred=None):
+        """Model 5: TCN (``pred`` from the streaming engine replaces the Keras call)"""
+        if pred is None and self.has_deep_model('tcn_predictor') and len(X_seq) > 0:
+            pred = self.keras_predict('tcn_predictor', X_seq)
+        if pred is not None and len(pred) > 0:
+            return {'predictions': np.asarray(pred).flatten()}
         return None
     
     def predict_random_forest(self, X):
         """Model 6: Random Forest"""
         if self.models['rf_fingerprinter']:
             try:
-                pred = self.models['rf_fingerprinter'].predict(X)
-                proba = self.models['rf_fingerprinter'].predict_proba(X)
-                return {'predictions': pred, 'confidence': np.max(proba, axis=1)}
+                return score_batch(self.models['rf_fingerprinter'], 'classifier', X)
             except:
                 return None
         return None
     
-    def predict_all_parallel(self, X, X_scaled, X_seq):
-        """Run all models in parallel"""
+    def predict_all_parallel(self, X, X_scaled, X_seq, stage=None, lstm_proba=None, tcn_pred=None):
+        """Run all models in parallel (stage='cheap' or 'deep' for one cascade stage)"""
         futures = {}
         results = {'models_used': []}
         
         # Submit all prediction tasks
-        futures['isolation_forest'] = self.executor.submit(self.predict_isolation_forest, X_scaled)
-        futures['autoencoder'] = self.executor.submit(self.predict_autoencoder, X_scaled)
-        futures['xgboost'] = self.executor.submit(self.predict_xgboost, X)
-        futures['lstm'] = self.executor.submit(self.predict_lstm, X_seq)
-        futures['tcn'] = self.executor.submit(self.predict_tcn, X_seq)
-        futures['random_forest'] = self.executor.submit(self.predict_random_forest, X)
+        if stage != 'deep':
+            if self.process_backend is not None:
+                futures['process_models'] = self.executor.submit(self.predict_process_models, X, X_scaled)
+            else:
+                futures['isolation_forest'] = self.executor.submit(self.predict_isolation_forest, X_scaled)
+                futures['xgboost'] = self.executor.submit(self.predict_xgboost, X)
+                futures['random_forest'] = self.executor.submit(self.predict_random_forest, X)
+        if stage != 'cheap':
+            futures['autoencoder'] = self.executor.submit(self.predict_autoencoder, X_scaled)
+            futures['lstm'] = self.executor.submit(self.predict_lstm, X_seq, lstm_proba)
+            futures['tcn'] = self.executor.submit(self.predict_tcn, X_seq, tcn_pred)
         
         # Collect results as they complete
+        model_results = {}
         for model_name, future in futures.items():
             try:
                 result = future.result(timeout=5)  # 5 second timeout per model
-                if result:
-                    if model_name == 'isolation_forest':
-                        results['isolation_forest_scores'] = result['scores']
-                        results['isolation_forest_anomalies'] = result['predictions']
-                        results['models_used'].append('Isolation Forest')
-                    elif model_name == 'autoencoder':
-                        results['autoencoder_scores'] = result['scores']
-                        results['autoencoder_anomalies'] = result['predictions']
-                        results['models_used'].append('Autoencoder')
-                    elif model_name == 'xgboost':
-                        results['xgboost_traffic_class'] = result['predictions']
-                        results['xgboost_confidence'] = result['confidence']
-                        results['models_used'].append('XGBoost')
-                    elif model_name == 'lstm':
-                        results['lstm_traffic_class'] = result['predictions']
-                        results['lstm_confidence'] = result['confidence']
-                        results['models_used'].append('LSTM')
-                    elif model_name == 'tcn':
-                        results['tcn_throughput'] = result['predictions']
-                        results['models_used'].append('TCN')
-                    elif model_name == 'random_forest':
-                        results['rf_device_id'] = result['predictions']
-                        results['rf_device_confidence'] = result['confidence']
-                        results['models_used'].append('Random Forest')
             except Exception as e:
-                pass  # Model failed, skip
+                print(f"[!] {model_name} prediction failed: {e!r}")
+                continue  # Model failed, skip
+            if model_name == 'process_models':
+                model_results.update(result)
+            else:
+                model_results[model_name] = result
+        
+        for model_name in ('isolation_forest', 'autoencoder', 'xgboost', 'lstm', 'tcn', 'random_forest'):
+            result = model_results.get(model_name)
+            if result:
+                if model_name == 'isolation_forest':
+                    results['isolation_forest_scores'] = result['scores']
+                    results['isolation_forest_anomalies'] = result['predictions']
+                    results['models_used'].append('Isolation Forest')
+                elif model_name == 'autoencoder':
+                    results['autoencoder_scores'] = result['scores']
+                    results['autoencoder_anomalies'] = result['predictions']
+                    results['models_used'].append('Autoencoder')
+                elif model_name == 'xgboost':
+                    results['xgboost_traffic_class'] = result['predictions']
+                    results['xgboost_confidence'] = result['confidence']
+                    results['models_used'].append('XGBoost')
+                elif model_name == 'lstm':
+                    results['lstm_traffic_class'] = result['predictions']
+                    results['lstm_confidence'] = result['confidence']
+                    results['models_used'].append('LSTM')
+                elif model_name == 'tcn':
+                    results['tcn_throughput'] = result['predictions']
+                    results['models_used'].append('TCN')
+                elif model_name == 'random_forest':
+                    results['rf_device_id'] = result['predictions']
+                    results['rf_device_confidence'] = result['confidence']
+                    results['models_used'].append('Random Forest')
         
         return results
 
@@ -516,28 +406,36 @@ class ParallelModelPredictor:
 class MultiModelAnalyzer:
     """Multi-model AI system with 6 concurrent models"""
     
-    def __init__(self):
-        self.models = {
-            'isolation_forest': None,
-            'autoencoder': None,
-            'autoencoder_threshold': None,
-            'xgboost_classifier': None,
-            'lstm_classifier': None,
-            'tcn_predictor': None,
-            'rf_fingerprinter': None
-        }
-        
-        self.scaler = StandardScaler()
-        self.feature_columns = None
+    def __init__(self, backend='thread', cascade=None, inference='keras'):
+        # Scaler, feature columns and models are published together as one
+        # bundle; training builds a new one and swaps the reference
+        self.bundle = None
+        self.backend = backend  # 'thread' or 'process' for the sklearn/XGBoost models
+        self.cascade = cascade  # ModelCascade: deep models only on suspicious/sampled flows
+        self.inference = inference  # 'keras' predict, 'function', 'tflite', 'tflite-int8' or 'onnx' (all models)
         self.training_data = []
-        self.models_trained = False
+        self.training_sequences = []
         self.min_samples_for_training = 20
-        self.parallel_predictor = None
+        self.executor = ThreadPoolExecutor(max_workers=6)
+        self.trainer = BackgroundTrainer(self.build_bundle, self.install_bundle)
+    
+    @property
+    def models_trained(self):
+        return self.bundle is not None
+    
+    @property
+    def parallel_predictor(self):
+        bundle = self.bundle
+        return bundle.predictor if bundle is not None else None
         
     def build_autoencoder(self, input_dim):
         """Build autoencoder"""
         if not TENSORFLOW_AVAILABLE:
             return None
+        import_tensorflow()
+        from tensorflow.keras.models import Sequential
+        from tensorflow.keras.layers import Dense
+        from tensorflow.keras.optimizers import Adam
         
         encoding_dim = max(input_dim // 2, 8)
         model = Sequential([
@@ -555,6 +453,10 @@ class MultiModelAnalyzer:
         """Build LSTM"""
         if not TENSORFLOW_AVAILABLE:
             return None
+        import_tensorflow()
+        from tensorflow.keras.models import Sequential
+        from tensorflow.keras.layers import Dense, LSTM, Dropout
+        from tensorflow.keras.optimizers import Adam
         
         model = Sequential([
             LSTM(64, input_shape=(sequence_length, n_features), return_sequences=True),
@@ -571,6 +473,10 @@ class MultiModelAnalyzer:
         """Build TCN"""
         if not TENSORFLOW_AVAILABLE:
             return None
+        import_tensorflow()
+        from tensorflow.keras.models import Sequential
+        from tensorflow.keras.layers import Dense, Conv1D, MaxPooling1D, Flatten
+        from tensorflow.keras.optimizers import Adam
         
         model = Sequential([
             Conv1D(64, 3, activation='relu', padding='same', input_shape=(sequence_length, n_features)),
@@ -585,49 +491,101 @@ class MultiModelAnalyzer:
         return model
     
     def train_all_models(self, flow_features, sequences, verbose=True):
-        """Train all 6 models"""
+        """Train all 6 models and switch to them (blocks the caller)"""
+        start = time.perf_counter()
+        bundle = self.build_bundle(flow_features, sequences, verbose)
+        if bundle is None:
+            return False
+        bundle.training_seconds = time.perf_counter() - start
+        self.install_bundle(bundle)
+        return True
+    
+    def train_in_background(self, flow_features, sequences):
+        """Train a new bundle on the trainer thread; False if one is already training"""
+        return self.trainer.submit(flow_features, sequences)
+    
+    def install_bundle(self, bundle):
+        """Atomically replace the bundle used for predictions"""
+        previous = self.bundle
+        bundle.version = previous.version + 1 if previous is not None else 1
+        self.bundle = bundle
+        if previous is not None:
+            # Closed once the predictions still running on it have finished
+            previous.retire()
+        print(f"[+] Model bundle v{bundle.version} live ({bundle.active_models}/6 models, "
+              f"{bundle.training_flows} flows, trained in {bundle.training_seconds:.1f}s)")
+    
+    def close(self):
+        """Release the live bundle's worker processes"""
+        bundle = self.bundle
+        if bundle is not None:
+            bundle.retire()
+    
+    def _hold_bundle(self):
+        """Live bundle, held so that a concurrent swap cannot close its predictor mid-batch"""
+        while True:
+            bundle = self.bundle
+            if bundle is None or bundle.acquire():
+                return bundle
+    
+    def build_bundle(self, flow_features, sequences, verbose=True):
+        """Train all 6 models into a new ModelBundle without touching the live one"""
         if verbose:
             print("\n" + "="*70)
             print("TRAINING ALL 6 AI MODELS")
             print("="*70)
         
-        X, ip_data = self._prepare_features(flow_features)
+        X, ip_data, feature_columns = self._prepare_features(flow_features)
         
         if X is None or len(X) < self.min_samples_for_training:
             if verbose:
                 print(f"[!] Not enough data (need {self.min_samples_for_training}, got {len(X) if X is not None else 0})")
-            return False
+            return None
         
-        self.training_data.extend(flow_features)
-        X_scaled = self.scaler.fit_transform(X)
+        from sklearn.ensemble import IsolationForest, RandomForestClassifier
+        from sklearn.preprocessing import StandardScaler
+        from sklearn.cluster import KMeans, DBSCAN
+        
+        models = {
+            'isolation_forest': None,
+            'autoencoder': None,
+            'autoencoder_threshold': None,
+            'xgboost_classifier': None,
+            'lstm_classifier': None,
+            'tcn_predictor': None,
+            'rf_fingerprinter': None
+        }
+        scaler = StandardScaler()
+        X_scaled = scaler.fit_transform(X)
         
         # Train all models
         if verbose:
             print(f"\n[1/6] Training Isolation Forest on {len(X)} flows...")
-        self.models['isolation_forest'] = IsolationForest(contamination=0.1, random_state=42, n_estimators=100)
-        self.models['isolation_forest'].fit(X_scaled)
+        models['isolation_forest'] = IsolationForest(contamination=0.1, random_state=42, n_estimators=100)
+        models['isolation_forest'].fit(X_scaled)
         if verbose:
             print("      ✓ Isolation Forest trained")
         
         if TENSORFLOW_AVAILABLE:
             if verbose:
                 print(f"\n[2/6] Training Autoencoder...")
-            self.models['autoencoder'] = self.build_autoencoder(X_scaled.shape[1])
-            if self.models['autoencoder']:
-                self.models['autoencoder'].fit(X_scaled, X_scaled, epochs=20, batch_size=32, verbose=0, validation_split=0.2)
-                reconstructions = self.models['autoencoder'].predict(X_scaled, verbose=0)
+            models['autoencoder'] = self.build_autoencoder(X_scaled.shape[1])
+            if models['autoencoder']:
+                models['autoencoder'].fit(X_scaled, X_scaled, epochs=20, batch_size=32, verbose=0, validation_split=0.2)
+                reconstructions = models['autoencoder'].predict(X_scaled, verbose=0)
                 mse = np.mean(np.power(X_scaled - reconstructions, 2), axis=1)
-                self.models['autoencoder_threshold'] = np.percentile(mse, 90)
+                models['autoencoder_threshold'] = np.percentile(mse, 90)
                 if verbose:
                     print("      ✓ Autoencoder trained")
         
         if XGBOOST_AVAILABLE:
+            import xgboost as xgb
             if verbose:
                 print(f"\n[3/6] Training XGBoost...")
             kmeans = KMeans(n_clusters=min(5, len(X) // 4), random_state=42)
             traffic_labels = kmeans.fit_predict(X_scaled)
-            self.models['xgboost_classifier'] = xgb.XGBClassifier(n_estimators=100, max_depth=6, learning_rate=0.1, random_state=42, verbosity=0)
-            self.models['xgboost_classifier'].fit(X, traffic_labels)
+            models['xgboost_classifier'] = xgb.XGBClassifier(n_estimators=100, max_depth=6, learning_rate=0.1, random_state=42, verbosity=0)
+            models['xgboost_classifier'].fit(X, traffic_labels)
             if verbose:
                 print(f"      ✓ XGBoost trained ({len(np.unique(traffic_labels))} classes)")
         
@@ -638,9 +596,9 @@ class MultiModelAnalyzer:
             if len(X_seq) >= self.min_samples_for_training:
                 y_seq = traffic_labels[:len(X_seq)]
                 n_classes = len(np.unique(y_seq))
-                self.models['lstm_classifier'] = self.build_lstm_classifier(X_seq.shape[1], X_seq.shape[2], n_classes)
-                if self.models['lstm_classifier']:
-                    self.models['lstm_classifier'].fit(X_seq, y_seq, epochs=15, batch_size=16, verbose=0, validation_split=0.2)
+                models['lstm_classifier'] = self.build_lstm_classifier(X_seq.shape[1], X_seq.shape[2], n_classes)
+                if models['lstm_classifier']:
+                    models['lstm_classifier'].fit(X_seq, y_seq, epochs=15, batch_size=16, verbose=0, validation_split=0.2)
                     if verbose:
                         print("      ✓ LSTM trained")
         
@@ -650,9 +608,9 @@ class MultiModelAnalyzer:
             X_seq = np.array([seq for seq in sequences if len(seq) > 0])
             if len(X_seq) >= self.min_samples_for_training:
                 throughput = X[:len(X_seq), 2] / (X[:len(X_seq), 0] + 1)
-                self.models['tcn_predictor'] = self.build_tcn_predictor(X_seq.shape[1], X_seq.shape[2])
-                if self.models['tcn_predictor']:
-                    self.models['tcn_predictor'].fit(X_seq, throughput, epochs=15, batch_size=16, verbose=0, validation_split=0.2)
+                models['tcn_predictor'] = self.build_tcn_predictor(X_seq.shape[1], X_seq.shape[2])
+                if models['tcn_predictor']:
+                    models['tcn_predictor'].fit(X_seq, throughput, epochs=15, batch_size=16, verbose=0, validation_split=0.2)
                     if verbose:
                         print("      ✓ TCN trained")
         
@@ -665,70 +623,122 @@ class MultiModelAnalyzer:
             if np.sum(valid_idx) >= 10:
                 X_valid = X[valid_idx]
                 y_valid = device_labels[valid_idx]
-                self.models['rf_fingerprinter'] = RandomForestClassifier(n_estimators=100, max_depth=10, random_state=42)
-                self.models['rf_fingerprinter'].fit(X_valid, y_valid)
+                models['rf_fingerprinter'] = RandomForestClassifier(n_estimators=100, max_depth=10, random_state=42)
+                models['rf_fingerprinter'].fit(X_valid, y_valid)
                 if verbose:
                     print(f"      ✓ Random Forest trained ({len(np.unique(y_valid))} devices)")
         
-        self.models_trained = True
-        self.parallel_predictor = ParallelModelPredictor(self.models)
-        
         if verbose:
             print("\n" + "="*70)
             print("✓ ALL MODELS TRAINED - PARALLEL PROCESSING ENABLED")
             print("="*70)
         
-        return True
+        # Compiled runners for the Keras models; training data calibrates int8 TFLite
+        bundle = ModelBundle(models, scaler, feature_columns, training_flows=len(X))
+        X_seq = np.array([seq for seq in sequences if len(seq) > 0]) if sequences else np.array([])
+        runners = compile_bundle(bundle, self.inference, {'autoencoder': X_scaled, 'lstm_classifier': X_seq,
+                                                          'tcn_predictor': X_seq})
+        bundle.predictor = ParallelModelPredictor(models, self.executor, self.backend, runners)
+        return bundle
     
-    def predict_all(self, flow_features, sequences):
-        """Run predictions with all 6 models IN PARALLEL"""
-        if not self.models_trained or not self.parallel_predictor:
+    def export_onnx(self, directory='onnx_models'):
+        """Write the live bundle's scaler and models to ``directory`` as ONNX files"""
+        bundle = self.bundle
+        if bundle is None:
+            return []
+        paths = write_onnx(bundle, directory)
+        print(f"[+] Exported {len(paths)} ONNX models to {directory}")
+        return paths
+    
+    def predict_all(self, flow_features, sequences, lstm_proba=None, tcn_pred=None):
+        """Run predictions with all 6 models IN PARALLEL (``lstm_proba``/``tcn_pred``: streamed outputs)"""
+        # One read of the reference: a concurrent swap cannot mix bundles
+        bundle = self._hold_bundle()
+        if bundle is None:
             return None
-        
-        X, ip_data = self._prepare_features(flow_features)
+        try:
+            if not bundle.predictor:
+                return None
+            return self._predict_bundle(bundle, flow_features, sequences, lstm_proba, tcn_pred)
+        finally:
+            bundle.release()
+    
+    def _predict_bundle(self, bundle, flow_features, sequences, lstm_proba, tcn_pred):
+        X, ip_data, _ = self._prepare_features(flow_features, bundle.feature_columns)
         if X is None:
             return None
         
-        X_scaled = self.scaler.transform(X)
+        X_scaled = (bundle.predictor.scaler or bundle.scaler).transform(X)
         X_seq = np.array([seq for seq in sequences if len(seq) > 0]) if sequences else np.array([])
         
-        # Run all models in parallel
-        results = self.parallel_predictor.predict_all_parallel(X, X_scaled, X_seq)
+        # Run all models in parallel (deep models on a subset with a cascade)
+        if self.cascade is not None:
+            results = self.cascade.run(bundle.predictor, X, X_scaled, X_seq, lstm_proba, tcn_pred)
+        else:
+            results = bundle.predictor.predict_all_parallel(X, X_scaled, X_seq, lstm_proba=lstm_proba,
+                                                            tcn_pred=tcn_pred)
         results['flow_count'] = len(X)
+        results['bundle_version'] = bundle.version
         
         return results
     
-    def _prepare_features(self, flow_features):
-        """Convert flow features to numerical array"""
+    def _prepare_features(self, flow_features, feature_columns=None):
+        """Convert flow features to numerical array in the bundle's column order"""
         if not flow_features:
-            return None, None
+            return None, None, feature_columns
         
+        import pandas as pd
         df = pd.DataFrame(flow_features)
         ip_data = df[['src_ip', 'dst_ip']].copy() if 'src_ip' in df.columns else None
         numerical_cols = [col for col in df.columns if col not in ['src_ip', 'dst_ip', 'protocol']]
         X = df[numerical_cols].fillna(0)
         
-        if self.feature_columns is None:
-            self.feature_columns = X.columns.tolist()
+        if feature_columns is None:
+            feature_columns = X.columns.tolist()
         
-        for col in self.feature_columns:
+        for col in feature_columns:
             if col not in X.columns:
                 X[col] = 0
         
-        X = X[self.feature_columns]
-        return X.values, ip_data
+        X = X[feature_columns]
+        return X.values, ip_data, feature_columns
 
 
 class RealTimeMultiModelAnalyzer:
     """Real-time continuous analysis with parallel model execution"""
     
-    def __init__(self, analysis_interval=15, debug_interval=5):
-        self.extractor = RealTimeFeatureExtractor(flow_timeout=300)  # 5 minute timeout
-        self.analyzer = MultiModelAnalyzer()
+    def __init__(self, analysis_interval=15, debug_interval=5, retrain_every=0, max_training_flows=5000,
+                 batch_wait=0.05, max_batch_size=256, model_backend='thread', cascade=None,
+                 streaming=False, inference='keras', clock=time.time):
+        # Flow timeouts and the analysis/debug intervals run on clock. A
+        # ReplayClock follows the replayed packets, and training then blocks
+        # the replay so the models go live at the same packet on every run
+        self.clock = clock
+        self.replaying = isinstance(clock, ReplayClock)
+        self.extractor = RealTimeFeatureExtractor(flow_timeout=300, clock=clock)  # 5 minute timeout
+        self.analyzer = MultiModelAnalyzer(backend=model_backend, cascade=cascade, inference=inference)
+        # Completed flows are scored in micro-batches: batch_wait trades latency for throughput
+        self.scheduler = MicroBatchScheduler(self.analyzer.predict_all, self._display_batch_results,
+                                             max_batch_size=max_batch_size, max_wait=batch_wait,
+                                             clock=clock if self.replaying else None).start()
         self.analysis_interval = analysis_interval
         self.debug_interval = debug_interval
-        self.last_analysis = time.time()
-        self.last_debug = time.time()
+        # Retrain in the background every N completed flows (0 = train once)
+        self.retrain_every = retrain_every
+        self.max_training_flows = max_training_flows
+        self.flows_since_training = 0
+        # Periodic analysis updates per-flow LSTM state / TCN activations instead of re-running whole windows
+        self.streaming = streaming
+        self.streams = {}  # model key -> (bundle version, streaming engine or None)
+        self.last_analysis = clock()
+        self.last_debug = clock()
+        # Set on each analysis tick; cleared by whichever worker gets model_lock next
+        self.analysis_pending = False
+        
+        # 802.11 management/data frames from a raw capture; records idle past
+        # the aggregator's timeout move to wireless_records (saved as CSV)
+        self.wireless = WirelessAggregator()
+        self.wireless_records = ([], [])
         
         # Statistics
         self.total_packets = 0
@@ -738,40 +748,142 @@ class RealTimeMultiModelAnalyzer:
         self.traffic_class_counts = defaultdict(int)
         self.device_counts = defaultdict(int)
         
+        # process_packet runs on several pipeline workers: flow updates run
+        # concurrently, model work on whichever worker holds model_lock
+        self.stats_lock = threading.Lock()
+        self.model_lock = threading.Lock()
+        self.pending_flows = deque()
+        self.pipeline = None
+        self.kernel_stats = None   # capture socket counters (KernelCaptureStats)
+        
         self.running = True
         
     def process_packet(self, packet):
-        """Process single packet in real-time"""
-        self.total_packets += 1
-        
-        # Extract features and update flow stats
-        flow_key = self.extractor.update_flow_stats(packet)
+        """Process single packet in real-time (safe to call from several workers)"""
+        # Extract features and update flow stats; raw frames were already
+        # classified, 802.11 frames feed the wireless aggregator instead
+        # (it locks its records, so both workers may update it)
+        if isinstance(packet, RawFrame):
+            if packet.kind & FRAME_DOT11:
+                self.wireless.update(packet.data, packet.linktype, packet.timestamp)
+            if packet.kind & FRAME_IP:
+                self.extractor.update_flow_stats(packet)
+        else:
+            self.extractor.update_flow_stats(packet)
+        
+        current_time = self.clock()
+        with self.stats_lock:
+            self.total_packets += 1
+            print_debug = current_time - self.last_debug >= self.debug_interval
+            if print_debug:
+                self.last_debug = current_time
+            run_analysis = current_time - self.last_analysis >= self.analysis_interval
+            if run_analysis:
+                self.last_analysis = current_time
+                self.analysis_pending = True
         
         # Debug output every X seconds
-        current_time = time.time()
-        if current_time - self.last_debug >= self.debug_interval:
+        if print_debug:
             self._print_debug_info()
-            self.last_debug = current_time
         
-        # Check for completed flows and analyze them immediately
-        completed_flows = self.extractor.check_completed_flows()
-        if completed_flows:
-            self._process_completed_flows(completed_flows)
+        if run_analysis:
+            self._expire_wireless()
         
-        # Periodic full analysis
-        if current_time - self.last_analysis >= self.analysis_interval:
-            if self.analyzer.models_trained:
+        # Check for completed flows and analyze them immediately
+        self.pending_flows.extend(self.extractor.check_completed_flows())
+        if self.replaying:
+            # Batches due on the replay clock go to the scheduler thread
+            self.scheduler.poll()
+        
+        # Training and inference run on one worker at a time; the others
+        # keep updating flows instead of waiting for the models
+        if not self.model_lock.acquire(blocking=False):
+            return
+        try:
+            completed_flows = []
+            while self.pending_flows:
+                completed_flows.append(self.pending_flows.popleft())
+            if completed_flows:
+                self._process_completed_flows(list(dict.fromkeys(completed_flows)))
+            
+            # Periodic full analysis, also for a tick that fell on a worker
+            # which could not take model_lock
+            with self.stats_lock:
+                analysis_due, self.analysis_pending = self.analysis_pending, False
+            if analysis_due and self.analyzer.models_trained:
                 self.analyze_all_active_flows()
-            self.last_analysis = current_time
+        finally:
+            self.model_lock.release()
     
     def _print_debug_info(self):
         """Print debug information every few seconds"""
         active_flows = self.extractor.get_active_flow_count()
-        print(f"\n[DEBUG {datetime.now().strftime('%H:%M:%S')}] "
+        queue_info = ""
+        if self.pipeline is not None:
+            queue_info = (f"Queue: {self.pipeline.depth} | "
+                          f"Dropped: {self.pipeline.dropped:,} | ")
+        if self.kernel_stats is not None and self.kernel_stats.available:
+            self.kernel_stats.poll()
+            queue_info += f"Kernel drops: {self.kernel_stats.drops:,} | "
+        wireless_info = f"802.11: {self.wireless.summary()} | " if self.wireless.frames else ""
+        print(f"\n[DEBUG {self._now()}] "
               f"Packets: {self.total_packets:,} | "
               f"Active Flows: {active_flows} | "
               f"Processed: {self.total_flows_processed} | "
-              f"Models: {'✓ TRAINED' if self.analyzer.models_trained else '✗ Training...'}")
+              f"{queue_info}{wireless_info}"
+              f"Models: {self._model_status()}")
+    
+    def _now(self):
+        """Current time of the analyzer's clock (capture time when replaying) for headers"""
+        return datetime.fromtimestamp(self.clock()).strftime('%H:%M:%S')
+    
+    def _model_status(self):
+        """Short model state for the debug line"""
+        bundle = self.analyzer.bundle
+        if bundle is None:
+            return '✗ Training...' if self.analyzer.trainer.busy else '✗ Collecting...'
+        status = f"✓ TRAINED v{bundle.version}"
+        if self.analyzer.trainer.busy:
+            status += " (retraining)"
+        return status
+    
+    def _expire_wireless(self):
+        """Move BSSID/station records idle past the aggregator's timeout to wireless_records"""
+        bssids, stations = self.wireless.expire()
+        with self.stats_lock:
+            self.wireless_records[0].extend(bssids)
+            self.wireless_records[1].extend(stations)
+    
+    def save_wireless_records(self, directory='wireless_records'):
+        """Write expired and live 802.11 records as CSV training data"""
+        bssids, stations = self.wireless.records()
+        if not (bssids or stations or self.wireless_records[0] or self.wireless_records[1]):
+            return
+        os.makedirs(directory, exist_ok=True)
+        for label, expired, live in (('BSSID', self.wireless_records[0], bssids),
+                                     ('station', self.wireless_records[1], stations)):
+            path = os.path.join(directory, f"wifi_{label.lower()}s.csv")
+            print(f"[+] {save_records(expired + live, path)} {label} records saved to {path}")
+    
+    def _collect_training_flows(self, flow_features, sequences):
+        """Keep the most recent completed flows (and their sequences) for training"""
+        self.analyzer.training_data.extend(flow_features)
+        self.analyzer.training_sequences.extend(sequences)
+        excess = len(self.analyzer.training_data) - self.max_training_flows
+        if excess > 0:
+            del self.analyzer.training_data[:excess]
+            del self.analyzer.training_sequences[:excess]
+        self.flows_since_training += len(flow_features)
+    
+    def _start_training(self):
+        """Hand a snapshot of the training flows to the background trainer"""
+        if self.analyzer.train_in_background(self.analyzer.training_data,
+                                             self.analyzer.training_sequences):
+            self.flows_since_training = 0
+            if self.replaying:
+                self.analyzer.trainer.wait()
+            return True
+        return False
     
     def _process_completed_flows(self, completed_flow_keys):
         """Process completed flows immediately with PARALLEL model execution"""
@@ -789,29 +901,25 @@ class RealTimeMultiModelAnalyzer:
         if not flow_features:
             return
         
-        # If models not trained yet, accumulate data and train when ready
+        if not self.analyzer.models_trained or self.retrain_every:
+            self._collect_training_flows(flow_features, sequences)
+        
+        # If models not trained yet, accumulate data and train when ready;
+        # training runs in the background while capture continues
         if not self.analyzer.models_trained:
-            total_data = len(self.analyzer.training_data) + len(flow_features)
-            if total_data >= 20:
-                print(f"\n[*] Sufficient flows ({total_data}). Training all 6 models in parallel...")
-                all_features = self.analyzer.training_data + flow_features
-                all_sequences = sequences
-                success = self.analyzer.train_all_models(all_features, all_sequences, verbose=True)
-                if success:
-                    print("[+] ✓ Models ready! All predictions now run in PARALLEL!")
-            else:
-                # Store for later training
-                self.analyzer.training_data.extend(flow_features)
+            total_data = len(self.analyzer.training_data)
+            if total_data < 20:
                 print(f"[*] Collecting flows... ({total_data}/20 for training)")
+            elif self._start_training():
+                print(f"\n[*] Sufficient flows ({total_data}). Training all 6 models in the background...")
         
         # If models are trained, analyze completed flows IN PARALLEL
-        elif self.analyzer.models_trained:
-            results = self.analyzer.predict_all(flow_features, sequences)
-            if results:
-                print(f"\n{'='*70}")
-                print(f"[{datetime.now().strftime('%H:%M:%S')}] COMPLETED FLOWS → PARALLEL ANALYSIS ({len(flow_features)} flows)")
-                print(f"{'='*70}")
-                self._display_flow_results(results, flow_features)
+        else:
+            if self.retrain_every and self.flows_since_training >= self.retrain_every:
+                if self._start_training():
+                    print(f"\n[*] Retraining on {len(self.analyzer.training_data)} flows in the background...")
+            
+            self.scheduler.submit(flow_features, sequences)
         
         # Remove completed flows from tracking
         for flow_key in completed_flow_keys:
@@ -822,23 +930,60 @@ class RealTimeMultiModelAnalyzer:
         if not self.analyzer.models_trained:
             return
         
+        flow_keys = []
         flow_features = []
-        sequences = []
         
         for flow_key in list(self.extractor.flow_stats.keys()):
             feat = self.extractor.get_flow_features(flow_key)
             if feat:
+                flow_keys.append(flow_key)
                 flow_features.append(feat)
-                seq = self.extractor.get_flow_sequence(flow_key)
-                sequences.append(seq)
         
         if not flow_features:
             return
         
-        results = self.analyzer.predict_all(flow_features, sequences)
+        lstm_proba = tcn_pred = None
+        if self.streaming:
+            lstm_proba = self._stream_model('lstm_classifier', StreamingLSTM, flow_keys)
+            tcn_pred = self._stream_model('tcn_predictor', StreamingTCN, flow_keys)
+        
+        # Full windows are only needed for a sequence model that is not streamed
+        sequences = []
+        if lstm_proba is None or tcn_pred is None:
+            sequences = [self.extractor.get_flow_sequence(flow_key) for flow_key in flow_keys]
+        
+        results = self.analyzer.predict_all(flow_features, sequences, lstm_proba, tcn_pred)
         if results:
             self._display_multi_model_results(results, flow_features)
     
+    def _stream_model(self, model_key, engine_class, flow_keys):
+        """Outputs of one sequence model for the active flows from its streaming engine (None if unavailable)"""
+        bundle = self.analyzer.bundle
+        model = bundle.models.get(model_key) if bundle is not None else None
+        if model is None or not TENSORFLOW_AVAILABLE:
+            return None
+        stream = self.streams.get(model_key)
+        if stream is None or stream[0] != bundle.version:
+            # A new bundle starts fresh states; flows in progress resume from their stored window
+            try:
+                engine = engine_class.from_keras(model)
+            except ValueError as e:
+                print(f"[!] {model_key} cannot be streamed, running it on full windows: {e}")
+                engine = None
+            stream = self.streams[model_key] = (bundle.version, engine)
+        if stream[1] is None:
+            return None
+        return stream_flows(stream[1], self.extractor, flow_keys)
+    
+    def _display_batch_results(self, results, flow_features, info):
+        """Print one scored micro-batch of completed flows"""
+        print(f"\n{'='*70}")
+        print(f"[{self._now()}] COMPLETED FLOWS → PARALLEL ANALYSIS ({len(flow_features)} flows)")
+        print(f"  Batch: {info.latency * 1e3:.0f} ms latency ({info.wait * 1e3:.0f} ms queued) | "
+              f"{info.throughput:,.0f} flows/s")
+        print(f"{'='*70}")
+        self._display_flow_results(results, flow_features)
+    
     def _display_flow_results(self, results, flow_features):
         """Display brief results from completed flows"""
         print(f"  Models Used: {', '.join(results['models_used'])}")
@@ -873,7 +1018,7 @@ class RealTimeMultiModelAnalyzer:
     def _display_multi_model_results(self, results, flow_features):
         """Display comprehensive results from all models"""
         print(f"\n{'='*70}")
-        print(f"[{datetime.now().strftime('%H:%M:%S')}] PERIODIC ANALYSIS - ALL MODELS (PARALLEL)")
+        print(f"[{self._now()}] PERIODIC ANALYSIS - ALL MODELS (PARALLEL)")
         print(f"{'='*70}")
         print(f"Models: {', '.join(results['models_used'])}")
         print(f"Active Flows: {results['flow_count']}")
@@ -914,14 +1059,14 @@ class RealTimeMultiModelAnalyzer:
         # LSTM
         if 'lstm_traffic_class' in results:
             print(f"\n[4. LSTM - Sequential Analysis]")
-            unique_classes = np.unique(results['lstm_traffic_class'])
+            unique_classes = np.unique(results['lstm_traffic_class'][results['lstm_traffic_class'] >= 0])
             print(f"  Patterns: {len(unique_classes)}")
         
         # TCN
         if 'tcn_throughput' in results:
             print(f"\n[5. TCN - Performance Prediction]")
-            print(f"  Throughput: Avg={np.mean(results['tcn_throughput']):.1f} "
-                  f"Max={np.max(results['tcn_throughput']):.1f} bytes/sec")
+            print(f"  Throughput: Avg={np.nanmean(results['tcn_throughput']):.1f} "
+                  f"Max={np.nanmax(results['tcn_throughput']):.1f} bytes/sec")
         
         # Random Forest
         if 'rf_device_id' in results:
@@ -937,9 +1082,21 @@ class RealTimeMultiModelAnalyzer:
         print(f"FINAL ANALYSIS SUMMARY")
         print(f"{'='*70}")
         print(f"Total Packets Captured: {self.total_packets:,}")
+        if self.wireless.frames:
+            print(f"802.11 Frames: {self.wireless.summary()}")
+        if self.kernel_stats is not None and self.kernel_stats.available:
+            print(f"Kernel Capture: {self.kernel_stats.summary()}")
+        if self.pipeline is not None:
+            print(f"Capture Queue: {self.pipeline.summary()}")
+        print(f"Inference Batches: {self.scheduler.summary()}")
+        if self.analyzer.cascade is not None:
+            print(f"Model Cascade: {self.analyzer.cascade.summary()}")
         print(f"Total Flows Processed: {self.total_flows_processed:,}")
         print(f"Active Flows at End: {self.extractor.get_active_flow_count()}")
         print(f"Models Trained: {'Yes' if self.analyzer.models_trained else 'No'}")
+        if self.analyzer.models_trained:
+            print(f"Model Bundle: v{self.analyzer.bundle.version} "
+                  f"({self.analyzer.trainer.jobs} background training runs)")
         print(f"Parallel Processing: {'Enabled' if self.analyzer.parallel_predictor else 'Disabled'}")
         
         if self.analyzer.models_trained:
@@ -1017,18 +1174,42 @@ def main():
     # List available interfaces
     capture.list_interfaces()
     
-    # Get interface from user
-    interface = input("\n[?] Enter interface name (default: wlan0): ").strip()
-    if interface:
-        capture.interface = interface
+    # Replay or live source (interface, monitor mode, backend, scope)
+    monitor = 'y' if configure_capture(capture, ask_monitor=True) else 'n'
+    
+    # sklearn/XGBoost scoring in worker processes needs spare cores
+    processes = input("[?] Score IF/XGBoost/RF in worker processes? (y/n, default: n): ").strip().lower()
+    
+    # Keras models only on flows the cheap models find suspicious (plus a 5% sample)
+    cascade = input("[?] Run deep models only on suspicious flows? (y/n, default: n): ").strip().lower()
     
-    # Ask about monitor mode
-    monitor = input("[?] Enable monitor mode? (y/n, default: n): ").strip().lower()
-    if monitor == 'y':
-        capture.enable_monitor_mode()
+    # Periodic analysis: LSTM state and TCN activations carried per flow, updated by new packets only
+    streaming = input("[?] Stream LSTM/TCN state per flow between analyses? (y/n, default: n): ").strip().lower()
     
-    # Initialize analyzer with parallel processing
-    analyzer = RealTimeMultiModelAnalyzer(analysis_interval=15, debug_interval=5)
+    # Keras models through a tf.function or TFLite, or every model through onnxruntime
+    inference = input(f"[?] Keras inference ({'/'.join(INFERENCE_MODES)}, default: keras): ").strip().lower()
+    if inference not in INFERENCE_MODES:
+        inference = 'keras'
+    
+    # Monitor mode is mostly 802.11 frames without IP: classify raw bytes, drop or divert before dissection
+    raw = input(f"[?] Drop non-IP frames before dissection? (y/n, default: {monitor or 'n'}): ").strip().lower() or monitor
+    
+    # Initialize analyzer with parallel processing; a replay runs it on the
+    # replay's clock with a fixed cascade sample, so repeated runs agree
+    replaying = capture.replay is not None
+    analyzer = RealTimeMultiModelAnalyzer(analysis_interval=15, debug_interval=5,
+                                          model_backend='process' if processes == 'y' else 'thread',
+                                          cascade=ModelCascade(seed=0 if replaying else None) if cascade == 'y' else None,
+                                          streaming=streaming == 'y', inference=inference,
+                                          clock=capture.replay.clock if replaying else time.time)
+    
+    # Capture thread only enqueues; two workers update flows and run the models.
+    # A replay skips the queue: packets are processed in file order, one at a time
+    pipeline = PacketPipeline(analyzer.process_packet, workers=2, maxsize=10000,
+                              policy='drop-newest')
+    if not replaying:
+        analyzer.pipeline = pipeline
+        analyzer.kernel_stats = capture.kernel_stats
     
     print("\n[*] Starting continuous packet capture...")
     print("[*] System will:")
@@ -1043,18 +1224,26 @@ def main():
     
     try:
         # Start continuous capture with real-time processing
-        capture.start_capture(prn=analyzer.process_packet)
+        if replaying:
+            capture.start_capture(prn=analyzer.process_packet, raw=raw == 'y')
+        else:
+            pipeline.start()
+            capture.start_capture(prn=pipeline.submit, raw=raw == 'y')
         
     except KeyboardInterrupt:
         print("\n[*] Stopping capture...")
     finally:
         capture.stop_capture()
+        pipeline.stop()
+        analyzer.scheduler.stop()
+        analyzer.analyzer.close()
         
         if monitor == 'y':
             capture.disable_monitor_mode()
         
         # Final comprehensive summary
         analyzer.display_final_summary()
+        analyzer.save_wireless_records()
         print("\n[+] Multi-model parallel analysis complete!")
 
 
@@ -1,6 +1,6 @@
 """
 Real-Time WiFi Traffic Capture & AI Analysis System
-Directly captures packets using tshark/tcpdump and processes them in real-time
+Captures packets with scapy or through a dumpcap/tcpdump pipe and processes them in real-time
 Optimized for Kali Linux
 
 Requirements:
@@ -22,12 +22,10 @@ from collections import defaultdict, deque
 from datetime import datetime
 
 import numpy as np
-import pandas as pd
-from scapy.all import sniff, IP, TCP, UDP, ICMP, wrpcap, Ether, RadioTap
-from sklearn.ensemble import IsolationForest, RandomForestClassifier, RandomForestRegressor
-from sklearn.preprocessing import StandardScaler
-import xgboost as xgb
-import lightgbm as lgb
+from packet_decoder import decode_bytes, decode_packet
+from flow_stats import FlowRecord, packet_flow_key
+from capture_pipeline import PacketPipeline
+# scikit-learn, pandas and scapy are imported on first use (fast start-up)
 import warnings
 warnings.filterwarnings('ignore')
 
@@ -35,9 +33,12 @@ warnings.filterwarnings('ignore')
 class LivePacketCapture:
     """Live packet capture using Scapy and system tools"""
     
-    def __init__(self, interface='wlan0', buffer_size=100):
+    def __init__(self, interface='wlan0', buffer_size=100, pipe_source=None):
         self.interface = interface
         self.buffer_size = buffer_size
+        # dumpcap/tcpdump (or a pcap file/FIFO path) to capture through instead of scapy
+        self.pipe_source = pipe_source
+        self.pipe = None
         self.packet_buffer = deque(maxlen=buffer_size)
         self.capture_active = False
         self.packet_count = 0
@@ -118,7 +119,12 @@ class LivePacketCapture:
             if prn is None:
                 prn = self.packet_callback
             
+            if self.pipe_source:
+                self._capture_pipe(prn, duration, packet_count)
+                return
+            
             # Start sniffing
+            from scapy.all import sniff
             sniff(
                 iface=self.interface,
                 prn=prn,
@@ -137,10 +143,32 @@ class LivePacketCapture:
         finally:
             self.capture_active = False
     
+    def _capture_pipe(self, prn, duration=None, packet_count=None):
+        """Capture in a dumpcap/tcpdump child process and decode its pcap stream"""
+        from pcap_stream import PcapPipe
+        deadline = time.time() + duration if duration else None
+        remaining = [packet_count or -1]
+        
+        def is_active():
+            return self.capture_active and remaining[0] != 0 and (deadline is None or time.time() < deadline)
+        
+        self.pipe = PcapPipe(self.pipe_source, self.interface)
+        try:
+            for view, linktype, timestamp in self.pipe.frames(is_active):
+                # The view is reused for the next record: hand out the decoded headers
+                prn(decode_bytes(view, linktype, timestamp))
+                remaining[0] -= 1
+                if not is_active():
+                    break
+        finally:
+            self.pipe.close()
+    
     def stop_capture(self):
         """Stop packet capture"""
         self.capture_active = False
         print(f"\n[+] Capture stopped. Total packets: {self.packet_count}")
+        if self.pipe is not None:
+            print(f"[+] Pipe: {self.pipe.summary()}")
     
     def get_packets(self):
         """Get captured packets from buffer"""
@@ -150,140 +178,98 @@ class LivePacketCapture:
 class RealTimeFeatureExtractor:
     """Extract features from packets in real-time"""
     
-    def __init__(self, window_size=50):
-        self.window_size = window_size
-        self.flow_windows = defaultdict(lambda: deque(maxlen=window_size))
-        self.flow_stats = defaultdict(lambda: {
-            'packet_count': 0,
-            'byte_count': 0,
-            'start_time': None,
-            'last_time': None,
-            'src_ip': None,
-            'dst_ip': None,
-            'src_port': None,
-            'dst_port': None,
-            'protocol': None
-        })
+    def __init__(self):
+        self.flow_stats = defaultdict(FlowRecord)
     
     def extract_packet_features(self, packet):
         """Extract features from single packet"""
+        frame = decode_packet(packet)
         features = {
             'timestamp': time.time(),
-            'packet_length': len(packet),
+            'packet_length': frame.length,
             'has_ip': 0,
             'has_tcp': 0,
             'has_udp': 0,
             'has_icmp': 0
         }
         
-        if packet.haslayer(IP):
+        if frame.has_ip:
             features['has_ip'] = 1
-            ip = packet[IP]
-            features['ip_len'] = ip.len
-            features['ip_ttl'] = ip.ttl
-            features['ip_proto'] = ip.proto
-            features['src_ip'] = ip.src
-            features['dst_ip'] = ip.dst
+            features['ip_len'] = frame.ip_len
+            features['ip_ttl'] = frame.ip_ttl
+            features['ip_proto'] = frame.ip_proto
+            features['src_ip'] = frame.src_ip
+            features['dst_ip'] = frame.dst_ip
             
-            if packet.haslayer(TCP):
+            if frame.has_tcp:
                 features['has_tcp'] = 1
-                tcp = packet[TCP]
-                features['src_port'] = tcp.sport
-                features['dst_port'] = tcp.dport
-                features['tcp_window'] = tcp.window
-                features['flag_syn'] = 1 if tcp.flags.S else 0
-                features['flag_ack'] = 1 if tcp.flags.A else 0
-                features['flag_fin'] = 1 if tcp.flags.F else 0
-                features['flag_rst'] = 1 if tcp.flags.R else 0
-                features['flag_psh'] = 1 if tcp.flags.P else 0
+                features['src_port'] = frame.src_port
+                features['dst_port'] = frame.dst_port
+                features['tcp_window'] = frame.tcp_window
+                features['flag_syn'] = frame.flag_syn
+                features['flag_ack'] = frame.flag_ack
+                features['flag_fin'] = frame.flag_fin
+                features['flag_rst'] = frame.flag_rst
+                features['flag_psh'] = frame.flag_psh
                 
-            elif packet.haslayer(UDP):
+            elif frame.has_udp:
                 features['has_udp'] = 1
-                udp = packet[UDP]
-                features['src_port'] = udp.sport
-                features['dst_port'] = udp.dport
-                features['udp_len'] = udp.len
+                features['src_port'] = frame.src_port
+                features['dst_port'] = frame.dst_port
+                features['udp_len'] = frame.udp_len
             
-            elif packet.haslayer(ICMP):
+            elif frame.has_icmp:
                 features['has_icmp'] = 1
         
         return features
     
     def update_flow_stats(self, packet):
         """Update flow statistics with new packet"""
-        if not packet.haslayer(IP):
+        frame = decode_packet(packet)
+        if not frame.has_ip:
             return None
         
-        flow_key = self._get_flow_key(packet)
-        if not flow_key:
+        key = self._get_flow_key(frame)
+        if key is None:
             return None
+        flow_key, direction = key >> 1, key & 1
         
-        stats = self.flow_stats[flow_key]
-        current_time = time.time()
-        
-        # Update basic stats
-        stats['packet_count'] += 1
-        stats['byte_count'] += len(packet)
-        
-        if stats['start_time'] is None:
-            stats['start_time'] = current_time
-        stats['last_time'] = current_time
-        
-        # Store packet info
-        ip = packet[IP]
-        stats['src_ip'] = ip.src
-        stats['dst_ip'] = ip.dst
-        
-        if packet.haslayer(TCP):
-            stats['protocol'] = 'TCP'
-            stats['src_port'] = packet[TCP].sport
-            stats['dst_port'] = packet[TCP].dport
-        elif packet.haslayer(UDP):
-            stats['protocol'] = 'UDP'
-            stats['src_port'] = packet[UDP].sport
-            stats['dst_port'] = packet[UDP].dport
-        
-        # Add to flow window
-        self.flow_windows[flow_key].append({
-            'length': len(packet),
-            'time': current_time
-        })
+        # Update basic stats and the size/gap accumulators
+        self.flow_stats[flow_key].update(frame, time.time(), direction)
         
         return flow_key
     
     def get_flow_features(self, flow_key):
         """Get comprehensive features for a flow"""
         stats = self.flow_stats[flow_key]
-        window = list(self.flow_windows[flow_key])
         
-        if len(window) < 2:
+        if stats.packet_count < 2:
             return None
         
-        # Calculate statistics
-        lengths = [p['length'] for p in window]
-        times = [p['time'] for p in window]
-        intervals = [times[i] - times[i-1] for i in range(1, len(times))]
-        
         features = {
-            'flow_duration': stats['last_time'] - stats['start_time'] if stats['start_time'] else 0,
-            'flow_packet_count': stats['packet_count'],
-            'flow_byte_count': stats['byte_count'],
-            'flow_bytes_per_packet_mean': np.mean(lengths),
-            'flow_bytes_per_packet_std': np.std(lengths),
-            'flow_bytes_per_packet_min': np.min(lengths),
-            'flow_bytes_per_packet_max': np.max(lengths),
-            'src_ip': stats['src_ip'],
-            'dst_ip': stats['dst_ip'],
-            'src_port': stats.get('src_port', 0),
-            'dst_port': stats.get('dst_port', 0),
-            'protocol': stats.get('protocol', 'OTHER')
+            'flow_duration': stats.last_time - stats.start_time if stats.start_time else 0,
+            'flow_packet_count': stats.packet_count,
+            'flow_byte_count': stats.byte_count,
+            'flow_bytes_per_packet_mean': stats.size_mean,
+            'flow_bytes_per_packet_std': stats.size_std,
+            'flow_bytes_per_packet_min': stats.size_min,
+            'flow_bytes_per_packet_max': stats.size_max,
+            'flow_fwd_packets': stats.fwd_packets,
+            'flow_bwd_packets': stats.bwd_packets,
+            'flow_fwd_bytes': stats.fwd_bytes,
+            'flow_bwd_bytes': stats.bwd_bytes,
+            'src_ip': stats.src_ip,
+            'dst_ip': stats.dst_ip,
+            'src_port': stats.src_port,
+            'dst_port': stats.dst_port,
+            'protocol': stats.protocol
         }
         
-        if intervals:
-            features['flow_inter_arrival_mean'] = np.mean(intervals)
-            features['flow_inter_arrival_std'] = np.std(intervals)
-            features['flow_inter_arrival_min'] = np.min(intervals)
-            features['flow_inter_arrival_max'] = np.max(intervals)
+        if stats.gap_count:
+            features['flow_inter_arrival_mean'] = stats.gap_mean
+            features['flow_inter_arrival_std'] = stats.gap_std
+            features['flow_inter_arrival_min'] = stats.gap_min
+            features['flow_inter_arrival_max'] = stats.gap_max
         else:
             features['flow_inter_arrival_mean'] = 0
             features['flow_inter_arrival_std'] = 0
@@ -293,27 +279,8 @@ class RealTimeFeatureExtractor:
         return features
     
     def _get_flow_key(self, packet):
-        """Generate flow identifier"""
-        if not packet.haslayer(IP):
-            return None
-        
-        src_ip = packet[IP].src
-        dst_ip = packet[IP].dst
-        
-        if packet.haslayer(TCP):
-            src_port = packet[TCP].sport
-            dst_port = packet[TCP].dport
-            proto = 'TCP'
-        elif packet.haslayer(UDP):
-            src_port = packet[UDP].sport
-            dst_port = packet[UDP].dport
-            proto = 'UDP'
-        else:
-            src_port = 0
-            dst_port = 0
-            proto = 'OTHER'
-        
-        return tuple(sorted([(src_ip, src_port), (dst_ip, dst_port)]) + [proto])
+        """Packed packet key: flow identifier (same for both directions) << 1 | direction bit"""
+        return packet_flow_key(decode_packet(packet))
 
 
 class RealTimeAnalyzer:
@@ -323,7 +290,7 @@ class RealTimeAnalyzer:
         self.extractor = RealTimeFeatureExtractor()
         self.models_trained = False
         self.anomaly_detector = None
-        self.scaler = StandardScaler()
+        self.scaler = None
         self.feature_columns = None
         self.update_interval = update_interval
         self.last_update = time.time()
@@ -338,7 +305,7 @@ class RealTimeAnalyzer:
         # Extract features and update flow stats
         flow_key = self.extractor.update_flow_stats(packet)
         
-        if flow_key:
+        if flow_key is not None:
             self.total_flows = len(self.extractor.flow_stats)
         
         # Periodically update display and analyze
@@ -371,7 +338,10 @@ class RealTimeAnalyzer:
             return False
         
         # Train anomaly detector
+        from sklearn.ensemble import IsolationForest
+        from sklearn.preprocessing import StandardScaler
         print(f"[*] Training Isolation Forest on {len(X)} flows...")
+        self.scaler = StandardScaler()
         self.anomaly_detector = IsolationForest(
             contamination=0.1,
             random_state=42,
@@ -449,6 +419,7 @@ class RealTimeAnalyzer:
         if not flow_features:
             return None
         
+        import pandas as pd
         df = pd.DataFrame(flow_features)
         
         # Select numerical features
@@ -510,9 +481,17 @@ def main():
     if monitor == 'y':
         capture.enable_monitor_mode()
     
+    # Native capture process: packets queue up in the pipe instead of being dropped when Python stalls
+    source = input("[?] Capture through dumpcap/tcpdump or a pcap FIFO path (default: scapy sniff): ").strip()
+    if source:
+        capture.pipe_source = source
+    
     # Initialize analyzer
     analyzer = RealTimeAnalyzer(update_interval=10)
     
+    # Phase 2 hands packets to one analysis worker so inference never blocks capture
+    pipeline = PacketPipeline(analyzer.process_packet, workers=1, maxsize=10000, policy='drop-newest')
+    
     print("\n[*] Phase 1: Capturing initial traffic for model training...")
     print("[*] Capturing 500 packets for baseline...")
     
@@ -539,12 +518,14 @@ def main():
         
         # Start real-time capture and analysis
         capture.packet_count = 0
-        capture.start_capture(prn=analyzer.process_packet)
+        pipeline.start()
+        capture.start_capture(prn=pipeline.submit)
         
     except KeyboardInterrupt:
         print("\n[*] Stopping capture...")
     finally:
         capture.stop_capture()
+        pipeline.stop()
         
         if monitor == 'y':
             capture.disable_monitor_mode()
@@ -553,6 +534,7 @@ def main():
         analyzer.display_status()
         print("\n[+] Analysis complete!")
         print(f"[+] Total packets analyzed: {analyzer.total_packets}")
+        print(f"[+] Capture queue: {pipeline.summary()}")
         print(f"[+] Total flows tracked: {analyzer.total_flows}")
         print(f"[+] Total anomalies detected: {analyzer.anomaly_count}")
 